@@ -0,0 +1,118 @@
+"""
+Alignment microbenchmark: SequenceMatcher + compare() vs AlignmentEngine.
+
+Times the per-candidate extraction of matches, past/present, missing and
+extras for patterns of 10, 50 and 200 symbols against a 20-symbol STM:
+  - compare:   SequenceMatcher blocks over the pattern, then a second
+               SequenceMatcher over present whose compare() delta lines are
+               parsed into missing and extras (the previous extractor)
+  - alignment: one AlignmentEngine per STM, one alignment per candidate,
+               missing and extras read off the blocks as index ranges
+
+Both must produce the same fields. No services needed.
+
+Usage:
+    python -m benchmarks.test_alignment
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+import time
+
+from benchmarks.profiler import TimingCollector
+
+VOCABULARY = 40
+STATE_LENGTH = 20
+CANDIDATES = 2_000
+
+
+def _compare_extract(pattern, state):
+    from kato.informatics.extractor import SequenceMatcher
+
+    matcher = SequenceMatcher()
+    matcher.set_seq1(pattern)
+    matcher.set_seq2(state)
+    blocks = matcher.get_matching_blocks()
+    matches = []
+    for _, j, n in blocks[:-1]:
+        matches += state[j:j + n]
+    if len(blocks) > 1:
+        i0 = blocks[0][0]
+        i1, _, n1 = blocks[-2]
+        past, present = pattern[:i0], pattern[i0:i1 + n1]
+    else:
+        past, present = [], pattern
+    missing, extras = [], []
+    if present:
+        matcher.set_seq1(present)
+        for diff in matcher.compare():
+            if diff.startswith("- "):
+                missing.append(diff[2:])
+            elif diff.startswith("+ "):
+                extras.append(diff[2:])
+    return matches, past, present, missing, extras
+
+
+def _alignment_extract(engine, pattern, state):
+    alignment = engine.align(pattern)
+    return (alignment.matching_intersection(state), pattern[slice(*alignment.past)],
+            pattern[slice(*alignment.present)], alignment.missing(pattern), alignment.extras(state))
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 5) -> TimingCollector:
+    """Run both extractions per candidate across pattern lengths."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10, 50, 200]
+
+    from kato.informatics.alignment import AlignmentEngine
+
+    rng = random.Random(11)
+    state = [f"tok_{rng.randrange(VOCABULARY)}" for _ in range(STATE_LENGTH)]
+
+    print("=" * 70)
+    print(f"  KATO Alignment: per-candidate extraction, {STATE_LENGTH}-symbol STM")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        patterns = [[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(tier)] for _ in range(CANDIDATES)]
+        row = {'tier': tier}
+        for _ in range(iterations):
+            start = time.perf_counter()
+            expected = [_compare_extract(p, state) for p in patterns]
+            collector.record(f"compare.{tier}", (time.perf_counter() - start) * 1e6 / CANDIDATES)
+
+            start = time.perf_counter()
+            engine = AlignmentEngine(state)
+            actual = [_alignment_extract(engine, p, state) for p in patterns]
+            collector.record(f"alignment.{tier}", (time.perf_counter() - start) * 1e6 / CANDIDATES)
+        if actual != expected:
+            print(f"  WARNING: alignment and compare() results differ for {tier}-symbol patterns")
+        row['compare'] = collector.get_stats(f"compare.{tier}")
+        row['alignment'] = collector.get_stats(f"alignment.{tier}")
+        results.append(row)
+
+    print(f"\n  {'Pattern len':>11} {'compare() p50':>14} {'Alignment p50':>14} {'Speedup':>8}")
+    for r in results:
+        print(
+            f"  {r['tier']:>11,} "
+            f"{r['compare']['median']:>11.1f}us "
+            f"{r['alignment']['median']:>11.1f}us "
+            f"{r['compare']['median'] / max(r['alignment']['median'], 1e-9):>7.1f}x"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
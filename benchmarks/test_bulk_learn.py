@@ -0,0 +1,114 @@
+"""
+Bulk learn benchmark: learnPattern per pattern vs SuperKnowledgeBase.learnPatterns.
+
+Imports the same generated patterns (10% duplicates, a quarter with emotives
+and metadata) into a fresh kb with:
+  - single: one learnPattern call per pattern (async_insert row per pattern)
+  - bulk: learnPatterns (in-process dedup, pipelined Redis chunks, large
+    synchronous ClickHouse INSERT blocks)
+
+Single-pattern learning is timed on at most `single_limit` patterns and its
+rate is used for the comparison; bulk learning imports the whole tier.
+Requires running ClickHouse and Redis; each kb is deleted afterwards.
+
+Usage:
+    python -m benchmarks.test_bulk_learn
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def _items(patterns):
+    items = []
+    for i, pattern in enumerate(patterns):
+        if i % 4 == 0:
+            items.append((pattern, [{'utility': float(i % 7)}], {'source': [f"import_{i % 3}"]}))
+        else:
+            items.append((pattern, [], {}))
+    items.extend(items[:len(items) // 10])
+    return items
+
+
+def _drop_kb(kb):
+    kb.clickhouse_writer.delete_all_patterns()
+    kb.redis_writer.delete_all_metadata()
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            single_limit: int = 5_000) -> TimingCollector:
+    """Run single vs bulk learn throughput across import sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10_000, 100_000, 1_000_000]
+
+    from kato.informatics.knowledge_base import SuperKnowledgeBase
+
+    generator = BenchmarkDataGenerator(seed=42)
+
+    print("=" * 70)
+    print("  KATO Bulk Learn: learnPattern per pattern vs learnPatterns")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        items = _items(generator.generate_patterns(tier))
+        print(f"\n  {len(items):,} learns ({tier:,} unique patterns)...")
+
+        single_kb = SuperKnowledgeBase(BenchmarkDataGenerator.make_processor_id(tier) + '_single')
+        _drop_kb(single_kb)
+        sample = items[:single_limit]
+        start = time.perf_counter()
+        for pattern, emotives, metadata in sample:
+            with perf_timer(f"single.{tier}", collector):
+                single_kb.learnPattern(pattern, emotives=list(emotives), metadata=metadata)
+        single_kb.clickhouse_writer.flush_async_insert_queue()
+        single_rate = len(sample) / (time.perf_counter() - start)
+        _drop_kb(single_kb)
+
+        bulk_kb = SuperKnowledgeBase(BenchmarkDataGenerator.make_processor_id(tier) + '_bulk')
+        _drop_kb(bulk_kb)
+        start = time.perf_counter()
+        with perf_timer(f"bulk.{tier}", collector):
+            statuses = bulk_kb.learnPatterns([(p, list(e), m) for p, e, m in items])
+        bulk_rate = len(items) / (time.perf_counter() - start)
+        stored = bulk_kb.clickhouse_writer.count_patterns()
+        _drop_kb(bulk_kb)
+
+        row = {'tier': tier, 'learns': len(items), 'single_rate': single_rate, 'bulk_rate': bulk_rate,
+               'new': sum(statuses), 'stored': stored}
+        results.append(row)
+        print(f"    single {single_rate:,.0f} patterns/s  bulk {bulk_rate:,.0f} patterns/s  "
+              f"({row['new']:,} new, {stored:,} rows stored)")
+
+    collector.print_summary("Bulk Learn Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Import Throughput")
+    print(f"{'=' * 70}")
+    print(f"  {'Patterns':>10} {'Learns':>10} {'Single/s':>10} {'Bulk/s':>10} {'Speedup':>8} {'Rows OK':>8}")
+    for r in results:
+        print(
+            f"  {r['tier']:>10,} "
+            f"{r['learns']:>10,} "
+            f"{r['single_rate']:>10,.0f} "
+            f"{r['bulk_rate']:>10,.0f} "
+            f"{r['bulk_rate'] / max(r['single_rate'], 1e-9):>7.1f}x "
+            f"{str(r['stored'] == r['new']):>8}"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,182 @@
+"""
+Candidate set cache benchmark: repeated predictions on unchanged STMs.
+
+Loads a synthetic knowledge base of 10-event patterns, then replays a
+polling workload: sessions with one of a few STMs predict repeatedly
+without new observations (every Nth prediction observes a new event), each
+prediction running the length -> jaccard filter pipeline plus pattern_data
+materialization, in two modes:
+  - uncached: every prediction runs the database stages
+  - cached:   predictions on an STM already filtered at the current kb
+              version are served from the candidate cache
+
+Every prediction must get the same candidates in both modes. Reports
+per-prediction latency, ClickHouse round trips and the hit rate. A pattern
+is then learned into the kb to check that the cache bypasses and then
+refreshes its entries.
+
+Usage:
+    python -m benchmarks.test_candidate_cache
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import time
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_candidate_cache__"
+
+PATTERNS = 100_000
+EVENTS = 10
+TOKENS_PER_EVENT = 4
+DISTINCT_STMS = 4
+PREDICTIONS = 200
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_patterns(ch, count: int, offset: int = 0) -> None:
+    """Insert synthetic patterns of varying length drawn from a 1000-token vocabulary."""
+    events = f"(3 + number % {EVENTS})"
+    data = (f"arrayMap(e -> arrayMap(i -> concat('tok_', toString(cityHash64(number, e, i) % 1000)), "
+            f"range({TOKENS_PER_EVENT})), range({events}))")
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            hex(SHA1(toString(number))),
+            {data},
+            {events} * {TOKENS_PER_EVENT},
+            arrayDistinct(arrayFlatten({data})),
+            {events} * {TOKENS_PER_EVENT},
+            [], [], '', ''
+        FROM numbers({offset}, {count})
+        """
+    )
+
+
+def _predictions(observe_every: int):
+    """STMs of a polling workload: a new event every observe_every predictions."""
+    for i in range(PREDICTIONS):
+        session = i % DISTINCT_STMS
+        step = i // (DISTINCT_STMS * observe_every)
+        yield [f"tok_{(session * 7 + j) % 1000}" for j in range(step, step + 40)]
+
+
+def _run(ch, config, states, candidate_cache):
+    """Run one pipeline per state; returns (latencies ms, candidates, round trips)."""
+    from kato.filters.executor import FilterPipelineExecutor
+
+    latencies, candidates, round_trips = [], [], 0
+    for state in states:
+        executor = FilterPipelineExecutor(config, state, ch, None, KB_ID, candidate_cache=candidate_cache)
+        start = time.perf_counter()
+        result = executor.execute_pipeline()
+        executor.materialize(result)
+        latencies.append((time.perf_counter() - start) * 1000)
+        candidates.append(result)
+        round_trips += executor.get_metrics()['total_round_trips']
+    return latencies, candidates, round_trips
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 3) -> TimingCollector:
+    """Replay polling workloads uncached and cached."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1, 5, 20]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    from kato.filters.candidate_cache import CandidateSetCache
+
+    ch = _get_clickhouse()
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception:
+        pass
+    _insert_patterns(ch, PATTERNS)
+    ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+
+    config = SimpleNamespace(filter_pipeline=['length', 'jaccard'],
+                             length_min_ratio=0.5, length_max_ratio=1.5,
+                             jaccard_threshold=0.05, jaccard_min_overlap=3,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+
+    print("=" * 70)
+    print(f"  KATO Candidate Cache: {PATTERNS:,} patterns, {DISTINCT_STMS} sessions, "
+          f"{PREDICTIONS} predictions")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        states = list(_predictions(tier))
+        row = {'tier': tier}
+        for mode in ('uncached', 'cached'):
+            for _ in range(iterations):
+                cache = CandidateSetCache(settle_ms=0) if mode == 'cached' else None
+                latencies, candidates, round_trips = _run(ch, config, states, cache)
+                collector.record(f"{mode}.{tier}", sum(latencies) / len(latencies))
+            row[mode] = {
+                'stats': collector.get_stats(f"{mode}.{tier}"),
+                'round_trips': round_trips,
+                'candidates': candidates,
+                'hit_rate': cache.get_stats()['hit_rate'] if cache is not None else 0.0,
+            }
+        if row['uncached']['candidates'] != row['cached']['candidates']:
+            print(f"  WARNING: cached and uncached candidates differ when observing every {tier} predictions")
+        results.append(row)
+
+    print(f"\n  {'Observe every':>13} {'Mode':>9} {'Mean latency':>13} {'Round trips':>12} {'Hit rate':>9}")
+    for r in results:
+        for mode in ('uncached', 'cached'):
+            m = r[mode]
+            print(
+                f"  {r['tier']:>13} {mode:>9} "
+                f"{m['stats']['median']:>11.2f}ms "
+                f"{m['round_trips']:>12} "
+                f"{m['hit_rate']:>8.0%}"
+            )
+
+    # Learning invalidates: the kb bypasses while the insert settles, then refreshes
+    cache = CandidateSetCache(settle_ms=500)
+    state = next(_predictions(1))
+    before = _run(ch, config, [state, state], cache)[1][0]
+    _insert_patterns(ch, 1000, offset=PATTERNS)
+    cache.bump(KB_ID)
+    during = _run(ch, config, [state], cache)[1][0]
+    ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+    time.sleep(0.5)
+    after = _run(ch, config, [state], cache)[1][0]
+    expected = _run(ch, config, [state], None)[1][0]
+    stats = cache.get_stats()
+    print(f"\n  After learning: {len(before):,} -> {len(after):,} candidates "
+          f"(uncached {len(expected):,}), bypassed {stats['bypassed']}, "
+          f"invalidations {stats['invalidations']}")
+    if after != expected or len(during) < len(before):
+        print("  WARNING: cache served candidates of the previous kb version")
+    print(f"{'=' * 70}")
+
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,133 @@
+"""
+Filter pipeline candidate hand-off benchmark: external table vs chunked IN lists.
+
+Loads a synthetic knowledge base, then runs a length -> jaccard pipeline
+where the length stage passes every pattern on to the jaccard stage. For each
+kb size the jaccard stage is timed with:
+  - external: candidates shipped as a ClickHouse external table (1 query)
+  - chunked:  candidates pasted into 500-name IN lists (N serial queries)
+
+Per-stage round trips and SQL bytes come from FilterPipelineExecutor metrics.
+
+Usage:
+    python -m benchmarks.test_candidate_handoff
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_candidate_handoff__"
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_patterns(ch, start: int, count: int) -> None:
+    """Insert synthetic 4-token patterns drawn from a 1000-token vocabulary."""
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            hex(SHA1(toString(number))),
+            [arrayMap(i -> concat('tok_', toString(cityHash64(number, i) % 1000)), range(4))],
+            4,
+            arrayDistinct(arrayMap(i -> concat('tok_', toString(cityHash64(number, i) % 1000)), range(4))),
+            4,
+            [], [], '', ''
+        FROM numbers({start}, {count})
+        """
+    )
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 10) -> TimingCollector:
+    """Run candidate hand-off benchmarks across candidate-set sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 10_000, 50_000]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    import kato.filters.executor as executor_module
+    from kato.filters.executor import FilterPipelineExecutor
+
+    ch = _get_clickhouse()
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception:
+        pass
+
+    # Length bounds admit every 4-token pattern; jaccard does the real work
+    state = [f"tok_{i}" for i in range(4)]
+    config = SimpleNamespace(filter_pipeline=['length', 'jaccard'],
+                             length_min_ratio=0.25, length_max_ratio=4.0,
+                             jaccard_threshold=0.1, jaccard_min_overlap=1,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+
+    print("=" * 70)
+    print("  KATO Filter Candidate Hand-off: external table vs chunked IN")
+    print("=" * 70)
+
+    results = []
+    loaded = 0
+    for tier in tiers:
+        if tier > loaded:
+            _insert_patterns(ch, loaded, tier - loaded)
+            loaded = tier
+        ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+
+        row = {'tier': tier}
+        for mode, use_external in (('external', True), ('chunked', False)):
+            executor_module.USE_EXTERNAL_CANDIDATES = use_external
+            label = f"handoff.{mode}.{tier}"
+            for _ in range(iterations):
+                executor = FilterPipelineExecutor(config, state, ch, None, KB_ID)
+                executor.execute_pipeline()
+                jaccard_stage = executor.stage_metrics[-1]
+                collector.record(label, jaccard_stage['time_ms'])
+            row[mode] = {
+                'stats': collector.get_stats(label),
+                'round_trips': jaccard_stage['round_trips'],
+                'query_bytes': jaccard_stage['query_bytes'],
+                'candidates_in': jaccard_stage['candidates_in'],
+            }
+        results.append(row)
+
+    executor_module.USE_EXTERNAL_CANDIDATES = True
+
+    print(f"\n  {'Candidates':>10} {'Mode':>9} {'p50':>10} {'p99':>10} {'Trips':>6} {'SQL bytes':>11}")
+    for r in results:
+        for mode in ('external', 'chunked'):
+            m = r[mode]
+            print(
+                f"  {m['candidates_in']:>10,} {mode:>9} "
+                f"{m['stats']['median']:>8.1f}ms "
+                f"{m['stats']['p99']:>8.1f}ms "
+                f"{m['round_trips']:>6d} "
+                f"{m['query_bytes']:>11,}"
+            )
+    print(f"{'=' * 70}")
+
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
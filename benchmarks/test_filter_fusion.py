@@ -0,0 +1,166 @@
+"""
+Filter stage fusion benchmark: one query per stage vs one fused query.
+
+Loads a synthetic knowledge base of 10-event patterns, then runs a
+length -> jaccard -> minhash pipeline in two modes:
+  - staged: each database filter is its own query, and the next stage
+    receives its candidates through the external table
+    (KATO_FUSE_FILTER_STAGES=false)
+  - fused:  the three predicates are ANDed into one query; only MinHash
+    verification runs afterwards in Python
+
+Both modes must return the same candidates. Reports pipeline time, round
+trips and bytes read/returned from the executor's stage metrics. The LSH
+predicate scans patterns_data.lsh_bands, so no lsh_buckets backfill is
+needed; signatures are random, so MinHash mostly passes through candidates
+with matching bands.
+
+Usage:
+    python -m benchmarks.test_filter_fusion
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_filter_fusion__"
+
+EVENTS = 10
+TOKENS_PER_EVENT = 4
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_patterns(ch, start: int, count: int) -> None:
+    """Insert synthetic patterns of varying length drawn from a 1000-token vocabulary."""
+    events = f"(3 + number % {EVENTS})"
+    data = (f"arrayMap(e -> arrayMap(i -> concat('tok_', toString(cityHash64(number, e, i) % 1000)), "
+            f"range({TOKENS_PER_EVENT})), range({events}))")
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            hex(SHA1(toString(number))),
+            {data},
+            {events} * {TOKENS_PER_EVENT},
+            arrayDistinct(arrayFlatten({data})),
+            {events} * {TOKENS_PER_EVENT},
+            arrayMap(i -> toUInt32(cityHash64(number, i) % 4294967296), range(100)),
+            arrayMap(b -> cityHash64(number % 50, b), range(20)),
+            '', ''
+        FROM numbers({start}, {count})
+        """
+    )
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 10) -> TimingCollector:
+    """Run staged vs fused filter pipelines across kb sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10_000, 50_000, 200_000]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    import kato.filters.executor as executor_module
+    import kato.filters.minhash_filter as minhash_module
+    from kato.filters.executor import FilterPipelineExecutor
+    from kato.filters.pattern_data_cache import PatternDataCache
+
+    ch = _get_clickhouse()
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception:
+        pass
+
+    state = [f"tok_{i}" for i in range(0, 400, 10)]
+    config = SimpleNamespace(filter_pipeline=['length', 'jaccard', 'minhash'],
+                             length_min_ratio=0.5, length_max_ratio=1.5,
+                             jaccard_threshold=0.02, jaccard_min_overlap=2,
+                             minhash_threshold=0.0,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+    no_cache = PatternDataCache(max_bytes=0)
+    minhash_module.USE_LSH_BUCKETS = False
+
+    print("=" * 70)
+    print("  KATO Filter Fusion: one query per stage vs one fused query")
+    print("=" * 70)
+
+    results = []
+    loaded = 0
+    for tier in tiers:
+        if tier > loaded:
+            _insert_patterns(ch, loaded, tier - loaded)
+            loaded = tier
+        ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+
+        row = {'tier': tier}
+        for mode, fuse in (('staged', False), ('fused', True)):
+            executor_module.FUSE_DB_STAGES = fuse
+            label = f"pipeline.{mode}.{tier}"
+            for _ in range(iterations):
+                executor = FilterPipelineExecutor(config, state, ch, None, KB_ID, pattern_cache=no_cache)
+                candidates = executor.execute_pipeline()
+                collector.record(label, sum(m['time_ms'] for m in executor.stage_metrics))
+            row[mode] = {
+                'stats': collector.get_stats(label),
+                'metrics': executor.get_metrics(),
+                'stages': executor.stage_metrics,
+                'candidates': candidates,
+            }
+        if row['staged']['candidates'] != row['fused']['candidates']:
+            print(f"  WARNING: fused and staged candidates differ at {tier:,} patterns")
+        results.append(row)
+
+    executor_module.FUSE_DB_STAGES = True
+    minhash_module.USE_LSH_BUCKETS = True
+
+    print(f"\n  {'Patterns':>9} {'Mode':>7} {'Stage':>22} {'Cands out':>10} {'Read MB':>9} {'Result MB':>10} {'ms':>8}")
+    for r in results:
+        for mode in ('staged', 'fused'):
+            for stage in r[mode]['stages']:
+                print(
+                    f"  {r['tier']:>9,} {mode:>7} {stage['filter']:>22} "
+                    f"{stage['candidates_after']:>10,} "
+                    f"{stage['read_bytes'] / 1e6:>9.2f} "
+                    f"{stage['result_bytes'] / 1e6:>10.2f} "
+                    f"{stage['time_ms']:>8.1f}"
+                )
+    print(f"\n  {'Patterns':>9} {'Final':>7} {'Staged p50':>11} {'Fused p50':>10} {'Speedup':>8} "
+          f"{'Round trips':>12} {'Staged read MB':>15} {'Fused read MB':>14}")
+    for r in results:
+        staged, fused = r['staged'], r['fused']
+        print(
+            f"  {r['tier']:>9,} {len(fused['candidates']):>7,} "
+            f"{staged['stats']['median']:>9.1f}ms "
+            f"{fused['stats']['median']:>8.1f}ms "
+            f"{staged['stats']['median'] / max(fused['stats']['median'], 1e-9):>7.1f}x "
+            f"{staged['metrics']['total_round_trips']:>5} -> {fused['metrics']['total_round_trips']:<4} "
+            f"{staged['metrics']['total_read_bytes'] / 1e6:>15.2f} "
+            f"{fused['metrics']['total_read_bytes'] / 1e6:>14.2f}"
+        )
+    print(f"{'=' * 70}")
+
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
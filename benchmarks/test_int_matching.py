@@ -0,0 +1,110 @@
+"""
+Integer-encoded matching benchmark: string path vs IntegerMatcher.
+
+Times the token-level matching step of causalBelief (RapidFuzz scoring plus
+extract_prediction_info for every match) over 1K, 5K and 20K candidates with:
+  - string: InformationExtractor on token strings (default path)
+  - int: IntegerMatcher on int32-encoded sequences (KATO_USE_INT_MATCHING)
+
+Pattern encodings are warmed by one untimed call, as they would be after the
+first prediction on a kb. Every query's results are compared for equality.
+
+No database is required; patterns come from BenchmarkDataGenerator.
+
+Usage:
+    python -m benchmarks.test_int_matching
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from itertools import chain
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 10) -> TimingCollector:
+    """Run string vs integer matching benchmarks across candidate-set sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 5_000, 20_000]
+
+    from kato.searches.pattern_search import InformationExtractor, _match_batch
+
+    generator = BenchmarkDataGenerator(seed=42)
+    all_patterns = generator.generate_patterns(max(tiers))
+    batch_data = [(p.name, list(chain(*p.pattern_data))) for p in all_patterns]
+    queries = generator.generate_observations(all_patterns, count=iterations)
+    recall_threshold = 0.1
+
+    extractors = {
+        'string': InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                       use_int_matching=False),
+        'int': InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                    use_int_matching=True),
+    }
+
+    print("=" * 70)
+    print("  KATO Token Matching: string path vs integer-encoded path")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        candidates = batch_data[:tier]
+        print(f"\n  {tier:,} candidates...")
+
+        # Warm the encoded-pattern cache
+        _match_batch(extractors['int'], queries[0]['stm_flat'], candidates,
+                     recall_threshold, True, 0.0)
+
+        row = {'tier': tier, 'matches': 0, 'identical': True}
+        for q in queries:
+            outputs = {}
+            for mode, extractor in extractors.items():
+                with perf_timer(f"{mode}.{tier}", collector):
+                    outputs[mode] = _match_batch(extractor, q['stm_flat'], candidates,
+                                                 recall_threshold, True, 0.0)
+            row['matches'] += len(outputs['string'])
+            row['identical'] &= outputs['string'] == outputs['int']
+
+        for mode in extractors:
+            row[mode] = collector.get_stats(f"{mode}.{tier}")
+        results.append(row)
+        print(f"    string p50={row['string']['median']:.1f}ms  int p50={row['int']['median']:.1f}ms  "
+              f"({row['matches'] / len(queries):.0f} matches/query, identical={row['identical']})")
+
+    collector.print_summary("Integer Matching Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Matching Throughput by Candidate Count")
+    print(f"{'=' * 70}")
+    print(f"  {'Candidates':>10} {'String p50':>11} {'Int p50':>9} {'String cand/s':>14} "
+          f"{'Int cand/s':>11} {'Speedup':>8} {'Identical':>10}")
+    for r in results:
+        s_ms, i_ms = r['string']['median'], r['int']['median']
+        print(
+            f"  {r['tier']:>10,} "
+            f"{s_ms:>9.1f}ms "
+            f"{i_ms:>7.1f}ms "
+            f"{r['tier'] / (s_ms / 1000):>14,.0f} "
+            f"{r['tier'] / (i_ms / 1000):>11,.0f} "
+            f"{s_ms / max(i_ms, 1e-9):>7.2f}x "
+            f"{str(r['identical']):>10}"
+        )
+    vocabulary = extractors['int'].int_matcher.vocabulary
+    print(f"  Vocabulary: {vocabulary.vocab_size:,} symbols, "
+          f"{extractors['int'].int_matcher.cached_patterns:,} encoded patterns")
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
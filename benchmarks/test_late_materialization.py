@@ -0,0 +1,157 @@
+"""
+Late materialization benchmark: pattern_data in every stage vs final candidates only.
+
+Loads a synthetic knowledge base of 10-event patterns, then runs a
+length -> jaccard pipeline followed by FilterPipelineExecutor.materialize()
+(what PatternSearcher does before matching) in two modes:
+  - eager: every database stage selects pattern_data (the former behaviour,
+    KATO_LATE_MATERIALIZATION=false)
+  - late:  stages select name and length only; pattern_data is read once,
+    for the jaccard survivors
+
+The pattern data cache is disabled (zero budget) so every iteration reads
+from ClickHouse. Per-stage bytes read and returned come from the
+X-ClickHouse-Summary counters in the executor's stage metrics.
+
+Usage:
+    python -m benchmarks.test_late_materialization
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_late_materialization__"
+
+EVENTS = 10
+TOKENS_PER_EVENT = 4
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_patterns(ch, start: int, count: int) -> None:
+    """Insert synthetic 10-event patterns drawn from a 1000-token vocabulary."""
+    tokens = EVENTS * TOKENS_PER_EVENT
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            hex(SHA1(toString(number))),
+            arrayMap(e -> arrayMap(i -> concat('tok_', toString(cityHash64(number, e, i) % 1000)),
+                                   range({TOKENS_PER_EVENT})), range({EVENTS})),
+            {tokens},
+            arrayDistinct(arrayFlatten(arrayMap(e -> arrayMap(i -> concat('tok_', toString(cityHash64(number, e, i) % 1000)),
+                                                        range({TOKENS_PER_EVENT})), range({EVENTS})))),
+            {tokens},
+            [], [], '', ''
+        FROM numbers({start}, {count})
+        """
+    )
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 10) -> TimingCollector:
+    """Run eager vs late materialization across kb sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10_000, 50_000, 200_000]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    import kato.filters.base as base_module
+    from kato.filters.executor import FilterPipelineExecutor
+    from kato.filters.pattern_data_cache import PatternDataCache
+
+    ch = _get_clickhouse()
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception:
+        pass
+
+    # Length admits every pattern; jaccard keeps those sharing 2+ STM tokens
+    state = [f"tok_{i}" for i in range(0, 400, 10)]
+    config = SimpleNamespace(filter_pipeline=['length', 'jaccard'],
+                             length_min_ratio=0.5, length_max_ratio=2.0,
+                             jaccard_threshold=0.02, jaccard_min_overlap=2,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+    no_cache = PatternDataCache(max_bytes=0)
+
+    print("=" * 70)
+    print("  KATO Late Materialization: pattern_data per stage vs final candidates")
+    print("=" * 70)
+
+    results = []
+    loaded = 0
+    for tier in tiers:
+        if tier > loaded:
+            _insert_patterns(ch, loaded, tier - loaded)
+            loaded = tier
+        ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+
+        row = {'tier': tier}
+        for mode, late in (('eager', False), ('late', True)):
+            base_module.LATE_MATERIALIZATION = late
+            label = f"pipeline.{mode}.{tier}"
+            for _ in range(iterations):
+                executor = FilterPipelineExecutor(config, state, ch, None, KB_ID, pattern_cache=no_cache)
+                candidates = executor.execute_pipeline()
+                executor.materialize(candidates)
+                collector.record(label, sum(m['time_ms'] for m in executor.stage_metrics))
+            row[mode] = {
+                'stats': collector.get_stats(label),
+                'stages': executor.stage_metrics,
+                'final': len(candidates),
+            }
+        results.append(row)
+
+    base_module.LATE_MATERIALIZATION = True
+
+    print(f"\n  {'Patterns':>9} {'Mode':>6} {'Stage':>12} {'Cands out':>10} {'Read MB':>9} {'Result MB':>10} {'ms':>8}")
+    for r in results:
+        for mode in ('eager', 'late'):
+            m = r[mode]
+            for stage in m['stages']:
+                print(
+                    f"  {r['tier']:>9,} {mode:>6} {stage['filter']:>12} "
+                    f"{stage['candidates_after']:>10,} "
+                    f"{stage['read_bytes'] / 1e6:>9.2f} "
+                    f"{stage['result_bytes'] / 1e6:>10.2f} "
+                    f"{stage['time_ms']:>8.1f}"
+                )
+    print(f"\n  {'Patterns':>9} {'Final':>7} {'Eager p50':>11} {'Late p50':>10} {'Speedup':>8} "
+          f"{'Eager read MB':>14} {'Late read MB':>13}")
+    for r in results:
+        eager, late = r['eager'], r['late']
+        print(
+            f"  {r['tier']:>9,} {late['final']:>7,} "
+            f"{eager['stats']['median']:>9.1f}ms "
+            f"{late['stats']['median']:>8.1f}ms "
+            f"{eager['stats']['median'] / max(late['stats']['median'], 1e-9):>7.1f}x "
+            f"{sum(s['read_bytes'] for s in eager['stages']) / 1e6:>14.2f} "
+            f"{sum(s['read_bytes'] for s in late['stages']) / 1e6:>13.2f}"
+        )
+    print(f"{'=' * 70}")
+
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
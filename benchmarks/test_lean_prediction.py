@@ -0,0 +1,130 @@
+"""
+Lean prediction benchmark: Prediction dicts vs LeanPrediction + materialize().
+
+Builds predictions for 10K matched candidates and keeps the top 300 by
+pre-potential, as predictPattern does with max_predictions=100:
+  - eager: a Prediction dict per candidate (event slices, event-aligned
+           missing/extras), then pruning
+  - lean:  a slotted LeanPrediction per candidate (scores and event
+           bounds), pruning, then materialize() for the survivors only
+
+Reports CPU time and tracemalloc peak memory. Both must keep the same
+predictions. No services needed.
+
+Usage:
+    python -m benchmarks.test_lean_prediction
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+import time
+import tracemalloc
+from heapq import nlargest
+
+from benchmarks.profiler import TimingCollector
+
+VOCABULARY = 60
+KEEP = 300
+
+
+def _candidates(count, rng):
+    from kato.searches.pattern_search import InformationExtractor
+
+    extractor = InformationExtractor(use_fast_matcher=False, use_token_matching=True)
+    stm_events = [[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(3)] for _ in range(3)]
+    state = [t for event in stm_events for t in event]
+    candidates = []
+    for n in range(count):
+        events = [[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(rng.randint(2, 5))]
+                  for _ in range(rng.randint(6, 12))]
+        flat = [t for event in events for t in event]
+        info = extractor.extract_prediction_info(flat, state, 0.0)
+        pattern = {'name': f"PTRN|{n:040x}", 'pattern_data': events, 'length': len(flat),
+                   'frequency': 1 + n % 5, 'emotives': {}}
+        candidates.append((pattern, info))
+    return candidates, stm_events
+
+
+def _eager(candidates, stm_events):
+    from kato.representations.prediction import Prediction, pre_potential
+
+    predictions = [Prediction(pattern, *info[1:8], anomalies=info[8], stm_events=stm_events,
+                              weighted_similarity=info[9]) for pattern, info in candidates]
+    return nlargest(KEEP, predictions, key=pre_potential)
+
+
+def _lean(candidates, stm_events):
+    from kato.representations.prediction import LeanPrediction, pre_potential
+
+    predictions = [LeanPrediction(pattern, *info[1:8], anomalies=info[8], stm_events=stm_events,
+                                  weighted_similarity=info[9]) for pattern, info in candidates]
+    return [p.materialize() for p in nlargest(KEEP, predictions, key=pre_potential)]
+
+
+def _peak_kib(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def run_all(collector: TimingCollector = None, tiers: list = None,
+            iterations: int = 5) -> TimingCollector:
+    """Build and prune predictions eagerly and lazily across candidate counts."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 10_000]
+
+    rng = random.Random(19)
+
+    print("=" * 70)
+    print(f"  KATO Lean Predictions: build + keep top {KEEP} by pre-potential")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        candidates, stm_events = _candidates(tier, rng)
+        for _ in range(iterations):
+            start = time.process_time()
+            expected = _eager(candidates, stm_events)
+            collector.record(f"eager.{tier}", (time.process_time() - start) * 1000)
+
+            start = time.process_time()
+            actual = _lean(candidates, stm_events)
+            collector.record(f"lean.{tier}", (time.process_time() - start) * 1000)
+        if [list(p.items()) for p in actual] != [list(p.items()) for p in expected]:
+            print(f"  WARNING: lean and eager predictions differ for {tier:,} candidates")
+        results.append({
+            'tier': tier,
+            'eager': collector.get_stats(f"eager.{tier}"),
+            'lean': collector.get_stats(f"lean.{tier}"),
+            'eager_kib': _peak_kib(_eager, candidates, stm_events),
+            'lean_kib': _peak_kib(_lean, candidates, stm_events),
+        })
+
+    print(f"\n  {'Candidates':>10} {'Eager CPU':>10} {'Lean CPU':>10} {'Speedup':>8} "
+          f"{'Eager peak':>11} {'Lean peak':>10} {'Saved':>6}")
+    for r in results:
+        print(
+            f"  {r['tier']:>10,} "
+            f"{r['eager']['median']:>8.1f}ms "
+            f"{r['lean']['median']:>8.1f}ms "
+            f"{r['eager']['median'] / max(r['lean']['median'], 1e-9):>7.1f}x "
+            f"{r['eager_kib']:>8,.0f}KiB "
+            f"{r['lean_kib']:>7,.0f}KiB "
+            f"{1 - r['lean_kib'] / max(r['eager_kib'], 1e-9):>5.0%}"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,136 @@
+"""
+Learn throughput benchmark: step-by-step Redis learn vs single round-trip script.
+
+Learns the same stream of patterns (about a third of them re-learns with
+emotives and metadata) through SuperKnowledgeBase.learnPattern with:
+  - legacy: SETNX/INCR, GET + SET of emotives/metadata, symbol stats MULTI
+    and affinity pipeline (4-6 round trips per learn)
+  - script: one EVALSHA of the learn script (KATO_SINGLE_ROUND_TRIP_LEARN)
+
+ClickHouse writes are skipped so only the Redis side is measured. Requires a
+local Redis (the connection manager's settings); each mode uses its own kb_id,
+deleted afterwards. The final Redis state of both modes is compared.
+
+Usage:
+    python -m benchmarks.test_learn_throughput
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+class _NullClickHouseWriter:
+    def write_pattern(self, pattern_object):
+        pass
+
+
+def _make_kb(kb_id, redis_client):
+    from kato.informatics.knowledge_base import SuperKnowledgeBase
+    from kato.storage.redis_writer import RedisWriter
+
+    kb = object.__new__(SuperKnowledgeBase)
+    kb.id = kb_id
+    kb.persistence = 7
+    kb.emotives_available = set()
+    kb.redis_writer = RedisWriter(kb_id, redis_client)
+    kb.clickhouse_writer = _NullClickHouseWriter()
+    kb.redis_writer.delete_all_metadata()
+    return kb
+
+
+def _pattern_state(redis_client, kb_id):
+    """Frequencies, emotives and metadata of every pattern in a kb."""
+    state = {}
+    for kind in ('frequency', 'emotives', 'metadata'):
+        for key in redis_client.scan_iter(f"{kb_id}:{kind}:*"):
+            value = redis_client.get(key)
+            state[key.split(':', 1)[1]] = value if kind == 'frequency' else json.loads(value)
+    return state
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 3) -> TimingCollector:
+    """Run legacy vs script learn throughput across learn counts."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 5_000]
+
+    import kato.informatics.knowledge_base as knowledge_base_module
+    from kato.storage.connection_manager import OptimizedConnectionManager
+
+    redis_client = OptimizedConnectionManager().redis
+    generator = BenchmarkDataGenerator(seed=42)
+
+    print("=" * 70)
+    print("  KATO Learn Throughput: step-by-step Redis learn vs single round trip")
+    print("=" * 70)
+
+    original_flag = knowledge_base_module.USE_SINGLE_ROUND_TRIP_LEARN
+    results = []
+    try:
+        for tier in tiers:
+            unique = generator.generate_patterns(max(tier * 2 // 3, 1))
+            stream = [(p, None, None) for p in unique]
+            stream += [(unique[i % len(unique)], [{'utility': i % 5 / 2}], {'source': [f"s{i % 3}"]})
+                       for i in range(tier - len(unique))]
+            print(f"\n  {tier:,} learns ({len(unique):,} unique patterns)...")
+
+            row = {'tier': tier, 'identical': True}
+            for _ in range(iterations):
+                states = {}
+                for mode in ('legacy', 'script'):
+                    knowledge_base_module.USE_SINGLE_ROUND_TRIP_LEARN = mode == 'script'
+                    kb_id = f"bench_learn_{mode}_{tier}"
+                    kb = _make_kb(kb_id, redis_client)
+                    start = time.perf_counter()
+                    for pattern, emotives, metadata in stream:
+                        with perf_timer(f"{mode}.{tier}", collector):
+                            kb.learnPattern(pattern, emotives=emotives, metadata=metadata)
+                    row.setdefault(f"{mode}_s", []).append(time.perf_counter() - start)
+                    states[mode] = _pattern_state(redis_client, kb_id)
+                    kb.redis_writer.delete_all_metadata()
+                row['identical'] &= states['legacy'] == states['script']
+
+            for mode in ('legacy', 'script'):
+                row[mode] = collector.get_stats(f"{mode}.{tier}")
+                row[f"{mode}_lps"] = tier / min(row[f"{mode}_s"])
+            results.append(row)
+            print(f"    legacy {row['legacy_lps']:,.0f} learns/s  script {row['script_lps']:,.0f} learns/s  "
+                  f"(identical={row['identical']})")
+    finally:
+        knowledge_base_module.USE_SINGLE_ROUND_TRIP_LEARN = original_flag
+
+    collector.print_summary("Learn Throughput Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Learn Throughput (Redis side only)")
+    print(f"{'=' * 70}")
+    print(f"  {'Learns':>8} {'Legacy p50':>11} {'Script p50':>11} {'Legacy/s':>10} "
+          f"{'Script/s':>10} {'Speedup':>8} {'Identical':>10}")
+    for r in results:
+        print(
+            f"  {r['tier']:>8,} "
+            f"{r['legacy']['median']:>9.3f}ms "
+            f"{r['script']['median']:>9.3f}ms "
+            f"{r['legacy_lps']:>10,.0f} "
+            f"{r['script_lps']:>10,.0f} "
+            f"{r['script_lps'] / max(r['legacy_lps'], 1e-9):>7.2f}x "
+            f"{str(r['identical']):>10}"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
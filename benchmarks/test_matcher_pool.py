@@ -0,0 +1,136 @@
+"""
+Matcher pool benchmark: per-request ProcessPoolExecutor vs persistent MatcherPool.
+
+Times the process-parallel matching step of causalBeliefAsync at 1K, 10K and
+100K candidates with:
+  - per_request: new ProcessPoolExecutor per call, every batch pickled
+    (the path used when the matcher pool is not running)
+  - pool: long-lived MatcherPool; patterns live in a shared-memory arena and
+    only candidate indices + STM are sent (arena is warm after the first call)
+
+No database is required; patterns come from BenchmarkDataGenerator.
+
+Usage:
+    python -m benchmarks.test_matcher_pool
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+from itertools import chain
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def _per_request(state, candidates, patterns, recall_threshold, workers, batch_size=100):
+    """Replicates the per-request ProcessPoolExecutor path of causalBeliefAsync."""
+    from kato.searches.pattern_search import _process_batch_worker
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i in range(0, len(candidates), batch_size):
+            batch = [(pid, patterns[pid]) for pid in candidates[i:i + batch_size]]
+            futures.append(executor.submit(_process_batch_worker, state, batch,
+                                           recall_threshold, True, 0.0))
+        for future in concurrent.futures.as_completed(futures):
+            results.extend(future.result())
+    return results
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 20,
+            workers: int = None) -> TimingCollector:
+    """Run matcher pool benchmarks across candidate-set sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 10_000, 100_000]
+    if workers is None:
+        workers = min(multiprocessing.cpu_count(), 4)
+
+    from kato.searches.matcher_pool import MatcherPool
+
+    generator = BenchmarkDataGenerator(seed=42)
+    all_patterns = generator.generate_patterns(max(tiers))
+    patterns = {p.name: list(chain(*p.pattern_data)) for p in all_patterns}
+    queries = generator.generate_observations(all_patterns, count=iterations)
+    recall_threshold = 0.3
+
+    print("=" * 70)
+    print(f"  KATO Matcher Pool: per-request pool vs persistent pool ({workers} workers)")
+    print("=" * 70)
+
+    pool = MatcherPool(workers=workers)
+    with perf_timer("matcher_pool.start", collector):
+        pool.start()
+
+    loop = asyncio.new_event_loop()
+    results = []
+    for tier in tiers:
+        candidates = [p.name for p in all_patterns[:tier]]
+        print(f"\n  {tier:,} candidates...")
+
+        # Arena load for this kb happens once; keep it out of the steady state
+        with perf_timer(f"matcher_pool.arena_load.{tier}", collector):
+            loop.run_until_complete(pool.match(f"bench_{tier}", candidates, patterns,
+                                               queries[0]['stm_flat'], recall_threshold, True))
+
+        pool_matches = per_request_matches = 0
+        for q in queries:
+            with perf_timer(f"pool.{tier}", collector):
+                pool_matches = len(loop.run_until_complete(pool.match(
+                    f"bench_{tier}", candidates, patterns, q['stm_flat'], recall_threshold, True)))
+
+        # The per-request path is slow at 100K; fewer samples still give a stable p50
+        per_request_iters = queries if tier < 100_000 else queries[:5]
+        for q in per_request_iters:
+            with perf_timer(f"per_request.{tier}", collector):
+                per_request_matches = len(_per_request(q['stm_flat'], candidates, patterns,
+                                                       recall_threshold, workers))
+
+        row = {'tier': tier,
+               'pool': collector.get_stats(f"pool.{tier}"),
+               'per_request': collector.get_stats(f"per_request.{tier}")}
+        results.append(row)
+        print(f"    pool        p50={row['pool']['median']:.1f}ms p99={row['pool']['p99']:.1f}ms "
+              f"({pool_matches} matches, last query)")
+        print(f"    per_request p50={row['per_request']['median']:.1f}ms "
+              f"p99={row['per_request']['p99']:.1f}ms ({per_request_matches} matches, last query)")
+
+    loop.close()
+    stats = pool.get_stats()
+    pool.shutdown()
+
+    collector.print_summary("Matcher Pool Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Matching Latency by Candidate Count")
+    print(f"{'=' * 70}")
+    print(f"  {'Candidates':>10} {'Pool p50':>10} {'Pool p99':>10} {'PerReq p50':>11} {'PerReq p99':>11} {'Speedup':>8}")
+    for r in results:
+        print(
+            f"  {r['tier']:>10,} "
+            f"{r['pool']['median']:>8.1f}ms "
+            f"{r['pool']['p99']:>8.1f}ms "
+            f"{r['per_request']['median']:>9.1f}ms "
+            f"{r['per_request']['p99']:>9.1f}ms "
+            f"{r['per_request']['median'] / max(r['pool']['median'], 1e-9):>7.1f}x"
+        )
+    print(f"  Arena sizes: " + ", ".join(
+        f"{kb}={a['patterns']:,} patterns/{a['bytes'] / 1024:.0f}KiB" for kb, a in stats['arenas'].items()))
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
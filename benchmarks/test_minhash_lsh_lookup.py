@@ -0,0 +1,158 @@
+"""
+MinHash stage latency benchmark: lsh_buckets point lookups vs lsh_bands scan.
+
+Grows a synthetic knowledge base from 10K to 10M patterns and, at each tier,
+times the MinHash database stage through FilterPipelineExecutor with:
+  - lsh_buckets lookup ((length, name) IN (SELECT pattern_length, pattern_name
+    FROM lsh_buckets ...))
+  - legacy scan (hasAny(patterns_data.lsh_bands, [...]))
+
+Filler patterns are generated server-side (INSERT ... SELECT FROM numbers())
+with random band hashes, so they never collide with the query STM. A fixed
+set of real patterns is learned through ClickHouseWriter so every query has
+true LSH hits. The bucket lookup should stay roughly flat across tiers while
+the scan grows with the kb partition.
+
+Usage:
+    python -m benchmarks.test_minhash_lsh_lookup
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+KB_ID = "__bench_minhash_lsh__"
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_filler(ch, start: int, count: int) -> None:
+    """Insert synthetic patterns with random MinHash signatures and bands."""
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            concat('filler_', toString(number)),
+            [[concat('ftok_', toString(number % 50000)), concat('ftok_', toString(number % 7919))]],
+            2,
+            [concat('ftok_', toString(number % 50000)), concat('ftok_', toString(number % 7919))],
+            2,
+            arrayMap(i -> toUInt32(cityHash64(number, i) % 4294967296), range(100)),
+            arrayMap(i -> cityHash64(number, i, 'band'), range(20)),
+            concat('ftok_', toString(number % 50000)),
+            concat('ftok_', toString(number % 7919))
+        FROM numbers({start}, {count})
+        """,
+        settings={'max_insert_threads': 4},
+    )
+
+
+def _time_stage(executor_cls, config, state, ch, collector, label, iterations) -> int:
+    """Time the MinHash DB stage and return the candidate count of the last run."""
+    candidates = set()
+    for _ in range(iterations):
+        executor = executor_cls(config, state, ch, None, KB_ID)
+        with perf_timer(label, collector):
+            candidates = executor.execute_pipeline()
+    return len(candidates)
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 20) -> TimingCollector:
+    """Run MinHash lookup benchmarks across kb size tiers."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10_000, 100_000, 1_000_000, 10_000_000]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    import kato.filters.minhash_filter as minhash_filter
+    from kato.filters.executor import FilterPipelineExecutor
+    from kato.storage.clickhouse_writer import ClickHouseWriter
+
+    ch = _get_clickhouse()
+    writer = ClickHouseWriter(KB_ID, ch, batch_size=500)
+    writer.delete_all_patterns()
+
+    # Real patterns give each query STM genuine band collisions
+    generator = BenchmarkDataGenerator(seed=42)
+    patterns = generator.generate_patterns(1_000)
+    for p in patterns:
+        writer.write_pattern(p)
+    writer.flush_if_pending()
+    writer.flush_async_insert_queue()
+
+    queries = generator.generate_observations(patterns, count=5,
+                                              overlap_min=0.9, overlap_max=1.0)
+    config = SimpleNamespace(filter_pipeline=['minhash'], minhash_threshold=0.0,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+
+    print("=" * 70)
+    print("  KATO MinHash Stage: lsh_buckets lookup vs lsh_bands scan")
+    print("=" * 70)
+
+    results = []
+    loaded = 0
+    for tier in tiers:
+        print(f"\n  Growing kb to {tier:,} filler patterns...")
+        if tier > loaded:
+            _insert_filler(ch, loaded, tier - loaded)
+            loaded = tier
+        writer.flush_async_insert_queue()
+        writer.backfill_lsh_buckets()
+        minhash_filter.reset_lsh_bucket_status()
+
+        row = {'tier': tier}
+        for mode, use_buckets in (('buckets', True), ('scan', False)):
+            minhash_filter.USE_LSH_BUCKETS = use_buckets
+            label = f"minhash.{mode}.{tier}"
+            hits = 0
+            for q in queries:
+                hits = _time_stage(FilterPipelineExecutor, config, q['stm_flat'],
+                                   ch, collector, label, max(1, iterations // len(queries)))
+            stats = collector.get_stats(label)
+            row[mode] = stats
+            print(f"    {mode:<8} p50={stats['median']:.2f}ms p99={stats['p99']:.2f}ms "
+                  f"(last query: {hits} candidates)")
+        results.append(row)
+
+    minhash_filter.USE_LSH_BUCKETS = True
+
+    print(f"\n{'=' * 70}")
+    print(f"  MinHash DB Stage Latency by KB Size")
+    print(f"{'=' * 70}")
+    print(f"  {'Patterns':>12} {'Buckets p50':>12} {'Buckets p99':>12} {'Scan p50':>12} {'Scan p99':>12}")
+    for r in results:
+        print(
+            f"  {r['tier']:>12,} "
+            f"{r['buckets']['median']:>10.2f}ms "
+            f"{r['buckets']['p99']:>10.2f}ms "
+            f"{r['scan']['median']:>10.2f}ms "
+            f"{r['scan']['p99']:>10.2f}ms"
+        )
+    print(f"{'=' * 70}")
+
+    try:
+        writer.delete_all_patterns()
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
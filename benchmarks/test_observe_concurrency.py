@@ -0,0 +1,139 @@
+"""
+Observe concurrency benchmark: throughput vs concurrent sessions on one node.
+
+Preloads patterns into one KatoProcessor, then runs N sessions concurrently
+on it, each sending a sequence of observations in order (as the API's
+per-session locks enforce). Two modes per session count:
+  - serialized: every observe holds one node-wide lock (the old
+    ObservationProcessor.processing_lock behaviour)
+  - concurrent: sessions only serialize on their own state
+
+Observations carry 2-3 symbols so the full prediction path (filter
+pipeline, matching, metrics) runs; auto-learning is disabled. Throughput
+is observations/second across all sessions. Requires running ClickHouse
+and Redis; the kb is deleted afterwards.
+
+Usage:
+    python -m benchmarks.test_observe_concurrency
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def _session_streams(patterns, sessions: int, observations: int, seed: int) -> list[list[list[str]]]:
+    """Per-session observation streams sampled from learned pattern events."""
+    rng = random.Random(seed)
+    events = [event for pattern in patterns for event in pattern.pattern_data if len(event) >= 2]
+    return [[rng.choice(events)[:3] for _ in range(observations)] for _ in range(sessions)]
+
+
+async def _run_sessions(processor, config, streams, collector, label, node_lock=None) -> float:
+    """Run every session's stream concurrently; returns elapsed seconds."""
+
+    async def run_session(index, stream):
+        state = SimpleNamespace(stm=[], time=0, emotives_accumulator=[], metadata_accumulator=[])
+        for step, symbols in enumerate(stream):
+            observation = {'strings': list(symbols), 'vectors': [], 'emotives': {},
+                           'unique_id': f"bench_{index}_{step}"}
+            with perf_timer(label, collector):
+                if node_lock is not None:
+                    async with node_lock:
+                        result = await processor.observe(observation, session_state=state, config=config)
+                else:
+                    result = await processor.observe(observation, session_state=state, config=config)
+            # Keep a short STM so every observe predicts from a few events
+            state.stm = result['stm'][-3:]
+            state.time = result['time']
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i, stream) for i, stream in enumerate(streams)))
+    return time.perf_counter() - start
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            pattern_count: int = 10_000,
+            observations: int = 20) -> TimingCollector:
+    """Run observe throughput for increasing numbers of concurrent sessions."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1, 2, 4, 8, 16, 32]
+
+    from kato.config.session_config import SessionConfiguration
+    from kato.workers.kato_processor import KatoProcessor
+
+    generator = BenchmarkDataGenerator(seed=42)
+    processor_id = BenchmarkDataGenerator.make_processor_id(pattern_count) + '_observe'
+    processor = KatoProcessor(name=processor_id, processor_id=processor_id)
+    processor.pattern_processor.superkb.clickhouse_writer.delete_all_patterns()
+    processor.pattern_processor.superkb.redis_writer.delete_all_metadata()
+
+    patterns = generator.generate_patterns(pattern_count)
+    processor.learn_bulk([{'events': p.pattern_data} for p in patterns])
+    config = SessionConfiguration(max_pattern_length=0, process_predictions=True)
+
+    print("=" * 70)
+    print(f"  KATO Observe Concurrency: {pattern_count:,} patterns, {observations} observes/session")
+    print("=" * 70)
+
+    results = []
+    try:
+        loop = asyncio.new_event_loop()
+        # Warm-up: load caches and connections before timing
+        loop.run_until_complete(_run_sessions(
+            processor, config, _session_streams(patterns, 2, 5, seed=0), collector, 'warmup'))
+        for sessions in tiers:
+            streams = _session_streams(patterns, sessions, observations, seed=sessions)
+            total = sessions * observations
+            row = {'sessions': sessions, 'observations': total}
+            for mode in ('serialized', 'concurrent'):
+                node_lock = asyncio.Lock() if mode == 'serialized' else None
+                elapsed = loop.run_until_complete(_run_sessions(
+                    processor, config, streams, collector, f"{mode}.{sessions}", node_lock=node_lock))
+                row[f"{mode}_ops"] = total / elapsed
+                row[mode] = collector.get_stats(f"{mode}.{sessions}")
+            results.append(row)
+            print(f"\n  {sessions} sessions: serialized {row['serialized_ops']:,.0f} obs/s  "
+                  f"concurrent {row['concurrent_ops']:,.0f} obs/s")
+        loop.close()
+    finally:
+        processor.pattern_processor.superkb.clickhouse_writer.delete_all_patterns()
+        processor.pattern_processor.superkb.redis_writer.delete_all_metadata()
+
+    collector.print_summary("Observe Concurrency Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Observe Throughput vs Concurrent Sessions (single node)")
+    print(f"{'=' * 70}")
+    print(f"  {'Sessions':>8} {'Observes':>9} {'Serial/s':>10} {'Concur/s':>10} "
+          f"{'Speedup':>8} {'Concur p50':>11} {'Scaling':>8}")
+    base = results[0]['concurrent_ops'] if results else 1.0
+    for r in results:
+        print(
+            f"  {r['sessions']:>8} "
+            f"{r['observations']:>9,} "
+            f"{r['serialized_ops']:>10,.0f} "
+            f"{r['concurrent_ops']:>10,.0f} "
+            f"{r['concurrent_ops'] / max(r['serialized_ops'], 1e-9):>7.2f}x "
+            f"{r['concurrent']['median']:>9.1f}ms "
+            f"{r['concurrent_ops'] / max(base, 1e-9):>7.2f}x"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,132 @@
+"""
+Observe-sequence benchmark: eager vs lazy predictions for long sequences.
+
+Preloads patterns into one KatoProcessor, then replays sequences of 100 to
+1K observations through KatoProcessor.observe exactly as the
+observe-sequence endpoint does, in two modes:
+  - eager: every observation runs the prediction pipeline (the former
+    behaviour; all but the last result are discarded)
+  - lazy: only the last observation predicts (lazy_predictions=true)
+
+Auto-learning stays enabled (max_pattern_length=10) so both modes exercise
+the same STM and learning path; the benchmark checks that final STM and
+final predictions match. Reports end-to-end time per sequence. Requires
+running ClickHouse and Redis; the kb is deleted afterwards.
+
+Usage:
+    python -m benchmarks.test_observe_sequence
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def _sequence(patterns, length: int, seed: int) -> list[list[str]]:
+    """Observation sequence sampled from learned pattern events."""
+    rng = random.Random(seed)
+    events = [event for pattern in patterns for event in pattern.pattern_data if event]
+    return [rng.choice(events)[:3] for _ in range(length)]
+
+
+async def _replay(processor, config, sequence, lazy: bool):
+    """Observe a sequence the way observe_sequence_in_session does; returns the final state."""
+    state = SimpleNamespace(stm=[], time=0, emotives_accumulator=[], metadata_accumulator=[],
+                            percept_data={}, predictions=[])
+    last_position = len(sequence) - 1
+    for i, symbols in enumerate(sequence):
+        observation = {'strings': list(symbols), 'vectors': [], 'emotives': {}, 'metadata': {},
+                       'unique_id': f"seq_{i}", 'source': 'sequence'}
+        result = await processor.observe(observation, session_state=state, config=config,
+                                         predict=not lazy or i == last_position)
+        state.stm = result['stm']
+        state.time = result['time']
+        state.emotives_accumulator = result['emotives_accumulator']
+        state.metadata_accumulator = result['metadata_accumulator']
+        state.percept_data = result['percept_data']
+        state.predictions = result.get('predictions', [])
+    return state
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            pattern_count: int = 10_000,
+            iterations: int = 3) -> TimingCollector:
+    """Run eager vs lazy sequence observation for increasing sequence lengths."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [100, 300, 1_000]
+
+    from kato.config.session_config import SessionConfiguration
+    from kato.workers.kato_processor import KatoProcessor
+
+    generator = BenchmarkDataGenerator(seed=42)
+    processor_id = BenchmarkDataGenerator.make_processor_id(pattern_count) + '_sequence'
+    processor = KatoProcessor(name=processor_id, processor_id=processor_id)
+    processor.pattern_processor.superkb.clickhouse_writer.delete_all_patterns()
+    processor.pattern_processor.superkb.redis_writer.delete_all_metadata()
+
+    patterns = generator.generate_patterns(pattern_count)
+    processor.learn_bulk([{'events': p.pattern_data} for p in patterns])
+    config = SessionConfiguration(max_pattern_length=10, process_predictions=True)
+
+    print("=" * 70)
+    print(f"  KATO Observe Sequence: eager vs lazy predictions, {pattern_count:,} patterns")
+    print("=" * 70)
+
+    results = []
+    try:
+        loop = asyncio.new_event_loop()
+        # Warm-up: load caches and connections before timing
+        loop.run_until_complete(_replay(processor, config, _sequence(patterns, 20, seed=0), lazy=False))
+        for length in tiers:
+            identical = True
+            for iteration in range(iterations):
+                sequence = _sequence(patterns, length, seed=length * 100 + iteration)
+                with perf_timer(f"eager.{length}", collector):
+                    eager = loop.run_until_complete(_replay(processor, config, sequence, lazy=False))
+                with perf_timer(f"lazy.{length}", collector):
+                    lazy = loop.run_until_complete(_replay(processor, config, sequence, lazy=True))
+                identical &= (lazy.stm == eager.stm and
+                              [p['name'] for p in lazy.predictions] == [p['name'] for p in eager.predictions])
+            row = {'length': length, 'identical': identical,
+                   'eager': collector.get_stats(f"eager.{length}"),
+                   'lazy': collector.get_stats(f"lazy.{length}")}
+            results.append(row)
+            print(f"\n  {length:,} observations: eager {row['eager']['median']:.0f}ms  "
+                  f"lazy {row['lazy']['median']:.0f}ms  (identical={identical})")
+        loop.close()
+    finally:
+        processor.pattern_processor.superkb.clickhouse_writer.delete_all_patterns()
+        processor.pattern_processor.superkb.redis_writer.delete_all_metadata()
+
+    collector.print_summary("Observe Sequence Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  End-to-End Time per Sequence")
+    print(f"{'=' * 70}")
+    print(f"  {'Observations':>12} {'Eager p50':>11} {'Lazy p50':>10} {'Speedup':>8} {'Identical':>10}")
+    for r in results:
+        print(
+            f"  {r['length']:>12,} "
+            f"{r['eager']['median']:>9.0f}ms "
+            f"{r['lazy']['median']:>8.0f}ms "
+            f"{r['eager']['median'] / max(r['lazy']['median'], 1e-9):>7.1f}x "
+            f"{str(r['identical']):>10}"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,155 @@
+"""
+Pattern data cache benchmark: per-executor dicts vs one shared, bounded cache.
+
+Replays filter pipeline results through FilterPipelineExecutor for 1 to 8
+executors of the same kb (one per processor/searcher in a worker), each
+running queries whose candidates follow a skewed (Zipf-like) popularity
+over 20K patterns, in these modes:
+  - private: every executor keeps its own unbounded cache (the former
+    FilterPipelineExecutor.patterns_cache behaviour)
+  - shared: all executors use one process-wide PatternDataCache with a
+    byte budget (KATO_PATTERN_CACHE_MAX_BYTES), LRU and LFU eviction
+
+Rows are decoded from JSON per query, as the ClickHouse driver hands back
+fresh objects, and decoding is excluded from the timings. Reports retained
+memory (tracemalloc) after all queries, time to cache one query's rows, and
+hit rate. No database is required; patterns come from BenchmarkDataGenerator.
+
+Usage:
+    python -m benchmarks.test_pattern_data_cache
+"""
+
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+COLUMNS = ['name', 'pattern_data', 'length']
+
+
+def _queries(pattern_count: int, count: int, candidates: int, seed: int) -> list[list[int]]:
+    """Candidate index lists with skewed popularity (a few patterns are hot)."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(pattern_count)]
+    return [sorted(set(rng.choices(range(pattern_count), weights=weights, k=candidates)))
+            for _ in range(count)]
+
+
+def _cache_rows(mode: str, executor, result) -> None:
+    if mode != 'private':
+        # Former behaviour (private): the per-executor dict is never reset
+        executor.patterns_cache = {}
+    executor._cache_result_rows(result)
+
+
+def _run(mode: str, executors: int, patterns, encoded, queries, budget: int, collector, label: str,
+         trace: bool = False):
+    """Cache every query's rows; returns (retained bytes or None, shared cache hit rate or None).
+
+    Memory is traced in a separate, untimed pass (trace=True): tracemalloc
+    slows allocation-heavy code by several times.
+    """
+    from kato.filters.executor import FilterPipelineExecutor
+    from kato.filters.pattern_data_cache import PatternDataCache
+
+    config = SimpleNamespace(filter_pipeline=['length'], enable_filter_metrics=False,
+                             max_candidates_per_stage=None)
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+
+    shared = PatternDataCache(budget, mode) if mode != 'private' else None
+    pool = [
+        FilterPipelineExecutor(config, [], None, None, 'kb_bench',
+                               pattern_cache=shared if shared is not None else PatternDataCache(1 << 62))
+        for _ in range(executors)
+    ]
+    for i, query in enumerate(queries):
+        executor = pool[i % executors]
+        result = SimpleNamespace(
+            column_names=COLUMNS,
+            result_rows=[(patterns[j].name, json.loads(encoded[j]), patterns[j].length) for j in query])
+        if trace:
+            _cache_rows(mode, executor, result)
+        else:
+            with perf_timer(label, collector):
+                _cache_rows(mode, executor, result)
+
+    retained = None
+    if trace:
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+    if shared is None:
+        return retained, None
+    return retained, shared.hits / max(shared.hits + shared.misses, 1)
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            pattern_count: int = 20_000,
+            query_count: int = 400,
+            candidates: int = 2_000,
+            budget: int = 16 * 1024 * 1024) -> TimingCollector:
+    """Run private vs shared pattern caches for increasing executor counts."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1, 4, 8]
+
+    generator = BenchmarkDataGenerator(seed=42)
+    patterns = generator.generate_patterns(pattern_count)
+    encoded = [json.dumps(p.pattern_data) for p in patterns]
+    queries = _queries(pattern_count, query_count, candidates, seed=7)
+
+    print("=" * 70)
+    print(f"  KATO Pattern Data Cache: {pattern_count:,} patterns, {query_count} queries, "
+          f"budget {budget / 1024 / 1024:.0f}MB")
+    print("=" * 70)
+
+    results = []
+    for executors in tiers:
+        row = {'executors': executors}
+        for mode in ('private', 'lru', 'lfu'):
+            label = f"{mode}.{executors}"
+            _, hit_rate = _run(mode, executors, patterns, encoded, queries, budget, collector, label)
+            retained, _ = _run(mode, executors, patterns, encoded, queries, budget, collector, label, trace=True)
+            row[mode] = {'retained': retained, 'hit_rate': hit_rate, **collector.get_stats(label)}
+        results.append(row)
+        print(f"\n  {executors} executors: private {row['private']['retained'] / 1024 / 1024:.1f}MB, "
+              f"lru {row['lru']['retained'] / 1024 / 1024:.1f}MB, "
+              f"lfu {row['lfu']['retained'] / 1024 / 1024:.1f}MB")
+
+    collector.print_summary("Pattern Data Cache Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Retained Memory, Time per Query and Hit Rate")
+    print(f"{'=' * 70}")
+    print(f"  {'Executors':>9} {'Mode':>8} {'Retained MB':>12} {'p50':>9} {'Hit rate':>9}")
+    for r in results:
+        for mode in ('private', 'lru', 'lfu'):
+            m = r[mode]
+            print(
+                f"  {r['executors']:>9} "
+                f"{mode:>8} "
+                f"{m['retained'] / 1024 / 1024:>12.1f} "
+                f"{m['median']:>7.2f}ms "
+                f"{'-' if m['hit_rate'] is None else format(m['hit_rate'], '.1%'):>9}"
+            )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,178 @@
+"""
+Prediction metrics microbenchmark: per-candidate loop vs columnar NumPy pass.
+
+Times the post-matching metrics step of predictPattern (cosine distance,
+itfdf_similarity, confluence, entropy fallbacks, TF-IDF) over 100 to 3K
+candidates with:
+  - loop: the former per-candidate Python loop (direct confluence, no
+    conditional probability cache round trips)
+  - columnar: kato.informatics.prediction_metrics.prediction_metrics
+
+Half of the candidates carry pre-computed metrics (finalize-training), half
+take the runtime fallbacks. Both paths' outputs are compared for exact
+equality. No database is required; patterns come from BenchmarkDataGenerator.
+
+Usage:
+    python -m benchmarks.test_prediction_metrics
+"""
+
+import random
+import sys
+from collections import Counter
+from itertools import chain
+from math import log, log2
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+
+def _loop_metrics(present_lists, frequencies, state, precomputed, cache,
+                  total_pattern_frequencies, total_ensemble, total_unique_patterns, total_symbols):
+    """Per-candidate metrics as predictPattern computed them before the columnar pass."""
+    from kato.informatics.metrics import confluence
+
+    N = len(present_lists)
+    global_symbols = sorted(set().union(*present_lists) | set(state))
+    symbol_to_idx = {s: i for i, s in enumerate(global_symbols)}
+    state_vec = np.zeros(len(global_symbols))
+    for symbol, count in Counter(state).items():
+        state_vec[symbol_to_idx[symbol]] = cache.get(symbol, 0) * count
+    state_norm = np.linalg.norm(state_vec)
+    pattern_matrix = np.zeros((N, len(global_symbols)))
+    for i, _present in enumerate(present_lists):
+        for symbol, count in Counter(_present).items():
+            pattern_matrix[i, symbol_to_idx[symbol]] = cache.get(symbol, 0) * count
+    if state_norm > 0:
+        denom = np.linalg.norm(pattern_matrix, axis=1) * state_norm
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = 1.0 - np.where(denom > 0, (pattern_matrix @ state_vec) / denom, 0.0)
+    else:
+        distances = np.ones(N)
+
+    rows = []
+    for i, _present in enumerate(present_lists):
+        distance = float(distances[i])
+        _p_e_h = float(frequencies[i] / total_pattern_frequencies) if total_pattern_frequencies > 0 else 0.0
+        itfdf = 1 - (distance * frequencies[i] / total_ensemble) if total_ensemble > 0 else 0.0
+        confluence_val = _p_e_h * (1 - confluence(_present, cache)) if _present else 0.0
+        precomp = precomputed[i]
+        if precomp:
+            entropy = precomp['entropy']
+            normalized = precomp['normalized_entropy']
+            global_normalized = precomp['global_normalized_entropy']
+            items = list(precomp['tf_vector'].items())
+        else:
+            entropy = normalized = global_normalized = 0.0
+            if _present:
+                length = len(_present)
+                for count in Counter(_present).values():
+                    p = count / length
+                    entropy -= p * log2(p)
+                if total_symbols > 1:
+                    for count in Counter(_present).values():
+                        p = count / length
+                        normalized -= p * log(p, total_symbols)
+                    for symbol in set(_present):
+                        prob = cache.get(symbol, 0)
+                        if prob > 0:
+                            global_normalized -= prob * log(prob, total_symbols)
+            items = [(s, _present.count(s) / len(_present)) for s in set(_present)]
+        scores = []
+        for symbol, tf in items:
+            patterns_with_symbol = int(cache[symbol] * total_unique_patterns) if symbol in cache else 1
+            scores.append(tf * (log2(total_unique_patterns / max(patterns_with_symbol, 1)) + 1))
+        tfidf = sum(scores) / len(scores) if scores else 0.0
+        rows.append((entropy, normalized, global_normalized, itfdf, confluence_val, tfidf))
+    return rows
+
+
+def _inputs(patterns, query, rng):
+    """Prediction-like inputs: present = a random window of each pattern."""
+    present_lists, frequencies, precomputed = [], [], []
+    vocabulary = set()
+    for pattern in patterns:
+        events = pattern.pattern_data
+        start = rng.randint(0, len(events) - 1)
+        present = list(chain(*events[start:start + 2]))
+        present_lists.append(present)
+        frequencies.append(rng.randint(1, 20))
+        flat = list(chain(*events))
+        vocabulary.update(flat)
+        if rng.random() < 0.5:
+            counts = Counter(flat)
+            precomputed.append({'entropy': 1.0, 'normalized_entropy': 0.5, 'global_normalized_entropy': 0.25,
+                                'tf_vector': {s: c / len(flat) for s, c in counts.items()}})
+        else:
+            precomputed.append(None)
+    cache = {s: rng.randint(1, 200) / 1000 for s in vocabulary}
+    return (present_lists, frequencies, query, precomputed, cache,
+            sum(frequencies) * 5, sum(frequencies), 1000, len(vocabulary))
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 20) -> TimingCollector:
+    """Run loop vs columnar prediction metrics across candidate counts."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [100, 300, 1_000, 3_000]
+
+    from kato.informatics.prediction_metrics import prediction_metrics
+
+    generator = BenchmarkDataGenerator(seed=42)
+    all_patterns = generator.generate_patterns(max(tiers))
+    queries = generator.generate_observations(all_patterns, count=iterations)
+    rng = random.Random(7)
+
+    print("=" * 70)
+    print("  KATO Prediction Metrics: per-candidate loop vs columnar pass")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        identical = True
+        for query in queries:
+            args = _inputs(all_patterns[:tier], list(chain(*query['stm'])), rng)
+            with perf_timer(f"loop.{tier}", collector):
+                expected = _loop_metrics(*args)
+            with perf_timer(f"columnar.{tier}", collector):
+                metrics = prediction_metrics(*args)
+            actual = list(zip(metrics['entropy'], metrics['normalized_entropy'],
+                              metrics['global_normalized_entropy'], metrics['itfdf_similarity'],
+                              metrics['confluence'], metrics['tfidf_score']))
+            identical &= actual == expected
+        row = {'tier': tier, 'identical': identical,
+               'loop': collector.get_stats(f"loop.{tier}"),
+               'columnar': collector.get_stats(f"columnar.{tier}")}
+        results.append(row)
+        print(f"\n  {tier:,} candidates: loop {row['loop']['median']:.2f}ms  "
+              f"columnar {row['columnar']['median']:.2f}ms  (identical={identical})")
+
+    collector.print_summary("Prediction Metrics Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Prediction Metrics per Query")
+    print(f"{'=' * 70}")
+    print(f"  {'Candidates':>10} {'Loop p50':>10} {'Columnar p50':>13} {'Speedup':>8} {'Identical':>10}")
+    for r in results:
+        print(
+            f"  {r['tier']:>10,} "
+            f"{r['loop']['median']:>8.2f}ms "
+            f"{r['columnar']['median']:>11.2f}ms "
+            f"{r['loop']['median'] / max(r['columnar']['median'], 1e-9):>7.1f}x "
+            f"{str(r['identical']):>10}"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -167,10 +167,13 @@ def run_prediction_benchmark(tier_size: int, collector: TimingCollector,
             print(f"\n  Filter pipeline stage metrics (last run):")
             for sm in fe.stage_metrics:
                 stage_name = sm.get('filter', 'unknown')
-                stage_ms = sm.get('duration_ms', 0)
+                stage_ms = sm.get('time_ms', 0)
                 in_count = sm.get('candidates_in', 0)
-                out_count = sm.get('candidates_out', 0)
-                print(f"    {stage_name:<20}: {stage_ms:.1f}ms ({in_count} -> {out_count} candidates)")
+                out_count = sm.get('candidates_after', 0)
+                round_trips = sm.get('round_trips', 0)
+                handoff = sm.get('handoff', 'none')
+                print(f"    {stage_name:<20}: {stage_ms:.1f}ms ({in_count} -> {out_count} candidates, "
+                      f"{round_trips} round trips, handoff={handoff})")
 
     # Restore original methods
     for uninstrument in uninstrument_fns:
@@ -0,0 +1,179 @@
+"""
+Request coalescing benchmark: concurrent filter pipelines with and without batching.
+
+Loads a synthetic knowledge base of 10-event patterns, then runs the
+length -> jaccard filter pipeline (plus pattern_data materialization) for
+N concurrent sessions of one kb, each with one of a few STMs (overlapping
+sessions), in two modes:
+  - separate:  every session sends its own scan and pattern_data read
+  - coalesced: sessions arriving within KATO_COALESCE_WINDOW_MS share one
+               scan (one flag column per distinct STM) and one read
+
+Each session must get the same candidates in both modes. Reports wall time
+for the whole wave, per-session latency, ClickHouse round trips and the
+coalescer's batch sizes and queueing delay. A single session is also timed
+alone, to check low-load latency grows by no more than the window.
+
+Usage:
+    python -m benchmarks.test_request_coalescing
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_request_coalescing__"
+
+PATTERNS = 100_000
+EVENTS = 10
+TOKENS_PER_EVENT = 4
+DISTINCT_STMS = 4
+WINDOW_MS = 5.0
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _insert_patterns(ch, count: int) -> None:
+    """Insert synthetic patterns of varying length drawn from a 1000-token vocabulary."""
+    events = f"(3 + number % {EVENTS})"
+    data = (f"arrayMap(e -> arrayMap(i -> concat('tok_', toString(cityHash64(number, e, i) % 1000)), "
+            f"range({TOKENS_PER_EVENT})), range({events}))")
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT
+            '{KB_ID}',
+            hex(SHA1(toString(number))),
+            {data},
+            {events} * {TOKENS_PER_EVENT},
+            arrayDistinct(arrayFlatten({data})),
+            {events} * {TOKENS_PER_EVENT},
+            [], [], '', ''
+        FROM numbers({count})
+        """
+    )
+
+
+def _wave(ch, states, config, coalescer):
+    """Run one pipeline per state concurrently; returns (wall ms, latencies, candidates, round trips)."""
+    from kato.filters.executor import FilterPipelineExecutor
+    from kato.filters.pattern_data_cache import PatternDataCache
+
+    no_cache = PatternDataCache(max_bytes=0)
+    executors = [FilterPipelineExecutor(config, state, ch, None, KB_ID, pattern_cache=no_cache,
+                                        coalescer=coalescer) for state in states]
+    latencies = [0.0] * len(states)
+    candidates = [None] * len(states)
+
+    def run(i):
+        start = time.perf_counter()
+        candidates[i] = executors[i].execute_pipeline()
+        executors[i].materialize(candidates[i])
+        latencies[i] = (time.perf_counter() - start) * 1000
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(states))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_ms = (time.perf_counter() - start) * 1000
+    round_trips = sum(e.get_metrics()['total_round_trips'] for e in executors)
+    return wall_ms, latencies, candidates, round_trips
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 5) -> TimingCollector:
+    """Run waves of concurrent sessions, separate vs coalesced."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1, 8, 32]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    from kato.filters.coalescer import RequestCoalescer
+
+    ch = _get_clickhouse()
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception:
+        pass
+    _insert_patterns(ch, PATTERNS)
+    ch.command("SYSTEM FLUSH ASYNC INSERT QUEUE")
+
+    stms = [[f"tok_{i}" for i in range(offset, 400 + offset, 10)] for offset in range(DISTINCT_STMS)]
+    config = SimpleNamespace(filter_pipeline=['length', 'jaccard'],
+                             length_min_ratio=0.5, length_max_ratio=1.5,
+                             jaccard_threshold=0.05, jaccard_min_overlap=3,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+
+    print("=" * 70)
+    print(f"  KATO Request Coalescing: {PATTERNS:,} patterns, {DISTINCT_STMS} distinct STMs, "
+          f"{WINDOW_MS:g}ms window")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        states = [stms[i % DISTINCT_STMS] for i in range(tier)]
+        row = {'tier': tier}
+        for mode, window_ms in (('separate', 0.0), ('coalesced', WINDOW_MS)):
+            coalescer = RequestCoalescer(window_ms=window_ms, max_batch=64)
+            latencies = []
+            for _ in range(iterations):
+                wall_ms, wave_latencies, candidates, round_trips = _wave(ch, states, config, coalescer)
+                collector.record(f"{mode}.{tier}", wall_ms)
+                latencies.extend(wave_latencies)
+            row[mode] = {
+                'stats': collector.get_stats(f"{mode}.{tier}"),
+                'latency_p50': statistics.median(latencies),
+                'latency_max': max(latencies),
+                'round_trips': round_trips,
+                'candidates': candidates,
+                'coalescer': coalescer.get_stats()['operations'].get('scan', {}),
+            }
+        if row['separate']['candidates'] != row['coalesced']['candidates']:
+            print(f"  WARNING: coalesced and separate candidates differ for {tier} sessions")
+        results.append(row)
+
+    print(f"\n  {'Sessions':>8} {'Mode':>10} {'Wave p50':>10} {'Session p50':>12} {'Session max':>12} "
+          f"{'Round trips':>12} {'Mean batch':>11} {'Mean queue':>11}")
+    for r in results:
+        for mode in ('separate', 'coalesced'):
+            m = r[mode]
+            coalesced = m['coalescer']
+            print(
+                f"  {r['tier']:>8} {mode:>10} "
+                f"{m['stats']['median']:>8.1f}ms "
+                f"{m['latency_p50']:>10.1f}ms "
+                f"{m['latency_max']:>10.1f}ms "
+                f"{m['round_trips']:>12} "
+                f"{coalesced.get('mean_batch_size', 0):>11.1f} "
+                f"{coalesced.get('mean_queue_ms', 0):>9.1f}ms"
+            )
+    print(f"{'=' * 70}")
+
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{KB_ID}'")
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,158 @@
+"""
+Session storage benchmark: bytes transferred and latency per observe.
+
+Replays the Redis side of the observe endpoint (get_session, update STM,
+accumulators, percept data and predictions, update_session) against a real
+Redis with two RedisSessionManager layouts:
+  - document: one JSON document per session (SETEX + EXISTS per save,
+    GET + EXPIRE per read)
+  - compact: hash + STM/accumulator lists (session_layout.py); observe
+    reads STM and accumulators only and writes deltas
+
+Sessions hold 0 to 500 predictions (prediction-shaped dicts built from
+BenchmarkDataGenerator patterns) and an STM that grows to 20 events.
+Bytes are Redis' total_net_input_bytes + total_net_output_bytes (INFO
+stats) per observe. Requires Redis (REDIS_URL or settings); the
+benchmark's session keys are deleted afterwards.
+
+Usage:
+    python -m benchmarks.test_session_storage
+"""
+
+import asyncio
+import random
+import sys
+from itertools import chain
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector, perf_timer
+
+OBSERVE_PARTS = ('stm', 'emotives', 'metadata')
+
+
+def _predictions(patterns, count: int, rng: random.Random) -> list[dict]:
+    """Prediction-shaped dicts, as observe stores them in the session."""
+    predictions = []
+    for pattern in rng.sample(patterns, count):
+        events = pattern.pattern_data
+        split = rng.randint(0, len(events) - 1)
+        present = events[split:split + 2]
+        predictions.append({
+            'type': 'prototypical', 'name': pattern.name, 'frequency': rng.randint(1, 50),
+            'matches': list(chain(*present))[:3], 'missing': list(chain(*present))[3:],
+            'extras': [], 'past': events[:split], 'present': present, 'future': events[split + 2:],
+            'similarity': rng.random(), 'number_of_blocks': 1, 'evidence': rng.random(),
+            'confidence': rng.random(), 'snr': rng.random(), 'fragmentation': 0, 'anomalies': [],
+            'entropy': rng.random(), 'normalized_entropy': rng.random(),
+            'global_normalized_entropy': rng.random(), 'itfdf_similarity': rng.random(),
+            'confluence': rng.random(), 'tfidf_score': rng.random(), 'predictive_information': rng.random(),
+            'potential': rng.random(), 'emotives': {'utility': rng.random()}, 'metadata': {},
+        })
+    return predictions
+
+
+async def _net_bytes(client) -> int:
+    stats = await client.info('stats')
+    return int(stats['total_net_input_bytes']) + int(stats['total_net_output_bytes'])
+
+
+async def _observe_loop(manager, session_id, stream, predictions, collector, label, parts):
+    """Observe-endpoint session traffic for a stream of events; returns bytes per observe."""
+    before = await _net_bytes(manager.redis_client)
+    for step, event in enumerate(stream):
+        with perf_timer(label, collector):
+            session = await manager.get_session(session_id, parts=parts)
+            session.stm = (session.stm + [event])[-20:]
+            session.emotives_accumulator = (session.emotives_accumulator + [{'utility': step / 100}])[-20:]
+            session.metadata_accumulator = (session.metadata_accumulator + [{'step': [str(step)]}])[-20:]
+            session.time += 1
+            session.percept_data = {'strings': event, 'vectors': [], 'emotives': {}, 'path': [], 'metadata': {}}
+            session.predictions = predictions[step % len(predictions)] if predictions else []
+            await manager.update_session(session)
+    after = await _net_bytes(manager.redis_client)
+    # Two INFO calls are included; they are a few KB against hundreds of observes
+    return (after - before) / len(stream)
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            observations: int = 200) -> TimingCollector:
+    """Run document vs compact session storage for increasing prediction counts."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [0, 50, 200, 500]
+
+    from kato.config.settings import get_settings
+    from kato.sessions.redis_session_manager import RedisSessionManager
+
+    redis_url = get_settings().database.redis_url or "redis://localhost:6379"
+    generator = BenchmarkDataGenerator(seed=42)
+    patterns = generator.generate_patterns(2_000)
+    rng = random.Random(5)
+    stream = [sorted(rng.sample(generator.word_tokens, 3)) for _ in range(observations)]
+
+    managers = {
+        'document': RedisSessionManager(redis_url=redis_url, key_prefix="bench:session:doc:", compact_layout=False),
+        'compact': RedisSessionManager(redis_url=redis_url, key_prefix="bench:session:compact:", compact_layout=True),
+    }
+
+    print("=" * 70)
+    print(f"  KATO Session Storage: {observations} observes per tier")
+    print("=" * 70)
+
+    results = []
+
+    async def run():
+        for manager in managers.values():
+            await manager.initialize()
+        try:
+            for tier in tiers:
+                # A few distinct prediction lists so consecutive observes differ
+                predictions = [_predictions(patterns, tier, rng) for _ in range(3)] if tier else []
+                row = {'predictions': tier}
+                for mode, manager in managers.items():
+                    session = await manager.create_session(f"bench_{mode}_{tier}")
+                    parts = OBSERVE_PARTS if mode == 'compact' else None
+                    row[f"{mode}_bytes"] = await _observe_loop(
+                        manager, session.session_id, stream, predictions, collector, f"{mode}.{tier}", parts)
+                    row[mode] = collector.get_stats(f"{mode}.{tier}")
+                    await manager.delete_session(session.session_id)
+                results.append(row)
+                print(f"\n  {tier} predictions: document {row['document_bytes'] / 1024:,.1f}KB "
+                      f"{row['document']['median']:.2f}ms  compact {row['compact_bytes'] / 1024:,.1f}KB "
+                      f"{row['compact']['median']:.2f}ms")
+        finally:
+            for manager in managers.values():
+                await manager.shutdown()
+
+    asyncio.run(run())
+
+    collector.print_summary("Session Storage Timing Summary")
+
+    print(f"\n{'=' * 70}")
+    print(f"  Redis Traffic and Latency per Observe")
+    print(f"{'=' * 70}")
+    print(f"  {'Predictions':>11} {'Doc KB':>8} {'Compact KB':>11} {'Ratio':>6} "
+          f"{'Doc p50':>9} {'Compact p50':>12} {'Speedup':>8}")
+    for r in results:
+        print(
+            f"  {r['predictions']:>11} "
+            f"{r['document_bytes'] / 1024:>8.1f} "
+            f"{r['compact_bytes'] / 1024:>11.1f} "
+            f"{r['document_bytes'] / max(r['compact_bytes'], 1e-9):>5.1f}x "
+            f"{r['document']['median']:>7.2f}ms "
+            f"{r['compact']['median']:>10.2f}ms "
+            f"{r['document']['median'] / max(r['compact']['median'], 1e-9):>7.1f}x"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,137 @@
+"""
+Single-symbol prediction benchmark: computed per call vs materialized.
+
+Learns a generated knowledge base through a PatternProcessor, then polls
+one-symbol predictions for symbols that start patterns (common symbols
+start thousands), in two modes:
+  - computed:     every call scans ClickHouse for patterns starting with the
+                  symbol and aligns each one against the STM
+  - materialized: the first call of a symbol stores its ranked predictions;
+                  later calls read them and the returned patterns' metadata
+
+Both modes must return the same predictions. A pattern is then learned to
+check that only its first symbol is recomputed.
+
+Usage:
+    python -m benchmarks.test_single_symbol_predictions
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import time
+
+from benchmarks.data_generator import BenchmarkDataGenerator
+from benchmarks.profiler import TimingCollector
+
+POLLS = 5
+SYMBOLS = 20
+
+
+def _setup_processor(processor_id: str):
+    from kato.config.settings import get_settings
+    from kato.workers.pattern_processor import PatternProcessor
+
+    return PatternProcessor(settings=get_settings(), name=processor_id, kb_id=processor_id,
+                            max_pattern_length=0, persistence=7, max_predictions=100,
+                            recall_threshold=0.1, use_token_matching=True)
+
+
+def _learn(pp, patterns) -> None:
+    pp.learn_bulk([{'events': pattern.pattern_data} for pattern in patterns])
+    pp.superkb.clickhouse_writer.flush_if_pending()
+    pp.superkb.clickhouse_writer.flush_async_insert_queue()
+
+
+def _poll(pp, loop, symbols, collector, name):
+    """Predict every symbol POLLS times; returns the last predictions per symbol."""
+    results = {}
+    for _ in range(POLLS):
+        for symbol in symbols:
+            start = time.perf_counter()
+            results[symbol] = loop.run_until_complete(pp._predict_single_symbol_fast(symbol, [[symbol]]))
+            collector.record(name, (time.perf_counter() - start) * 1000)
+    return results
+
+
+def _names(results):
+    return {symbol: [p['name'] for p in predictions] for symbol, predictions in results.items()}
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 1) -> TimingCollector:
+    """Poll single-symbol predictions computed and materialized."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000, 10_000, 100_000]
+
+    from kato.searches.single_symbol_predictions import (
+        get_single_symbol_predictions,
+        reset_single_symbol_predictions,
+    )
+
+    print("=" * 70)
+    print(f"  KATO Single-Symbol Predictions: {SYMBOLS} symbols polled {POLLS}x")
+    print("=" * 70)
+
+    generator = BenchmarkDataGenerator()
+    loop = asyncio.new_event_loop()
+    results = []
+    for tier in tiers:
+        processor_id = BenchmarkDataGenerator.make_processor_id(tier) + "_single"
+        pp = _setup_processor(processor_id)
+        pp.clear_all_memory()
+        patterns = generator.generate_patterns(tier)
+        _learn(pp, patterns)
+        queries = generator.generate_single_symbol_queries(patterns, count=SYMBOLS)
+        symbols = list(dict.fromkeys(q['symbol'] for q in queries))
+
+        row = {'tier': tier}
+        for mode in ('computed', 'materialized'):
+            for _ in range(iterations):
+                reset_single_symbol_predictions(max_predictions=0 if mode == 'computed' else 200_000,
+                                                settle_ms=0)
+                row[mode] = _names(_poll(pp, loop, symbols, collector, f"{mode}.{tier}"))
+            row[f"{mode}_stats"] = collector.get_stats(f"{mode}.{tier}")
+        if row['computed'] != row['materialized']:
+            print(f"  WARNING: materialized predictions differ at {tier:,} patterns")
+
+        # Learn a pattern starting with the first symbol: only that symbol is recomputed
+        store = get_single_symbol_predictions()
+        misses = store.get_stats()['misses']
+        new = generator.generate_patterns(1)[0]
+        events = [[symbols[0]] + [t for t in new.pattern_data[0] if t != symbols[0]]] + new.pattern_data[1:]
+        pp.learn_events(events)
+        pp.superkb.clickhouse_writer.flush_async_insert_queue()
+        after = _names(_poll(pp, loop, symbols, collector, f"after_learn.{tier}"))
+        row['recomputed'] = store.get_stats()['misses'] - misses
+        if row['recomputed'] != 1 or any(after[s] != row['materialized'][s] for s in symbols[1:]):
+            print(f"  WARNING: learning one pattern recomputed {row['recomputed']} symbols at {tier:,} patterns")
+        results.append(row)
+        pp.clear_all_memory()
+
+    print(f"\n  {'Patterns':>9} {'Computed p50':>13} {'Materialized p50':>17} {'Speedup':>8} {'Recomputed':>11}")
+    for r in results:
+        computed = r['computed_stats']['median']
+        materialized = r['materialized_stats']['median']
+        print(
+            f"  {r['tier']:>9,} "
+            f"{computed:>11.2f}ms "
+            f"{materialized:>15.2f}ms "
+            f"{computed / max(materialized, 1e-9):>7.1f}x "
+            f"{r['recomputed']:>11}"
+        )
+    print(f"{'=' * 70}")
+
+    loop.close()
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
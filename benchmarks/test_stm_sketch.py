@@ -0,0 +1,113 @@
+"""
+STM sketch benchmark: per-prediction filter setup, rebuilt vs incremental.
+
+Replays observation streams and, after every observation, builds the
+length, jaccard and minhash filters the pipeline would run:
+  - rebuild: filters derive length, token set, MinHash signature and LSH
+             bands from the flattened STM (every token hashed per prediction)
+  - sketch:  the session's StmSketch is synced with the STM (one appended
+             event, one rolled off in ROLLING mode) and handed to the filters
+
+Streams use STMs of 10, 40 and 160 tokens in ROLLING mode. Signatures and
+bands must be identical. No services needed.
+
+Usage:
+    python -m benchmarks.test_stm_sketch
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+VOCABULARY = 500
+TOKENS_PER_EVENT = 4
+OBSERVATIONS = 300
+
+
+def _stream(stm_tokens, rng):
+    """Rolling STMs of stm_tokens tokens, one event appended and one dropped per observation."""
+    window = stm_tokens // TOKENS_PER_EVENT
+    stm = []
+    for _ in range(window + OBSERVATIONS):
+        stm = (stm + [[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(TOKENS_PER_EVENT)]])[-window:]
+        if len(stm) == window:
+            yield stm
+
+
+def _filters(config, state, sketch=None):
+    from kato.filters.jaccard_filter import JaccardFilter
+    from kato.filters.length_filter import LengthFilter
+    from kato.filters.minhash_filter import MinHashFilter
+
+    LengthFilter(config, state, sketch=sketch)
+    JaccardFilter(config, state, sketch=sketch)
+    return MinHashFilter(config, state, kb_id='kb', sketch=sketch)
+
+
+def run_all(collector: TimingCollector = None, tiers: list = None,
+            iterations: int = 3) -> TimingCollector:
+    """Replay observation streams with rebuilt and incrementally synced sketches."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [10, 40, 160]
+
+    from kato.filters.stm_sketch import StmSketch
+
+    config = SimpleNamespace(minhash_threshold=0.5, minhash_bands=20, minhash_rows=5, minhash_num_hashes=100,
+                             length_min_ratio=0.5, length_max_ratio=2.0,
+                             jaccard_threshold=0.2, jaccard_min_overlap=1)
+
+    print("=" * 70)
+    print("  KATO STM Sketch: filter setup per prediction, ROLLING STM")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        stream = list(_stream(tier, random.Random(tier)))
+        states = [[t for event in stm for t in event] for stm in stream]
+        mismatches = 0
+        for _ in range(iterations):
+            start = time.perf_counter()
+            rebuilt = [_filters(config, state).stm_lsh_bands for state in states]
+            collector.record(f"rebuild.{tier}", (time.perf_counter() - start) * 1e6 / len(states))
+
+            start = time.perf_counter()
+            sketch = StmSketch()
+            incremental = []
+            for stm, state in zip(stream, states):
+                sketch.sync(stm)
+                incremental.append(_filters(config, state, sketch=sketch).stm_lsh_bands)
+            collector.record(f"sketch.{tier}", (time.perf_counter() - start) * 1e6 / len(states))
+            mismatches += rebuilt != incremental
+        if mismatches:
+            print(f"  WARNING: sketch bands differ from the batch computation for {tier}-token STMs")
+        results.append({
+            'tier': tier,
+            'rebuild': collector.get_stats(f"rebuild.{tier}"),
+            'sketch': collector.get_stats(f"sketch.{tier}"),
+        })
+
+    print(f"\n  {'STM tokens':>10} {'Rebuild p50':>12} {'Sketch p50':>11} {'Speedup':>8}")
+    for r in results:
+        print(
+            f"  {r['tier']:>10,} "
+            f"{r['rebuild']['median']:>10.1f}us "
+            f"{r['sketch']['median']:>9.1f}us "
+            f"{r['rebuild']['median'] / max(r['sketch']['median'], 1e-9):>7.1f}x"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,178 @@
+"""
+Integer token schema benchmark: String token sets vs dictionary IDs.
+
+Loads the same synthetic knowledge base twice into ClickHouse:
+  - v1: token_set Array(String) (current schema)
+  - v2: token_ids Array(UInt32) from the kb's token dictionary, token_set
+        empty (KATO_TOKEN_IDS=true)
+
+then reports the compressed / uncompressed size of the token set column
+and the latency of the Jaccard filter stage on each. Both schemas must
+select the same patterns.
+
+Requires ClickHouse with the schema v2 column (config/clickhouse/init.sql
+or scripts/migrate_token_ids.py) and Redis for the token dictionary.
+
+Usage:
+    python -m benchmarks.test_token_ids
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks.profiler import TimingCollector
+
+KB_V1 = "__bench_token_ids_v1__"
+KB_V2 = "__bench_token_ids_v2__"
+
+VOCABULARY = 5000
+TOKENS_PER_PATTERN = 12
+QUERIES = 20
+STM_TOKENS = 20
+
+
+def _get_clients():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    manager = OptimizedConnectionManager()
+    return manager.clickhouse, manager.redis
+
+
+def _drop(ch, kb_id: str) -> None:
+    try:
+        ch.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{kb_id}'")
+    except Exception:
+        pass
+
+
+def _load(ch, redis, count: int):
+    """Insert count patterns into both kbs; returns the v2 token dictionary."""
+    from kato.storage.token_dictionary import TOKEN_IDS_SCHEMA, TokenDictionary, token_dictionary_keys
+
+    for statement in TOKEN_IDS_SCHEMA:
+        ch.command(statement)
+    for kb_id in (KB_V1, KB_V2):
+        _drop(ch, kb_id)
+
+    # A fresh dictionary assigns tok_i -> i + 1, matching the server-side generation below
+    redis.delete(*token_dictionary_keys(KB_V2))
+    dictionary = TokenDictionary(KB_V2, redis)
+    dictionary.assign([f"tok_{i}" for i in range(VOCABULARY)])
+
+    ids = (f"arraySort(arrayDistinct(arrayMap(i -> toUInt32(cityHash64(number, i) % {VOCABULARY}) + 1, "
+           f"range({TOKENS_PER_PATTERN}))))")
+    tokens = "arrayMap(id -> concat('tok_', toString(id - 1)), ids)"
+    for kb_id, token_set, token_ids in ((KB_V1, tokens, "[]"), (KB_V2, "[]", "ids")):
+        ch.command(
+            f"""
+            INSERT INTO kato.patterns_data
+                (kb_id, name, pattern_data, length, token_set, token_ids, token_count,
+                 minhash_sig, lsh_bands, first_token, last_token)
+            SELECT '{kb_id}', hex(SHA1(toString(number))), [{tokens}], length(ids),
+                   {token_set}, {token_ids}, length(ids), [], [], '', ''
+            FROM (SELECT number, {ids} AS ids FROM numbers({count}))
+            """,
+            settings={'max_insert_block_size': 100_000},
+        )
+    ch.command("OPTIMIZE TABLE kato.patterns_data FINAL")
+    return dictionary
+
+
+def _column_bytes(ch, kb_id: str, column: str) -> tuple[int, int]:
+    result = ch.query(
+        f"SELECT sum(column_data_compressed_bytes), sum(column_data_uncompressed_bytes) "
+        f"FROM system.parts_columns WHERE database = 'kato' AND table = 'patterns_data' "
+        f"AND active AND partition = '{kb_id}' AND column = '{column}'"
+    )
+    return tuple(int(v or 0) for v in result.result_rows[0])
+
+
+def _run(ch, redis, kb_id: str, token_ids: bool, states, collector, name):
+    """Run the Jaccard stage per state; returns the candidate sets."""
+    import kato.filters.executor as executor_module
+    from kato.filters.executor import FilterPipelineExecutor
+
+    config = SimpleNamespace(filter_pipeline=['jaccard'], jaccard_threshold=0.1, jaccard_min_overlap=2,
+                             enable_filter_metrics=False, max_candidates_per_stage=None)
+    executor_module.USE_TOKEN_IDS = token_ids
+    candidates = []
+    for state in states:
+        executor = FilterPipelineExecutor(config, state, ch, redis, kb_id)
+        start = time.perf_counter()
+        result = executor.execute_pipeline()
+        collector.record(name, (time.perf_counter() - start) * 1000)
+        candidates.append(result)
+    return candidates
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 3) -> TimingCollector:
+    """Compare storage and Jaccard latency of String and UInt32 token sets."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [100_000, 1_000_000]
+
+    import kato.filters  # noqa: F401  (registers filters)
+    import kato.filters.executor as executor_module
+    from kato.storage.token_dictionary import USE_TOKEN_IDS
+
+    ch, redis = _get_clients()
+    rng = random.Random(0)
+    # STMs of mostly known tokens plus a few the kb has never seen
+    states = [[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(STM_TOKENS - 2)] + ['unseen_a', 'unseen_b']
+              for _ in range(QUERIES)]
+
+    print("=" * 70)
+    print(f"  KATO Token IDs: {VOCABULARY:,}-token vocabulary, {QUERIES} Jaccard queries")
+    print("=" * 70)
+
+    results = []
+    try:
+        for tier in tiers:
+            print(f"\n  Loading {tier:,} patterns per schema...")
+            _load(ch, redis, tier)
+            row = {'tier': tier,
+                   'v1_bytes': _column_bytes(ch, KB_V1, 'token_set'),
+                   'v2_bytes': _column_bytes(ch, KB_V2, 'token_ids')}
+            for _ in range(iterations):
+                v1 = _run(ch, redis, KB_V1, False, states, collector, f"v1.{tier}")
+                v2 = _run(ch, redis, KB_V2, True, states, collector, f"v2.{tier}")
+            if v1 != v2:
+                print(f"  WARNING: token_ids selected different patterns at {tier:,} patterns")
+            row['v1'] = collector.get_stats(f"v1.{tier}")
+            row['v2'] = collector.get_stats(f"v2.{tier}")
+            row['candidates'] = sum(len(c) for c in v2) // len(v2)
+            results.append(row)
+    finally:
+        executor_module.USE_TOKEN_IDS = USE_TOKEN_IDS
+
+    print(f"\n  {'Patterns':>9} {'Schema':>7} {'Compressed':>11} {'Uncompressed':>13} {'Jaccard p50':>12} {'Speedup':>8}")
+    for r in results:
+        for schema in ('v1', 'v2'):
+            compressed, uncompressed = r[f"{schema}_bytes"]
+            print(
+                f"  {r['tier']:>9,} {schema:>7} "
+                f"{compressed / 1e6:>9.1f}MB "
+                f"{uncompressed / 1e6:>11.1f}MB "
+                f"{r[schema]['median']:>10.2f}ms "
+                f"{r['v1']['median'] / max(r[schema]['median'], 1e-9):>7.1f}x"
+            )
+        print(f"  {'':>9} {'':>7} candidates per query: {r['candidates']:,}")
+    print(f"{'=' * 70}")
+
+    for kb_id in (KB_V1, KB_V2):
+        _drop(ch, kb_id)
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,161 @@
+"""
+Token index benchmark: first-token lookups at 1M+ patterns.
+
+Loads synthetic knowledge bases into ClickHouse (first tokens drawn from a
+1000-token vocabulary, so each token starts ~0.1% of the patterns),
+backfills kato.pattern_token_index and mirrors synthetic frequencies into
+it, then looks up the patterns starting with a token in three modes:
+  - scan:  patterns_data WHERE first_token = ... (reads the kb partition)
+  - index: one pattern_token_index key range, then patterns_data rows by
+           primary key (kb_id, length, name)
+  - top-K: the index lookup with ORDER BY frequency DESC LIMIT K
+
+scan and index must return the same patterns; top-K must return the K
+most frequent of them. Reports latency and rows read per lookup.
+
+Usage:
+    python -m benchmarks.test_token_index
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import time
+
+from benchmarks.profiler import TimingCollector
+
+KB_ID = "__bench_token_index__"
+
+VOCABULARY = 1000
+LOOKUPS = 20
+TOP_K = 100
+
+
+def _get_clickhouse():
+    from kato.storage.connection_manager import OptimizedConnectionManager
+    return OptimizedConnectionManager().clickhouse
+
+
+def _load(ch, count: int) -> None:
+    """Insert synthetic patterns, backfill the token index and mirror frequencies."""
+    from kato.storage.clickhouse_writer import ClickHouseWriter
+    from kato.storage.token_index import CREATE_TOKEN_INDEX_TABLE
+
+    ch.command(CREATE_TOKEN_INDEX_TABLE)
+    writer = ClickHouseWriter(KB_ID, ch, token_index=True)
+    writer.delete_all_patterns()
+
+    token = f"concat('tok_', toString(cityHash64(number, e, i) % {VOCABULARY}))"
+    data = f"arrayMap(e -> arrayMap(i -> {token}, range(3)), range(3 + number % 5))"
+    ch.command(
+        f"""
+        INSERT INTO kato.patterns_data
+            (kb_id, name, pattern_data, length, token_set, token_count,
+             minhash_sig, lsh_bands, first_token, last_token)
+        SELECT kb_id, name, data, length(arrayFlatten(data)), arrayDistinct(arrayFlatten(data)),
+               length(arrayDistinct(arrayFlatten(data))), [], [], data[1][1], data[-1][-1]
+        FROM (SELECT '{KB_ID}' AS kb_id, hex(SHA1(toString(number))) AS name, {data} AS data
+              FROM numbers({count}))
+        """,
+        settings={'max_insert_block_size': 100_000},
+    )
+    writer.backfill_token_index()
+
+    # Stand-in for mirror_frequencies: a newer row per index entry with a skewed frequency
+    ch.command(
+        f"""
+        INSERT INTO kato.pattern_token_index (kb_id, position, token, name, length, frequency)
+        SELECT kb_id, position, token, name, length, 1 + intDiv(1000000, 1 + cityHash64(name) % 1000)
+        FROM kato.pattern_token_index FINAL WHERE kb_id = '{KB_ID}'
+        """
+    )
+
+
+def _read_rows(result) -> int:
+    summary = getattr(result, 'summary', None) or {}
+    return int(summary.get('read_rows', 0))
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 3) -> TimingCollector:
+    """Compare first-token scans with index lookups and top-K pushdown."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [1_000_000, 5_000_000]
+
+    from kato.storage.token_index import patterns_by_token_query
+
+    ch = _get_clickhouse()
+    symbols = [f"tok_{i * (VOCABULARY // LOOKUPS)}" for i in range(LOOKUPS)]
+
+    print("=" * 70)
+    print(f"  KATO Token Index: {LOOKUPS} first-token lookups, top-K = {TOP_K}")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        print(f"\n  Loading {tier:,} patterns...")
+        _load(ch, tier)
+
+        queries = {
+            'scan': lambda s: (f"SELECT name, pattern_data, length FROM kato.patterns_data "
+                               f"WHERE kb_id = '{KB_ID}' AND first_token = '{s}'"),
+            'index': lambda s: patterns_by_token_query(KB_ID, s, 'first'),
+            'top_k': lambda s: patterns_by_token_query(KB_ID, s, 'first', top_k=TOP_K),
+        }
+        row = {'tier': tier}
+        names = {}
+        for mode, query in queries.items():
+            read_rows = 0
+            for _ in range(iterations):
+                for symbol in symbols:
+                    start = time.perf_counter()
+                    result = ch.query(query(symbol))
+                    collector.record(f"{mode}.{tier}", (time.perf_counter() - start) * 1000)
+                    read_rows += _read_rows(result)
+                    names[(mode, symbol)] = {r[0] for r in result.result_rows}
+            row[mode] = {'stats': collector.get_stats(f"{mode}.{tier}"),
+                         'read_rows': read_rows // (iterations * len(symbols)),
+                         'matches': sum(len(names[(mode, s)]) for s in symbols) // len(symbols)}
+
+        for symbol in symbols:
+            if names[('scan', symbol)] != names[('index', symbol)]:
+                print(f"  WARNING: index lookup of {symbol} differs from the scan at {tier:,} patterns")
+            expected = ch.query(
+                f"SELECT name FROM kato.pattern_token_index FINAL WHERE kb_id = '{KB_ID}' "
+                f"AND position = 'first' AND token = '{symbol}' ORDER BY frequency DESC, name LIMIT {TOP_K}"
+            )
+            if names[('top_k', symbol)] != {r[0] for r in expected.result_rows}:
+                print(f"  WARNING: top-K lookup of {symbol} is not the {TOP_K} most frequent at {tier:,} patterns")
+        results.append(row)
+
+    print(f"\n  {'Patterns':>9} {'Mode':>6} {'p50':>10} {'Rows read':>11} {'Matches':>8} {'Speedup':>8}")
+    for r in results:
+        scan = r['scan']['stats']['median']
+        for mode in ('scan', 'index', 'top_k'):
+            m = r[mode]
+            print(
+                f"  {r['tier']:>9,} {mode:>6} "
+                f"{m['stats']['median']:>8.2f}ms "
+                f"{m['read_rows']:>11,} "
+                f"{m['matches']:>8,} "
+                f"{scan / max(m['stats']['median'], 1e-9):>7.1f}x"
+            )
+    print(f"{'=' * 70}")
+
+    try:
+        from kato.storage.clickhouse_writer import ClickHouseWriter
+        ClickHouseWriter(KB_ID, ch, token_index=True).delete_all_patterns()
+    except Exception as e:
+        print(f"  Warning: cleanup failed: {e}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,147 @@
+"""
+Top-K bounded matching benchmark: exhaustive vs bounded candidate scoring.
+
+Builds synthetic candidate sets of patterns (2-40 events drawn from a
+30-token vocabulary) and times PatternSearcher.causalBeliefAsync for a
+6-symbol STM in two modes:
+  - exhaustive: every candidate above the recall threshold is aligned and
+    built into a Prediction (KATO_TOPK_BOUNDED_MATCHING=false)
+  - bounded:    candidates are aligned in descending pre-potential upper
+    bound and matching stops once none left can enter the top
+    max_predictions * PRUNING_FACTOR
+
+Both modes must keep the same predictions after predictPattern's pruning.
+Runs in-process against an in-memory pattern cache; no ClickHouse or Redis
+needed.
+
+Usage:
+    python -m benchmarks.test_topk_bounded_matching
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import heapq
+import random
+import time
+
+from benchmarks.profiler import TimingCollector
+
+VOCABULARY = 500
+MOTIFS = 100
+
+
+class _PatternStore:
+    """Stands in for the filter executor's pattern data cache."""
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+
+    def get_pattern(self, name):
+        events = self.patterns[name]
+        return {'pattern_data': events, 'length': sum(map(len, events))}
+
+
+def _searcher(count: int, seed: int = 7):
+    """Patterns of 1-6 motifs (3 events each) picked from MOTIFS, plus noise events."""
+    from kato.searches.pattern_search import InformationExtractor, PatternSearcher
+
+    rng = random.Random(seed)
+    motifs = [[[f"tok_{rng.randrange(VOCABULARY)}" for _ in range(rng.randint(1, 3))]
+               for _ in range(3)] for _ in range(MOTIFS)]
+    patterns = {}
+    for i in range(count):
+        events = []
+        for _ in range(rng.randint(1, 6)):
+            events.extend(rng.choice(motifs) if rng.random() < 0.8
+                          else [[f"tok_{rng.randrange(VOCABULARY)}"]])
+        patterns[f"PTRN|{i:08x}"] = events
+
+    searcher = PatternSearcher.__new__(PatternSearcher)
+    searcher.kb_id = 'bench_topk'
+    searcher.recall_threshold = 0.1
+    searcher.session_config = None
+    searcher.redis_client = None
+    searcher.use_hybrid_architecture = False
+    searcher.use_indexing = False
+    searcher.index_manager = None
+    searcher.use_fast_matching = True
+    searcher.use_token_matching = True
+    searcher.affinity_weights = None
+    searcher.extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True)
+    searcher.patterns_cache = {name: [t for e in events for t in e] for name, events in patterns.items()}
+    searcher.patterns_count = len(patterns)
+    searcher.filter_executor = _PatternStore(patterns)
+    return searcher, motifs
+
+
+def run_all(collector: TimingCollector = None,
+            tiers: list[int] = None,
+            iterations: int = 5,
+            max_predictions: int = 100) -> TimingCollector:
+    """Run exhaustive vs bounded matching across candidate set sizes."""
+    if collector is None:
+        collector = TimingCollector()
+    if tiers is None:
+        tiers = [2_000, 10_000, 40_000]
+
+    import kato.searches.pattern_search as pattern_search_module
+    from kato.representations.prediction import pre_potential
+    from kato.workers.pattern_processor import PRUNING_FACTOR
+
+    # Time the in-process path only
+    pattern_search_module.PROCESS_POOL_CANDIDATE_THRESHOLD = float('inf')
+    top_k = max_predictions * PRUNING_FACTOR
+
+    print("=" * 70)
+    print(f"  KATO Top-K Bounded Matching: top {top_k} of each candidate set")
+    print("=" * 70)
+
+    results = []
+    for tier in tiers:
+        searcher, motifs = _searcher(tier)
+        # The STM: the tail of one learned motif followed by another
+        stm_events = motifs[0][1:] + motifs[1][:2]
+        state = [t for e in stm_events for t in e]
+        row = {'tier': tier}
+        for mode, bounded in (('exhaustive', False), ('bounded', True)):
+            pattern_search_module.TOPK_BOUNDED_MATCHING = bounded
+            label = f"match.{mode}.{tier}"
+            for _ in range(iterations):
+                start = time.perf_counter()
+                predictions = asyncio.run(searcher.causalBeliefAsync(
+                    state, stm_events=stm_events, top_k=top_k))
+                collector.record(label, (time.perf_counter() - start) * 1000)
+            kept = heapq.nlargest(top_k, predictions, key=pre_potential)
+            row[mode] = {
+                'stats': collector.get_stats(label),
+                'built': len(predictions),
+                'kept': sorted(pre_potential(p) for p in kept),
+            }
+        if row['exhaustive']['kept'] != row['bounded']['kept']:
+            print(f"  WARNING: bounded and exhaustive top {top_k} differ at {tier:,} candidates")
+        results.append(row)
+
+    pattern_search_module.TOPK_BOUNDED_MATCHING = False
+
+    print(f"\n  {'Candidates':>10} {'Built (exh)':>12} {'Built (bnd)':>12} "
+          f"{'Exhaustive p50':>15} {'Bounded p50':>12} {'Speedup':>8}")
+    for r in results:
+        exhaustive, bounded = r['exhaustive'], r['bounded']
+        print(
+            f"  {r['tier']:>10,} {exhaustive['built']:>12,} {bounded['built']:>12,} "
+            f"{exhaustive['stats']['median']:>13.1f}ms "
+            f"{bounded['stats']['median']:>10.1f}ms "
+            f"{exhaustive['stats']['median'] / max(bounded['stats']['median'], 1e-9):>7.1f}x"
+        )
+    print(f"{'=' * 70}")
+
+    return collector
+
+
+if __name__ == "__main__":
+    run_all()
@@ -46,7 +46,17 @@ ALTER TABLE patterns_data
 ALTER TABLE patterns_data
     ADD INDEX IF NOT EXISTS idx_token_count token_count TYPE minmax GRANULARITY 4;
 
--- LSH buckets table (optional, for more efficient LSH lookups) with node isolation
+-- Schema v2 (KATO_TOKEN_IDS=true): token sets as kb-scoped dictionary IDs
+-- (see kato/storage/token_dictionary.py); token_set is then written empty.
+-- Migrate existing KBs with scripts/migrate_token_ids.py
+ALTER TABLE patterns_data
+    ADD COLUMN IF NOT EXISTS token_ids Array(UInt32) AFTER token_count;
+
+ALTER TABLE patterns_data
+    ADD INDEX IF NOT EXISTS idx_token_ids_bloom token_ids TYPE bloom_filter(0.01) GRANULARITY 4;
+
+-- LSH buckets table (band -> pattern point lookups for the MinHash filter) with node isolation
+-- Maintained by ClickHouseWriter; backfill older KBs with scripts/backfill_lsh_buckets.py
 CREATE TABLE IF NOT EXISTS lsh_buckets (
     kb_id String,                         -- Knowledge base / node identifier (for isolation)
     band_index UInt8,                     -- Band number (0-19)
@@ -56,6 +66,21 @@ CREATE TABLE IF NOT EXISTS lsh_buckets (
 PARTITION BY kb_id                        -- Physical isolation per node
 ORDER BY (kb_id, band_hash, pattern_name);
 
+-- Token index table (patterns ordered by first / last token) with node isolation
+-- Maintained by ClickHouseWriter; frequency is mirrored from Redis and older KBs
+-- are backfilled by scripts/migrate_token_index.py
+CREATE TABLE IF NOT EXISTS pattern_token_index (
+    kb_id String,                         -- Knowledge base / node identifier (for isolation)
+    position Enum8('first' = 1, 'last' = 2),  -- Which end of the pattern the token is
+    token String,                         -- First or last token of the pattern
+    name String,                          -- Pattern name
+    length UInt32,                        -- Pattern length (patterns_data primary key lookup)
+    frequency UInt64 DEFAULT 1,           -- Mirrored pattern frequency (top-K ordering)
+    updated_at DateTime64(3) DEFAULT now64(3)  -- Version: newest frequency wins on merge
+) ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY kb_id                        -- Physical isolation per node
+ORDER BY (kb_id, position, token, name);
+
 -- Statistics table for monitoring (per kb_id for node-specific metrics)
 CREATE TABLE IF NOT EXISTS pattern_stats (
     kb_id String,                         -- Knowledge base / node identifier
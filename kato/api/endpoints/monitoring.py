@@ -18,10 +18,15 @@ from kato.api.schemas.monitoring import (
     ConcurrencyResponse,
     ConnectionPoolsResponse,
     DistributedSTMStatsResponse,
+    FilterStageStatsResponse,
     MetricHistoryResponse,
     MetricsResponse,
     StatsResponse,
 )
+from kato.filters.candidate_cache import get_candidate_cache
+from kato.filters.coalescer import get_request_coalescer
+from kato.filters.pattern_data_cache import get_pattern_data_cache
+from kato.filters.stage_stats import get_filter_stage_stats
 from kato.storage.pattern_cache import get_cache_manager
 
 router = APIRouter(tags=["monitoring"])
@@ -128,7 +133,8 @@ def _get_concurrency_recommendations(current: int, peak: int, limit: int, worker
 
 @router.get("/cache/stats", response_model=CacheStatsResponse)
 async def get_cache_stats():
-    """Get Redis pattern cache performance statistics"""
+    """Get Redis pattern cache and in-process pattern data cache statistics"""
+    pattern_data_cache = get_pattern_data_cache().get_stats()
     try:
         cache_manager = await get_cache_manager()
         if cache_manager and cache_manager.is_initialized() and cache_manager.pattern_cache:
@@ -138,12 +144,14 @@ async def get_cache_stats():
             return {
                 "cache_performance": stats,
                 "cache_health": health,
+                "pattern_data_cache": pattern_data_cache,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
         else:
             return {
                 "cache_performance": {"status": "disabled", "reason": "Cache manager not available"},
                 "cache_health": {"status": "disabled"},
+                "pattern_data_cache": pattern_data_cache,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
     except Exception as e:
@@ -151,10 +159,25 @@ async def get_cache_stats():
         return {
             "cache_performance": {"status": "error", "error": str(e)},
             "cache_health": {"status": "error", "error": str(e)},
+            "pattern_data_cache": pattern_data_cache,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
 
+@router.get("/filters/stats", response_model=FilterStageStatsResponse)
+async def get_filter_stats(kb_id: Optional[str] = None):
+    """Get learned filter stage selectivity, cost and run order (optionally for one kb), query coalescing and candidate cache hit rates"""
+    stage_stats = get_filter_stage_stats()
+    return {
+        "skip_pass_rate": stage_stats.skip_pass_rate,
+        "explore_interval": stage_stats.explore_interval,
+        "knowledge_bases": stage_stats.get_stats(kb_id),
+        "coalescing": get_request_coalescer().get_stats(),
+        "candidate_cache": get_candidate_cache().get_stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
 @router.post("/cache/invalidate", response_model=CacheInvalidateResponse)
 async def invalidate_cache(session_id: Optional[str] = None):
     """Invalidate pattern cache (optionally for specific session)"""
@@ -15,6 +15,8 @@ from typing import Any
 from fastapi import APIRouter, HTTPException, Request
 
 from kato.api.schemas import (
+    BulkLearnRequest,
+    BulkLearnResult,
     CreateSessionRequest,
     FinalizeTrainingResult,
     LearnResult,
@@ -40,6 +42,10 @@ from kato.api.schemas.session_extra import (
     TestResponse,
 )
 
+# Session parts read by endpoints that observe or learn (predictions and
+# percept data are replaced, not read)
+_OBSERVE_PARTS = ('stm', 'emotives', 'metadata')
+
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 logger = logging.getLogger('kato.api.sessions')
 
@@ -349,7 +355,7 @@ async def observe_in_session(
 
     async with lock:
         # Get fresh session state inside the lock to avoid race conditions
-        session = await app_state.session_manager.get_session(session_id)
+        session = await app_state.session_manager.get_session(session_id, parts=_OBSERVE_PARTS)
         if not session:
             raise HTTPException(404, detail=f"Session {session_id} not found or expired")
 
@@ -428,7 +434,7 @@ async def get_session_stm(session_id: str):
 
     logger.debug(f"Getting STM for session: {session_id}")
 
-    session = await app_state.session_manager.get_session(session_id)
+    session = await app_state.session_manager.get_session(session_id, parts=('stm',))
 
     if not session:
         logger.warning(f"Session {session_id} not found")
@@ -450,7 +456,7 @@ async def learn_in_session(session_id: str):
     """Learn a pattern from the session's current STM"""
     from kato.services.kato_fastapi import app_state
 
-    session = await app_state.session_manager.get_session(session_id)
+    session = await app_state.session_manager.get_session(session_id, parts=_OBSERVE_PARTS)
 
     if not session:
         raise HTTPException(404, detail=f"Session {session_id} not found or expired")
@@ -481,6 +487,43 @@ async def learn_in_session(session_id: str):
     )
 
 
+@router.post("/{session_id}/learn-bulk", response_model=BulkLearnResult)
+async def learn_bulk_in_session(session_id: str, request: BulkLearnRequest):
+    """
+    Learn many pattern sequences into the session's node in one request.
+
+    Intended for importing historical data. Each sequence is stored as if it
+    had been observed and learned (the session's STM is not used or changed).
+    Duplicates are folded together and storage is written in batches.
+    """
+    from kato.services.kato_fastapi import app_state
+
+    session = await app_state.session_manager.get_session(session_id)
+    if not session:
+        raise HTTPException(404, detail=f"Session {session_id} not found or expired")
+
+    processor = await app_state.processor_manager.get_processor(session.node_id, session.session_config)
+
+    start = time.perf_counter()
+    results = processor.learn_bulk(
+        [item.model_dump() for item in request.patterns],
+        config=session.session_config
+    )
+    statuses = [r['status'] for r in results]
+
+    return BulkLearnResult(
+        status="learned",
+        total=len(results),
+        new=statuses.count('new'),
+        relearned=statuses.count('relearned'),
+        skipped=statuses.count('skipped'),
+        time_ms=round((time.perf_counter() - start) * 1000, 2),
+        results=results,
+        session_id=session_id,
+        node_id=session.node_id
+    )
+
+
 @router.post("/{session_id}/finalize-training", response_model=FinalizeTrainingResult)
 async def finalize_training(session_id: str):
     """
@@ -568,6 +611,8 @@ async def observe_sequence_in_session(
     - Sequential processing with shared STM context
     - Isolated processing where each observation gets fresh STM
     - Auto-learning after each observation or at the end
+    - Lazy predictions (default): predictions are computed for the last
+      observation and any prediction_checkpoints only
     """
     from kato.api.schemas import ObservationSequenceResult
     from kato.services.kato_fastapi import app_state
@@ -601,7 +646,7 @@ async def observe_sequence_in_session(
 
     async with lock:
         # Get fresh session state inside the lock
-        session = await app_state.session_manager.get_session(session_id)
+        session = await app_state.session_manager.get_session(session_id, parts=_OBSERVE_PARTS)
         if not session:
             raise HTTPException(404, detail=f"Session {session_id} not found or expired")
 
@@ -636,6 +681,12 @@ async def observe_sequence_in_session(
         initial_stm_length = len(session.stm)
         auto_learned_patterns = []
 
+        # Lazy predictions: only the last observation and explicit checkpoints predict.
+        # Intermediate results are discarded, so skipping them leaves the final
+        # predictions unchanged
+        last_position = len(data.observations) - 1
+        checkpoints = set(data.prediction_checkpoints)
+
         # Track current session state through sequence (stateless approach)
         current_state = session
 
@@ -661,7 +712,8 @@ async def observe_sequence_in_session(
                     result = await processor.observe(
                         observation,
                         session_state=current_state,
-                        config=session.session_config
+                        config=session.session_config,
+                        predict=not data.lazy_predictions or i == last_position or i in checkpoints
                     )
                 except Exception as e:
                     # Import VectorDimensionError to check exception type
@@ -718,6 +770,8 @@ async def observe_sequence_in_session(
                     "unique_id": observation['unique_id'],
                     "auto_learned_pattern": result.get('auto_learned_pattern')
                 }
+                if i in checkpoints:
+                    observation_result["predictions"] = current_state.predictions
                 results.append(observation_result)
 
             # Learn from final STM if requested and STM is not empty
@@ -772,7 +826,7 @@ async def get_session_predictions(session_id: str):
     """Get predictions based on the session's current STM"""
     from kato.services.kato_fastapi import app_state
 
-    session = await app_state.session_manager.get_session(session_id)
+    session = await app_state.session_manager.get_session(session_id, parts=('stm',))
 
     if not session:
         raise HTTPException(404, detail=f"Session {session_id} not found or expired")
@@ -784,17 +838,12 @@ async def get_session_predictions(session_id: str):
 
     async with lock:
         # NO PROCESSOR LOCK NEEDED (stateless processor)
-        # Get predictions with session state - stateless call
-        predictions = await processor.get_predictions(
+        # Get predictions and their future_potentials with session state - stateless call
+        predictions, future_potentials = await processor.get_predictions_with_potentials(
             session_state=session,
             config=session.session_config
         )
 
-        # Get future_potentials from the pattern processor if available
-        future_potentials = None
-        if hasattr(processor.pattern_processor, 'future_potentials'):
-            future_potentials = processor.pattern_processor.future_potentials
-
     return PredictionsResponse(
         predictions=predictions,
         future_potentials=future_potentials,
@@ -819,7 +868,7 @@ async def get_session_percept_data(session_id: str):
     """
     from kato.services.kato_fastapi import app_state
 
-    session = await app_state.session_manager.get_session(session_id)
+    session = await app_state.session_manager.get_session(session_id, parts=('percept',))
 
     if not session:
         raise HTTPException(404, detail=f"Session {session_id} not found or expired")
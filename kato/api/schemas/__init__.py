@@ -11,7 +11,13 @@ from .observation import (
     ObservationSequenceResult,
     STMResponse,
 )
-from .prediction import FinalizeTrainingResult, LearnResult, PredictionsResponse
+from .prediction import (
+    BulkLearnRequest,
+    BulkLearnResult,
+    FinalizeTrainingResult,
+    LearnResult,
+    PredictionsResponse,
+)
 from .session import CreateSessionRequest, SessionResponse
 
 __all__ = [
@@ -24,5 +30,7 @@ __all__ = [
     'ObservationSequenceResult',
     'PredictionsResponse',
     'LearnResult',
+    'BulkLearnRequest',
+    'BulkLearnResult',
     'FinalizeTrainingResult'
 ]
@@ -18,6 +18,16 @@ class ConcurrencyResponse(BaseModel):
 class CacheStatsResponse(BaseModel):
     cache_performance: Dict[str, Any]
     cache_health: Dict[str, Any]
+    pattern_data_cache: Optional[Dict[str, Any]] = None
+    timestamp: str
+
+
+class FilterStageStatsResponse(BaseModel):
+    skip_pass_rate: float
+    explore_interval: int
+    knowledge_bases: Dict[str, Any]
+    coalescing: Optional[Dict[str, Any]] = None
+    candidate_cache: Optional[Dict[str, Any]] = None
     timestamp: str
 
 
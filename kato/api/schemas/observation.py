@@ -42,6 +42,8 @@ class ObservationSequenceRequest(BaseModel):
     learn_after_each: bool = Field(default=False, description="Whether to learn after each observation")
     learn_at_end: bool = Field(default=False, description="Whether to learn from final STM state")
     clear_stm_between: bool = Field(default=False, description="Whether to clear STM between each observation")
+    lazy_predictions: bool = Field(default=False, description="Opt-in: compute predictions only for the last observation and prediction_checkpoints; other observations update STM and auto-learn without predicting")
+    prediction_checkpoints: list[int] = Field(default_factory=list, description="Sequence positions whose predictions are computed and included in their result")
 
 
 
@@ -2,7 +2,7 @@
 Prediction-related Pydantic models for KATO API
 """
 
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel, Field
 
@@ -16,6 +16,37 @@ class LearnResult(BaseModel):
     message: Optional[str] = Field(None, description="Human-readable message")
 
 
+class BulkLearnItem(BaseModel):
+    """One pattern sequence in a bulk learn request"""
+    events: list[list[str]] = Field(..., description="Pattern events (lists of symbols), in order")
+    emotives: list[dict[str, float]] = Field(default_factory=list, description="Emotive dicts for this learn")
+    metadata: dict[str, Any] = Field(default_factory=dict, description="Metadata for this learn")
+
+
+class BulkLearnRequest(BaseModel):
+    """Request to learn many pattern sequences at once"""
+    patterns: list[BulkLearnItem] = Field(..., description="Pattern sequences to learn")
+
+
+class BulkLearnItemResult(BaseModel):
+    """Outcome for one sequence of a bulk learn"""
+    pattern_name: Optional[str] = Field(None, description="Name of the learned pattern (None if skipped)")
+    status: str = Field(..., description="new, relearned, or skipped (fewer than two symbols)")
+
+
+class BulkLearnResult(BaseModel):
+    """Result of a bulk learn operation"""
+    status: str = Field(..., description="Status of the operation (learned)")
+    total: int = Field(..., description="Number of sequences received")
+    new: int = Field(..., description="Number of patterns created")
+    relearned: int = Field(..., description="Number of sequences that re-learned an existing pattern")
+    skipped: int = Field(..., description="Number of sequences skipped")
+    time_ms: float = Field(..., description="Time taken in milliseconds")
+    results: list[BulkLearnItemResult] = Field(..., description="Per-sequence outcomes, in request order")
+    session_id: Optional[str] = Field(None, description="Session ID")
+    node_id: Optional[str] = Field(None, description="Node ID the patterns were learned into")
+
+
 class FinalizeTrainingResult(BaseModel):
     """Result of finalize-training operation"""
     status: str = Field(..., description="Status of the operation (completed)")
@@ -108,7 +108,8 @@ class ConfigurationService:
             'minhash_num_hashes': 100,
             'bloom_false_positive_rate': 0.01,
             'max_candidates_per_stage': 100000,
-            'enable_filter_metrics': True
+            'enable_filter_metrics': True,
+            'filter_ordering': 'configured'
         }
 
     def resolve_configuration(
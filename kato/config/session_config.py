@@ -65,6 +65,7 @@ class SessionConfiguration:
     # Pipeline Control Parameters
     max_candidates_per_stage: Optional[int] = None  # Safety limit per stage (default: 100000)
     enable_filter_metrics: Optional[bool] = None  # Log timing and counts (default: True)
+    filter_ordering: Optional[str] = None  # 'configured', 'auto' or 'strict' (default: 'configured')
 
     # Metadata
     session_id: str = field(default="")
@@ -183,6 +184,10 @@ class SessionConfiguration:
                 logger.error(f"Invalid max_candidates_per_stage: {self.max_candidates_per_stage}")
                 return False
 
+            if self.filter_ordering is not None and self.filter_ordering not in ('configured', 'auto', 'strict'):
+                logger.error(f"Invalid filter_ordering: {self.filter_ordering}")
+                return False
+
             return True
 
         except Exception as e:
@@ -283,7 +288,8 @@ class SessionConfiguration:
             'filter_pipeline', 'length_min_ratio', 'length_max_ratio',
             'jaccard_threshold', 'jaccard_min_overlap',
             'minhash_threshold', 'minhash_bands', 'minhash_rows', 'minhash_num_hashes',
-            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics'
+            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics',
+            'filter_ordering'
         }
 
         filtered_data = {k: v for k, v in data.items() if k in valid_fields}
@@ -320,7 +326,8 @@ class SessionConfiguration:
             'filter_pipeline', 'length_min_ratio', 'length_max_ratio',
             'jaccard_threshold', 'jaccard_min_overlap',
             'minhash_threshold', 'minhash_bands', 'minhash_rows', 'minhash_num_hashes',
-            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics'
+            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics',
+            'filter_ordering'
         ]
 
         for key in config_keys:
@@ -353,7 +360,8 @@ class SessionConfiguration:
             'filter_pipeline', 'length_min_ratio', 'length_max_ratio',
             'jaccard_threshold', 'jaccard_min_overlap',
             'minhash_threshold', 'minhash_bands', 'minhash_rows', 'minhash_num_hashes',
-            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics'
+            'bloom_false_positive_rate', 'max_candidates_per_stage', 'enable_filter_metrics',
+            'filter_ordering'
         ]
 
         # For each config key, use session value if set, otherwise use default
@@ -312,6 +312,28 @@ class PerformanceConfig(BaseSettings):
         json_schema_extra={'env': 'KATO_USE_INDEXING'},
         description="Use pattern indexing for faster lookups"
     )
+    use_int_matching: bool = Field(
+        False,
+        json_schema_extra={'env': 'KATO_USE_INT_MATCHING'},
+        description="Match token-level candidates on integer-encoded sequences (identical predictions)"
+    )
+    incremental_symbol_table: bool = Field(
+        True,
+        json_schema_extra={'env': 'KATO_INCREMENTAL_SYMBOL_TABLE'},
+        description="Keep symbol stats in-process from learn deltas instead of reloading after every learn"
+    )
+    symbol_changelog_maxlen: int = Field(
+        10000,
+        json_schema_extra={'env': 'KATO_SYMBOL_CHANGELOG_MAXLEN'},
+        ge=100,
+        le=10000000,
+        description="Approximate number of per-learn symbol deltas kept in the Redis change log"
+    )
+    single_round_trip_learn: bool = Field(
+        True,
+        json_schema_extra={'env': 'KATO_SINGLE_ROUND_TRIP_LEARN'},
+        description="Run the Redis side of each learn as one atomic server-side script"
+    )
     use_optimized: bool = Field(
         True,
         json_schema_extra={'env': 'KATO_USE_OPTIMIZED'},
@@ -352,6 +374,25 @@ class PerformanceConfig(BaseSettings):
         le=300.0,
         description="Request timeout in seconds"
     )
+    matcher_pool_enabled: bool = Field(
+        True,
+        json_schema_extra={'env': 'KATO_MATCHER_POOL_ENABLED'},
+        description="Start a persistent shared-memory process pool for large candidate sets"
+    )
+    matcher_pool_workers: int = Field(
+        4,
+        json_schema_extra={'env': 'KATO_MATCHER_POOL_WORKERS'},
+        ge=1,
+        le=64,
+        description="Number of matcher pool worker processes"
+    )
+    matcher_pool_arena_max_mb: int = Field(
+        256,
+        json_schema_extra={'env': 'KATO_MATCHER_POOL_ARENA_MAX_MB'},
+        ge=1,
+        le=65536,
+        description="Shared-memory budget per kb pattern arena; an arena over it is rebuilt"
+    )
 
     model_config = ConfigDict(env_prefix='')
 
@@ -5,11 +5,18 @@ Provides abstract interface that all filters must implement.
 """
 
 from abc import ABC, abstractmethod
+from os import environ
 from typing import Optional, Set, List, Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Database stages return names and small scalar columns only; the executor
+# reads pattern_data once, for the final candidates (and before Python-side
+# stages that need it). Set KATO_LATE_MATERIALIZATION=false to select
+# pattern_data in every stage.
+LATE_MATERIALIZATION = environ.get('KATO_LATE_MATERIALIZATION', 'true').lower() == 'true'
+
 
 class PatternFilter(ABC):
     """
@@ -20,18 +27,38 @@ class PatternFilter(ABC):
     and applies them appropriately.
     """
 
-    def __init__(self, config: Any, state: List[str]):
+    # Whether filter_python() reads pattern_data / pattern_data_flat
+    needs_pattern_data: bool = False
+
+    # Columns besides name and length that the Python-side stage reads
+    db_columns: tuple = ()
+
+    # Configuration attributes the filter reads (part of the candidate cache key)
+    config_fields: tuple = ()
+
+    # Whether the result depends on the order of the STM tokens, not only on
+    # their count and set (the candidate cache then keys on the sequence)
+    stm_order_sensitive: bool = True
+
+    def __init__(self, config: Any, state: List[str], sketch: Optional[Any] = None):
         """
         Initialize filter with session config and current state.
 
         Args:
             config: SessionConfig with filter parameters
             state: Current STM state (flattened list of tokens)
+            sketch: Optional StmSketch of the session's STM (see
+                kato.filters.stm_sketch), read instead of recomputing from state
         """
         self.config = config
         self.state = state
-        self.stm_length = len(state)
-        self.stm_tokens = set(state)
+        self.sketch = sketch
+        if sketch is not None:
+            self.stm_length = sketch.length
+            self.stm_tokens = sketch.tokens
+        else:
+            self.stm_length = len(state)
+            self.stm_tokens = set(state)
         self.stm_token_list = list(self.stm_tokens)
 
     @abstractmethod
@@ -60,6 +87,35 @@ class PatternFilter(ABC):
         """
         pass
 
+    def get_db_condition(self) -> Optional[str]:
+        """
+        WHERE predicate of the database stage on patterns_data.
+
+        The executor ANDs the predicates of consecutive database stages into
+        one query. Returns None for Python-side filters and for database
+        filters that cannot be fused.
+
+        Returns:
+            SQL boolean expression or None
+        """
+        return None
+
+    def select_columns(self, *columns: str) -> str:
+        """
+        SELECT list for a database stage.
+
+        Args:
+            *columns: Extra columns the Python-side stage needs (e.g. minhash_sig)
+
+        Returns:
+            'name, length, ...', with pattern_data only when late
+            materialization is disabled
+        """
+        selected = ['name', 'length', *columns]
+        if not LATE_MATERIALIZATION:
+            selected.insert(1, 'pattern_data')
+        return ', '.join(selected)
+
     def is_database_filter(self) -> bool:
         """Check if this filter runs on database side."""
         return self.get_db_query() is not None
@@ -33,7 +33,12 @@ class BloomFilterStage(PatternFilter):
     Note: The Bloom filter instance must be provided during initialization.
     """
 
-    def __init__(self, config: Any, state: list[str], bloom_filter: Optional[Any] = None):
+    needs_pattern_data = True
+    config_fields = ('bloom_false_positive_rate',)
+    stm_order_sensitive = False
+
+    def __init__(self, config: Any, state: list[str], bloom_filter: Optional[Any] = None,
+                 sketch: Optional[Any] = None):
         """
         Initialize Bloom filter stage.
 
@@ -41,8 +46,9 @@ class BloomFilterStage(PatternFilter):
             config: SessionConfiguration with bloom_false_positive_rate
             state: Current STM state (flattened token list)
             bloom_filter: Pre-built PatternBloomFilter instance (optional)
+            sketch: Optional StmSketch of the STM
         """
-        super().__init__(config, state)
+        super().__init__(config, state, sketch)
 
         # Get configuration
         self.false_positive_rate = getattr(config, 'bloom_false_positive_rate', None) or 0.01
@@ -77,7 +83,7 @@ class BloomFilterStage(PatternFilter):
         Args:
             candidates: Set of pattern names to filter
             patterns_cache: Dict mapping pattern names to pattern data
-                Expected key: 'pattern_data' (flattened list of tokens)
+                Expected key: 'pattern_data_flat' (flattened list of tokens)
 
         Returns:
             Filtered set of patterns that might match observed symbols
@@ -104,9 +110,9 @@ class BloomFilterStage(PatternFilter):
                 continue
 
             # Extract pattern_data (flattened list of tokens)
-            pattern_data = pattern_data_dict.get('pattern_data')
+            pattern_data = pattern_data_dict.get('pattern_data_flat')
             if not pattern_data:
-                logger.warning(f"Pattern '{pattern_name}' missing pattern_data, skipping")
+                logger.warning(f"Pattern '{pattern_name}' missing pattern_data_flat, skipping")
                 continue
 
             # Get unique tokens in pattern
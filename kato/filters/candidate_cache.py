@@ -0,0 +1,305 @@
+"""
+Process-wide cache of filter pipeline candidate sets.
+
+Clients polling predictions without new observations, and sessions
+replaying similar workloads, run the same filter stages over and over for
+identical STM states. The candidate set a pipeline produces depends only
+on the STM, the filter configuration and the patterns of the kb, so it is
+cached under:
+
+- a canonical STM fingerprint: the token count and sorted distinct tokens
+  when every filter of the pipeline reads only those (length, jaccard,
+  minhash, bloom), the token sequence otherwise (rapidfuzz)
+- the effective filter settings (pipeline, ordering and the parameters the
+  pipeline's filters declare in config_fields)
+- the kb's write version (kato.storage.kb_write_versions), bumped in every
+  process whenever patterns are learned, deleted or cleared; for
+  KATO_CANDIDATE_CACHE_SETTLE_MS after a write the cache is bypassed
+
+A lookup hit skips every database stage of the pipeline; pattern_data of
+the candidates is still materialized through the pattern data cache.
+
+Entries live in a bounded in-process LRU and, with
+KATO_CANDIDATE_CACHE_SHARED, in Redis with a TTL, so processes share
+candidate sets of the same version.
+
+Configuration:
+    KATO_CANDIDATE_CACHE_NAMES           candidate names kept in process (default 1000000, 0 disables)
+    KATO_CANDIDATE_CACHE_MAX_CANDIDATES  largest candidate set cached (default 100000)
+    KATO_CANDIDATE_CACHE_SETTLE_MS       bypass after a write to the kb (default 1000)
+    KATO_CANDIDATE_CACHE_SHARED          share entries through Redis (default false)
+    KATO_CANDIDATE_CACHE_SHARED_TTL      seconds a shared entry lives (default 300)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from os import environ
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from kato.storage.kb_write_versions import KbWriteVersions
+
+logger = logging.getLogger('kato.filters.candidate_cache')
+
+CANDIDATE_CACHE_NAMES = int(environ.get('KATO_CANDIDATE_CACHE_NAMES', '1000000'))
+CANDIDATE_CACHE_MAX_CANDIDATES = int(environ.get('KATO_CANDIDATE_CACHE_MAX_CANDIDATES', '100000'))
+CANDIDATE_CACHE_SETTLE_MS = float(environ.get('KATO_CANDIDATE_CACHE_SETTLE_MS', '1000'))
+CANDIDATE_CACHE_SHARED = environ.get('KATO_CANDIDATE_CACHE_SHARED', 'false').lower() == 'true'
+CANDIDATE_CACHE_SHARED_TTL = int(environ.get('KATO_CANDIDATE_CACHE_SHARED_TTL', '300'))
+
+ENTRY_KEY = 'kato:candidates:{kb_id}:{version}:{digest}'
+
+# version: (Redis write version, this process's write version)
+CandidateKey = namedtuple('CandidateKey', ['kb_id', 'version', 'digest'])
+
+
+def stm_fingerprint(state: List[str], settings: Dict[str, Any], order_sensitive: bool) -> str:
+    """
+    Digest of an STM and the filter settings it is filtered with.
+
+    Args:
+        state: Flattened STM tokens
+        settings: Effective filter settings (JSON-serializable)
+        order_sensitive: Whether a filter of the pipeline reads the token
+            sequence; otherwise STMs with equal token count and token set
+            share a fingerprint
+
+    Returns:
+        Hex digest
+    """
+    stm = list(state) if order_sensitive else [len(state), sorted(set(state))]
+    encoded = json.dumps([settings, stm], sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class CandidateSetCache:
+    """
+    Thread-safe candidate set cache bounded by the number of names held.
+
+    Entries are frozensets of pattern names keyed by CandidateKey; a kb
+    write bumps its version, so older entries are never looked up again
+    (they are dropped from this process immediately and expire in Redis).
+    """
+
+    def __init__(self, max_names: int = CANDIDATE_CACHE_NAMES,
+                 max_candidates: int = CANDIDATE_CACHE_MAX_CANDIDATES,
+                 settle_ms: float = CANDIDATE_CACHE_SETTLE_MS,
+                 shared: bool = CANDIDATE_CACHE_SHARED,
+                 shared_ttl: int = CANDIDATE_CACHE_SHARED_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            max_names: Candidate names kept across all entries; 0 disables the cache
+            max_candidates: Larger candidate sets are not cached
+            settle_ms: After a kb write, lookups bypass the cache this long
+            shared: Also store and look up entries in Redis
+            shared_ttl: Expiry of shared entries in seconds
+        """
+        self.max_names = max(0, max_names)
+        self.max_candidates = max_candidates
+        self.versions = KbWriteVersions('candidates', settle_ms)
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._lock = threading.Lock()
+
+        self._entries: 'OrderedDict[CandidateKey, FrozenSet[str]]' = OrderedDict()
+        self.names = 0
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.oversized = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_names > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, kb_id: str, settings: Dict[str, Any], state: List[str],
+            order_sensitive: bool, redis_client: Any = None) -> Optional[CandidateKey]:
+        """
+        Cache key of a pipeline run, or None when the cache must be bypassed.
+
+        Bypassed while disabled, while the kb settles after a write, and
+        when the Redis write version cannot be read.
+
+        Args:
+            kb_id: Knowledge base the pipeline filters
+            settings: Effective filter settings
+            state: Flattened STM tokens
+            order_sensitive: Whether the pipeline reads the token sequence
+            redis_client: Redis client holding the shared write version
+        """
+        if not self.enabled:
+            return None
+        version = self.versions.read(kb_id, redis_client=redis_client)
+        if version is None or not version.settled:
+            self._bypass()
+            return None
+        return CandidateKey(kb_id, (version.shared[0], version.local),
+                            stm_fingerprint(state, settings, order_sensitive))
+
+    def get(self, key: Optional[CandidateKey], redis_client: Any = None) -> Optional[FrozenSet[str]]:
+        """Cached candidate set for key (from this process, then Redis), or None."""
+        if key is None:
+            return None
+        with self._lock:
+            candidates = self._entries.get(key)
+            if candidates is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return candidates
+
+        if self.shared and redis_client is not None:
+            try:
+                value = redis_client.get(self._entry_key(key))
+            except Exception as e:
+                logger.warning(f"Shared candidate cache read failed: {e}")
+                self._error()
+                value = None
+            if value is not None:
+                candidates = frozenset(json.loads(value))
+                with self._lock:
+                    self.shared_hits += 1
+                    self._insert(key, candidates)
+                return candidates
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: Optional[CandidateKey], candidates: Iterable[str],
+            redis_client: Any = None) -> None:
+        """Cache the candidate set a pipeline produced for key."""
+        if key is None:
+            return
+        candidates = frozenset(candidates)
+        with self._lock:
+            if len(candidates) > self.max_candidates or len(candidates) > self.max_names:
+                self.oversized += 1
+                return
+            self.stores += 1
+            self._insert(key, candidates)
+
+        if self.shared and redis_client is not None:
+            try:
+                redis_client.set(self._entry_key(key), json.dumps(sorted(candidates)), ex=self.shared_ttl)
+            except Exception as e:
+                logger.warning(f"Shared candidate cache write failed: {e}")
+                self._error()
+
+    def bump(self, kb_id: str, redis_client: Any = None) -> None:
+        """
+        Record a write to the kb (patterns learned, deleted or cleared).
+
+        Call after the write reached ClickHouse. Entries of earlier
+        versions are no longer returned, and the kb bypasses the cache for
+        settle_ms.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.invalidations += 1
+            self._drop(kb_id)
+        self.versions.bump(kb_id, redis_client=redis_client)
+
+    def drop_kb(self, kb_id: str) -> int:
+        """Remove every entry of a kb from this process; returns the number removed."""
+        with self._lock:
+            return self._drop(kb_id)
+
+    def clear(self) -> None:
+        """Remove all entries (metrics and versions are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.names = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates, occupancy and invalidation counters."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'shared': self.shared,
+                'max_names': self.max_names,
+                'names': self.names,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'bypassed': self.bypassed,
+                'stores': self.stores,
+                'oversized': self.oversized,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'errors': self.errors + self.versions.errors,
+            }
+
+    def _entry_key(self, key: CandidateKey) -> str:
+        return ENTRY_KEY.format(kb_id=key.kb_id, version=key.version[0], digest=key.digest)
+
+    def _insert(self, key: CandidateKey, candidates: FrozenSet[str]) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.names -= len(previous)
+        self._entries[key] = candidates
+        self.names += len(candidates)
+        while self.names > self.max_names:
+            _, evicted = self._entries.popitem(last=False)
+            self.names -= len(evicted)
+            self.evictions += 1
+
+    def _drop(self, kb_id: str) -> int:
+        keys = [key for key in self._entries if key.kb_id == kb_id]
+        for key in keys:
+            self.names -= len(self._entries.pop(key))
+        return len(keys)
+
+    def _bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def _error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+
+# Global candidate set cache instance
+_candidate_cache: Optional[CandidateSetCache] = None
+_candidate_cache_lock = threading.Lock()
+
+
+def get_candidate_cache() -> CandidateSetCache:
+    """Get or create the process-wide candidate set cache."""
+    global _candidate_cache
+
+    if _candidate_cache is None:
+        with _candidate_cache_lock:
+            if _candidate_cache is None:
+                _candidate_cache = CandidateSetCache()
+                logger.info(
+                    f"Candidate set cache initialized ({_candidate_cache.max_names} names, "
+                    f"shared={_candidate_cache.shared})"
+                )
+
+    return _candidate_cache
+
+
+def reset_candidate_cache(**kwargs: Any) -> CandidateSetCache:
+    """Replace the process-wide cache (tests and benchmarks)."""
+    global _candidate_cache
+
+    with _candidate_cache_lock:
+        _candidate_cache = CandidateSetCache(**kwargs)
+    return _candidate_cache
@@ -0,0 +1,200 @@
+"""
+Micro-batching of concurrent filter pipeline queries per kb.
+
+Under load, many sessions of one node run their filter pipelines at the
+same moment, each scanning the same kb partition with its own ClickHouse
+query. RequestCoalescer collects the requests for one (operation, kb) that
+arrive within a short window and runs them as one batch:
+
+- The first caller of a window becomes the batch leader. It waits up to
+  KATO_COALESCE_WINDOW_MS (or until KATO_COALESCE_MAX_BATCH requests have
+  joined), then runs the batch function once for all of them.
+- Every other caller blocks until the batch is done and receives its own
+  result, or the batch's exception.
+
+FilterPipelineExecutor coalesces two queries this way: the leading
+database stage, which scans the kb (one query ORing the requests'
+predicates, with one flag column per distinct predicate to fan rows back
+out), and the pattern_data read for the final candidates (one read of the
+union of names). Python-side stages and scoring stay per request.
+
+A request waits at most one window before its batch is dispatched, so
+latency at low load grows by no more than the window. The window is off by
+default.
+
+Configuration:
+    KATO_COALESCE_WINDOW_MS   batching window in ms (default 0, disabled)
+    KATO_COALESCE_MAX_BATCH   requests per batch before early dispatch (default 64)
+"""
+
+import logging
+import threading
+import time
+from os import environ
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger('kato.filters.coalescer')
+
+COALESCE_WINDOW_MS = float(environ.get('KATO_COALESCE_WINDOW_MS', '0'))
+COALESCE_MAX_BATCH = int(environ.get('KATO_COALESCE_MAX_BATCH', '64'))
+
+
+class _Batch:
+    """Requests collected for one key within one window."""
+
+    __slots__ = ('payloads', 'arrivals', 'full', 'done', 'closed', 'results', 'error')
+
+    def __init__(self):
+        self.payloads: List[Any] = []
+        self.arrivals: List[float] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.closed = False
+        self.results: Optional[List[Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class _OperationStats:
+    """Batch size and queueing delay counters for one operation."""
+
+    __slots__ = ('batches', 'requests', 'max_batch_size', 'queue_ms_total', 'queue_ms_max', 'errors')
+
+    def __init__(self):
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_size = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.errors = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'mean_queue_ms': self.queue_ms_total / self.requests if self.requests else 0.0,
+            'max_queue_ms': self.queue_ms_max,
+            'errors': self.errors,
+        }
+
+
+class RequestCoalescer:
+    """Thread-safe window batching of requests with equal keys."""
+
+    def __init__(self, window_ms: float = COALESCE_WINDOW_MS, max_batch: int = COALESCE_MAX_BATCH):
+        self.window_ms = window_ms
+        self.max_batch = max(1, max_batch)
+        self._open: Dict[Hashable, _Batch] = {}
+        self._stats: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+    def submit(self, operation: str, kb_id: str, payload: Any,
+               run_batch: Callable[[List[Any]], List[Any]]) -> Any:
+        """
+        Run payload in the current batch for (operation, kb_id).
+
+        Args:
+            operation: Kind of request (requests only batch with their own kind)
+            kb_id: Knowledge base the request reads
+            payload: This request's input to run_batch
+            run_batch: Maps the batch's payloads to one result each, in
+                order; called once per batch, by the leader's thread
+
+        Returns:
+            This request's result
+
+        Raises:
+            Whatever run_batch raised for the batch
+        """
+        key = (operation, kb_id)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.payloads)
+            batch.payloads.append(payload)
+            batch.arrivals.append(time.perf_counter())
+            if len(batch.payloads) >= self.max_batch:
+                # Closed to newcomers; the leader dispatches now
+                del self._open[key]
+                batch.closed = True
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window_ms / 1000.0)
+            with self._lock:
+                if not batch.closed:
+                    del self._open[key]
+                    batch.closed = True
+            self._dispatch(operation, batch, run_batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _dispatch(self, operation: str, batch: _Batch, run_batch: Callable[[List[Any]], List[Any]]) -> None:
+        dispatched = time.perf_counter()
+        try:
+            batch.results = run_batch(batch.payloads)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+        with self._lock:
+            stats = self._stats.setdefault(operation, _OperationStats())
+            stats.batches += 1
+            stats.requests += len(batch.payloads)
+            stats.max_batch_size = max(stats.max_batch_size, len(batch.payloads))
+            for arrival in batch.arrivals:
+                queue_ms = (dispatched - arrival) * 1000
+                stats.queue_ms_total += queue_ms
+                stats.queue_ms_max = max(stats.queue_ms_max, queue_ms)
+            if batch.error is not None:
+                stats.errors += 1
+        if len(batch.payloads) > 1:
+            logger.debug(f"Coalesced {len(batch.payloads)} '{operation}' requests into one batch")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Window, batch sizes and queueing delay per operation."""
+        with self._lock:
+            return {
+                'window_ms': self.window_ms,
+                'max_batch': self.max_batch,
+                'operations': {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
+
+
+# Global coalescer instance
+_request_coalescer: Optional[RequestCoalescer] = None
+_request_coalescer_lock = threading.Lock()
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Get or create the process-wide request coalescer."""
+    global _request_coalescer
+
+    if _request_coalescer is None:
+        with _request_coalescer_lock:
+            if _request_coalescer is None:
+                _request_coalescer = RequestCoalescer()
+
+    return _request_coalescer
+
+
+def reset_request_coalescer(window_ms: float = COALESCE_WINDOW_MS,
+                            max_batch: int = COALESCE_MAX_BATCH) -> RequestCoalescer:
+    """Replace the process-wide coalescer (tests and benchmarks)."""
+    global _request_coalescer
+
+    with _request_coalescer_lock:
+        _request_coalescer = RequestCoalescer(window_ms, max_batch)
+    return _request_coalescer
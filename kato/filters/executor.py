@@ -7,12 +7,46 @@ optimization of database queries.
 
 import time
 import logging
+from collections import namedtuple
+from contextlib import nullcontext
+from itertools import chain
+from os import environ
 from typing import Set, Dict, List, Any, Optional
 
 from kato.filters.base import PatternFilter
+from kato.filters.candidate_cache import CandidateSetCache
+from kato.filters.coalescer import RequestCoalescer, get_request_coalescer
+from kato.filters.pattern_data_cache import PatternDataCache, get_pattern_data_cache
+from kato.filters.stage_stats import FilterStageStats, get_filter_stage_stats
+from kato.storage.token_dictionary import USE_TOKEN_IDS, get_token_dictionary
+
+try:
+    from clickhouse_connect.driver.external import ExternalData
+except ImportError:
+    ExternalData = None
 
 logger = logging.getLogger(__name__)
 
+# Hand candidates from one stage to the next as a ClickHouse external table
+# (sent with the query over HTTP) so a stage is always a single round trip.
+# Set KATO_FILTER_EXTERNAL_CANDIDATES=false to fall back to chunked IN lists.
+USE_EXTERNAL_CANDIDATES = environ.get('KATO_FILTER_EXTERNAL_CANDIDATES', 'true').lower() == 'true'
+
+# Name of the external table carrying the previous stage's candidate names
+EXTERNAL_CANDIDATES_TABLE = '_kato_candidates'
+
+# Run the database side of consecutive filters (e.g. length, jaccard, minhash)
+# as one query instead of one query per stage. Set
+# KATO_FUSE_FILTER_STAGES=false to run every stage separately.
+FUSE_DB_STAGES = environ.get('KATO_FUSE_FILTER_STAGES', 'true').lower() == 'true'
+
+# One request's share of a coalesced query (see kato.filters.coalescer),
+# shaped like the ClickHouse result fields _cache_result_rows reads
+CoalescedResult = namedtuple('CoalescedResult', ['column_names', 'result_rows'])
+
+# Cache entry columns materialize() guarantees for the final candidates
+MATERIALIZED_COLUMNS = frozenset(('pattern_data', 'length'))
+
 
 class FilterPipelineExecutor:
     """
@@ -32,7 +66,12 @@ class FilterPipelineExecutor:
                  redis_client: Any,
                  kb_id: str,
                  bloom_filter: Optional[Any] = None,
-                 extractor: Optional[Any] = None):
+                 extractor: Optional[Any] = None,
+                 pattern_cache: Optional[PatternDataCache] = None,
+                 stage_stats: Optional[FilterStageStats] = None,
+                 coalescer: Optional[RequestCoalescer] = None,
+                 sketch: Optional[Any] = None,
+                 candidate_cache: Optional[CandidateSetCache] = None):
         """
         Initialize filter pipeline executor.
 
@@ -44,20 +83,57 @@ class FilterPipelineExecutor:
             kb_id: Knowledge base / node / processor identifier (for isolation)
             bloom_filter: Optional Bloom filter instance
             extractor: Optional prediction info extractor (for RapidFuzz)
+            pattern_cache: Shared pattern data cache (defaults to the process-wide one)
+            stage_stats: Per-kb stage statistics for ordering (defaults to the process-wide one)
+            coalescer: Batches the kb scan and pattern_data reads of concurrent
+                pipelines (defaults to the process-wide one)
+            sketch: Optional StmSketch of the session's STM (state flattened),
+                handed to the filters instead of recomputing it from state
+            candidate_cache: Candidate sets per STM and kb write version; a hit
+                skips the stages (None runs them every time; pattern searchers
+                pass the process-wide one)
         """
         self.config = config
         self.state = state
+        self.sketch = sketch
         self.clickhouse = clickhouse_client
         self.redis = redis_client
         self.kb_id = kb_id  # For ClickHouse partition pruning
         self.bloom_filter = bloom_filter
         self.extractor = extractor
 
-        # Cache for loaded patterns
+        # Pattern rows shared by every executor of this process, keyed by (kb_id, name)
+        self.shared_cache = pattern_cache if pattern_cache is not None else get_pattern_data_cache()
+
+        # Patterns touched by the current pipeline run (references into shared_cache);
+        # reset per run so an executor never holds more than one query's candidates
         self.patterns_cache: Dict[str, Any] = {}
 
+        # Learned per-kb stage selectivity and cost, used by filter_ordering auto/strict
+        self.stage_stats = stage_stats if stage_stats is not None else get_filter_stage_stats()
+        self.filter_ordering = getattr(config, 'filter_ordering', None) or 'configured'
+        self.skipped_filters: List[str] = []
+
+        # Concurrent pipelines of a kb share the leading scan and materialization
+        self.coalescer = coalescer if coalescer is not None else get_request_coalescer()
+
+        # Candidate sets of earlier runs on the same STM, configuration and kb version
+        self.candidate_cache = candidate_cache
+        self.candidate_cache_status: Optional[str] = None
+        # Filters or queries of the current run that failed (their stage passed candidates through)
+        self._failures = 0
+
         # Metrics tracking
         self.stage_metrics: List[Dict[str, Any]] = []
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        # Per-stage database I/O counters (reset at the start of each stage)
+        self._stage_round_trips = 0
+        self._stage_query_bytes = 0
+        self._stage_read_bytes = 0
+        self._stage_result_bytes = 0
+        self._stage_handoff = 'none'
 
         # Get filter pipeline from config or use default
         self.filter_pipeline = self._get_filter_pipeline()
@@ -91,24 +167,12 @@ class FilterPipelineExecutor:
             all_patterns = set()
             for row in result.result_rows:
                 name = row[0]
-                pattern_data = row[1] if len(row) > 1 else None
-                length = row[2] if len(row) > 2 else 0
-
                 all_patterns.add(name)
-
-                # Cache pattern data for matching
-                if name not in self.patterns_cache:
-                    self.patterns_cache[name] = {}
-
-                if pattern_data:
-                    from itertools import chain
-                    # Store original event-structured for Prediction class
-                    self.patterns_cache[name]['pattern_data'] = pattern_data
-                    # Store flattened version for similarity matching
-                    self.patterns_cache[name]['pattern_data_flat'] = list(chain(*pattern_data))
-
-                # Cache length for evidence calculation
-                self.patterns_cache[name]['length'] = length
+                self._remember(name, (
+                    ('pattern_data', row[1] if len(row) > 1 else None),
+                    # Cache length for evidence calculation
+                    ('length', row[2] if len(row) > 2 else 0),
+                ))
 
             logger.info(f"Retrieved {len(all_patterns)} patterns from database (no filtering)")
             return all_patterns
@@ -136,6 +200,11 @@ class FilterPipelineExecutor:
         Returns:
             Set of pattern names that passed all filters
         """
+        self.patterns_cache = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self.candidate_cache_status = None
+
         if not self.filter_pipeline:
             logger.info("Empty filter pipeline, querying all patterns from database")
             return self._get_all_patterns()
@@ -143,44 +212,67 @@ class FilterPipelineExecutor:
         candidates: Optional[Set[str]] = None
         pipeline_start = time.time()
 
-        for filter_name in self.filter_pipeline:
-            stage_start = time.time()
-
-            # Get filter class from registry
-            filter_class = self.FILTER_REGISTRY.get(filter_name)
-            if not filter_class:
-                logger.warning(f"Unknown filter '{filter_name}', skipping")
-                continue
+        cache_key = None
+        if self.candidate_cache is not None and self.candidate_cache.enabled:
+            cache_key = self._candidate_cache_key()
+            cached = self.candidate_cache.get(cache_key, self.redis)
+            if cached is not None:
+                return self._cached_candidates(cached, pipeline_start)
+            self.candidate_cache_status = 'miss' if cache_key is not None else 'bypass'
+        self._failures = 0
+
+        plan = self._plan()
+        logger.debug(
+            "Filter plan: " + " -> ".join('+'.join(name for name, _ in stage) for stage in plan)
+        )
 
-            # Initialize filter with appropriate dependencies
-            filter_instance = self._create_filter_instance(filter_class, filter_name)
-            if not filter_instance:
-                logger.warning(f"Failed to create filter instance for '{filter_name}', skipping")
-                continue
+        for stage in plan:
+            stage_name = '+'.join(name for name, _ in stage)
+            fused = len(stage) > 1
+            stage_start = time.time()
+            candidates_in = len(candidates) if candidates else 0
+            self._reset_stage_counters()
 
             # Execute filter
             try:
-                is_db_filter = filter_instance.is_database_filter()
-                is_hybrid = filter_instance.is_hybrid_filter()
-
-                logger.info(
-                    f"Filter '{filter_name}': is_database={is_db_filter}, "
-                    f"is_hybrid={is_hybrid}, initial_candidates={len(candidates) if candidates else 0}"
-                )
+                filters = [f for _, f in stage]
+                if candidates is None and self._can_coalesce(filters):
+                    # Leading scan of the kb, shared with concurrent pipelines
+                    candidates = self._execute_coalesced_scan(filters)
+                    logger.info(f"Stage '{stage_name}' coalesced scan: {len(candidates)} candidates")
+                    python_stages = [(n, f) for n, f in stage if f.is_hybrid_filter()]
+                elif fused:
+                    # Stage 1: one query for the database side of consecutive filters
+                    logger.info(f"Fused stage '{stage_name}': initial_candidates={candidates_in}")
+                    candidates = self._execute_database_query(
+                        self._fused_query(filters), stage_name, candidates
+                    )
+                    logger.info(f"Fused stage '{stage_name}' DB stage: {candidates_in} → {len(candidates)} candidates")
+                    python_stages = [(n, f) for n, f in stage if f.is_hybrid_filter()]
+                else:
+                    filter_name, filter_instance = stage[0]
+                    is_db_filter = filter_instance.is_database_filter()
+                    is_hybrid = filter_instance.is_hybrid_filter()
 
-                # Stage 1: Database-side filtering (if applicable)
-                if is_db_filter:
-                    candidates_before = len(candidates) if candidates else 0
-                    candidates = self._execute_database_filter(filter_instance, candidates)
                     logger.info(
-                        f"Filter '{filter_name}' DB stage: {candidates_before} → {len(candidates)} candidates"
+                        f"Filter '{filter_name}': is_database={is_db_filter}, "
+                        f"is_hybrid={is_hybrid}, initial_candidates={len(candidates) if candidates else 0}"
                     )
 
+                    # Stage 1: Database-side filtering (if applicable)
+                    if is_db_filter:
+                        candidates_before = len(candidates) if candidates else 0
+                        candidates = self._execute_database_filter(filter_instance, candidates)
+                        logger.info(
+                            f"Filter '{filter_name}' DB stage: {candidates_before} → {len(candidates)} candidates"
+                        )
+                    python_stages = [stage[0]] if not is_db_filter or is_hybrid else []
+
                 # Stage 2: Python-side filtering (if applicable)
                 # This handles:
                 # - Pure Python filters (bloom, rapidfuzz without DB stage)
                 # - Hybrid filters (minhash - DB stage + Python verification)
-                if not is_db_filter or is_hybrid:
+                for filter_name, filter_instance in python_stages:
                     # Ensure we have candidates from database stage
                     if candidates is None:
                         logger.error(
@@ -191,6 +283,10 @@ class FilterPipelineExecutor:
                             f"Pipeline must start with database filter, not '{filter_name}'"
                         )
 
+                    # Late materialization: read pattern_data only if this stage uses it
+                    if filter_instance.needs_pattern_data:
+                        self._fetch_pattern_data(candidates)
+
                     # Run Python-side filtering
                     candidates_before_python = len(candidates)
                     logger.info(
@@ -202,7 +298,8 @@ class FilterPipelineExecutor:
                     )
 
             except Exception as e:
-                logger.error(f"Filter '{filter_name}' failed with error: {e}")
+                logger.error(f"Filter '{stage_name}' failed with error: {e}")
+                self._failures += 1
                 # Continue with next filter rather than failing entire pipeline
                 continue
 
@@ -211,22 +308,30 @@ class FilterPipelineExecutor:
             candidate_count = len(candidates) if candidates else 0
 
             self.stage_metrics.append({
-                "filter": filter_name,
+                "filter": stage_name,
+                "fused": fused,
+                "candidates_in": candidates_in,
                 "candidates_after": candidate_count,
-                "time_ms": round(stage_time, 2)
+                "time_ms": round(stage_time, 2),
+                "round_trips": self._stage_round_trips,
+                "query_bytes": self._stage_query_bytes,
+                "read_bytes": self._stage_read_bytes,
+                "result_bytes": self._stage_result_bytes,
+                "handoff": self._stage_handoff
             })
 
             # Log metrics if enabled
             if self.config.enable_filter_metrics:
                 logger.info(
-                    f"Filter '{filter_name}': {candidate_count} candidates ({stage_time:.1f}ms)"
+                    f"Filter '{stage_name}': {candidate_count} candidates ({stage_time:.1f}ms, "
+                    f"{self._stage_round_trips} round trips, handoff={self._stage_handoff})"
                 )
 
             # Safety check: max candidates per stage
             max_candidates = getattr(self.config, 'max_candidates_per_stage', 100000)
             if max_candidates and candidate_count > max_candidates:
                 logger.warning(
-                    f"Filter '{filter_name}' exceeded max_candidates_per_stage "
+                    f"Filter '{stage_name}' exceeded max_candidates_per_stage "
                     f"({candidate_count} > {max_candidates})"
                 )
 
@@ -235,6 +340,12 @@ class FilterPipelineExecutor:
                 logger.info("No candidates remaining, stopping pipeline early")
                 break
 
+        self.stage_stats.record(self.kb_id, self.stage_metrics, self.skipped_filters)
+
+        # A run with a failed filter or query returned a superset; don't serve it again
+        if cache_key is not None and not self._failures:
+            self.candidate_cache.put(cache_key, candidates or (), self.redis)
+
         # Log total pipeline time
         pipeline_time = (time.time() - pipeline_start) * 1000
         final_count = len(candidates) if candidates else 0
@@ -245,6 +356,333 @@ class FilterPipelineExecutor:
 
         return candidates if candidates else set()
 
+    def _candidate_cache_key(self) -> Optional[Any]:
+        """Candidate cache key of this run (None: bypass the cache)."""
+        classes = [self.FILTER_REGISTRY.get(name) for name in self.filter_pipeline]
+        settings = {
+            'filter_pipeline': list(self.filter_pipeline),
+            'filter_ordering': self.filter_ordering,
+            # RapidFuzz verification matches with the extractor's mode
+            'extractor_token_matching': getattr(self.extractor, 'use_token_matching', None),
+        }
+        for filter_class in classes:
+            for field in getattr(filter_class, 'config_fields', ()):
+                settings[field] = getattr(self.config, field, None)
+        order_sensitive = any(c is None or c.stm_order_sensitive for c in classes)
+        return self.candidate_cache.key(self.kb_id, settings, self.state, order_sensitive, self.redis)
+
+    def _cached_candidates(self, cached: Any, pipeline_start: float) -> Set[str]:
+        """Return a cached candidate set, recorded as a stage without database I/O."""
+        self.candidate_cache_status = 'hit'
+        self.skipped_filters = []
+        self.stage_metrics.append({
+            "filter": "candidate_cache",
+            "fused": False,
+            "candidates_in": 0,
+            "candidates_after": len(cached),
+            "time_ms": round((time.time() - pipeline_start) * 1000, 2),
+            "round_trips": 0,
+            "query_bytes": 0,
+            "read_bytes": 0,
+            "result_bytes": 0,
+            "handoff": "cache"
+        })
+        logger.info(f"Filter pipeline served from candidate cache: {len(cached)} candidates")
+        return set(cached)
+
+    def _plan(self) -> List[List[tuple]]:
+        """
+        Instantiate the configured filters, order them and group them into stages.
+
+        With filter_ordering 'auto' or 'strict' the run order comes from the
+        learned stage statistics (see kato.filters.stage_stats); 'auto' may
+        also skip stages, recorded in self.skipped_filters.
+
+        Consecutive filters with a database predicate (get_db_condition)
+        form one stage whose database side runs as a single query; the
+        Python side of hybrid filters in the group runs after it, in
+        pipeline order. Every other filter is a stage of its own. All
+        database stages and Python verifications are per-pattern
+        predicates whose results are intersected, so fusing does not change
+        the final candidate set.
+
+        Returns:
+            List of stages, each a list of (filter name, filter instance)
+        """
+        instances = []
+        # Filters copy what they read from the sketch; a concurrent sync of the same session waits
+        with self.sketch.lock if self.sketch is not None else nullcontext():
+            for filter_name in self.filter_pipeline:
+                # Get filter class from registry
+                filter_class = self.FILTER_REGISTRY.get(filter_name)
+                if not filter_class:
+                    logger.warning(f"Unknown filter '{filter_name}', skipping")
+                    continue
+
+                # Initialize filter with appropriate dependencies
+                filter_instance = self._create_filter_instance(filter_class, filter_name)
+                if not filter_instance:
+                    logger.warning(f"Failed to create filter instance for '{filter_name}', skipping")
+                    continue
+
+                fusable = FUSE_DB_STAGES and filter_instance.get_db_condition() is not None
+                instances.append((filter_name, filter_instance, fusable))
+
+        order, self.skipped_filters = self.stage_stats.plan_order(
+            self.kb_id, [(name, fusable) for name, _, fusable in instances], self.filter_ordering
+        )
+        remaining = list(instances)
+        ordered = []
+        for filter_name in order:
+            entry = next(e for e in remaining if e[0] == filter_name)
+            remaining.remove(entry)
+            ordered.append(entry)
+
+        plan: List[List[tuple]] = []
+        fusable_tail = False
+        for filter_name, filter_instance, fusable in ordered:
+            if fusable and fusable_tail:
+                plan[-1].append((filter_name, filter_instance))
+            else:
+                plan.append([(filter_name, filter_instance)])
+            fusable_tail = fusable
+        return plan
+
+    def _fused_query(self, filters: List[PatternFilter]) -> str:
+        """SELECT over patterns_data ANDing the database predicates of several filters."""
+        return f"""
+            SELECT {self._stage_columns(filters)}
+            FROM patterns_data
+            WHERE {self._stage_condition(filters)}
+            """
+
+    def _stage_columns(self, filters: List[PatternFilter]) -> str:
+        """SELECT list covering the columns every filter of a stage reads."""
+        columns = list(dict.fromkeys(c for f in filters for c in f.db_columns))
+        return filters[0].select_columns(*columns)
+
+    def _stage_condition(self, filters: List[PatternFilter]) -> str:
+        """Database predicates of a stage's filters, ANDed."""
+        return "\n              AND ".join(f"({f.get_db_condition()})" for f in filters)
+
+    def _can_coalesce(self, filters: List[PatternFilter]) -> bool:
+        """Whether a leading stage can run as part of a coalesced kb scan."""
+        return self.coalescer.enabled and all(f.get_db_condition() is not None for f in filters)
+
+    def _execute_coalesced_scan(self, filters: List[PatternFilter]) -> Set[str]:
+        """
+        Run the leading database stage in this kb's current scan batch.
+
+        Args:
+            filters: Filters of the stage, all with a database predicate
+
+        Returns:
+            Candidate set of this pipeline's stage
+        """
+        payload = (self._stage_condition(filters), self._stage_columns(filters).split(', '))
+        self._stage_handoff = 'coalesced'
+        try:
+            result = self.coalescer.submit('scan', self.kb_id, payload, self._run_coalesced_scans)
+        except Exception as e:
+            logger.error(f"Coalesced scan failed: {e}")
+            self._failures += 1
+            return set()
+        return self._cache_result_rows(result)
+
+    def _run_coalesced_scans(self, payloads: List[tuple]) -> List[CoalescedResult]:
+        """
+        One kb scan for a batch of leading stages.
+
+        Selects the rows matching any request's predicate, with a flag column
+        per distinct predicate so each request gets exactly the rows of its
+        own query. Requests with the same predicate (e.g. the same STM) share
+        a flag; a batch with a single distinct predicate runs the plain query.
+
+        Args:
+            payloads: (predicate, selected columns) per request
+
+        Returns:
+            One CoalescedResult per payload
+        """
+        conditions = list(dict.fromkeys(condition for condition, _ in payloads))
+        columns = list(dict.fromkeys(c for _, selected in payloads for c in selected))
+        kb_id_where = f"kb_id = '{self.kb_id}'"
+
+        if len(conditions) == 1:
+            query = f"""
+            SELECT {', '.join(columns)}
+            FROM patterns_data
+            WHERE {kb_id_where} AND ({conditions[0]})
+            """
+            rows = self._run_query(query).result_rows
+            return [CoalescedResult(columns, rows)] * len(payloads)
+
+        flags = ",\n                   ".join(
+            f"({condition}) AS _kato_match_{i}" for i, condition in enumerate(conditions)
+        )
+        union = "\n               OR ".join(f"({condition})" for condition in conditions)
+        query = f"""
+            SELECT {', '.join(columns)},
+                   {flags}
+            FROM patterns_data
+            WHERE {kb_id_where} AND ({union})
+            """
+        rows = self._run_query(query).result_rows
+        width = len(columns)
+        by_condition = {
+            condition: [row[:width] for row in rows if row[width + i]]
+            for i, condition in enumerate(conditions)
+        }
+        return [CoalescedResult(columns, by_condition[condition]) for condition, _ in payloads]
+
+    def explain(self) -> List[Dict[str, Any]]:
+        """
+        Describe how the pipeline will run, without querying ClickHouse.
+
+        Returns:
+            One dict per stage: filters, whether they are fused, the SQL sent
+            (scoped to this kb, with the previous stage's candidates as the
+            external table, or None for Python-only stages) and the filters
+            whose Python side runs afterwards
+        """
+        kb_id_where = f"kb_id = '{self.kb_id}'"
+        steps = []
+        for position, stage in enumerate(self._plan()):
+            filters = [f for _, f in stage]
+            if len(stage) > 1:
+                query = self._fused_query(filters)
+            else:
+                query = filters[0].get_db_query()
+
+            sql = None
+            if query:
+                sql = self._scope_query(query, kb_id_where)
+                if position > 0:
+                    sql = self._restrict_to_external(sql, kb_id_where)
+                sql = "\n".join(line.strip() for line in sql.strip().splitlines())
+
+            steps.append({
+                "stage": '+'.join(name for name, _ in stage),
+                "filters": [name for name, _ in stage],
+                "fused": len(stage) > 1,
+                "sql": sql,
+                "python": [
+                    name for name, f in stage
+                    if f.is_hybrid_filter() or not f.is_database_filter()
+                ],
+            })
+        return steps
+
+    def materialize(self, candidates: Set[str]) -> None:
+        """
+        Read pattern_data (and length) for final candidates that do not have it yet.
+
+        Database stages select names and scalar columns only, so the
+        sequences are read once, for the patterns that survived the whole
+        pipeline, just before matching. Patterns whose data is already in
+        the shared pattern cache are not read again. Recorded as a
+        'materialize' stage in the pipeline metrics.
+
+        Args:
+            candidates: Final candidate set from execute_pipeline()
+        """
+        stage_start = time.time()
+        self._reset_stage_counters()
+        fetched = self._fetch_pattern_data(candidates)
+
+        stage_time = (time.time() - stage_start) * 1000
+        self.stage_metrics.append({
+            "filter": "materialize",
+            "candidates_in": len(candidates),
+            "candidates_after": len(candidates),
+            "materialized": fetched,
+            "time_ms": round(stage_time, 2),
+            "round_trips": self._stage_round_trips,
+            "query_bytes": self._stage_query_bytes,
+            "read_bytes": self._stage_read_bytes,
+            "result_bytes": self._stage_result_bytes,
+            "handoff": self._stage_handoff
+        })
+        if fetched and self.config.enable_filter_metrics:
+            logger.info(
+                f"Materialized pattern_data for {fetched}/{len(candidates)} candidates "
+                f"({stage_time:.1f}ms, {self._stage_read_bytes} bytes read)"
+            )
+
+    def _fetch_pattern_data(self, candidates: Set[str]) -> int:
+        """Read pattern_data and length for candidates whose cache entry lacks either.
+
+        Candidates served from the candidate cache ran no stage, so their
+        length (evidence depends on it) is read here too.
+
+        Args:
+            candidates: Pattern names that need pattern_data
+
+        Returns:
+            Number of patterns requested from ClickHouse
+        """
+        missing = [
+            name for name in candidates
+            if not MATERIALIZED_COLUMNS.issubset(self.patterns_cache.get(name, ()))
+        ]
+        if not missing:
+            return 0
+
+        kb_id_where = f"kb_id = '{self.kb_id}'"
+        query = f"SELECT name, pattern_data, length FROM patterns_data WHERE {kb_id_where}"
+        try:
+            if self.coalescer.enabled:
+                # One read of the union of names for concurrent pipelines of this kb
+                self._stage_handoff = 'coalesced'
+                self._cache_result_rows(
+                    self.coalescer.submit('materialize', self.kb_id, missing, self._run_coalesced_reads)
+                )
+            elif USE_EXTERNAL_CANDIDATES and ExternalData is not None:
+                query, external_data = self._attach_external_candidates(query, kb_id_where, missing)
+                self._stage_handoff = 'external'
+                self._cache_result_rows(self._run_query(query, external_data=external_data))
+            else:
+                self._stage_handoff = 'chunked'
+                self._execute_chunked_query(query, kb_id_where, missing, 500)
+        except Exception as e:
+            logger.error(f"Failed to materialize pattern_data for {len(missing)} candidates: {e}")
+        return len(missing)
+
+    def _run_coalesced_reads(self, payloads: List[List[str]]) -> List[CoalescedResult]:
+        """
+        One pattern_data read for a batch of materializations.
+
+        Args:
+            payloads: Pattern names each request is missing
+
+        Returns:
+            One CoalescedResult per payload, with the rows of its names
+        """
+        names = list(dict.fromkeys(chain(*payloads)))
+        kb_id_where = f"kb_id = '{self.kb_id}'"
+        query = f"SELECT name, pattern_data, length FROM patterns_data WHERE {kb_id_where}"
+        if USE_EXTERNAL_CANDIDATES and ExternalData is not None:
+            query, external_data = self._attach_external_candidates(query, kb_id_where, names)
+            results = [self._run_query(query, external_data=external_data)]
+        else:
+            results = [
+                self._run_query(self._chunk_query(query, kb_id_where, names[i:i + 500]))
+                for i in range(0, len(names), 500)
+            ]
+        rows = {row[0]: row for result in results for row in result.result_rows}
+        columns = ['name', 'pattern_data', 'length']
+        return [
+            CoalescedResult(columns, [rows[name] for name in payload if name in rows])
+            for payload in payloads
+        ]
+
+    def _reset_stage_counters(self) -> None:
+        self._stage_round_trips = 0
+        self._stage_query_bytes = 0
+        self._stage_read_bytes = 0
+        self._stage_result_bytes = 0
+        self._stage_handoff = 'none'
+
     def _create_filter_instance(self, filter_class: type, filter_name: str) -> Optional[PatternFilter]:
         """
         Create filter instance with appropriate dependencies.
@@ -257,13 +695,26 @@ class FilterPipelineExecutor:
             Filter instance or None if creation failed
         """
         try:
-            # Base filters just need config and state
-            if filter_name in ['length', 'jaccard', 'minhash']:
-                return filter_class(self.config, self.state)
+            # Base filters just need config and state (or the STM sketch)
+            if filter_name == 'length':
+                return filter_class(self.config, self.state, sketch=self.sketch)
+
+            # Jaccard filter reads token_ids through the kb's dictionary (schema v2)
+            elif filter_name == 'jaccard':
+                token_dictionary = None
+                if USE_TOKEN_IDS and self.redis is not None and self.kb_id:
+                    token_dictionary = get_token_dictionary(self.kb_id, self.redis)
+                return filter_class(self.config, self.state, sketch=self.sketch,
+                                    token_dictionary=token_dictionary)
+
+            # MinHash filter needs kb_id and the client for its lsh_buckets lookup
+            elif filter_name == 'minhash':
+                return filter_class(self.config, self.state, kb_id=self.kb_id, sketch=self.sketch,
+                                    clickhouse_client=self.clickhouse)
 
             # Bloom filter needs bloom_filter instance
             elif filter_name == 'bloom':
-                return filter_class(self.config, self.state, self.bloom_filter)
+                return filter_class(self.config, self.state, self.bloom_filter, sketch=self.sketch)
 
             # RapidFuzz filter needs extractor
             elif filter_name == 'rapidfuzz':
@@ -275,6 +726,7 @@ class FilterPipelineExecutor:
 
         except Exception as e:
             logger.error(f"Failed to create filter instance '{filter_name}': {e}")
+            self._failures += 1
             return None
 
     def _execute_database_filter(
@@ -295,97 +747,234 @@ class FilterPipelineExecutor:
         Returns:
             New filtered candidate set
         """
-        query = filter_instance.get_db_query()
+        return self._execute_database_query(
+            filter_instance.get_db_query(), filter_instance.get_filter_name(), existing_candidates
+        )
 
+    def _scope_query(self, query: str, kb_id_where: str) -> str:
+        """Add the kb_id filter as the first WHERE condition (partition pruning)."""
+        if "WHERE" not in query:
+            # No WHERE clause yet, add kb_id filter
+            return query.replace(
+                "FROM patterns_data",
+                f"FROM patterns_data WHERE {kb_id_where}"
+            )
+        # Already has WHERE, inject kb_id as first condition
+        return query.replace("WHERE", f"WHERE {kb_id_where} AND", 1)
+
+    def _execute_database_query(
+        self,
+        query: Optional[str],
+        stage_name: str,
+        existing_candidates: Optional[Set[str]]
+    ) -> Set[str]:
+        """
+        Execute a database stage query (one filter's, or several fused).
+
+        Args:
+            query: SELECT over patterns_data from a filter or _fused_query()
+            stage_name: Stage name for logging
+            existing_candidates: Existing candidate set (or None)
+
+        Returns:
+            New filtered candidate set
+        """
         if not query:
             logger.warning(
-                f"Filter {filter_instance.get_filter_name()} returned empty query"
+                f"Filter {stage_name} returned empty query"
             )
             return existing_candidates if existing_candidates else set()
 
         # CRITICAL: Add kb_id filter FIRST for partition pruning
         kb_id_where = f"kb_id = '{self.kb_id}'"
-
-        if "WHERE" not in query:
-            # No WHERE clause yet, add kb_id filter
-            query = query.replace(
-                "FROM patterns_data",
-                f"FROM patterns_data WHERE {kb_id_where}"
-            )
-        else:
-            # Already has WHERE, inject kb_id as first condition
-            query = query.replace("WHERE", f"WHERE {kb_id_where} AND", 1)
+        query = self._scope_query(query, kb_id_where)
 
         # Refine query if we have existing candidates
+        external_data = None
         if existing_candidates is not None and len(existing_candidates) > 0:
             candidate_list = list(existing_candidates)
 
-            # Chunk large candidate sets to avoid ClickHouse max_query_size overflow
-            # Each SHA1 hash is ~42 chars quoted; 500 * 42 = ~21KB per chunk (safe under 262KB limit)
-            CHUNK_SIZE = 500
-            if len(candidate_list) > CHUNK_SIZE:
-                return self._execute_chunked_query(
-                    query, kb_id_where, candidate_list, CHUNK_SIZE
+            if USE_EXTERNAL_CANDIDATES and ExternalData is not None:
+                # Ship the whole candidate set as an external table: one round
+                # trip and a constant-size SQL text regardless of set size
+                query, external_data = self._attach_external_candidates(
+                    query, kb_id_where, candidate_list
                 )
-
-            candidate_str = ", ".join(f"'{c}'" for c in candidate_list)
-
-            # Inject WHERE clause into query (kb_id already added above)
-            if "WHERE" in query:
-                # Already has WHERE (kb_id), add AND condition for candidates
-                query = query.replace("WHERE", f"WHERE name IN ({candidate_str}) AND", 1)
-                # This creates: WHERE name IN (...) AND kb_id = '...' AND <filter conditions>
-                # Move kb_id to beginning for partition pruning efficiency
-                query = query.replace(f"WHERE name IN ({candidate_str}) AND {kb_id_where}",
-                                     f"WHERE {kb_id_where} AND name IN ({candidate_str})")
+                self._stage_handoff = 'external'
             else:
-                # This shouldn't happen since we added kb_id above, but handle it
-                query = query.replace(
-                    "FROM patterns_data",
-                    f"FROM patterns_data WHERE {kb_id_where} AND name IN ({candidate_str})"
-                )
+                # Chunk large candidate sets to avoid ClickHouse max_query_size overflow
+                # Each SHA1 hash is ~42 chars quoted; 500 * 42 = ~21KB per chunk (safe under 262KB limit)
+                CHUNK_SIZE = 500
+                if len(candidate_list) > CHUNK_SIZE:
+                    self._stage_handoff = 'chunked'
+                    return self._execute_chunked_query(
+                        query, kb_id_where, candidate_list, CHUNK_SIZE
+                    )
+
+                self._stage_handoff = 'inline'
+                candidate_str = ", ".join(f"'{c}'" for c in candidate_list)
+
+                # Inject WHERE clause into query (kb_id already added above)
+                if "WHERE" in query:
+                    # Already has WHERE (kb_id), add AND condition for candidates
+                    query = query.replace("WHERE", f"WHERE name IN ({candidate_str}) AND", 1)
+                    # This creates: WHERE name IN (...) AND kb_id = '...' AND <filter conditions>
+                    # Move kb_id to beginning for partition pruning efficiency
+                    query = query.replace(f"WHERE name IN ({candidate_str}) AND {kb_id_where}",
+                                         f"WHERE {kb_id_where} AND name IN ({candidate_str})")
+                else:
+                    # This shouldn't happen since we added kb_id above, but handle it
+                    query = query.replace(
+                        "FROM patterns_data",
+                        f"FROM patterns_data WHERE {kb_id_where} AND name IN ({candidate_str})"
+                    )
 
         # Execute query
         try:
-            result = self.clickhouse.query(query)
+            result = self._run_query(query, external_data=external_data)
 
             # Extract candidate names and cache ALL columns for Python-side filters
-            new_candidates = set()
-            column_names = result.column_names if hasattr(result, 'column_names') else []
+            return self._cache_result_rows(result)
 
-            for row in result.result_rows:
-                # First column is always 'name'
-                name = row[0]
-                new_candidates.add(name)
+        except Exception as e:
+            logger.error(f"Database query failed: {e}")
+            logger.error(f"Query was: {query}")
+            self._failures += 1
+            # Return existing candidates on error to allow pipeline to continue
+            return existing_candidates if existing_candidates else set()
 
-                # Cache ALL columns as dict for Python-side filters
-                if name not in self.patterns_cache:
-                    self.patterns_cache[name] = {}
+    def _attach_external_candidates(self, query: str, kb_id_where: str,
+                                    candidate_list: List[str]) -> tuple:
+        """Restrict a query to candidates supplied as a ClickHouse external table.
 
-                # Map column names to values
-                for i, col_name in enumerate(column_names):
-                    if i == 0:
-                        continue  # Skip 'name' column (already used as key)
+        Args:
+            query: The filter query with WHERE clause already containing kb_id
+            kb_id_where: The kb_id WHERE clause string
+            candidate_list: Candidate pattern names from the previous stage
 
-                    value = row[i] if i < len(row) else None
+        Returns:
+            Tuple of (rewritten query, ExternalData payload)
+        """
+        query = self._restrict_to_external(query, kb_id_where)
+
+        # TabSeparated needs backslash, tab and newline escaped
+        payload = "\n".join(
+            c.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+            for c in candidate_list
+        ).encode("utf-8")
+        external_data = ExternalData(
+            file_name=EXTERNAL_CANDIDATES_TABLE,
+            data=payload,
+            fmt="TabSeparated",
+            structure=["name String"]
+        )
+        self._stage_query_bytes += len(payload)
+        return query, external_data
+
+    def _restrict_to_external(self, query: str, kb_id_where: str) -> str:
+        """Restrict a kb-scoped query to names in the external candidates table."""
+        return query.replace(
+            f"WHERE {kb_id_where}",
+            f"WHERE {kb_id_where} AND name IN (SELECT name FROM {EXTERNAL_CANDIDATES_TABLE})",
+            1
+        )
 
-                    # Special handling for pattern_data: store both event-structured and flattened versions
-                    if col_name == 'pattern_data' and value:
-                        from itertools import chain
-                        # Store original event-structured for Prediction class
-                        self.patterns_cache[name]['pattern_data'] = value
-                        # Store flattened version for similarity matching
-                        self.patterns_cache[name]['pattern_data_flat'] = list(chain(*value))
-                    else:
-                        self.patterns_cache[name][col_name] = value
+    def _run_query(self, query: str, external_data: Any = None) -> Any:
+        """Run a ClickHouse query and count it against the current stage.
 
-            return new_candidates
+        Args:
+            query: SQL text
+            external_data: Optional ExternalData sent alongside the query
 
-        except Exception as e:
-            logger.error(f"Database query failed: {e}")
-            logger.error(f"Query was: {query}")
-            # Return existing candidates on error to allow pipeline to continue
-            return existing_candidates if existing_candidates else set()
+        Returns:
+            ClickHouse query result
+        """
+        self._stage_round_trips += 1
+        self._stage_query_bytes += len(query)
+        if external_data is not None:
+            result = self.clickhouse.query(query, external_data=external_data)
+        else:
+            result = self.clickhouse.query(query)
+
+        # Server-side counters from the X-ClickHouse-Summary header
+        summary = getattr(result, 'summary', None)
+        if isinstance(summary, dict):
+            self._stage_read_bytes += int(summary.get('read_bytes', 0) or 0)
+            self._stage_result_bytes += int(summary.get('result_bytes', 0) or 0)
+        return result
+
+    def _cache_result_rows(self, result: Any) -> Set[str]:
+        """Collect candidate names from a result and cache ALL columns.
+
+        Args:
+            result: ClickHouse query result whose first column is 'name'
+
+        Returns:
+            Set of candidate names in the result
+        """
+        new_candidates = set()
+        column_names = result.column_names if hasattr(result, 'column_names') else []
+
+        for row in result.result_rows:
+            # First column is always 'name'
+            name = row[0]
+            new_candidates.add(name)
+
+            # Cache ALL columns (except 'name', the key) for Python-side filters
+            self._remember(name, (
+                (col_name, row[i] if i < len(row) else None)
+                for i, col_name in enumerate(column_names) if i > 0
+            ))
+
+        return new_candidates
+
+    def _remember(self, name: str, columns: Any) -> Dict[str, Any]:
+        """Add a pattern row to this run's working set through the shared cache.
+
+        A pattern already in the shared cache is reused as is: pattern_data
+        is keyed by content (the pattern name is its hash), so it is neither
+        stored again nor re-flattened.
+
+        Args:
+            name: Pattern name
+            columns: (column name, value) pairs of the row
+
+        Returns:
+            The pattern's cache entry
+        """
+        entry = self.patterns_cache.get(name)
+        if entry is None:
+            entry = self.shared_cache.get(self.kb_id, name)
+            if entry is None:
+                self._cache_misses += 1
+                entry = {}
+            else:
+                self._cache_hits += 1
+            self.patterns_cache[name] = entry
+
+        added = False
+        for col_name, value in columns:
+            if col_name == 'pattern_data':
+                # Store both event-structured (for Prediction) and flattened
+                # (for similarity matching) versions
+                if value and 'pattern_data' not in entry:
+                    entry['pattern_data'] = value
+                    entry['pattern_data_flat'] = list(chain(*value))
+                    added = True
+            else:
+                added = added or col_name not in entry
+                entry[col_name] = value
+
+        if added:
+            self.shared_cache.put(self.kb_id, name, entry)
+        return entry
+
+    def get_pattern(self, name: str) -> Dict[str, Any]:
+        """Cached columns of a pattern: this run's working set, then the shared cache."""
+        entry = self.patterns_cache.get(name)
+        if entry is None:
+            entry = self.shared_cache.get(self.kb_id, name) or {}
+        return entry
 
     def _execute_chunked_query(self, base_query: str, kb_id_where: str,
                                candidate_list: List[str], chunk_size: int) -> Set[str]:
@@ -403,59 +992,42 @@ class FilterPipelineExecutor:
         Returns:
             Set of candidate names passing the filter across all chunks
         """
-        from itertools import chain as itertools_chain
         all_candidates = set()
 
         for i in range(0, len(candidate_list), chunk_size):
-            chunk = candidate_list[i:i + chunk_size]
-            candidate_str = ", ".join(f"'{c}'" for c in chunk)
-
-            chunk_query = base_query
-            if "WHERE" in chunk_query:
-                chunk_query = chunk_query.replace(
-                    "WHERE",
-                    f"WHERE name IN ({candidate_str}) AND", 1
-                )
-                chunk_query = chunk_query.replace(
-                    f"WHERE name IN ({candidate_str}) AND {kb_id_where}",
-                    f"WHERE {kb_id_where} AND name IN ({candidate_str})"
-                )
-            else:
-                chunk_query = chunk_query.replace(
-                    "FROM patterns_data",
-                    f"FROM patterns_data WHERE {kb_id_where} AND name IN ({candidate_str})"
-                )
+            chunk_query = self._chunk_query(base_query, kb_id_where, candidate_list[i:i + chunk_size])
 
             try:
-                result = self.clickhouse.query(chunk_query)
-                column_names = result.column_names if hasattr(result, 'column_names') else []
-
-                for row in result.result_rows:
-                    name = row[0]
-                    all_candidates.add(name)
-
-                    if name not in self.patterns_cache:
-                        self.patterns_cache[name] = {}
-
-                    for j, col_name in enumerate(column_names):
-                        if j == 0:
-                            continue
-                        value = row[j] if j < len(row) else None
-                        if col_name == 'pattern_data' and value:
-                            from itertools import chain
-                            self.patterns_cache[name]['pattern_data'] = value
-                            self.patterns_cache[name]['pattern_data_flat'] = list(chain(*value))
-                        else:
-                            self.patterns_cache[name][col_name] = value
+                result = self._run_query(chunk_query)
+                all_candidates.update(self._cache_result_rows(result))
 
             except Exception as e:
                 logger.error(f"Chunked query failed (chunk {i//chunk_size + 1}): {e}")
+                self._failures += 1
 
         logger.debug(f"Chunked query: {len(candidate_list)} candidates in "
                      f"{(len(candidate_list) + chunk_size - 1) // chunk_size} chunks, "
                      f"{len(all_candidates)} results")
         return all_candidates
 
+    def _chunk_query(self, base_query: str, kb_id_where: str, chunk: List[str]) -> str:
+        """Restrict a kb-scoped query to one chunk of candidates with an IN list."""
+        candidate_str = ", ".join(f"'{c}'" for c in chunk)
+
+        if "WHERE" in base_query:
+            chunk_query = base_query.replace(
+                "WHERE",
+                f"WHERE name IN ({candidate_str}) AND", 1
+            )
+            return chunk_query.replace(
+                f"WHERE name IN ({candidate_str}) AND {kb_id_where}",
+                f"WHERE {kb_id_where} AND name IN ({candidate_str})"
+            )
+        return base_query.replace(
+            "FROM patterns_data",
+            f"FROM patterns_data WHERE {kb_id_where} AND name IN ({candidate_str})"
+        )
+
     def get_metrics(self) -> Dict[str, Any]:
         """
         Return pipeline execution metrics.
@@ -466,6 +1038,13 @@ class FilterPipelineExecutor:
         return {
             "stages": self.stage_metrics,
             "total_stages": len(self.stage_metrics),
+            "total_round_trips": sum(m.get("round_trips", 0) for m in self.stage_metrics),
+            "total_read_bytes": sum(m.get("read_bytes", 0) for m in self.stage_metrics),
+            "pattern_cache_hits": self._cache_hits,
+            "pattern_cache_misses": self._cache_misses,
+            "filter_ordering": self.filter_ordering,
+            "skipped_filters": self.skipped_filters,
+            "candidate_cache": self.candidate_cache_status,
             "final_candidates": (
                 self.stage_metrics[-1]["candidates_after"]
                 if self.stage_metrics
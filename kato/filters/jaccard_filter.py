@@ -20,6 +20,9 @@ class JaccardFilter(PatternFilter):
     Uses precomputed 'token_set' field in ClickHouse to efficiently calculate
     Jaccard similarity = |intersection| / |union| using array functions.
 
+    With a TokenDictionary (schema v2, KATO_TOKEN_IDS=true) the same
+    predicate runs on the integer 'token_ids' column instead.
+
     Configuration:
         - jaccard_threshold (default: 0.3): Minimum Jaccard similarity (0.0-1.0)
         - jaccard_min_overlap (default: 2): Minimum absolute token overlap count
@@ -36,51 +39,91 @@ class JaccardFilter(PatternFilter):
         - Jaccard >= 0.3 (passes)
     """
 
-    def __init__(self, config: Any, state: list[str]):
+    config_fields = ('jaccard_threshold', 'jaccard_min_overlap')
+    stm_order_sensitive = False
+
+    def __init__(self, config: Any, state: list[str], sketch: Optional[Any] = None,
+                 token_dictionary: Optional[Any] = None):
         """
         Initialize Jaccard filter.
 
         Args:
             config: SessionConfiguration with jaccard_threshold, jaccard_min_overlap
             state: Current STM state (flattened token list)
+            sketch: Optional StmSketch of the STM
+            token_dictionary: Optional TokenDictionary of the kb; filters on
+                token_ids instead of token_set
         """
-        super().__init__(config, state)
+        super().__init__(config, state, sketch)
 
         # Get configuration with defaults
         self.threshold = getattr(config, 'jaccard_threshold', None) or 0.3
         self.min_overlap = getattr(config, 'jaccard_min_overlap', None) or 2
 
+        # STM tokens without an ID occur in no pattern: they only widen the union
+        self.stm_ids = token_dictionary.encode_set(self.stm_tokens) if token_dictionary is not None else None
+
         logger.debug(
             f"JaccardFilter initialized: STM tokens={len(self.stm_tokens)}, "
             f"threshold={self.threshold}, min_overlap={self.min_overlap}"
         )
 
-    def get_db_query(self) -> Optional[str]:
+    def get_db_condition(self) -> Optional[str]:
         """
-        Generate ClickHouse SQL query for Jaccard similarity filtering.
+        Token overlap predicate.
 
         Uses array functions for set operations:
         - arrayIntersect: Find common tokens
         - arrayConcat + arrayDistinct: Calculate union
 
         Returns:
-            SQL query string filtering by Jaccard similarity
+            SQL predicate on token_set (token_ids with a token dictionary)
         """
+        if self.stm_ids is not None:
+            return self._token_ids_condition()
+
         # Convert STM tokens to ClickHouse array literal
         stm_tokens_str = ", ".join(f"'{token}'" for token in self.stm_token_list)
         stm_array = f"[{stm_tokens_str}]"
 
-        query = f"""
-        SELECT name, pattern_data, length
-        FROM patterns_data
-        WHERE (
+        return f"""(
             -- Calculate intersection size
             length(arrayIntersect(token_set, {stm_array})) >= {self.min_overlap}
             AND
             -- Calculate Jaccard similarity
             length(arrayIntersect(token_set, {stm_array})) * 1.0 /
             length(arrayDistinct(arrayConcat(token_set, {stm_array}))) >= {self.threshold}
-        )
+        )"""
+
+    def _token_ids_condition(self) -> str:
+        """
+        Token overlap predicate on the integer token_ids column.
+
+        Both sides are distinct sets, so |union| = token_count + |STM| - overlap.
+        min_overlap >= 1 implies hasAny(), which the bloom skip index can use.
+        """
+        if not self.stm_ids:
+            return "0"
+        stm_array = f"[{', '.join(map(str, self.stm_ids))}]"
+        overlap = f"length(arrayIntersect(token_ids, {stm_array}))"
+
+        return f"""(
+            hasAny(token_ids, {stm_array})
+            AND {overlap} >= {self.min_overlap}
+            AND {overlap} * 1.0 / (token_count + {len(self.stm_tokens)} - {overlap}) >= {self.threshold}
+        )"""
+
+    def get_db_query(self) -> Optional[str]:
+        """
+        Generate ClickHouse SQL query for Jaccard similarity filtering.
+
+        Returns:
+            SQL query string filtering by Jaccard similarity
+        """
+        query = f"""
+        SELECT {self.select_columns()}
+        FROM patterns_data
+        WHERE {self.get_db_condition()}
         """
 
         return query
@@ -31,15 +31,19 @@ class LengthFilter(PatternFilter):
         Query: WHERE length BETWEEN 5 AND 20
     """
 
-    def __init__(self, config: Any, state: list[str]):
+    config_fields = ('length_min_ratio', 'length_max_ratio')
+    stm_order_sensitive = False
+
+    def __init__(self, config: Any, state: list[str], sketch: Optional[Any] = None):
         """
         Initialize length filter.
 
         Args:
             config: SessionConfiguration with length_min_ratio, length_max_ratio
             state: Current STM state (flattened token list)
+            sketch: Optional StmSketch of the STM
         """
-        super().__init__(config, state)
+        super().__init__(config, state, sketch)
 
         # Get configuration with defaults
         self.min_ratio = getattr(config, 'length_min_ratio', None) or 0.5
@@ -55,6 +59,10 @@ class LengthFilter(PatternFilter):
             f"min_length={self.min_length}, max_length={self.max_length}"
         )
 
+    def get_db_condition(self) -> Optional[str]:
+        """Length range predicate."""
+        return f"length BETWEEN {self.min_length} AND {self.max_length}"
+
     def get_db_query(self) -> Optional[str]:
         """
         Generate ClickHouse SQL query for length-based filtering.
@@ -63,9 +71,9 @@ class LengthFilter(PatternFilter):
             SQL query string filtering by length bounds
         """
         query = f"""
-        SELECT name, pattern_data, length
+        SELECT {self.select_columns()}
         FROM patterns_data
-        WHERE length BETWEEN {self.min_length} AND {self.max_length}
+        WHERE {self.get_db_condition()}
         """
 
         return query
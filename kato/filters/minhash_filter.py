@@ -6,7 +6,10 @@ without computing exact pairwise comparisons.
 """
 
 from typing import Optional, Set, Dict, Any
+from os import environ
 import logging
+import threading
+import time
 
 from datasketch import MinHash, MinHashLSH
 
@@ -15,6 +18,57 @@ from kato.storage.clickhouse_writer import _MINHASH_HASHFUNC
 
 logger = logging.getLogger(__name__)
 
+# Resolve LSH candidates through point lookups on kato.lsh_buckets (default).
+# KBs whose buckets are missing or lack pattern lengths (not yet backfilled
+# with scripts/backfill_lsh_buckets.py) scan patterns_data.lsh_bands instead;
+# KATO_MINHASH_USE_LSH_BUCKETS=false always scans.
+USE_LSH_BUCKETS = environ.get('KATO_MINHASH_USE_LSH_BUCKETS', 'true').lower() == 'true'
+
+# A kb found without usable buckets is checked again after this many seconds
+LSH_BUCKETS_RECHECK_SECONDS = 60.0
+
+# kb_id -> (buckets usable, monotonic time of the check)
+_bucket_status: Dict[str, tuple] = {}
+_bucket_status_lock = threading.Lock()
+
+
+def lsh_buckets_ready(clickhouse_client: Any, kb_id: str) -> bool:
+    """
+    Whether kato.lsh_buckets holds rows with pattern lengths for kb_id.
+
+    Checked once per process for a ready kb; a kb without usable buckets is
+    checked again after LSH_BUCKETS_RECHECK_SECONDS (a backfill may run
+    meanwhile). Errors count as not ready, so the stage scans lsh_bands.
+    """
+    now = time.monotonic()
+    with _bucket_status_lock:
+        status = _bucket_status.get(kb_id)
+    if status is not None and (status[0] or now - status[1] < LSH_BUCKETS_RECHECK_SECONDS):
+        return status[0]
+
+    try:
+        result = clickhouse_client.query(
+            f"SELECT count(), countIf(pattern_length = 0) FROM lsh_buckets WHERE kb_id = '{kb_id}'"
+        )
+        rows, unsized = result.result_rows[0] if result.result_rows else (0, 0)
+        ready = rows > 0 and unsized == 0
+    except Exception as e:
+        logger.warning(f"Cannot check lsh_buckets of {kb_id}, scanning lsh_bands: {e}")
+        ready = False
+    if not ready:
+        logger.info(f"No usable lsh_buckets rows for {kb_id}, MinHash scans lsh_bands "
+                    f"(run scripts/backfill_lsh_buckets.py)")
+
+    with _bucket_status_lock:
+        _bucket_status[kb_id] = (ready, now)
+    return ready
+
+
+def reset_lsh_bucket_status() -> None:
+    """Forget the bucket checks (e.g. after a backfill in this process)."""
+    with _bucket_status_lock:
+        _bucket_status.clear()
+
 
 class MinHashFilter(PatternFilter):
     """
@@ -24,7 +78,10 @@ class MinHashFilter(PatternFilter):
 
     Stage 1 (Database): Query patterns with matching LSH bands
     - Compute STM's MinHash signature and LSH bands
-    - Query ClickHouse for patterns where ANY LSH band matches
+    - Look up (length, name) of the patterns colliding with the STM's band
+      hashes in lsh_buckets (primary-key point lookups on (kb_id, band_hash)),
+      then read only those rows from patterns_data through its
+      (kb_id, length, name) primary key
     - Reduces billions → millions with 99% candidate reduction
 
     Stage 2 (Python): Verify estimated Jaccard similarity
@@ -45,15 +102,29 @@ class MinHashFilter(PatternFilter):
         - With b=20, r=5: Patterns with J≥0.7 have ~95% collision probability
     """
 
-    def __init__(self, config: Any, state: list[str]):
+    db_columns = ('minhash_sig',)
+    config_fields = ('minhash_threshold', 'minhash_bands', 'minhash_rows', 'minhash_num_hashes')
+    stm_order_sensitive = False
+
+    def __init__(self, config: Any, state: list[str], kb_id: Optional[str] = None,
+                 sketch: Optional[Any] = None, clickhouse_client: Optional[Any] = None):
         """
         Initialize MinHash/LSH filter.
 
         Args:
             config: SessionConfiguration with minhash parameters
             state: Current STM state (flattened token list)
+            kb_id: Knowledge base identifier used to scope the lsh_buckets
+                lookup. Without it the filter scans patterns_data.lsh_bands.
+            sketch: Optional StmSketch of the STM; its incrementally maintained
+                signature and bands are used instead of hashing every token
+            clickhouse_client: Client checking that the kb's lsh_buckets are
+                usable (see lsh_buckets_ready); without it the filter scans
         """
-        super().__init__(config, state)
+        super().__init__(config, state, sketch)
+        self.kb_id = kb_id
+        self.use_buckets = bool(USE_LSH_BUCKETS and kb_id and clickhouse_client is not None
+                                and lsh_buckets_ready(clickhouse_client, kb_id))
 
         # Get configuration with defaults
         self.threshold = getattr(config, 'minhash_threshold', None) or 0.7
@@ -69,7 +140,20 @@ class MinHashFilter(PatternFilter):
             )
             self.bands = self.num_hashes // self.rows
 
-        # Compute STM MinHash signature and LSH bands
+        if sketch is not None:
+            self.stm_minhash = sketch.minhash(self.num_hashes)
+            self.stm_lsh_bands = sketch.lsh_bands(self.num_hashes, self.bands, self.rows)
+        else:
+            self._compute_stm_minhash()
+
+        logger.debug(
+            f"MinHashFilter initialized: STM tokens={len(self.stm_tokens)}, "
+            f"threshold={self.threshold}, bands={self.bands}, rows={self.rows}, "
+            f"num_hashes={self.num_hashes}, lsh_bands={len(self.stm_lsh_bands)}"
+        )
+
+    def _compute_stm_minhash(self) -> None:
+        """Compute the STM MinHash signature and LSH bands from the token set."""
         if _MINHASH_HASHFUNC:
             self.stm_minhash = MinHash(num_perm=self.num_hashes, hashfunc=_MINHASH_HASHFUNC)
         else:
@@ -81,12 +165,6 @@ class MinHashFilter(PatternFilter):
         # Compute LSH bands for database query
         self.stm_lsh_bands = self._compute_lsh_bands(self.stm_minhash)
 
-        logger.debug(
-            f"MinHashFilter initialized: STM tokens={len(self.stm_tokens)}, "
-            f"threshold={self.threshold}, bands={self.bands}, rows={self.rows}, "
-            f"num_hashes={self.num_hashes}, lsh_bands={len(self.stm_lsh_bands)}"
-        )
-
     def _compute_lsh_bands(self, minhash: MinHash) -> list[int]:
         """
         Compute LSH band hashes from MinHash signature.
@@ -114,6 +192,33 @@ class MinHashFilter(PatternFilter):
 
         return bands
 
+    def get_db_condition(self) -> Optional[str]:
+        """
+        LSH band membership predicate.
+
+        The (length, name) of colliding patterns are resolved from
+        lsh_buckets, whose sort key (kb_id, band_hash, pattern_name) turns
+        each band into a point lookup. Matching them against the patterns_data
+        sort key (kb_id, length, name) reads only the granules holding those
+        patterns, so the cost tracks the number of colliding patterns rather
+        than the size of the kb partition.
+
+        Returns:
+            SQL predicate matching patterns that share an LSH band with the STM
+        """
+        # Note: ClickHouse uses UInt64 for band hashes, handle negative hash values
+        bands_str = ", ".join(str(abs(band)) for band in self.stm_lsh_bands)
+
+        if self.use_buckets:
+            # The executor injects kb_id into the first (outer) WHERE; the
+            # subquery carries its own kb_id so it can use the primary key.
+            return f"""(length, name) IN (
+                SELECT pattern_length, pattern_name
+                FROM lsh_buckets
+                WHERE kb_id = '{self.kb_id}' AND band_hash IN ({bands_str})
+            )"""
+        return f"hasAny(lsh_bands, [{bands_str}])"
+
     def get_db_query(self) -> Optional[str]:
         """
         Generate ClickHouse SQL query for LSH band matching.
@@ -123,16 +228,11 @@ class MinHashFilter(PatternFilter):
         Returns:
             SQL query string for LSH band matching
         """
-        # Convert LSH bands to ClickHouse array literal
-        # Note: ClickHouse uses UInt64 for band hashes, handle negative hash values
-        bands_str = ", ".join(str(abs(band)) for band in self.stm_lsh_bands)
-        bands_array = f"[{bands_str}]"
-
         query = f"""
-        SELECT name, pattern_data, length, minhash_sig
-        FROM patterns_data
-        WHERE hasAny(lsh_bands, {bands_array})
-        """
+            SELECT {self.select_columns(*self.db_columns)}
+            FROM patterns_data
+            WHERE {self.get_db_condition()}
+            """
 
         return query
 
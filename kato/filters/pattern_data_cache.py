@@ -0,0 +1,269 @@
+"""
+Process-wide, size-bounded cache of pattern rows for the filter pipeline.
+
+Filter stages read pattern columns (pattern_data, length, minhash_sig, ...)
+from ClickHouse and the executor keeps them for the Python-side stages and
+for building predictions. Entries are cached here, keyed by
+(kb_id, pattern_name), so every FilterPipelineExecutor and PatternSearcher
+of a kb in this process shares one copy of a hot pattern (and its flattened
+symbol list) instead of each holding its own ever-growing dict.
+
+The cache is bounded by an approximate byte budget and evicts by least
+recent (lru) or least frequent (lfu, ties broken by recency) use. Pattern
+names are content hashes, so an entry only goes stale when its pattern is
+deleted; searchers discard those explicitly.
+
+Configuration:
+    KATO_PATTERN_CACHE_MAX_BYTES  byte budget (default 256 MiB, 0 disables)
+    KATO_PATTERN_CACHE_POLICY     'lru' (default) or 'lfu'
+"""
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from os import environ
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('kato.filters.pattern_data_cache')
+
+PATTERN_CACHE_MAX_BYTES = int(environ.get('KATO_PATTERN_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+PATTERN_CACHE_POLICY = environ.get('KATO_PATTERN_CACHE_POLICY', 'lru').lower()
+
+EVICTION_POLICIES = ('lru', 'lfu')
+
+CacheKey = Tuple[str, str]
+
+
+def _value_size(value: Any) -> int:
+    """Approximate deep size of a column value in bytes."""
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        if value and isinstance(value[0], (str, int, float)):
+            # Flat symbol or signature list: no further nesting to walk
+            return size + sum(map(sys.getsizeof, value))
+        return size + sum(map(_value_size, value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _value_size(k) + _value_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """
+    Approximate memory held by a cached pattern entry.
+
+    pattern_data_flat references the same symbol strings as pattern_data,
+    so only its list is counted.
+    """
+    size = sys.getsizeof(entry)
+    for column, value in entry.items():
+        if column == 'pattern_data_flat' and isinstance(value, list):
+            size += sys.getsizeof(value)
+        else:
+            size += _value_size(value)
+    return size
+
+
+class PatternDataCache:
+    """
+    Thread-safe pattern entry cache with a byte budget.
+
+    Entries are the column dicts the filter executor builds from ClickHouse
+    rows ({'pattern_data': ..., 'pattern_data_flat': ..., 'length': ...}).
+    Callers may hold an entry after it is evicted; the budget bounds what
+    the cache itself retains.
+    """
+
+    def __init__(self, max_bytes: int = PATTERN_CACHE_MAX_BYTES,
+                 policy: str = PATTERN_CACHE_POLICY):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Approximate byte budget; 0 keeps nothing
+            policy: 'lru' or 'lfu'
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown pattern cache policy '{policy}', expected one of {EVICTION_POLICIES}")
+
+        self.max_bytes = max(0, max_bytes)
+        self.policy = policy
+        self._lock = threading.Lock()
+
+        # key -> [entry, size, use count]
+        self._entries: Dict[CacheKey, list] = {}
+        # lru: keys from least to most recently used
+        self._order: 'OrderedDict[CacheKey, None]' = OrderedDict()
+        # lfu: use count -> keys from least to most recently used
+        self._buckets: Dict[int, 'OrderedDict[CacheKey, None]'] = {}
+        # kb_id -> number of cached entries
+        self._kb_entries: Dict[str, int] = {}
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    def get(self, kb_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Cached entry of a pattern, or None (counted as a miss)."""
+        key = (kb_id, name)
+        with self._lock:
+            slot = self._entries.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key, slot)
+            return slot[0]
+
+    def put(self, kb_id: str, name: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cache an entry, or re-size it after columns were added to it.
+
+        Evicts until the cache fits its budget; an entry larger than the
+        whole budget is not retained.
+
+        Returns:
+            The entry, for chaining
+        """
+        key = (kb_id, name)
+        size = entry_size(entry)
+        with self._lock:
+            slot = self._entries.get(key)
+            if slot is not None:
+                self.bytes += size - slot[1]
+                slot[0], slot[1] = entry, size
+                self._touch(key, slot)
+            elif size <= self.max_bytes:
+                # Make room first so a new entry is never its own victim
+                self._evict(size)
+                self._entries[key] = [entry, size, 1]
+                self.bytes += size
+                self.inserts += 1
+                self._kb_entries[kb_id] = self._kb_entries.get(kb_id, 0) + 1
+                if self.policy == 'lru':
+                    self._order[key] = None
+                else:
+                    self._buckets.setdefault(1, OrderedDict())[key] = None
+            self._evict()
+        return entry
+
+    def discard(self, kb_id: str, name: str) -> bool:
+        """Remove one pattern (e.g. after it was deleted); True if it was cached."""
+        with self._lock:
+            return self._remove((kb_id, name))
+
+    def drop_kb(self, kb_id: str) -> int:
+        """Remove every entry of a kb; returns the number removed."""
+        with self._lock:
+            if kb_id not in self._kb_entries:
+                return 0
+            keys = [key for key in self._entries if key[0] == kb_id]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries (metrics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._order.clear()
+            self._buckets.clear()
+            self._kb_entries.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'policy': self.policy,
+                'max_bytes': self.max_bytes,
+                'bytes': self.bytes,
+                'entries': len(self._entries),
+                'entries_by_kb': dict(self._kb_entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'inserts': self.inserts,
+                'evictions': self.evictions,
+            }
+
+    def _touch(self, key: CacheKey, slot: list) -> None:
+        if self.policy == 'lru':
+            self._order.move_to_end(key)
+            return
+        bucket = self._buckets[slot[2]]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[slot[2]]
+        slot[2] += 1
+        self._buckets.setdefault(slot[2], OrderedDict())[key] = None
+
+    def _remove(self, key: CacheKey) -> bool:
+        slot = self._entries.pop(key, None)
+        if slot is None:
+            return False
+        self.bytes -= slot[1]
+        remaining = self._kb_entries[key[0]] - 1
+        if remaining:
+            self._kb_entries[key[0]] = remaining
+        else:
+            del self._kb_entries[key[0]]
+        if self.policy == 'lru':
+            del self._order[key]
+        else:
+            bucket = self._buckets[slot[2]]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[slot[2]]
+        return True
+
+    def _evict(self, incoming: int = 0) -> None:
+        while self.bytes + incoming > self.max_bytes and self._entries:
+            if self.policy == 'lru':
+                key = next(iter(self._order))
+            else:
+                key = next(iter(self._buckets[min(self._buckets)]))
+            self._remove(key)
+            self.evictions += 1
+
+
+# Global pattern data cache instance
+_pattern_data_cache: Optional[PatternDataCache] = None
+_pattern_data_cache_lock = threading.Lock()
+
+
+def get_pattern_data_cache() -> PatternDataCache:
+    """Get or create the process-wide pattern data cache."""
+    global _pattern_data_cache
+
+    if _pattern_data_cache is None:
+        with _pattern_data_cache_lock:
+            if _pattern_data_cache is None:
+                _pattern_data_cache = PatternDataCache()
+                logger.info(
+                    f"Pattern data cache initialized ({_pattern_data_cache.policy}, "
+                    f"{_pattern_data_cache.max_bytes} bytes)"
+                )
+
+    return _pattern_data_cache
+
+
+def reset_pattern_data_cache(max_bytes: int = PATTERN_CACHE_MAX_BYTES,
+                             policy: str = PATTERN_CACHE_POLICY) -> PatternDataCache:
+    """Replace the process-wide cache (tests and benchmarks)."""
+    global _pattern_data_cache
+
+    with _pattern_data_cache_lock:
+        _pattern_data_cache = PatternDataCache(max_bytes, policy)
+    return _pattern_data_cache
@@ -40,6 +40,9 @@ class RapidFuzzFilter(PatternFilter):
     Note: Requires InformationExtractor instance for prediction info calculation.
     """
 
+    needs_pattern_data = True
+    config_fields = ('recall_threshold', 'use_token_matching', 'fuzzy_token_threshold')
+
     def __init__(self, config: Any, state: list[str], extractor: Optional[Any] = None):
         """
         Initialize RapidFuzz filter.
@@ -89,7 +92,7 @@ class RapidFuzzFilter(PatternFilter):
         Args:
             candidates: Set of pattern names to filter
             patterns_cache: Dict mapping pattern names to pattern data
-                Expected key: 'pattern_data' (flattened list of tokens)
+                Expected key: 'pattern_data_flat' (flattened list of tokens)
 
         Returns:
             Filtered set of patterns with similarity >= recall_threshold
@@ -0,0 +1,241 @@
+"""
+Per-kb filter stage statistics and cost-based stage ordering.
+
+FilterPipelineExecutor records every stage it runs here: how many
+candidates went in and came out, and how long the stage took. Statistics
+are kept per (kb_id, stage) as exponentially weighted moving averages, so
+they follow changes in the kb and in typical STM shapes.
+
+With filter_ordering 'auto' or 'strict' the executor asks plan_order() for
+the order to run the configured filters in:
+
+- The first configured filter stays first: it scans the kb, and only stages
+  that receive candidates have a measured pass rate.
+- With stage fusion on, the remaining database filters move up next to it;
+  they join the same query at no extra round trip.
+- The other stages run in ascending cost / (1 - pass rate), the classic
+  ordering for independent predicates: cheap, selective stages first.
+- 'auto' additionally skips unfused stages that keep nearly every candidate
+  (pass rate >= KATO_FILTER_SKIP_PASS_RATE). Every
+  KATO_FILTER_EXPLORE_INTERVAL-th run of a kb runs all stages, so the
+  statistics of skipped stages stay current.
+
+Every stage keeps only the candidates satisfying its own per-pattern
+predicate, so reordering returns exactly the configured pipeline's result
+('strict'); skipping a stage drops one predicate and returns a superset.
+
+Configuration:
+    KATO_FILTER_SKIP_PASS_RATE      skip threshold for 'auto' (default 0.99)
+    KATO_FILTER_EXPLORE_INTERVAL    full-pipeline run interval (default 50)
+"""
+
+import logging
+import threading
+from os import environ
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('kato.filters.stage_stats')
+
+FILTER_SKIP_PASS_RATE = float(environ.get('KATO_FILTER_SKIP_PASS_RATE', '0.99'))
+FILTER_EXPLORE_INTERVAL = int(environ.get('KATO_FILTER_EXPLORE_INTERVAL', '50'))
+
+# 'configured' runs filter_pipeline as given
+ORDERING_MODES = ('configured', 'auto', 'strict')
+
+# Weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.2
+
+# Observations of a stage before its statistics are used
+MIN_OBSERVATIONS = 5
+
+
+class StageStats:
+    """Moving averages for one stage of one kb."""
+
+    __slots__ = ('runs', 'scans', 'pass_rate', 'ms_per_candidate', 'time_ms',
+                 'candidates_in', 'candidates_out', 'skipped')
+
+    def __init__(self):
+        self.runs = 0              # Runs that received candidates
+        self.scans = 0             # Runs as the first stage (whole kb)
+        self.pass_rate: Optional[float] = None
+        self.ms_per_candidate: Optional[float] = None
+        self.time_ms: Optional[float] = None
+        self.candidates_in: Optional[float] = None
+        self.candidates_out: Optional[float] = None
+        self.skipped = 0
+
+    def observe(self, candidates_in: int, candidates_out: int, time_ms: float) -> None:
+        """Fold one stage run into the averages."""
+        self.time_ms = _ewma(self.time_ms, time_ms)
+        self.candidates_out = _ewma(self.candidates_out, candidates_out)
+        if candidates_in <= 0:
+            self.scans += 1
+            return
+        self.runs += 1
+        self.candidates_in = _ewma(self.candidates_in, candidates_in)
+        self.pass_rate = _ewma(self.pass_rate, min(candidates_out / candidates_in, 1.0))
+        self.ms_per_candidate = _ewma(self.ms_per_candidate, time_ms / candidates_in)
+
+    def rank(self) -> Optional[float]:
+        """Expected cost per candidate removed; None until enough runs are seen."""
+        if self.runs < MIN_OBSERVATIONS:
+            return None
+        return self.ms_per_candidate / max(1.0 - self.pass_rate, 1e-6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'scans': self.scans,
+            'skipped': self.skipped,
+            'pass_rate': _round(self.pass_rate, 4),
+            'ms_per_candidate': _round(self.ms_per_candidate, 6),
+            'time_ms': _round(self.time_ms, 2),
+            'candidates_in': _round(self.candidates_in, 1),
+            'candidates_out': _round(self.candidates_out, 1),
+            'rank': _round(self.rank(), 6),
+        }
+
+
+def _ewma(average: Optional[float], value: float) -> float:
+    return value if average is None else average + EWMA_ALPHA * (value - average)
+
+
+def _round(value: Optional[float], digits: int) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+class FilterStageStats:
+    """Thread-safe per-kb stage statistics shared by all executors in a process."""
+
+    def __init__(self, skip_pass_rate: float = FILTER_SKIP_PASS_RATE,
+                 explore_interval: int = FILTER_EXPLORE_INTERVAL):
+        self.skip_pass_rate = skip_pass_rate
+        self.explore_interval = explore_interval
+        self._stats: Dict[str, Dict[str, StageStats]] = {}
+        self._pipelines: Dict[str, int] = {}
+        self._orders: Dict[str, Tuple[List[str], List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kb_id: str, stage_metrics: Sequence[Dict[str, Any]],
+               skipped: Sequence[str] = ()) -> None:
+        """
+        Record one pipeline run.
+
+        Args:
+            kb_id: Knowledge base the pipeline ran against
+            stage_metrics: FilterPipelineExecutor.stage_metrics of the run
+            skipped: Filters the plan skipped in this run
+        """
+        with self._lock:
+            kb_stats = self._stats.setdefault(kb_id, {})
+            self._pipelines[kb_id] = self._pipelines.get(kb_id, 0) + 1
+            for metric in stage_metrics:
+                if metric.get('filter') == 'materialize':
+                    continue
+                stats = kb_stats.get(metric['filter'])
+                if stats is None:
+                    stats = kb_stats[metric['filter']] = StageStats()
+                stats.observe(metric.get('candidates_in', 0), metric.get('candidates_after', 0),
+                              metric.get('time_ms', 0.0))
+            for name in skipped:
+                stats = kb_stats.get(name)
+                if stats is not None:
+                    stats.skipped += 1
+
+    def plan_order(self, kb_id: str, filters: Sequence[Tuple[str, bool]],
+                   mode: str) -> Tuple[List[str], List[str]]:
+        """
+        Choose the order to run filters in.
+
+        Args:
+            kb_id: Knowledge base
+            filters: Configured (filter name, joins a fused database query)
+                pairs, in pipeline order
+            mode: 'configured', 'auto' or 'strict'
+
+        Returns:
+            (filter names in run order, filter names skipped)
+        """
+        names = [name for name, _ in filters]
+        if mode not in ('auto', 'strict') or len(filters) < 2:
+            return names, []
+
+        with self._lock:
+            kb_stats = self._stats.get(kb_id, {})
+            explore = self.explore_interval > 0 and self._pipelines.get(kb_id, 0) % self.explore_interval == 0
+
+            head = [names[0]]
+            fused = [name for name, fusable in filters[1:] if fusable] if filters[0][1] else []
+            rest = [name for name in names[1:] if name not in fused]
+
+            def rank(item):
+                position, name = item
+                stats = kb_stats.get(name)
+                value = stats.rank() if stats is not None else None
+                # Filters without enough statistics run last, in configured order
+                return (value is None, value if value is not None else position, position)
+
+            rest = [name for _, name in sorted(enumerate(rest), key=rank)]
+
+            skipped = []
+            if mode == 'auto' and not explore:
+                for name in rest:
+                    stats = kb_stats.get(name)
+                    if (stats is not None and stats.runs >= MIN_OBSERVATIONS
+                            and stats.pass_rate >= self.skip_pass_rate):
+                        skipped.append(name)
+
+            order = [name for name in head + fused + rest if name not in skipped]
+            if (order, skipped) != self._orders.get(kb_id) and (order != names or skipped):
+                logger.info(f"Filter order for kb '{kb_id}': {order} (configured {names}, skipped {skipped})")
+            self._orders[kb_id] = (order, skipped)
+            return order, skipped
+
+    def get_stats(self, kb_id: Optional[str] = None) -> Dict[str, Any]:
+        """Statistics per kb (or for one kb) for monitoring."""
+        with self._lock:
+            kb_ids = [kb_id] if kb_id is not None else list(self._stats)
+            return {
+                kb: {
+                    'pipelines': self._pipelines.get(kb, 0),
+                    'order': self._orders.get(kb, ([], []))[0],
+                    'skipped': self._orders.get(kb, ([], []))[1],
+                    'stages': {name: stats.to_dict() for name, stats in self._stats.get(kb, {}).items()},
+                }
+                for kb in kb_ids if kb in self._stats
+            }
+
+    def drop_kb(self, kb_id: str) -> None:
+        """Forget the statistics of a kb (e.g. after it is cleared)."""
+        with self._lock:
+            self._stats.pop(kb_id, None)
+            self._pipelines.pop(kb_id, None)
+            self._orders.pop(kb_id, None)
+
+
+# Global stage statistics instance
+_filter_stage_stats: Optional[FilterStageStats] = None
+_filter_stage_stats_lock = threading.Lock()
+
+
+def get_filter_stage_stats() -> FilterStageStats:
+    """Get or create the process-wide filter stage statistics."""
+    global _filter_stage_stats
+
+    if _filter_stage_stats is None:
+        with _filter_stage_stats_lock:
+            if _filter_stage_stats is None:
+                _filter_stage_stats = FilterStageStats()
+
+    return _filter_stage_stats
+
+
+def reset_filter_stage_stats(skip_pass_rate: float = FILTER_SKIP_PASS_RATE,
+                             explore_interval: int = FILTER_EXPLORE_INTERVAL) -> FilterStageStats:
+    """Replace the process-wide statistics (tests and benchmarks)."""
+    global _filter_stage_stats
+
+    with _filter_stage_stats_lock:
+        _filter_stage_stats = FilterStageStats(skip_pass_rate, explore_interval)
+    return _filter_stage_stats
@@ -0,0 +1,288 @@
+"""
+Per-session STM sketches maintained incrementally across observations.
+
+The filter stages derive everything they need from the STM: its length,
+its token set and, for MinHash, a signature over the tokens plus the LSH
+band hashes of that signature. Rebuilt per prediction, the signature costs
+one hash and num_perm permutations per token, although between two
+predictions the STM usually changed by one appended event (and, in ROLLING
+mode, one event rolled off the front).
+
+StmSketch keeps those values up to date event by event:
+
+- length and a token -> occurrence counter
+- per num_perm, each present token's permuted hash vector (hashed once, when
+  the token enters the STM) and the signature, their element-wise minimum.
+  A new token is merged with one minimum. A token leaving the STM only
+  forces a recomputation, over the cached vectors, when it held one of the
+  signature's minima.
+
+The vectors come from datasketch's own MinHash.update and the signature is
+the minimum over the same token set, so signatures and LSH bands are
+identical to MinHashFilter's batch computation.
+
+Sessions pass their STM statelessly, so StmSketchRegistry keeps one sketch
+per (kb_id, session_id) and brings it in line with the STM handed to each
+prediction: events dropped from the front and appended at the end are
+applied incrementally, anything else (e.g. the STM cleared after learning)
+re-counts the new STM, reusing the vectors of tokens still present.
+
+Configuration:
+    KATO_STM_SKETCHES             maintain sketches for predictions (default true)
+    KATO_STM_SKETCH_MAX_SESSIONS  sketches kept per process (default 10000)
+"""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+from os import environ
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+from datasketch import MinHash
+
+from kato.storage.clickhouse_writer import _MINHASH_HASHFUNC
+
+logger = logging.getLogger('kato.filters.stm_sketch')
+
+USE_STM_SKETCHES = environ.get('KATO_STM_SKETCHES', 'true').lower() == 'true'
+STM_SKETCH_MAX_SESSIONS = int(environ.get('KATO_STM_SKETCH_MAX_SESSIONS', '10000'))
+
+
+def new_minhash(num_perm: int) -> MinHash:
+    """Empty MinHash with the hash function pattern signatures are written with."""
+    if _MINHASH_HASHFUNC:
+        return MinHash(num_perm=num_perm, hashfunc=_MINHASH_HASHFUNC)
+    return MinHash(num_perm=num_perm)
+
+
+def band_hashes(signature: Sequence[Any], bands: int, rows: int) -> List[int]:
+    """Band hashes of a signature, as MinHashFilter computes them."""
+    return [hash(tuple(signature[i * rows:(i + 1) * rows])) for i in range(bands)]
+
+
+class _Signature:
+    """Token vectors and their running minimum for one num_perm."""
+
+    __slots__ = ('template', 'empty', 'scratch', 'vectors', 'values', 'stale')
+
+    def __init__(self, num_perm: int, tokens: Sequence[str]):
+        self.template = new_minhash(num_perm)
+        self.empty = self.template.hashvalues.copy()
+        # Reused to hash one token at a time (MinHash.copy() costs more than the update)
+        self.scratch = self.template.copy()
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.values = self.empty.copy()
+        self.stale = False
+        for token in tokens:
+            self.add(token)
+
+    def vector(self, token: str) -> np.ndarray:
+        self.scratch.hashvalues = self.empty.copy()
+        self.scratch.update(token.encode('utf-8'))
+        return self.scratch.hashvalues
+
+    def add(self, token: str) -> None:
+        vector = self.vectors[token] = self.vector(token)
+        if not self.stale:
+            np.minimum(self.values, vector, out=self.values)
+
+    def discard(self, token: str) -> None:
+        vector = self.vectors.pop(token)
+        # Only a token holding a minimum changes the signature
+        if not self.stale and np.any(vector == self.values):
+            self.stale = True
+
+    def signature(self) -> np.ndarray:
+        if self.stale:
+            values = self.empty.copy()
+            for vector in self.vectors.values():
+                np.minimum(values, vector, out=values)
+            self.values = values
+            self.stale = False
+        return self.values
+
+
+class StmSketch:
+    """
+    Length, token set and MinHash signatures of one STM, updated per event.
+
+    Attributes:
+        events: The STM events the sketch reflects
+        length: Number of tokens in the STM
+        counts: Token -> occurrences in the STM
+    """
+
+    def __init__(self, stm: Optional[Sequence[Sequence[str]]] = None):
+        self.events: deque = deque()
+        self.length = 0
+        self.counts: Dict[str, int] = {}
+        self._signatures: Dict[int, _Signature] = {}
+        self._tokens: Optional[FrozenSet[str]] = None
+        self._bands: Dict[Tuple[int, int, int], List[int]] = {}
+        self.lock = threading.Lock()
+        for event in stm or ():
+            self.append(event)
+
+    def append(self, event: Sequence[str]) -> None:
+        """Add an event at the end of the STM."""
+        self.events.append(list(event))
+        self.length += len(event)
+        for token in event:
+            count = self.counts.get(token, 0)
+            self.counts[token] = count + 1
+            if not count:
+                self._changed()
+                for signature in self._signatures.values():
+                    signature.add(token)
+
+    def popleft(self) -> List[str]:
+        """Remove the oldest event (ROLLING mode)."""
+        event = self.events.popleft()
+        self.length -= len(event)
+        for token in event:
+            count = self.counts[token] - 1
+            if count:
+                self.counts[token] = count
+            else:
+                del self.counts[token]
+                self._changed()
+                for signature in self._signatures.values():
+                    signature.discard(token)
+        return event
+
+    def sync(self, stm: Sequence[Sequence[str]]) -> None:
+        """
+        Bring the sketch in line with stm.
+
+        Applies the events dropped from the front and appended at the end
+        since the last sync; any other change re-counts stm, keeping the
+        cached vectors of tokens still present.
+        """
+        stm = list(stm)
+        old = list(self.events)
+        # Smallest number of leading events dropped such that the rest is a prefix of stm
+        dropped = next(d for d in range(len(old) + 1)
+                       if len(old) - d <= len(stm)
+                       and all(old[d + i] == stm[i] for i in range(len(old) - d)))
+        kept = len(old) - dropped
+
+        if old and not kept:
+            self._reset(stm)
+            return
+        for _ in range(dropped):
+            self.popleft()
+        for event in stm[kept:]:
+            self.append(event)
+
+    def _reset(self, stm: Sequence[Sequence[str]]) -> None:
+        self.events = deque(list(event) for event in stm)
+        self.length = sum(len(event) for event in stm)
+        counts: Dict[str, int] = {}
+        for event in stm:
+            for token in event:
+                counts[token] = counts.get(token, 0) + 1
+        self.counts = counts
+        self._changed()
+        for signature in self._signatures.values():
+            cached = signature.vectors
+            signature.vectors = {t: cached[t] if t in cached else signature.vector(t) for t in counts}
+            signature.stale = True
+
+    def _changed(self) -> None:
+        self._tokens = None
+        self._bands.clear()
+
+    @property
+    def tokens(self) -> FrozenSet[str]:
+        """Distinct tokens of the STM."""
+        if self._tokens is None:
+            self._tokens = frozenset(self.counts)
+        return self._tokens
+
+    def minhash(self, num_perm: int) -> MinHash:
+        """MinHash of the token set, equal to updating an empty MinHash with every token."""
+        signature = self._signature(num_perm)
+        minhash = signature.template.copy()
+        minhash.hashvalues = signature.signature().copy()
+        return minhash
+
+    def lsh_bands(self, num_perm: int, bands: int, rows: int) -> List[int]:
+        """LSH band hashes of minhash(num_perm)."""
+        key = (num_perm, bands, rows)
+        cached = self._bands.get(key)
+        if cached is None:
+            cached = self._bands[key] = band_hashes(self._signature(num_perm).signature(), bands, rows)
+        return list(cached)
+
+    def _signature(self, num_perm: int) -> _Signature:
+        signature = self._signatures.get(num_perm)
+        if signature is None:
+            signature = self._signatures[num_perm] = _Signature(num_perm, list(self.counts))
+        return signature
+
+
+class StmSketchRegistry:
+    """Process-wide, LRU-bounded STM sketches per (kb_id, session_id)."""
+
+    def __init__(self, max_sessions: int = STM_SKETCH_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sketches: "OrderedDict[Tuple[str, str], StmSketch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sync(self, kb_id: str, session_id: str, stm: Sequence[Sequence[str]]) -> StmSketch:
+        """
+        The session's sketch, updated to stm.
+
+        Args:
+            kb_id: Knowledge base the session predicts against
+            session_id: Session identifier
+            stm: The session's current STM events
+
+        Returns:
+            Sketch of stm; hold sketch.lock while reading it if the session
+            can predict concurrently
+        """
+        key = (kb_id, session_id)
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                self.misses += 1
+                sketch = self._sketches[key] = StmSketch()
+                while len(self._sketches) > self.max_sessions:
+                    self._sketches.popitem(last=False)
+            else:
+                self.hits += 1
+                self._sketches.move_to_end(key)
+        with sketch.lock:
+            sketch.sync(stm)
+        return sketch
+
+    def discard(self, kb_id: str, session_id: str) -> None:
+        """Forget a session's sketch (e.g. when the session is deleted)."""
+        with self._lock:
+            self._sketches.pop((kb_id, session_id), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'sessions': len(self._sketches), 'max_sessions': self.max_sessions,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+# Global registry instance
+_stm_sketches: Optional[StmSketchRegistry] = None
+_stm_sketches_lock = threading.Lock()
+
+
+def get_stm_sketches() -> StmSketchRegistry:
+    """Get or create the process-wide STM sketch registry."""
+    global _stm_sketches
+
+    if _stm_sketches is None:
+        with _stm_sketches_lock:
+            if _stm_sketches is None:
+                _stm_sketches = StmSketchRegistry()
+
+    return _stm_sketches
@@ -0,0 +1,234 @@
+"""
+Single-pass alignment of a pattern against a state.
+
+InformationExtractor used to align a candidate twice: SequenceMatcher's
+matching blocks for the matches and the past/present split, then a second
+SequenceMatcher over present whose compare() delta lines ("- x" / "+ x")
+were parsed back into missing and extras.
+
+AlignmentEngine computes the matching blocks once, exactly as
+kato.informatics.extractor.SequenceMatcher does (same longest-match
+tie-breaking and block collapsing), and reads everything else off them as
+index ranges:
+
+- similarity: SequenceMatcher.ratio() of the pair
+- past / present / future: pattern ranges before, spanning and after the
+  matching blocks
+- missing: pattern ranges inside present not covered by a block
+- extras: state ranges not covered by a block
+
+Matching present against the state again picks the same blocks (present
+spans all of them, and the longest-match recursion restricted to that span
+makes the same choices), so missing and extras equal the "- " and "+ "
+lines of compare() over present.
+
+The engine indexes the state once (symbol -> positions) and can align any
+number of patterns against it. Elements only need to be hashable, so
+integer-encoded sequences (kato.searches.int_matcher) use it too.
+"""
+
+from typing import Any, Hashable, Sequence
+
+__all__ = ['Alignment', 'AlignmentEngine', 'matching_blocks']
+
+Block = tuple[int, int, int]
+Range = tuple[int, int]
+
+
+def matching_blocks(a: Sequence[Hashable], alo: int, ahi: int, lb: int,
+                    b2j: dict[Any, list[int]]) -> list[Block]:
+    """
+    Matching blocks of a[alo:ahi] against b, as SequenceMatcher computes them.
+
+    Block coordinates in a are absolute (not relative to alo). Like
+    SequenceMatcher.get_matching_blocks, adjacent blocks are collapsed and the
+    list ends with the dummy (ahi, lb, 0).
+
+    Args:
+        a: Sequence to align (the pattern)
+        alo: Start of the aligned range in a
+        ahi: End of the aligned range in a
+        lb: Length of b (the state)
+        b2j: b's symbol -> increasing positions index
+
+    Returns:
+        List of (i, j, size) triples
+    """
+    queue = [(alo, ahi, 0, lb)]
+    blocks = []
+    nothing: list[int] = []
+
+    while queue:
+        qalo, qahi, qblo, qbhi = queue.pop()
+
+        # SequenceMatcher.find_longest_match
+        besti, bestj, bestsize = qalo, qblo, 0
+        j2len: dict[int, int] = {}
+        for i in range(qalo, qahi):
+            j2lenget = j2len.get
+            newj2len: dict[int, int] = {}
+            for j in b2j.get(a[i], nothing):
+                if j < qblo:
+                    continue
+                if j >= qbhi:
+                    break
+                k = newj2len[j] = j2lenget(j - 1, 0) + 1
+                if k > bestsize:
+                    besti, bestj, bestsize = i - k + 1, j - k + 1, k
+            j2len = newj2len
+
+        if bestsize:
+            blocks.append((besti, bestj, bestsize))
+            if qalo < besti and qblo < bestj:
+                queue.append((qalo, besti, qblo, bestj))
+            if besti + bestsize < qahi and bestj + bestsize < qbhi:
+                queue.append((besti + bestsize, qahi, bestj + bestsize, qbhi))
+
+    blocks.sort()
+
+    i1 = j1 = k1 = 0
+    non_adjacent = []
+    for i2, j2, k2 in blocks:
+        if i1 + k1 == i2 and j1 + k1 == j2:
+            k1 += k2
+        else:
+            if k1:
+                non_adjacent.append((i1, j1, k1))
+            i1, j1, k1 = i2, j2, k2
+    if k1:
+        non_adjacent.append((i1, j1, k1))
+
+    non_adjacent.append((ahi, lb, 0))
+    return non_adjacent
+
+
+def _flatten(sequence: Sequence[Any], ranges: list[Range]) -> list[Any]:
+    out: list[Any] = []
+    for lo, hi in ranges:
+        out.extend(sequence[lo:hi])
+    return out
+
+
+class Alignment:
+    """
+    Matching blocks of one pattern against the state, with derived index ranges.
+
+    Attributes:
+        blocks: (i, j, size) matching blocks, without SequenceMatcher's dummy
+            terminator
+        pattern_length: Length of the aligned pattern
+        state_length: Length of the state
+        present: (lo, hi) pattern range spanning all blocks; the whole
+            pattern when nothing matches
+    """
+
+    __slots__ = ('blocks', 'pattern_length', 'state_length', 'present')
+
+    def __init__(self, blocks: list[Block], pattern_length: int, state_length: int) -> None:
+        self.blocks = blocks
+        self.pattern_length = pattern_length
+        self.state_length = state_length
+        if blocks:
+            i1, _, n1 = blocks[-1]
+            self.present = (blocks[0][0], i1 + n1)
+        else:
+            self.present = (0, pattern_length)
+
+    @property
+    def number_of_blocks(self) -> int:
+        return len(self.blocks)
+
+    @property
+    def matches(self) -> int:
+        """Number of matched symbols."""
+        return sum(n for _, _, n in self.blocks)
+
+    @property
+    def similarity(self) -> float:
+        """SequenceMatcher.ratio() of the pair: 2 * matches / total length."""
+        total = self.pattern_length + self.state_length
+        return 2.0 * self.matches / total if total else 1.0
+
+    @property
+    def past(self) -> Range:
+        """Pattern range before the first block (empty when nothing matches)."""
+        return (0, self.present[0])
+
+    @property
+    def future(self) -> Range:
+        """Pattern range after the last block."""
+        return (self.present[1], self.pattern_length)
+
+    @property
+    def missing_ranges(self) -> list[Range]:
+        """Pattern ranges inside present that no block covers."""
+        lo, hi = self.present
+        if lo == hi:
+            return []
+        ranges = []
+        for i, _, n in self.blocks:
+            if lo < i:
+                ranges.append((lo, i))
+            lo = i + n
+        if lo < hi:
+            ranges.append((lo, hi))
+        return ranges
+
+    @property
+    def extras_ranges(self) -> list[Range]:
+        """State ranges that no block covers (none when present is empty)."""
+        if self.present[0] == self.present[1]:
+            return []
+        ranges = []
+        lo = 0
+        for _, j, n in self.blocks:
+            if lo < j:
+                ranges.append((lo, j))
+            lo = j + n
+        if lo < self.state_length:
+            ranges.append((lo, self.state_length))
+        return ranges
+
+    def matching_intersection(self, state: Sequence[Any]) -> list[Any]:
+        """Matched state symbols, in state order."""
+        return _flatten(state, [(j, j + n) for _, j, n in self.blocks])
+
+    def missing(self, pattern: Sequence[Any]) -> list[Any]:
+        """Unmatched pattern symbols in present, as compare()'s "- " lines."""
+        return _flatten(pattern, self.missing_ranges)
+
+    def extras(self, state: Sequence[Any]) -> list[Any]:
+        """Unmatched state symbols, as compare()'s "+ " lines."""
+        return _flatten(state, self.extras_ranges)
+
+
+class AlignmentEngine:
+    """
+    Aligns patterns against one state, indexed once.
+
+    Attributes:
+        state: The state sequence
+        b2j: State symbol -> increasing positions
+    """
+
+    __slots__ = ('state', 'b2j')
+
+    def __init__(self, state: Sequence[Hashable]) -> None:
+        self.state = state
+        self.b2j: dict[Any, list[int]] = {}
+        for j, symbol in enumerate(state):
+            self.b2j.setdefault(symbol, []).append(j)
+
+    def align(self, pattern: Sequence[Hashable]) -> Alignment:
+        """
+        Align a pattern against the state.
+
+        Args:
+            pattern: Pattern sequence, in the same symbol space as the state
+
+        Returns:
+            Alignment of the pair
+        """
+        blocks = matching_blocks(pattern, 0, len(pattern), len(self.state), self.b2j)
+        blocks.pop()
+        return Alignment(blocks, len(pattern), len(self.state))
@@ -1,13 +1,46 @@
 import logging
 from collections import Counter
 from itertools import chain
+from os import environ
 
 from kato.config.settings import get_settings
 from kato.informatics.metrics import average_emotives
+from kato.storage.learn_script import USE_SINGLE_ROUND_TRIP_LEARN
 
 logger = logging.getLogger('kato.informatics.knowledge-base')
 # Configure logging lazily
 
+# Unique patterns per Redis pipeline round of a bulk learn
+BULK_LEARN_CHUNK_SIZE = int(environ.get('KATO_BULK_LEARN_CHUNK_SIZE', '5000'))
+
+
+def _append_emotives(current, emotives, persistence):
+    """Append a learn's emotives to a stored rolling window and trim it to persistence."""
+    if not isinstance(current, list):
+        current = []  # Reset if corrupted
+
+    if isinstance(emotives, list):
+        current.extend(emotives)
+    else:
+        logger.warning(f"Received non-list emotives during re-learning: {type(emotives)}")
+        current.append(emotives)
+
+    # Enforce PERSISTENCE rolling window
+    if len(current) > persistence:
+        current = current[-persistence:]
+    return current
+
+
+def _merge_metadata(current, metadata):
+    """Merge a learn's metadata into stored metadata as sorted unique values per key."""
+    merged_metadata = {}
+    all_keys = set(current.keys()) | set(metadata.keys())
+    for key in all_keys:
+        existing_values = set(current.get(key, []))
+        new_values = set(metadata.get(key, []))
+        merged_metadata[key] = sorted(list(existing_values | new_values))
+    return merged_metadata
+
 
 class KnowledgeBase(dict):
     "KnowledgeBase database that can be combined with other KBs.  Currently used for ActionsKB."
@@ -65,6 +98,7 @@ class SuperKnowledgeBase:
             from kato.storage.connection_manager import get_clickhouse_client, get_redis_client
             from kato.storage.clickhouse_writer import ClickHouseWriter
             from kato.storage.redis_writer import RedisWriter
+            from kato.storage.token_dictionary import USE_TOKEN_IDS, get_token_dictionary
 
             clickhouse_client = get_clickhouse_client()
             redis_client = get_redis_client()
@@ -82,7 +116,9 @@ class SuperKnowledgeBase:
                 )
 
             # Initialize hybrid storage writers
-            self.clickhouse_writer = ClickHouseWriter(self.id, clickhouse_client)
+            token_dictionary = get_token_dictionary(self.id, redis_client) if USE_TOKEN_IDS else None
+            self.clickhouse_writer = ClickHouseWriter(self.id, clickhouse_client,
+                                                      token_dictionary=token_dictionary)
             self.redis_writer = RedisWriter(self.id, redis_client)
 
             # Set emotives tracking and observation counts
@@ -355,6 +391,40 @@ class SuperKnowledgeBase:
                 averaged_emotives=averaged
             )
 
+    def _learn_pattern_single_round_trip(self, pattern_object, emotives, metadata):
+        """
+        learnPattern with the Redis side in one atomic script call.
+
+        The script makes the same SETNX claim as the step-by-step path; only
+        its winner writes the ClickHouse row, after the Redis state is in place.
+        A re-learn's metadata is merged afterwards with _merge_metadata, under
+        WATCH (one more round trip, only when metadata is given).
+        """
+        all_symbols = list(chain(*pattern_object.pattern_data))
+        symbol_counts = Counter(all_symbols)
+        averaged = {}
+        if emotives:
+            averaged = average_emotives(emotives if isinstance(emotives, list) else [emotives])
+
+        is_new = self.redis_writer.learn_pattern(
+            pattern_name=pattern_object.name,
+            symbol_counts=symbol_counts,
+            total_symbol_count=len(all_symbols),
+            emotives=emotives,
+            metadata=metadata,
+            persistence=self.persistence,
+            averaged_emotives=averaged
+        )
+        if is_new:
+            self.clickhouse_writer.write_pattern(pattern_object)
+            logger.info(f"[HYBRID] Successfully learned new pattern {pattern_object.name} to ClickHouse + Redis")
+        else:
+            if metadata:
+                self.redis_writer.update_metadata(
+                    pattern_object.name, lambda current: _merge_metadata(current, metadata))
+            logger.debug(f"[HYBRID] Re-learned pattern {pattern_object.name} (frequency incremented)")
+        return is_new
+
     def learnPattern(self, pattern_object, emotives=None, metadata=None):
         """
         Core machine learning function.
@@ -391,6 +461,9 @@ class SuperKnowledgeBase:
                             self.emotives_available.update(emotive_dict.keys())
                 # No filtering needed - store raw list as rolling window
 
+            if USE_SINGLE_ROUND_TRIP_LEARN:
+                return self._learn_pattern_single_round_trip(pattern_object, emotives, metadata)
+
             # Atomic "is this a brand-new pattern?" claim via Redis SETNX.
             # Only one worker can succeed for a given pattern hash; all others
             # see the key already exists and take the re-learn branch.
@@ -451,30 +524,12 @@ class SuperKnowledgeBase:
                 # Process emotives: append to rolling window list
                 updated_emotives = existing_meta.get('emotives', [])
                 if emotives:
-                    if not isinstance(updated_emotives, list):
-                        updated_emotives = []  # Reset if corrupted
-
-                    if isinstance(emotives, list):
-                        updated_emotives.extend(emotives)
-                    else:
-                        logger.warning(f"Received non-list emotives during re-learning: {type(emotives)}")
-                        updated_emotives.append(emotives)
-
-                    # Enforce PERSISTENCE rolling window
-                    if len(updated_emotives) > self.persistence:
-                        updated_emotives = updated_emotives[-self.persistence:]
-                        logger.debug(f"Trimmed emotives to {self.persistence} entries for pattern {pattern_object.name}")
+                    updated_emotives = _append_emotives(updated_emotives, emotives, self.persistence)
 
                 # Process metadata: accumulate unique values
                 updated_metadata = existing_meta.get('metadata', {})
                 if metadata:
-                    merged_metadata = {}
-                    all_keys = set(updated_metadata.keys()) | set(metadata.keys())
-                    for key in all_keys:
-                        existing_values = set(updated_metadata.get(key, []))
-                        new_values = set(metadata.get(key, []))
-                        merged_metadata[key] = sorted(list(existing_values | new_values))
-                    updated_metadata = merged_metadata
+                    updated_metadata = _merge_metadata(updated_metadata, metadata)
 
                 # Write emotives + metadata. Frequency=None: INCR above already
                 # advanced it; SETting here would clobber concurrent INCRs.
@@ -504,6 +559,120 @@ class SuperKnowledgeBase:
             logger.error(f"[HYBRID] Exception in learnPattern: {pattern_object.name}, {e}")
             raise Exception(f"\nException in learnPattern: {pattern_object.name}, \n{e}")
 
+    def learnPatterns(self, items):
+        """
+        Learn many patterns at once (bulk import).
+
+        Equivalent to calling learnPattern for each item in order, but
+        duplicates are folded together in-process and storage is written in
+        chunks of BULK_LEARN_CHUNK_SIZE unique patterns: pipelined SETNX
+        claims and frequency INCRBYs, one metadata read and write pipeline,
+        one symbol stats MULTI, one affinity pipeline, and ClickHouse rows
+        for new patterns in large synchronous INSERT blocks.
+
+        Args:
+            items: List of (pattern_object, emotives, metadata) tuples
+
+        Returns:
+            One flag per item: True if that item created its pattern (later
+            duplicates in the same call report False, as re-learns)
+        """
+        statuses = [False] * len(items)
+        groups = {}
+        for index, (pattern_object, emotives, metadata) in enumerate(items):
+            group = groups.get(pattern_object.name)
+            if group is None:
+                group = groups[pattern_object.name] = {'pattern': pattern_object, 'first': index, 'learns': []}
+            group['learns'].append((emotives or [], metadata or {}))
+            if isinstance(emotives, list):
+                for emotive_dict in emotives:
+                    if isinstance(emotive_dict, dict):
+                        self.emotives_available.update(emotive_dict.keys())
+
+        groups = list(groups.values())
+        try:
+            for start in range(0, len(groups), BULK_LEARN_CHUNK_SIZE):
+                chunk = groups[start:start + BULK_LEARN_CHUNK_SIZE]
+                claimed = self.redis_writer.claim_patterns(
+                    [(g['pattern'].name, len(g['learns'])) for g in chunk])
+                self._write_bulk_chunk(chunk, claimed)
+                for group, is_new in zip(chunk, claimed):
+                    statuses[group['first']] = is_new
+            logger.info(f"[HYBRID] Bulk learned {len(items)} patterns ({len(groups)} unique, "
+                        f"{sum(statuses)} new) to ClickHouse + Redis")
+            return statuses
+
+        except Exception as e:
+            logger.error(f"[HYBRID] Exception in learnPatterns: {e}")
+            raise Exception(f"\nException in learnPatterns: \n{e}")
+
+    def _write_bulk_chunk(self, chunk, claimed):
+        """Write metadata, symbol stats, affinity and new ClickHouse rows for claimed groups."""
+        # Replay each group's learns over its stored (re-learn) or first (new) state
+        existing = self.redis_writer.get_metadata_batch([
+            g['pattern'].name for g, is_new in zip(chunk, claimed)
+            if not is_new and any(e or m for e, m in g['learns'])
+        ])
+        documents = {}
+        for group, is_new in zip(chunk, claimed):
+            learns = group['learns']
+            if is_new:
+                emotives, metadata = learns[0]
+                if isinstance(emotives, list) and len(emotives) > self.persistence:
+                    emotives = emotives[-self.persistence:]
+                updated = [list(emotives) if isinstance(emotives, list) else emotives, metadata]
+                learns = learns[1:]
+            else:
+                stored = existing.get(group['pattern'].name, {})
+                updated = [stored.get('emotives', []), stored.get('metadata', {})]
+                learns = [(e, m) for e, m in learns if e or m]
+                if not learns:
+                    continue
+            for emotives, metadata in learns:
+                if emotives:
+                    updated[0] = _append_emotives(updated[0], emotives, self.persistence)
+                if metadata:
+                    updated[1] = _merge_metadata(updated[1], metadata)
+            documents[group['pattern'].name] = tuple(updated)
+        self.redis_writer.write_metadata_batch(documents)
+
+        # Sum symbol statistics and affinity over every learn in the chunk
+        symbol_counts, pmf_counts = Counter(), Counter()
+        symbol_patterns = {}
+        affinity = {}
+        total_symbol_count = 0
+        for group, is_new in zip(chunk, claimed):
+            pattern_object = group['pattern']
+            counts = Counter(chain(*pattern_object.pattern_data))
+            learns = len(group['learns'])
+            total_symbol_count += sum(counts.values()) * learns
+            for symbol, count in counts.items():
+                symbol_counts[symbol] += count * learns
+                symbol_patterns.setdefault(symbol, []).append(pattern_object.name)
+                if is_new:
+                    pmf_counts[symbol] += 1
+            for emotives, _ in group['learns']:
+                if not emotives:
+                    continue
+                averaged = average_emotives(emotives if isinstance(emotives, list) else [emotives])
+                for symbol in counts:
+                    sums = affinity.setdefault(symbol, {})
+                    for emotive_name, value in averaged.items():
+                        sums[emotive_name] = sums.get(emotive_name, 0.0) + value
+
+        self.redis_writer.bulk_update_symbol_stats(
+            symbol_counts=dict(symbol_counts),
+            pmf_counts=dict(pmf_counts),
+            symbol_patterns=symbol_patterns,
+            total_symbol_count=total_symbol_count,
+            new_pattern_count=sum(claimed)
+        )
+        self.redis_writer.batch_add_symbol_affinity(affinity)
+
+        new_patterns = [g['pattern'] for g, is_new in zip(chunk, claimed) if is_new]
+        if new_patterns:
+            self.clickhouse_writer.write_patterns_bulk(new_patterns)
+
     def getPattern(self, pattern, by="name"):
         """
         Core machine learning function.
@@ -0,0 +1,308 @@
+"""
+Columnar prediction metrics for KATO.
+
+Computes the per-candidate metrics of PatternProcessor.predictPattern
+(cosine distance, itfdf_similarity, confluence, entropy fallbacks, TF-IDF)
+in one NumPy pass over all candidates instead of a Python loop per
+candidate. Symbols are encoded to integer ids once; per-symbol quantities
+(probability, log probability, IDF) live in arrays indexed by id.
+
+Results are numerically identical to the per-candidate formulas:
+- transcendental functions (log2, log, log10, pow) are evaluated with the
+  math module once per distinct symbol or (count, length) pair; NumPy's
+  SIMD implementations may differ in the last ulp
+- per-candidate sums are accumulated column by column over zero-padded
+  matrices, so each candidate is summed in the same order as the scalar
+  loop (adding or subtracting the 0.0 padding is exact)
+"""
+
+import logging
+import sys
+from collections import Counter
+from itertools import chain, count
+from math import log, log2, log10
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger('kato.informatics.prediction_metrics')
+
+# Probability conditionalProbability() assumes for unknown or zero-probability symbols
+_MISSING_SYMBOL_PROBABILITY = 1e-10
+
+
+def _ragged(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Left-aligned (len(lengths) x max length) matrix of concatenated rows, zero-padded."""
+    width = int(lengths.max()) if len(lengths) else 0
+    matrix = np.zeros((len(lengths), width), dtype=values.dtype)
+    if width:
+        matrix[np.arange(width) < lengths[:, None]] = values
+    return matrix
+
+
+def _left_sums(terms: np.ndarray) -> np.ndarray:
+    """Row sums ((t0 + t1) + t2) + ..., i.e. reduce(add, row)."""
+    if terms.shape[1] == 0:
+        return np.zeros(terms.shape[0])
+    total = terms[:, 0].copy()
+    for j in range(1, terms.shape[1]):
+        total += terms[:, j]
+    return total
+
+
+def _negated_sums(terms: np.ndarray) -> np.ndarray:
+    """((0.0 - t0) - t1) - ..., the `acc -= term` loop."""
+    total = np.zeros(terms.shape[0])
+    for j in range(terms.shape[1]):
+        total -= terms[:, j]
+    return total
+
+
+def _builtin_sums(terms: np.ndarray) -> np.ndarray:
+    """Row sums rounded as builtin sum() rounds them.
+
+    sum() adds floats left to right; from Python 3.12 on it uses Neumaier
+    compensated summation.
+    """
+    if sys.version_info < (3, 12) or terms.shape[1] < 2:
+        return _left_sums(terms)
+    total = terms[:, 0].copy()
+    compensation = np.zeros(terms.shape[0])
+    for j in range(1, terms.shape[1]):
+        x = terms[:, j]
+        t = total + x
+        compensation += np.where(np.abs(total) >= np.abs(x), (total - t) + x, (x - t) + total)
+        total = t
+    return np.where((compensation != 0) & np.isfinite(compensation), total + compensation, total)
+
+
+def prediction_metrics(present_lists: list[list[str]],
+                       frequencies: list[int],
+                       state: list[str],
+                       precomputed: list[Optional[dict[str, Any]]],
+                       symbol_probabilities: dict[str, float],
+                       total_pattern_frequencies: int,
+                       total_ensemble_pattern_frequencies: int,
+                       total_unique_patterns: int,
+                       total_symbols: int) -> dict[str, list[float]]:
+    """
+    Compute itfdf_similarity, confluence, entropies and TF-IDF for all candidates.
+
+    Args:
+        present_lists: Flattened present symbols per candidate
+        frequencies: Pattern frequency per candidate
+        state: Flattened STM state
+        precomputed: Pre-computed pattern metrics per candidate (entropy,
+            normalized_entropy, global_normalized_entropy, tf_vector) or None
+        symbol_probabilities: Probability that a pattern contains each symbol
+        total_pattern_frequencies: Sum of all pattern frequencies in the kb
+        total_ensemble_pattern_frequencies: Sum of candidate frequencies
+        total_unique_patterns: Number of patterns in the kb
+        total_symbols: Number of symbols in the kb
+
+    Returns:
+        Dict of per-candidate lists: entropy, normalized_entropy,
+        global_normalized_entropy, itfdf_similarity, confluence, tfidf_score
+    """
+    return _CandidateColumns(present_lists, state, precomputed, symbol_probabilities).metrics(
+        frequencies, total_pattern_frequencies, total_ensemble_pattern_frequencies,
+        total_unique_patterns, total_symbols)
+
+
+class _CandidateColumns:
+    """Integer-encoded present symbols of all candidates plus per-symbol arrays."""
+
+    def __init__(self, present_lists: list[list[str]], state: list[str],
+                 precomputed: list[Optional[dict[str, Any]]],
+                 symbol_probabilities: dict[str, float]):
+        self.present_lists = present_lists
+        self.state = state
+        self.precomputed = precomputed
+        self.symbol_probabilities = symbol_probabilities
+        self.n = len(present_lists)
+
+        # Cosine vocabulary (sorted present + state symbols) gets ids 0..D-1;
+        # symbols only found in pre-computed TF vectors are appended after
+        vocabulary = sorted(set(chain.from_iterable(present_lists)).union(state))
+        self.width = len(vocabulary)
+        self.index = dict(zip(vocabulary, count()))
+        tf_vectors = [p['tf_vector'] for p in precomputed if p and p['tf_vector']]
+        extra = set(chain.from_iterable(tf_vectors)).difference(self.index)
+        self.index.update(zip(extra, count(self.width)))
+        self.symbols = vocabulary + list(extra)
+
+        self.lengths = np.fromiter(map(len, present_lists), dtype=np.intp, count=self.n)
+        self.ids = np.fromiter(map(self.index.__getitem__, chain.from_iterable(present_lists)),
+                               dtype=np.intp, count=int(self.lengths.sum()))
+        self.rows = np.repeat(np.arange(self.n), self.lengths)
+        self.probabilities = np.array([symbol_probabilities.get(s, 0) for s in self.symbols], dtype=float)
+
+    def metrics(self, frequencies: list[int], total_pattern_frequencies: int,
+                total_ensemble_pattern_frequencies: int, total_unique_patterns: int,
+                total_symbols: int) -> dict[str, list[float]]:
+        freqs = np.array(frequencies, dtype=float)
+
+        if total_ensemble_pattern_frequencies > 0:
+            itfdf = 1 - (self.cosine_distances() * freqs / total_ensemble_pattern_frequencies)
+        else:
+            itfdf = np.zeros(self.n)
+
+        if total_pattern_frequencies > 0:
+            p_e_h = freqs / total_pattern_frequencies
+        else:
+            p_e_h = np.zeros(self.n)
+        confluence = np.where(self.lengths > 0, p_e_h * (1 - self.conditional_probabilities()), 0.0)
+
+        fallback = np.array([not p for p in self.precomputed], dtype=bool) & (self.lengths > 0)
+        entropy, normalized, global_normalized = self.entropies(fallback, total_symbols)
+        tfidf = self.tfidf_scores(fallback, total_unique_patterns)
+
+        return {
+            'entropy': entropy,
+            'normalized_entropy': normalized,
+            'global_normalized_entropy': global_normalized,
+            'itfdf_similarity': itfdf.tolist(),
+            'confluence': confluence.tolist(),
+            'tfidf_score': tfidf,
+        }
+
+    def cosine_distances(self) -> np.ndarray:
+        """1 - cosine similarity of probability-weighted symbol counts (1.0 for a zero state)."""
+        probabilities = self.probabilities[:self.width]
+        state_counts = np.zeros(self.width)
+        for symbol, n in Counter(self.state).items():
+            state_counts[self.index[symbol]] = n
+        state_vec = probabilities * state_counts
+        state_norm = np.linalg.norm(state_vec)
+        if not state_norm > 0:
+            return np.ones(self.n)
+
+        counts = np.bincount(self.rows * self.width + self.ids, minlength=self.n * self.width)
+        pattern_matrix = counts.reshape(self.n, self.width) * probabilities
+        dots = pattern_matrix @ state_vec
+        denom = np.linalg.norm(pattern_matrix, axis=1) * state_norm
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosine_sims = np.where(denom > 0, dots / denom, 0.0)
+        return 1.0 - cosine_sims
+
+    def conditional_probabilities(self) -> np.ndarray:
+        """conditionalProbability(present) per candidate: 10 ** sum of log10 probabilities."""
+        log_probabilities = np.zeros(len(self.symbols))
+        for symbol_id in np.unique(self.ids).tolist():
+            probability = self.symbol_probabilities.get(self.symbols[symbol_id], _MISSING_SYMBOL_PROBABILITY)
+            if not probability > 0:
+                probability = _MISSING_SYMBOL_PROBABILITY
+            log_probabilities[symbol_id] = log10(probability)
+        log_sums = _left_sums(_ragged(log_probabilities[self.ids], self.lengths))
+        return np.array([10 ** s for s in log_sums.tolist()], dtype=float)
+
+    def _symbol_counts(self, fallback: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per fallback candidate: symbol ids and counts in first-occurrence (Counter) order."""
+        selected = fallback[self.rows]
+        vocabulary_size = len(self.symbols)
+        keys = self.rows[selected] * vocabulary_size + self.ids[selected]
+        unique_keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        rows, ids = np.divmod(unique_keys[order], vocabulary_size)
+        return rows, ids, counts[order]
+
+    def entropies(self, fallback: np.ndarray,
+                  total_symbols: int) -> tuple[list[float], list[float], list[float]]:
+        """Entropy, normalized and global normalized entropy; pre-computed where available."""
+        entropy, normalized, global_normalized = [0.0] * self.n, [0.0] * self.n, [0.0] * self.n
+        for i, precomp in enumerate(self.precomputed):
+            if precomp:
+                entropy[i] = precomp['entropy']
+                normalized[i] = precomp['normalized_entropy']
+                global_normalized[i] = precomp['global_normalized_entropy']
+        fallback_rows = np.flatnonzero(fallback)
+        if not len(fallback_rows):
+            return entropy, normalized, global_normalized
+
+        rows, _, counts = self._symbol_counts(fallback)
+        per_row = np.bincount(rows, minlength=self.n)[fallback_rows]
+        lengths = self.lengths[rows]
+
+        # Terms depend only on (count, length): evaluate each distinct pair once
+        radix = int(self.lengths.max()) + 1
+        pairs, inverse = np.unique(counts * radix + lengths, return_inverse=True)
+        entropy_table, normalized_table = [], []
+        for pair in pairs.tolist():
+            n, length = divmod(pair, radix)
+            p = n / length
+            entropy_table.append(p * log2(p))
+            normalized_table.append(p * log(p, total_symbols) if total_symbols > 1 else 0.0)
+        inverse = inverse.reshape(-1)
+        fallback_entropy = _negated_sums(_ragged(np.array(entropy_table)[inverse], per_row)).tolist()
+
+        if total_symbols > 1:
+            fallback_normalized = _negated_sums(_ragged(np.array(normalized_table)[inverse], per_row)).tolist()
+            # Global normalized entropy iterates set(pattern_symbols)
+            set_ids, set_lengths = self._set_ordered_ids(fallback_rows)
+            global_terms = np.zeros(len(self.symbols))
+            for symbol_id in np.unique(set_ids).tolist():
+                probability = self.symbol_probabilities.get(self.symbols[symbol_id], 0)
+                if probability > 0:
+                    global_terms[symbol_id] = probability * log(probability, total_symbols)
+            fallback_global = _negated_sums(_ragged(global_terms[set_ids], set_lengths)).tolist()
+        else:
+            fallback_normalized = fallback_global = [0.0] * len(fallback_rows)
+
+        for j, i in enumerate(fallback_rows.tolist()):
+            entropy[i] = fallback_entropy[j]
+            normalized[i] = fallback_normalized[j]
+            global_normalized[i] = fallback_global[j]
+        return entropy, normalized, global_normalized
+
+    def _set_ordered_ids(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Symbol ids of the given candidates in set(present) iteration order."""
+        sets = [set(self.present_lists[i]) for i in rows.tolist()]
+        lengths = np.fromiter(map(len, sets), dtype=np.intp, count=len(sets))
+        ids = np.fromiter(map(self.index.__getitem__, chain.from_iterable(sets)),
+                          dtype=np.intp, count=int(lengths.sum()))
+        return ids, lengths
+
+    def tfidf_scores(self, fallback: np.ndarray, total_unique_patterns: int) -> list[float]:
+        """Mean TF-IDF over each pattern's symbols (pre-computed TF vector or present symbols)."""
+        scores = [0.0] * self.n
+        if total_unique_patterns <= 0:
+            return scores
+
+        idf = np.zeros(len(self.symbols))
+        for symbol_id, symbol in enumerate(self.symbols):
+            if symbol in self.symbol_probabilities:
+                patterns_with_symbol = int(self.symbol_probabilities[symbol] * total_unique_patterns)
+                if patterns_with_symbol == 0:
+                    patterns_with_symbol = 1
+            else:
+                patterns_with_symbol = 1
+            idf[symbol_id] = log2(total_unique_patterns / patterns_with_symbol) + 1
+
+        # Pre-computed TF vectors, in stored order
+        precomputed_rows = [i for i, p in enumerate(self.precomputed) if p and p['tf_vector']]
+        if precomputed_rows:
+            tf_vectors = [self.precomputed[i]['tf_vector'] for i in precomputed_rows]
+            lengths = np.fromiter(map(len, tf_vectors), dtype=np.intp, count=len(tf_vectors))
+            ids = np.fromiter(map(self.index.__getitem__, chain.from_iterable(tf_vectors)),
+                              dtype=np.intp, count=int(lengths.sum()))
+            tfs = np.fromiter(chain.from_iterable(v.values() for v in tf_vectors),
+                              dtype=float, count=int(lengths.sum()))
+            means = (_builtin_sums(_ragged(tfs * idf[ids], lengths)) / lengths).tolist()
+            for i, mean in zip(precomputed_rows, means):
+                scores[i] = mean
+
+        # Runtime TF over set(present) for candidates without pre-computed metrics
+        fallback_rows = np.flatnonzero(fallback)
+        if len(fallback_rows):
+            rows, ids, counts = self._symbol_counts(fallback)
+            vocabulary_size = len(self.symbols)
+            count_keys = rows * vocabulary_size + ids
+            key_order = np.argsort(count_keys)
+            set_ids, set_lengths = self._set_ordered_ids(fallback_rows)
+            set_rows = np.repeat(fallback_rows, set_lengths)
+            positions = key_order[np.searchsorted(count_keys[key_order], set_rows * vocabulary_size + set_ids)]
+            tfs = counts[positions] / self.lengths[set_rows]
+            means = (_builtin_sums(_ragged(tfs * idf[set_ids], set_lengths)) / set_lengths).tolist()
+            for i, mean in zip(fallback_rows.tolist(), means):
+                scores[i] = mean
+        return scores
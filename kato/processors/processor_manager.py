@@ -304,19 +304,37 @@ class ProcessorManager:
             "processors": []
         }
 
+        pool_totals = {"size": 0, "hits": 0, "misses": 0}
         for processor_id, info in self.processors.items():
             idle_seconds = (now - info['last_accessed']).total_seconds()
+            pool_stats = self._searcher_pool_stats(info['processor'])
+            for key in pool_totals:
+                pool_totals[key] += pool_stats.get(key, 0)
             stats["processors"].append({
                 "processor_id": processor_id,
                 "node_id": info['node_id'],
                 "created_at": info['created_at'].isoformat(),
                 "last_accessed": info['last_accessed'].isoformat(),
                 "access_count": info['access_count'],
-                "idle_seconds": idle_seconds
+                "idle_seconds": idle_seconds,
+                "searcher_pool": pool_stats
             })
 
+        requests = pool_totals["hits"] + pool_totals["misses"]
+        stats["searcher_pool"] = {
+            **pool_totals,
+            "reuse_rate": pool_totals["hits"] / requests if requests else 0.0
+        }
+
         return stats
 
+    @staticmethod
+    def _searcher_pool_stats(processor: Any) -> dict[str, Any]:
+        """Searcher pool metrics of a processor (empty if it has none)."""
+        pattern_processor = getattr(processor, 'pattern_processor', None)
+        pool = getattr(pattern_processor, 'searcher_pool', None)
+        return pool.get_stats() if pool is not None else {}
+
     def flush_all_pending_writes(self) -> int:
         """Flush all pending ClickHouse writes across all processors. Returns total rows flushed."""
         total = 0
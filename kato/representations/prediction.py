@@ -1,10 +1,122 @@
 from itertools import chain
 
+# Fields LeanPrediction answers by key, before materialization
+_LEAN_FIELDS = frozenset(('name', 'frequency', 'similarity', 'weighted_similarity', 'potential',
+                          'evidence', 'confidence', 'snr', 'fragmentation'))
+
+
+class LeanPrediction:
+    """
+    Scores and event bounds of a pattern match, without the dict view.
+
+    Takes the same arguments as Prediction and computes what pruning needs
+    (evidence, confidence, snr, fragmentation, similarity) plus the event
+    indices of past/present/future in the pattern. Event slices and the
+    event-aligned missing/extras are only built by materialize(), so
+    candidates pruned before the metrics loop never copy them.
+
+    Read access by key (pred['evidence'], pred.get('similarity')) covers the
+    score fields only.
+    """
+    __slots__ = ('pattern', 'matches', 'extras', 'anomalies', 'stm_events', 'similarity',
+                 'weighted_similarity', 'evidence', 'confidence', 'snr', 'fragmentation',
+                 'potential', 'present_start', 'present_end')
+
+    def __init__(self, _pattern, matching_intersection, past, present, missing, extras, similarity, number_of_blocks, anomalies=None, stm_events=None, weighted_similarity=None):
+        self.pattern = _pattern
+        self.matches = matching_intersection
+        self.extras = extras
+        self.anomalies = anomalies if anomalies else []
+        self.stm_events = stm_events
+        self.similarity = similarity
+        self.weighted_similarity = weighted_similarity
+        self.potential = float(0)
+        self.evidence = float(len(matching_intersection)/_pattern["length"]) if _pattern["length"] > 0 else 0.0
+        self.fragmentation = float(number_of_blocks - 1)
+        # Calculate SNR with division by zero protection
+        # Handle both event-structured and flat extras
+        if isinstance(extras, list) and extras and isinstance(extras[0], list):
+            total_extras = sum(len(event) for event in extras)
+        else:
+            total_extras = len(extras) if isinstance(extras, list) else 0
+
+        denominator = 2.0 * len(matching_intersection) + total_extras
+        if denominator > 0:
+            self.snr = float((2.0 * len(matching_intersection) - total_extras) / denominator)
+        else:
+            self.snr = float(0)  # Default to 0 when no matches or extras
+
+        # Events covering the extractor's flat past, then present
+        sequence = _pattern['pattern_data']
+        c1 = len(past)
+        c2 = 0
+        event_num = 0
+        while c2 < c1:
+            c2 += len(sequence[event_num])
+            event_num += 1
+
+        e_1 = event_num
+
+        c1 += len(present)
+        while c2 < c1:
+            c2 += len(sequence[event_num])
+            event_num += 1
+
+        ## This fixes the problem of some symbols from the tail-end of the last event getting put into the 'past' field instead of 'present'.
+        if e_1 > 0:
+            try:
+                if matching_intersection[0] in sequence[e_1 - 1]:
+                    e_1 -= 1
+            except Exception as e:
+                raise Exception("Error matching events in predictions! CODE-55 {}".format(e))
+
+        self.present_start = e_1
+        self.present_end = event_num
+
+        present_length = sum(len(sequence[i]) for i in range(e_1, event_num))
+        self.confidence = float(len(matching_intersection)/present_length) if present_length > 0 else 0.0
+
+    @property
+    def name(self):
+        return self.pattern['name']
+
+    @property
+    def frequency(self):
+        return self.pattern['frequency']
+
+    def __getitem__(self, key):
+        if key not in _LEAN_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in _LEAN_FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in _LEAN_FIELDS else default
+
+    def materialize(self):
+        """Build the full Prediction dict."""
+        return Prediction.from_lean(self)
+
 
 class Prediction(dict):
     "Pattern prediction."
     def __init__(self, _pattern, matching_intersection, past, present, missing, extras, similarity, number_of_blocks, anomalies=None, stm_events=None, weighted_similarity=None):
         super().__init__(self)
+        self._fill(LeanPrediction(_pattern, matching_intersection, past, present, missing, extras,
+                                  similarity, number_of_blocks, anomalies=anomalies,
+                                  stm_events=stm_events, weighted_similarity=weighted_similarity))
+
+    @classmethod
+    def from_lean(cls, lean):
+        prediction = cls.__new__(cls)
+        dict.__init__(prediction)
+        prediction._fill(lean)
+        return prediction
+
+    def _fill(self, lean):
+        _pattern = lean.pattern
         self['type'] = 'prototypical'
         self['name'] = _pattern['name']
         self['frequency'] = _pattern['frequency']
@@ -15,103 +127,71 @@ class Prediction(dict):
         else:
             self['emotives'] = {}
 
-        self['matches'] = matching_intersection
-        self['past'] = past
-        self['present'] = present
-        self['missing'] = missing
-        self['extras'] = extras
-        self['anomalies'] = anomalies if anomalies else []
-        self['potential'] = float(0)
-        self['evidence'] = float(len(self['matches'])/_pattern["length"]) if _pattern["length"] > 0 else 0.0
-        self['similarity'] = similarity
-        self['fragmentation'] = float(number_of_blocks - 1)
-        # Calculate SNR with division by zero protection
-        # Handle both event-structured and flat extras
-        if isinstance(self['extras'], list) and self['extras'] and isinstance(self['extras'][0], list):
-            total_extras = sum(len(event) for event in self['extras'])
-        else:
-            total_extras = len(self['extras']) if isinstance(self['extras'], list) else 0
-
-        denominator = 2.0 * len(self['matches']) + total_extras
-        if denominator > 0:
-            self['snr'] = float((2.0 * len(self['matches']) - total_extras) / denominator)
-        else:
-            self['snr'] = float(0)  # Default to 0 when no matches or extras
+        sequence = _pattern['pattern_data']
+        self['matches'] = lean.matches
+        self['past'] = sequence[:lean.present_start]
+        self['present'] = sequence[lean.present_start:lean.present_end]
+        self['missing'] = []
+        self['extras'] = lean.extras
+        self['anomalies'] = lean.anomalies
+        self['potential'] = lean.potential
+        self['evidence'] = lean.evidence
+        self['similarity'] = lean.similarity
+        self['fragmentation'] = lean.fragmentation
+        self['snr'] = lean.snr
         # Note: entropy, normalized_entropy, global_normalized_entropy, and confluence
         # are calculated in pattern_processor.py and set via prediction.update()
         self['confluence'] = float(0)
         self['predictive_information'] = float(0)  # Excess entropy / mutual information between past and future
-        self['sequence'] = _pattern['pattern_data']
-        self['pattern_data'] = _pattern['pattern_data']  # Keep for later popping in pattern_processor
-
-        sequence = _pattern['pattern_data']
-
-        __c1 = len(self['past'])
-        __c2 = 0
-        __event_num = 0
-        while __c2 < __c1:
-            __c2 += len(sequence[__event_num])
-            __event_num += 1
-
-        _e_1 = __event_num
-        self['past'] = sequence[:__event_num]
-
-        __c1 += len(self['present'])
-        while __c2 < __c1:
-            __c2 += len(sequence[__event_num])
-            __event_num += 1
-
-        self['present'] = sequence[_e_1:__event_num]
-        self['future'] = sequence[__event_num:]
-
-        ## This fixes the problem of some symbols from the tail-end of the last event getting put into the 'past' field instead of 'present'.
-        if len(self['past']) > 0:
-            try:
-                _first_match = self['matches'][0]
-                _tail = self['past'][-1].copy()
-                _tail.reverse()
-                if _first_match in self['past'][-1]:
-                    self['present'].insert(0, self['past'][-1])
-                    self['past'] = self['past'][:-1]
-            except Exception as e:
-                raise Exception("Error matching events in predictions! CODE-55 {}".format(e))
+        self['sequence'] = sequence
+        self['pattern_data'] = sequence  # Keep for later popping in pattern_processor
+        self['future'] = sequence[lean.present_end:]
 
+        # Set lookups: membership tests on the matches list were quadratic in long events
+        matches = set(lean.matches)
+        stm_events = lean.stm_events
         # Calculate event-aligned missing and extras using proper alignment
         if stm_events and len(stm_events) > 0:
             # Missing: aligned with PRESENT events (pattern events)
             # Each sub-list corresponds to a present event
             # Contains symbols from that pattern event that were not observed (not in matches)
-            self['missing'] = []
             for present_event in self['present']:
-                event_missing = [s for s in present_event if s not in self['matches']]
+                event_missing = [s for s in present_event if s not in matches]
                 self['missing'].append(event_missing)
 
             # Extras: aligned with STM events (observed events)
             # Each sub-list corresponds to an STM event
             # Contains symbols observed in STM but not expected in the pattern present
             self['extras'] = []
-            flattened_present = list(chain(*self['present']))
+            flattened_present = set(chain(*self['present']))
             for stm_event in stm_events:
                 event_extras = [s for s in stm_event if s not in flattened_present]
                 self['extras'].append(event_extras)
         else:
             # Fallback: Use old flat-list behavior (for backward compatibility)
-            self['missing'] = []
             for _symbol in chain(*self['present']):
-                if _symbol not in self['matches']:
+                if _symbol not in matches:
                     self['missing'].append(_symbol)
             # extras already set from constructor parameter
 
-        __present_length__ = sum([len(_event) for _event in self['present']])
-        self['confidence'] = float(len(self['matches'])/__present_length__) if __present_length__ > 0 else 0.0
+        self['confidence'] = lean.confidence
 
         # Affinity-weighted metrics (None when disabled)
-        self['weighted_similarity'] = weighted_similarity
+        self['weighted_similarity'] = lean.weighted_similarity
         self['weighted_evidence'] = None
         self['weighted_confidence'] = None
         self['weighted_snr'] = None
 
         self.present = self['present']
-        # self['past'] = ListValue().add_list().extend(self['past'])
-        # self['present'] = ListValue().add_list().extend(self['present'])
-        # self['future'] = ListValue().add_list().extend(self['future'])
+
+
+def pre_potential(prediction):
+    """
+    Potential before ensemble metrics: (evidence + confidence) * snr plus the
+    fragmentation term, without itfdf_similarity.
+
+    Used to prune candidates ahead of predictPattern's metrics loop.
+    """
+    frag = prediction['fragmentation']
+    return ((prediction['evidence'] + prediction['confidence']) * prediction['snr']
+            + (0.0 if frag == -1 else 1.0 / (frag + 1)))
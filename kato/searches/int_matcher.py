@@ -0,0 +1,242 @@
+"""
+Integer-encoded token matching for causalBelief.
+
+Optional matching mode (KATO_USE_INT_MATCHING=true) that produces exactly the
+same result tuples as InformationExtractor.extract_prediction_info with
+token-level matching, but runs the alignment on dense integer token IDs:
+
+- TokenVocabulary: CPU counterpart of kato.gpu.encoder.SymbolVocabularyEncoder.
+  In-process only (no persistence); IDs are meaningful solely within one
+  vocabulary instance.
+- Patterns are encoded once and cached as int32 arrays, keyed by pattern name.
+  Names are content-addressed (PTRN|<sha1>), so a cached encoding never goes
+  stale.
+- The STM is encoded and indexed (token -> positions) once per request rather
+  than once per candidate.
+- Alignment runs on the IDs through kato.informatics.alignment, the same
+  engine the string path uses.
+
+Fuzzy token matching (fuzzy_token_threshold > 0) compares token strings and
+always uses the string path.
+"""
+
+import logging
+import threading
+from os import environ
+from typing import Any, Optional
+
+import numpy as np
+
+from kato.informatics.alignment import AlignmentEngine
+
+try:
+    from rapidfuzz import process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+logger = logging.getLogger('kato.searches.int_matcher')
+
+USE_INT_MATCHING = environ.get('KATO_USE_INT_MATCHING', 'false').lower() == 'true'
+
+# Encoded patterns kept per matcher before the cache (and vocabulary) is reset
+MAX_ENCODED_PATTERNS = int(environ.get('KATO_INT_MATCHING_MAX_PATTERNS', '200000'))
+
+
+class TokenVocabulary:
+    """
+    In-process mapping between token strings and dense int32 IDs.
+
+    New tokens are assigned the next free ID under a lock, so concurrent
+    ThreadPool batches never hand the same ID to two different tokens.
+    """
+
+    def __init__(self) -> None:
+        self.symbol_to_id: dict[str, int] = {}
+        self.id_to_symbol: list[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def vocab_size(self) -> int:
+        """Get current vocabulary size."""
+        return len(self.id_to_symbol)
+
+    def _add(self, symbol: str) -> int:
+        with self._lock:
+            token_id = self.symbol_to_id.get(symbol)
+            if token_id is None:
+                token_id = len(self.id_to_symbol)
+                self.id_to_symbol.append(symbol)
+                self.symbol_to_id[symbol] = token_id
+            return token_id
+
+    def encode_list(self, symbols: list[str]) -> list[int]:
+        """Encode symbols to a list of integer IDs, extending the vocabulary."""
+        get = self.symbol_to_id.get
+        ids = []
+        for symbol in symbols:
+            token_id = get(symbol)
+            if token_id is None:
+                token_id = self._add(symbol)
+            ids.append(token_id)
+        return ids
+
+    def encode_sequence(self, symbols: list[str]) -> np.ndarray:
+        """Encode symbols to an int32 array."""
+        return np.array(self.encode_list(symbols), dtype=np.int32)
+
+    def decode_sequence(self, ids) -> list[str]:
+        """Decode integer IDs back to symbols."""
+        id_to_symbol = self.id_to_symbol
+        return [id_to_symbol[i] for i in ids]
+
+
+
+class EncodedState:
+    """STM encoded once per request: token IDs plus an AlignmentEngine indexing them."""
+
+    __slots__ = ('tokens', 'ids', 'engine', 'vocabulary', 'encoded')
+
+    def __init__(self, tokens: list[str], ids: list[int], vocabulary: TokenVocabulary,
+                 encoded: dict[str, np.ndarray]) -> None:
+        self.tokens = tokens
+        self.ids = ids
+        self.vocabulary = vocabulary
+        self.encoded = encoded
+        self.engine = AlignmentEngine(ids)
+
+
+class IntegerMatcher:
+    """
+    Token-level prediction extraction on integer-encoded sequences.
+
+    Attributes:
+        vocabulary: TokenVocabulary shared by patterns and states.
+        max_patterns: Encoded-pattern cache size before it is reset.
+    """
+
+    def __init__(self, max_patterns: int = MAX_ENCODED_PATTERNS) -> None:
+        self.max_patterns = max_patterns
+        self._lock = threading.Lock()
+        self._generation: tuple[TokenVocabulary, dict[str, np.ndarray]] = (TokenVocabulary(), {})
+
+    @property
+    def vocabulary(self) -> TokenVocabulary:
+        return self._generation[0]
+
+    @property
+    def cached_patterns(self) -> int:
+        return len(self._generation[1])
+
+    def prepare_state(self, state: list[str]) -> EncodedState:
+        """
+        Encode and index the STM once for a whole batch of candidates.
+
+        The returned state pins the current vocabulary and pattern cache, so a
+        cache reset by another thread never mixes IDs within one batch.
+        """
+        if len(self._generation[1]) >= self.max_patterns:
+            with self._lock:
+                if len(self._generation[1]) >= self.max_patterns:
+                    logger.debug(f"Encoded pattern cache reached {self.max_patterns}, resetting")
+                    self._generation = (TokenVocabulary(), {})
+        vocabulary, encoded = self._generation
+        return EncodedState(state, vocabulary.encode_list(state), vocabulary, encoded)
+
+    def encode_pattern(self, pattern_id: str, pattern: list[str], state: EncodedState) -> np.ndarray:
+        """Return the cached int32 encoding of a pattern, encoding it on first use."""
+        encoded = state.encoded.get(pattern_id)
+        if encoded is None:
+            encoded = state.encoded[pattern_id] = state.vocabulary.encode_sequence(pattern)
+        return encoded
+
+    def forget(self, pattern_id: str) -> None:
+        self._generation[1].pop(pattern_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation = (TokenVocabulary(), {})
+
+    def extract_prediction_info(self, pattern: list[str], pattern_ids: list[int],
+                                state: EncodedState, cutoff: float, similarity: float,
+                                weights: Optional[dict[str, float]] = None) -> Optional[tuple]:
+        """
+        Integer-encoded equivalent of InformationExtractor.extract_prediction_info.
+
+        Args:
+            pattern: Pattern tokens (returned slices are taken from this list).
+            pattern_ids: Encoded pattern as a list of IDs from this matcher's vocabulary.
+            state: EncodedState from prepare_state().
+            cutoff: Similarity threshold.
+            similarity: Pre-computed similarity for the pair.
+            weights: Optional affinity weights for weighted similarity.
+
+        Returns:
+            Same 10-tuple as InformationExtractor.extract_prediction_info, or
+            None when the pattern does not qualify.
+        """
+        if similarity < cutoff:
+            return None
+
+        tokens = state.tokens
+        alignment = state.engine.align(pattern_ids)
+        number_of_blocks = alignment.number_of_blocks
+        if not number_of_blocks and cutoff > 0.0:
+            return None
+
+        matching_intersection = alignment.matching_intersection(tokens)
+        past = pattern[slice(*alignment.past)]
+        present = pattern[slice(*alignment.present)]
+        missing = alignment.missing(pattern)
+        extras = alignment.extras(tokens)
+
+        weighted_similarity = None
+        if weights:
+            w_matched = sum(weights.get(t, 0.0) for t in matching_intersection)
+            w_state = sum(weights.get(t, 0.0) for t in tokens)
+            w_pattern = sum(weights.get(t, 0.0) for t in pattern)
+            w_total = w_state + w_pattern
+            weighted_similarity = (2.0 * w_matched / w_total) if w_total > 0 else None
+
+        return (pattern, matching_intersection, past, present,
+                missing, extras, similarity, number_of_blocks, [],
+                weighted_similarity)
+
+    def match_batch(self, state: list[str], batch_patterns_data: list[tuple[str, list[str]]],
+                    recall_threshold: float, scorer: Any,
+                    weights: Optional[dict[str, float]] = None) -> list[tuple]:
+        """
+        Score and extract a batch of (pattern_id, pattern_sequence) pairs.
+
+        Requires RapidFuzz; callers fall back to the string path without it.
+
+        Scoring runs RapidFuzz process.extract over the integer sequences with
+        the same scorer and cutoff as the string path, so matches, scores and
+        their order are unchanged.
+
+        Returns:
+            List of match result tuples (pattern_id, pattern_seq, *info[1:])
+        """
+        encoded_state = self.prepare_state(state)
+        sequences = {}
+        choices = {}
+        for pattern_id, pattern_seq in batch_patterns_data:
+            sequences[pattern_id] = pattern_seq
+            choices[pattern_id] = self.encode_pattern(pattern_id, pattern_seq, encoded_state).tolist()
+
+        batch_results = []
+        if not choices:
+            return batch_results
+
+        score_cutoff = recall_threshold * 100 - 1e-6
+        matches = process.extract(encoded_state.ids, choices, scorer=scorer,
+                                  score_cutoff=score_cutoff, limit=None)
+        for pattern_ids, score, pattern_id in matches:
+            similarity = score / 100.0
+            if similarity >= recall_threshold:
+                pattern_seq = sequences[pattern_id]
+                info = self.extract_prediction_info(pattern_seq, pattern_ids, encoded_state,
+                                                    recall_threshold, similarity, weights)
+                if info:
+                    batch_results.append((pattern_id, pattern_seq) + info[1:])
+        return batch_results
@@ -0,0 +1,493 @@
+"""
+Persistent process pool for pattern matching over shared-memory pattern arenas.
+
+Large candidate sets are matched in worker processes to bypass the GIL. A
+per-request ProcessPoolExecutor pays for process start-up and pickles every
+pattern sequence on every request; this pool is started once with the app
+and keeps each kb's pattern sequences in shared memory instead:
+
+- PatternArena: append-only, per-kb store of flattened pattern sequences in
+  SharedMemory segments. Tokens are integer-encoded against a per-segment
+  vocabulary, so a segment is a handful of flat arrays. An arena that grows
+  past its byte budget is rebuilt from the current request's patterns.
+- Workers attach a segment once and cache it; requests carry only candidate
+  indices, the STM and scoring parameters.
+- Patterns are content-addressed (name = SHA1 of the data), so arena entries
+  never go stale; deleted patterns stop appearing as candidates and are
+  reclaimed by the next budget rebuild.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+from itertools import chain
+from multiprocessing import shared_memory, util
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger('kato.searches.matcher_pool')
+
+# Segment header: n_patterns, n_tokens, n_vocab, vocab_nbytes
+_HEADER = np.dtype(np.int64).itemsize * 4
+
+# Compact an arena into a single segment once it has this many segments
+MAX_ARENA_SEGMENTS = 16
+
+# Default shared-memory budget per kb arena (see PatternArena.max_bytes)
+ARENA_MAX_BYTES = 256 * 1024 * 1024
+
+
+def encode_segment(sequences: list[list[str]]) -> bytes:
+    """
+    Encode pattern sequences into the flat shared-memory segment layout.
+
+    Layout (native byte order):
+        int64[4]             header (n_patterns, n_tokens, n_vocab, vocab_nbytes)
+        int64[n_patterns+1]  token offsets per pattern
+        int64[n_vocab+1]     byte offsets per vocabulary entry
+        int32[n_tokens]      token ids
+        bytes                UTF-8 vocabulary
+
+    Args:
+        sequences: Flattened pattern sequences
+
+    Returns:
+        Encoded segment bytes
+    """
+    vocab: dict[str, int] = {}
+    token_ids = np.fromiter(
+        (vocab.setdefault(token, len(vocab)) for token in chain.from_iterable(sequences)),
+        dtype=np.int32
+    )
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum([len(seq) for seq in sequences], out=offsets[1:])
+
+    encoded_vocab = [token.encode('utf-8') for token in vocab]
+    vocab_offsets = np.zeros(len(encoded_vocab) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded_vocab], out=vocab_offsets[1:])
+    vocab_bytes = b''.join(encoded_vocab)
+
+    header = np.array([len(sequences), len(token_ids), len(encoded_vocab), len(vocab_bytes)],
+                      dtype=np.int64)
+    return b''.join((header.tobytes(), offsets.tobytes(), vocab_offsets.tobytes(),
+                     token_ids.tobytes(), vocab_bytes))
+
+
+class SegmentView:
+    """Zero-copy view over an encoded segment (bytes or a SharedMemory buffer)."""
+
+    def __init__(self, buf) -> None:
+        header = np.frombuffer(buf, dtype=np.int64, count=4)
+        n_patterns, n_tokens, n_vocab, vocab_nbytes = (int(x) for x in header)
+        pos = _HEADER
+        self.offsets = np.frombuffer(buf, dtype=np.int64, count=n_patterns + 1, offset=pos)
+        pos += self.offsets.nbytes
+        vocab_offsets = np.frombuffer(buf, dtype=np.int64, count=n_vocab + 1, offset=pos)
+        pos += vocab_offsets.nbytes
+        self.token_ids = np.frombuffer(buf, dtype=np.int32, count=n_tokens, offset=pos)
+        pos += self.token_ids.nbytes
+        vocab_bytes = bytes(buf[pos:pos + vocab_nbytes])
+        bounds = vocab_offsets.tolist()
+        self.vocab = [vocab_bytes[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(n_vocab)]
+        self.count = n_patterns
+
+    def sequence(self, local_index: int) -> list[str]:
+        """Decode one pattern sequence."""
+        vocab = self.vocab
+        start, end = self.offsets[local_index], self.offsets[local_index + 1]
+        return [vocab[t] for t in self.token_ids[start:end].tolist()]
+
+    def release(self) -> None:
+        """Drop numpy views so the underlying buffer can be closed."""
+        self.offsets = None
+        self.token_ids = None
+
+
+class PatternArena:
+    """
+    Append-only shared-memory store of one kb's flattened pattern sequences.
+
+    Each pattern gets a stable global index. New patterns are appended as a
+    new segment; once MAX_ARENA_SEGMENTS is reached the arena is compacted
+    into one segment. When the segments grow past max_bytes the arena is
+    rebuilt from the current request's patterns only, which reclaims deleted
+    and no longer requested patterns (indices are reassigned).
+
+    Every acquired spec holds a reference on its segments; a replaced segment
+    is unlinked as soon as the last spec referencing it is released.
+    """
+
+    def __init__(self, kb_id: str, max_bytes: int = ARENA_MAX_BYTES) -> None:
+        self.kb_id = kb_id
+        self.max_bytes = max_bytes
+        self._names: list[str] = []
+        self._index: dict[str, int] = {}
+        self._segments: list[shared_memory.SharedMemory] = []
+        self._specs: list[tuple[str, int, int]] = []  # (shm_name, base, count)
+        self._refs: dict[str, int] = {}  # shm_name -> acquired specs using it
+        self._retired: dict[str, shared_memory.SharedMemory] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(seg.size for seg in self._segments)
+
+    def acquire(self, names: list[str], patterns: dict[str, list[str]]) -> tuple[list[int], tuple, list[str]]:
+        """
+        Map candidate names to arena indices, appending any unseen patterns.
+
+        Callers must call release(spec) once workers are done with the returned spec.
+
+        Args:
+            names: Candidate pattern names
+            patterns: Mapping of name -> flattened sequence for unseen patterns
+
+        Returns:
+            Tuple of (indices for names present in the arena, segment spec,
+            index -> name list valid for that spec)
+        """
+        with self._lock:
+            missing = [n for n in names if n not in self._index and n in patterns]
+            if missing:
+                self._append(missing, [patterns[n] for n in missing])
+                if self.nbytes > self.max_bytes and len(self._names) > len(set(names)):
+                    self._rebuild(names, patterns)
+                elif len(self._segments) > MAX_ARENA_SEGMENTS:
+                    self._compact()
+            specs = tuple(self._specs)
+            for shm_name, _, _ in specs:
+                self._refs[shm_name] = self._refs.get(shm_name, 0) + 1
+            indices = [self._index[n] for n in names if n in self._index]
+            return indices, (self.kb_id, specs), self._names
+
+    def release(self, spec: tuple) -> None:
+        """Drop a request's references and unlink replaced segments it was the last user of."""
+        with self._lock:
+            for shm_name, _, _ in spec[1]:
+                refs = self._refs.pop(shm_name) - 1
+                if refs:
+                    self._refs[shm_name] = refs
+                elif shm_name in self._retired:
+                    _unlink(self._retired.pop(shm_name))
+
+    def close(self) -> None:
+        """Unlink all segments (pool shutdown / kb cleared), deferring those in use."""
+        with self._lock:
+            self._retire(self._segments)
+            self._segments, self._specs = [], []
+            self._names, self._index = [], {}
+
+    def _retire(self, segments: list[shared_memory.SharedMemory]) -> None:
+        """Unlink replaced segments now, or on the release of their last spec."""
+        for seg in segments:
+            if seg.name in self._refs:
+                self._retired[seg.name] = seg
+            else:
+                _unlink(seg)
+
+    def _append(self, names: list[str], sequences: list[list[str]]) -> None:
+        data = encode_segment(sequences)
+        seg = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        seg.buf[:len(data)] = data
+        base = len(self._names)
+        for offset, name in enumerate(names):
+            self._index[name] = base + offset
+        self._names.extend(names)
+        self._segments.append(seg)
+        self._specs.append((seg.name, base, len(names)))
+
+    def _compact(self) -> None:
+        sequences = []
+        for seg, (_, _, count) in zip(self._segments, self._specs):
+            view = SegmentView(seg.buf)
+            sequences.extend(view.sequence(i) for i in range(count))
+            view.release()
+        names = self._names
+        self._retire(self._segments)
+        self._segments, self._specs, self._names, self._index = [], [], [], {}
+        self._append(names, sequences)
+        logger.debug(f"Compacted arena for kb_id={self.kb_id}: {len(names)} patterns in 1 segment")
+
+    def _rebuild(self, names: list[str], patterns: dict[str, list[str]]) -> None:
+        """Replace the arena with one segment holding only `names`."""
+        keep = [n for n in dict.fromkeys(names) if n in self._index]
+        stored = [n for n in keep if n not in patterns]
+        sequences = dict(zip(stored, self._decode(stored)))
+        sequences.update((n, patterns[n]) for n in keep if n in patterns)
+        before, nbytes = len(self._names), self.nbytes
+
+        self._retire(self._segments)
+        self._segments, self._specs, self._names, self._index = [], [], [], {}
+        self._append(keep, [sequences[n] for n in keep])
+        logger.info(f"Rebuilt arena for kb_id={self.kb_id} over its {self.max_bytes} byte budget: "
+                    f"{before} patterns ({nbytes} bytes) -> {len(keep)} ({self.nbytes} bytes)")
+
+    def _decode(self, names: list[str]) -> list[list[str]]:
+        """Decode stored sequences by name."""
+        views = [(base, count, SegmentView(seg.buf))
+                 for seg, (_, base, count) in zip(self._segments, self._specs)]
+        sequences = []
+        for idx in (self._index[n] for n in names):
+            for base, count, view in views:
+                if base <= idx < base + count:
+                    sequences.append(view.sequence(idx - base))
+                    break
+        for _, _, view in views:
+            view.release()
+        return sequences
+
+
+def _unlink(seg: shared_memory.SharedMemory) -> None:
+    try:
+        seg.close()
+        seg.unlink()
+    except FileNotFoundError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs in pool processes)
+# ---------------------------------------------------------------------------
+
+# kb_id -> {shm_name: (SharedMemory, SegmentView)}
+_worker_segments: dict[str, dict[str, tuple]] = {}
+# use_token_matching -> InformationExtractor
+_worker_extractors: dict[bool, Any] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        # Python 3.13+: the creating process owns cleanup
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_views(spec: tuple) -> list[tuple[int, int, SegmentView]]:
+    """Attach (once) and return views for the segments in a request spec."""
+    kb_id, segments = spec
+    cache = _worker_segments.setdefault(kb_id, {})
+    wanted = {shm_name for shm_name, _, _ in segments}
+    for stale in [n for n in cache if n not in wanted]:
+        shm, view = cache.pop(stale)
+        view.release()
+        shm.close()
+
+    views = []
+    for shm_name, base, count in segments:
+        if shm_name not in cache:
+            shm = _attach(shm_name)
+            cache[shm_name] = (shm, SegmentView(shm.buf))
+        views.append((base, count, cache[shm_name][1]))
+    return views
+
+
+def _match_indices_worker(spec, indices, state, recall_threshold, use_token_matching,
+                          fuzzy_token_threshold, weights):
+    """
+    Pool task: match arena patterns at `indices` against the STM.
+
+    Returns:
+        Match result tuples with the arena index in place of the pattern name
+        and None in place of the sequence (the parent already has both).
+    """
+    from kato.searches.pattern_search import InformationExtractor, _match_batch
+
+    extractor = _worker_extractors.get(use_token_matching)
+    if extractor is None:
+        extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=use_token_matching)
+        _worker_extractors[use_token_matching] = extractor
+
+    views = _worker_views(spec)
+    batch = []
+    for idx in indices:
+        for base, count, view in views:
+            if base <= idx < base + count:
+                batch.append((idx, view.sequence(idx - base)))
+                break
+
+    results = _match_batch(extractor, state, batch, recall_threshold, use_token_matching,
+                           fuzzy_token_threshold, weights)
+    return [(r[0], None) + tuple(r[2:]) for r in results]
+
+
+def _worker_close_all() -> None:
+    """Release cached segment views before the worker exits."""
+    for cache in _worker_segments.values():
+        for shm, view in cache.values():
+            view.release()
+            shm.close()
+    _worker_segments.clear()
+
+
+def _worker_init() -> None:
+    # Workers leave via os._exit; a multiprocessing finalizer still runs and
+    # avoids BufferError noise from SharedMemory.__del__ on exported views
+    util.Finalize(None, _worker_close_all, exitpriority=10)
+
+
+def _worker_ping():
+    return multiprocessing.current_process().pid
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+class MatcherPool:
+    """Long-lived process pool that matches candidates stored in PatternArenas."""
+
+    def __init__(self, workers: int = 4, start_method: str = 'spawn',
+                 arena_max_bytes: int = ARENA_MAX_BYTES) -> None:
+        self.workers = workers
+        self.start_method = start_method
+        self.arena_max_bytes = arena_max_bytes
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._arenas: dict[str, PatternArena] = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'tasks': 0, 'candidates': 0, 'arena_appends': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Start worker processes and wait until each one is up."""
+        if self._executor is not None:
+            return
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_worker_init
+        )
+        # Spawn all workers now rather than on the first large request
+        pids = {f.result() for f in [self._executor.submit(_worker_ping) for _ in range(self.workers * 2)]}
+        logger.info(f"MatcherPool started with {len(pids)} worker processes ({self.start_method})")
+
+    def shutdown(self) -> None:
+        """Stop workers and unlink every arena segment."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            for arena in self._arenas.values():
+                arena.close()
+            self._arenas.clear()
+        logger.info("MatcherPool shut down")
+
+    def arena(self, kb_id: str) -> PatternArena:
+        with self._lock:
+            arena = self._arenas.get(kb_id)
+            if arena is None:
+                arena = self._arenas[kb_id] = PatternArena(kb_id, self.arena_max_bytes)
+            return arena
+
+    def drop_arena(self, kb_id: str) -> None:
+        """Forget a kb's arena (e.g. after its patterns were cleared)."""
+        with self._lock:
+            arena = self._arenas.pop(kb_id, None)
+        if arena is not None:
+            arena.close()
+
+    async def match(self, kb_id: str, candidates: list[str], patterns: dict[str, list[str]],
+                    state: list[str], recall_threshold: float, use_token_matching: bool,
+                    fuzzy_token_threshold: float = 0.0,
+                    weights: Optional[dict[str, float]] = None,
+                    batch_size: int = 100) -> list[tuple]:
+        """
+        Match candidates against the STM in the worker processes.
+
+        Args:
+            kb_id: Knowledge base identifier (selects the arena)
+            candidates: Candidate pattern names
+            patterns: Mapping of name -> flattened sequence for the candidates
+            state: Flattened STM
+            recall_threshold: Minimum similarity threshold
+            use_token_matching: Token-level vs character-level matching
+            fuzzy_token_threshold: Fuzzy token matching threshold
+            weights: Optional affinity weights for weighted similarity
+            batch_size: Minimum candidates per worker task
+
+        Returns:
+            Match result tuples in the same shape as the in-process matchers
+        """
+        if self._executor is None:
+            raise RuntimeError("MatcherPool is not running")
+
+        arena = self.arena(kb_id)
+        before = len(arena)
+        indices, spec, names = arena.acquire(candidates, patterns)
+        try:
+            if len(names) != before:
+                self.stats['arena_appends'] += 1
+
+            # Few large tasks per worker: there is no per-pattern payload to spread out
+            task_size = max(batch_size, -(-len(indices) // (self.workers * 2)))
+            loop = asyncio.get_running_loop()
+            futures = [
+                asyncio.wrap_future(self._executor.submit(
+                    _match_indices_worker, spec, indices[i:i + task_size], state,
+                    recall_threshold, use_token_matching, fuzzy_token_threshold, weights
+                ), loop=loop)
+                for i in range(0, len(indices), task_size)
+            ]
+            self.stats['requests'] += 1
+            self.stats['tasks'] += len(futures)
+            self.stats['candidates'] += len(indices)
+
+            results = []
+            for batch in await asyncio.gather(*futures):
+                for r in batch:
+                    name = names[r[0]]
+                    results.append((name, patterns.get(name)) + tuple(r[2:]))
+            return results
+        finally:
+            arena.release(spec)
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            arenas = {
+                kb_id: {'patterns': len(a), 'segments': a.segment_count, 'bytes': a.nbytes}
+                for kb_id, a in self._arenas.items()
+            }
+        return {'running': self.running, 'workers': self.workers, **self.stats, 'arenas': arenas}
+
+
+# Global matcher pool instance (started by the FastAPI app)
+_matcher_pool: Optional[MatcherPool] = None
+
+
+def get_matcher_pool() -> Optional[MatcherPool]:
+    """Get the global matcher pool, or None if it was not started."""
+    return _matcher_pool
+
+
+def start_matcher_pool(workers: int = 4, start_method: str = 'spawn',
+                       arena_max_bytes: int = ARENA_MAX_BYTES) -> MatcherPool:
+    """Create and start the global matcher pool (idempotent)."""
+    global _matcher_pool
+
+    if _matcher_pool is None:
+        _matcher_pool = MatcherPool(workers=workers, start_method=start_method,
+                                    arena_max_bytes=arena_max_bytes)
+    _matcher_pool.start()
+    return _matcher_pool
+
+
+def shutdown_matcher_pool() -> None:
+    """Shut down the global matcher pool."""
+    global _matcher_pool
+
+    if _matcher_pool is not None:
+        _matcher_pool.shutdown()
+        _matcher_pool = None
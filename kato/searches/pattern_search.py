@@ -5,17 +5,20 @@ Provides ~300x performance improvements using optimized algorithms.
 
 import asyncio
 import concurrent.futures
+import heapq
 import logging
 import multiprocessing
+from collections import Counter
 from itertools import chain
 from operator import itemgetter
 from os import environ
 from queue import Queue
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
 # Import original components for compatibility
 from kato.informatics import extractor as difflib
-from kato.representations.prediction import Prediction
+from kato.informatics.alignment import AlignmentEngine
+from kato.representations.prediction import LeanPrediction, Prediction, pre_potential
 
 from ..storage.aggregation_pipelines import OptimizedQueryManager
 from ..storage.pattern_cache import PatternCache, get_cache_manager
@@ -24,10 +27,17 @@ from .bloom_filter import get_pattern_bloom_filter
 # Import new optimized components
 from .fast_matcher import FastSequenceMatcher
 from .index_manager import IndexManager
+from .int_matcher import USE_INT_MATCHING, IntegerMatcher
+from .matcher_pool import get_matcher_pool
+from .single_symbol_predictions import get_single_symbol_predictions
 
 # Import filter pipeline for ClickHouse/Redis hybrid architecture (REQUIRED)
 try:
     from ..filters import FilterPipelineExecutor
+    from ..filters.candidate_cache import get_candidate_cache
+    from ..filters.coalescer import get_request_coalescer
+    from ..filters.pattern_data_cache import get_pattern_data_cache
+    from ..filters.stage_stats import get_filter_stage_stats
     FILTER_PIPELINE_AVAILABLE = True
 except ImportError:
     FILTER_PIPELINE_AVAILABLE = False
@@ -85,26 +95,69 @@ def _lcs_ratio_scorer(s1: list, s2: list, **kwargs) -> float:
 # ProcessPool has higher startup/serialization cost but bypasses the GIL
 PROCESS_POOL_CANDIDATE_THRESHOLD = 500
 
+# Align candidates in descending pre-potential upper bound and stop once none
+# left can enter predictPattern's top max_predictions * PRUNING_FACTOR
+TOPK_BOUNDED_MATCHING = environ.get('KATO_TOPK_BOUNDED_MATCHING', 'false').lower() == 'true'
 
-def _process_batch_worker(state, batch_patterns_data, recall_threshold, use_token_matching, fuzzy_token_threshold):
+
+def pre_potential_upper_bound(pattern_length: int, state_length: int,
+                              similarity: Optional[float] = None, unmatched: int = 0) -> float:
     """
-    Module-level worker function for ProcessPoolExecutor (must be picklable).
+    Upper bound on a candidate's pre_potential() before it is aligned.
 
-    Processes a batch of pattern data for similarity matching. Creates its own
-    InformationExtractor since it runs in a separate process.
+    With exact token matching, confidence and the fragmentation term are each
+    at most 1. Matches cannot exceed either sequence's length, the state
+    symbols that occur in the pattern, or, for token-level similarity
+    (2 * LCS / total), the LCS it implies; state symbols absent from the
+    pattern are always extras. Evidence (matches / pattern length) and snr
+    are bounded from those counts.
+
+    Args:
+        pattern_length: Number of symbols in the pattern
+        state_length: Number of symbols in the state
+        similarity: Token-level similarity of the pair, if already computed
+        unmatched: Number of state symbols that do not occur in the pattern
+
+    Returns:
+        A value no aligned prediction of this pair can exceed
+    """
+    if pattern_length <= 0:
+        return 2.0
+    matches = min(pattern_length, state_length - unmatched)
+    if similarity is not None:
+        # Slack for the rounding of the 0-100 score
+        matches = min(matches, similarity * (pattern_length + state_length) / 2.0 + 1e-6)
+    denominator = 2.0 * matches + unmatched
+    snr = max((2.0 * matches - unmatched) / denominator, 0.0) if denominator > 0 else 0.0
+    return (matches / pattern_length + 1.0) * snr + 1.0 + 1e-9
+
+
+def _match_batch(extractor, state, batch_patterns_data, recall_threshold, use_token_matching,
+                 fuzzy_token_threshold, weights=None):
+    """
+    Match a batch of (pattern_id, pattern_sequence) pairs against the state.
+
+    Shared by the per-request process pool worker and the persistent
+    MatcherPool workers, which reuse one InformationExtractor across batches.
 
     Args:
+        extractor: InformationExtractor to use for detailed match info
         state: Current state sequence (list of tokens)
         batch_patterns_data: List of (pattern_id, pattern_sequence) tuples
         recall_threshold: Minimum similarity threshold
         use_token_matching: Whether to use token-level matching
         fuzzy_token_threshold: Fuzzy matching threshold
+        weights: Optional affinity weights for weighted similarity
 
     Returns:
-        List of match result tuples
+        List of match result tuples (pattern_id, pattern_seq, *info[1:])
     """
-    extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=use_token_matching)
     batch_results = []
+    recall_threshold_safe = recall_threshold if recall_threshold is not None else 0.1
+
+    if extractor.int_matcher is not None and use_token_matching and not fuzzy_token_threshold:
+        return extractor.int_matcher.match_batch(state, batch_patterns_data, recall_threshold_safe,
+                                                 _lcs_ratio_scorer, weights)
 
     if use_token_matching:
         choices = {pid: seq for pid, seq in batch_patterns_data}
@@ -121,37 +174,58 @@ def _process_batch_worker(state, batch_patterns_data, recall_threshold, use_toke
         # but our threshold semantics are >=
         score_cutoff = recall_threshold * 100 - 1e-6
         matches = process.extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=None)
+        sequences = dict(batch_patterns_data)
+        engine = AlignmentEngine(state)
 
         for _choice_str, score, pattern_id in matches:
             similarity = score / 100.0
             if similarity >= recall_threshold:
-                pattern_seq = dict(batch_patterns_data)[pattern_id]
-                recall_threshold_safe = recall_threshold if recall_threshold is not None else 0.1
+                pattern_seq = sequences[pattern_id]
                 info = extractor.extract_prediction_info(
                     pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold,
-                    precomputed_similarity=similarity)
+                    precomputed_similarity=similarity, weights=weights, alignment_engine=engine)
                 if info:
-                    batch_results.append((
-                        pattern_id, pattern_seq, info[1], info[2], info[3], info[4], info[5],
-                        info[6], info[7], info[8]
-                    ))
+                    batch_results.append((pattern_id, pattern_seq) + tuple(info[1:]))
     elif choices:
         # Fallback without RapidFuzz
-        recall_threshold_safe = recall_threshold if recall_threshold is not None else 0.1
+        engine = AlignmentEngine(state)
         for pattern_id, pattern_seq in batch_patterns_data:
             info = extractor.extract_prediction_info(
-                pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold)
+                pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold, weights=weights,
+                alignment_engine=engine)
             if info and len(info) >= 9:
                 similarity = info[6] if len(info) > 6 else 0.0
                 if similarity >= recall_threshold_safe:
-                    batch_results.append((
-                        pattern_id, pattern_seq, info[1], info[2], info[3], info[4], info[5],
-                        similarity, info[7] if len(info) > 7 else 0, info[8] if len(info) > 8 else []
-                    ))
+                    batch_results.append((pattern_id, pattern_seq) + tuple(info[1:]))
 
     return batch_results
 
 
+def _process_batch_worker(state, batch_patterns_data, recall_threshold, use_token_matching,
+                          fuzzy_token_threshold, weights=None):
+    """
+    Module-level worker function for ProcessPoolExecutor (must be picklable).
+
+    Processes a batch of pattern data for similarity matching. Creates its own
+    InformationExtractor since it runs in a separate process. Used only when
+    the persistent MatcherPool is not running.
+
+    Args:
+        state: Current state sequence (list of tokens)
+        batch_patterns_data: List of (pattern_id, pattern_sequence) tuples
+        recall_threshold: Minimum similarity threshold
+        use_token_matching: Whether to use token-level matching
+        fuzzy_token_threshold: Fuzzy matching threshold
+        weights: Optional affinity weights for weighted similarity
+
+    Returns:
+        List of match result tuples
+    """
+    extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=use_token_matching)
+    return _match_batch(extractor, state, batch_patterns_data, recall_threshold,
+                        use_token_matching, fuzzy_token_threshold, weights)
+
+
 class InformationExtractor:
     """
     Optimized information extraction using fast matching algorithms.
@@ -163,9 +237,11 @@ class InformationExtractor:
         use_fast_matcher: Whether to use optimized matching algorithms.
         use_token_matching: Whether to use token-level (vs character-level) matching.
         fast_matcher: FastSequenceMatcher instance for optimized matching.
+        int_matcher: IntegerMatcher for integer-encoded batch matching (None when disabled).
     """
 
-    def __init__(self, use_fast_matcher: bool = True, use_token_matching: bool = False) -> None:
+    def __init__(self, use_fast_matcher: bool = True, use_token_matching: bool = False,
+                 use_int_matching: Optional[bool] = None) -> None:
         """
         Initialize optimized extractor.
 
@@ -174,11 +250,19 @@ class InformationExtractor:
             use_token_matching: Use token-level matching for exact difflib compatibility.
                               False (default): Character-level matching (faster, ~0.03 score difference)
                               True: Token-level matching (slower, exact difflib match)
+            use_int_matching: Match token-level batches on integer-encoded sequences
+                              (identical results). Defaults to KATO_USE_INT_MATCHING.
         """
         self.use_fast_matcher = use_fast_matcher
         self.use_token_matching = use_token_matching
         self.fast_matcher = FastSequenceMatcher() if use_fast_matcher else None
 
+        if use_int_matching is None:
+            use_int_matching = USE_INT_MATCHING
+        self.int_matcher = (IntegerMatcher()
+                            if use_int_matching and use_fast_matcher and RAPIDFUZZ_AVAILABLE
+                            else None)
+
     def _fuzzy_match_tokens(self, token1: str, token2: str) -> float:
         """
         Calculate fuzzy similarity between two tokens using RapidFuzz.
@@ -217,7 +301,8 @@ class InformationExtractor:
     def extract_prediction_info(self, pattern: list[str], state: list[str],
                                cutoff: float, fuzzy_token_threshold: float = 0.0,
                                precomputed_similarity: float = None,
-                               weights: dict[str, float] = None) -> Optional[tuple[list[str], list[str], list[str], list[str], list[str], list[str], float, int, list[dict], float]]:
+                               weights: dict[str, float] = None,
+                               alignment_engine: Optional[AlignmentEngine] = None) -> Optional[tuple[list[str], list[str], list[str], list[str], list[str], list[str], float, int, list[dict], float]]:
         """
         Extract prediction information using optimized algorithms.
 
@@ -231,6 +316,8 @@ class InformationExtractor:
             weights: Optional dict mapping symbol -> weight for affinity-weighted similarity.
                 When provided, weighted_similarity is computed using these weights.
                 When None, weighted_similarity is returned as None.
+            alignment_engine: AlignmentEngine already indexing this state, so a
+                batch of candidates indexes the state once.
 
         Returns:
             Tuple containing:
@@ -253,6 +340,7 @@ class InformationExtractor:
         if fuzzy_token_threshold is None:
             fuzzy_token_threshold = 0.0
 
+        alignment = None
         if precomputed_similarity is not None:
             similarity = precomputed_similarity
         elif self.use_fast_matcher and RAPIDFUZZ_AVAILABLE:
@@ -269,15 +357,21 @@ class InformationExtractor:
                 state_str = ' '.join(state)
                 similarity = fuzz.ratio(pattern_str, state_str) / 100.0
         else:
-            # Fall back to original SequenceMatcher
-            matcher = difflib.SequenceMatcher()
-            matcher.set_seq1(pattern)
-            matcher.set_seq2(state)
-            similarity = matcher.ratio()
+            # Fall back to the alignment's SequenceMatcher ratio
+            if alignment_engine is None:
+                alignment_engine = AlignmentEngine(state)
+            alignment = alignment_engine.align(pattern)
+            similarity = alignment.similarity
 
         if similarity < cutoff:
             return None
 
+        # Single alignment pass: matches, temporal regions, missing and extras
+        if alignment is None:
+            if alignment_engine is None:
+                alignment_engine = AlignmentEngine(state)
+            alignment = alignment_engine.align(pattern)
+
         # Extract detailed match information with optional fuzzy matching
         anomalies = []  # NEW: Track fuzzy matches that aren't exact
         matching_intersection = []
@@ -332,52 +426,18 @@ class InformationExtractor:
                                 'similarity': best_similarity
                             })
 
-            # Build a simple matcher for temporal region extraction
-            # Use pattern positions of matched tokens
-            matcher = difflib.SequenceMatcher()
-            matcher.set_seq1(pattern)
-            matcher.set_seq2(state)
-            matching_blocks = matcher.get_matching_blocks()
-            num_actual_blocks = len(matching_blocks) - 1
-
         else:
-            # Original exact matching logic (backward compatible)
-            matcher = difflib.SequenceMatcher()
-            matcher.set_seq1(pattern)
-            matcher.set_seq2(state)
-            matching_blocks = matcher.get_matching_blocks()
-
-            for block in matching_blocks[:-1]:  # Skip terminator
-                (i, j, n) = tuple(block)
-                matching_intersection += state[j:j+n]
-
-            num_actual_blocks = len(matching_blocks) - 1
-
-        # Extract temporal regions
-        # matching_blocks includes a terminator at the end, so actual matches = len(matching_blocks) - 1
-        if num_actual_blocks >= 2:
-            # We have at least 2 actual matching blocks
-            (i0, j0, n0) = tuple(matching_blocks[0])
-            (i1, j1, n1) = tuple(matching_blocks[-2])  # Last actual match (before terminator)
-
-            past = pattern[:i0]
-            present = pattern[i0:i1+n1] if i1+n1 > i0 else pattern[i0:]
-        elif num_actual_blocks == 1:
-            # Only one matching block
-            (i0, j0, n0) = tuple(matching_blocks[0])
-            (i1, _, _) = (i0, j0, n0)  # Use same values for consistency
-
-            past = pattern[:i0]
-            present = pattern[i0:i0+n0]  # Just the matching portion
-        else:
-            # No matches - only valid for threshold 0.0
-            if cutoff > 0.0:
-                return None
-            # For threshold 0.0, include even non-matching patterns
-            past = []
-            present = pattern  # Entire pattern is "present" when no matches
+            # Exact matching: the matched state symbols of the alignment blocks
+            matching_intersection = alignment.matching_intersection(state)
 
-        number_of_blocks = num_actual_blocks
+        # Extract temporal regions: present spans the first to the last
+        # matching block, or the entire pattern when nothing matches
+        number_of_blocks = alignment.number_of_blocks
+        if not number_of_blocks and cutoff > 0.0:
+            # No matches - only valid for threshold 0.0
+            return None
+        past = pattern[slice(*alignment.past)]
+        present = pattern[slice(*alignment.present)]
 
         # Extract missing and extras (respecting fuzzy matches)
         missing = []
@@ -397,17 +457,9 @@ class InformationExtractor:
                 if state_token not in fuzzy_matches:
                     extras.append(state_token)
         else:
-            # Original exact matching for missing/extras
-            if present:
-                matcher.set_seq1(present)
-                # seq2 already has the full state set from earlier
-                diffs = list(matcher.compare())
-
-                for diff in diffs:
-                    if diff.startswith("- "):
-                        missing.append(diff[2:])
-                    elif diff.startswith("+ "):
-                        extras.append(diff[2:])
+            # Exact matching: unmatched present and state ranges of the alignment
+            missing = alignment.missing(pattern)
+            extras = alignment.extras(state)
 
         # Compute affinity-weighted similarity if weights provided
         weighted_similarity = None
@@ -616,67 +668,94 @@ class PatternSearcher:
             "for pattern loading during getCandidatesViaFilterPipeline()."
         )
 
-    def getCandidatesViaFilterPipeline(self, state: list[str]) -> set[str]:
+    def getCandidatesViaFilterPipeline(self, state: list[str], sketch: Optional[Any] = None) -> set[str]:
         """
         Get candidate patterns using ClickHouse filter pipeline.
 
         Uses multi-stage filtering to reduce billions of patterns to thousands
         before loading into memory. Provides 100-300x performance improvement.
+        The run's executor and candidate sequences become this searcher's
+        filter_executor and patterns_cache; concurrent callers use
+        _run_filter_pipeline() instead.
 
         Args:
             state: Current STM state (flattened token list)
+            sketch: Optional StmSketch of the session STM state was flattened from
 
         Returns:
             Set of pattern names that passed all filters
 
+        Raises:
+            RuntimeError: If hybrid architecture is not enabled
+        """
+        candidates, sequences, executor = self._run_filter_pipeline(state, sketch)
+        self.filter_executor = executor
+        self.patterns_cache = sequences
+        self.patterns_count = len(sequences)
+        return candidates
+
+    def _run_filter_pipeline(self, state: list[str], sketch: Optional[Any] = None
+                            ) -> tuple[set[str], dict[str, list[str]], FilterPipelineExecutor]:
+        """
+        Run the filter pipeline on an executor of its own, without touching this searcher.
+
+        Concurrent predictions sharing a searcher each get their own executor
+        (state, sketch, stage metrics and run patterns) and candidate map; only
+        the process-wide pattern data cache, candidate cache and request
+        coalescer, and so the ClickHouse scans, are shared.
+
+        Args:
+            state: Current STM state (flattened token list)
+            sketch: Optional StmSketch of the session STM state was flattened from
+
+        Returns:
+            Tuple of (candidate names, flattened sequence per candidate, executor
+            holding the candidates' pattern data)
+
         Raises:
             RuntimeError: If hybrid architecture is not enabled
         """
         if not self.use_hybrid_architecture:
             raise RuntimeError("Hybrid architecture not enabled - cannot use filter pipeline")
 
-        # Create filter executor if not already initialized
-        if self.filter_executor is None:
-            self.filter_executor = FilterPipelineExecutor(
-                config=self.session_config,
-                state=state,
-                clickhouse_client=self.clickhouse_client,
-                redis_client=self.redis_client,
-                kb_id=self.kb_id,  # For ClickHouse partition pruning and node isolation
-                bloom_filter=self.bloom_filter,
-                extractor=self.extractor
-            )
-        else:
-            # Update state for new query
-            self.filter_executor.state = state
-            self.filter_executor.stage_metrics = []
+        executor = FilterPipelineExecutor(
+            config=self.session_config,
+            state=state,
+            clickhouse_client=self.clickhouse_client,
+            redis_client=self.redis_client,
+            kb_id=self.kb_id,  # For ClickHouse partition pruning and node isolation
+            bloom_filter=self.bloom_filter,
+            extractor=self.extractor,
+            sketch=sketch,
+            candidate_cache=get_candidate_cache()
+        )
 
         # Execute pipeline
         logger.info(f"Executing filter pipeline on state with {len(state)} tokens")
-        candidates = self.filter_executor.execute_pipeline()
+        candidates = executor.execute_pipeline()
+
+        # Stages carry names and scalar columns; read the sequences once, for the survivors
+        executor.materialize(candidates)
 
         # Log metrics if enabled
         if self.session_config and getattr(self.session_config, 'enable_filter_metrics', True):
-            metrics = self.filter_executor.get_metrics()
+            metrics = executor.get_metrics()
             logger.info(f"Filter pipeline complete: {metrics['final_candidates']} candidates "
                        f"after {metrics['total_stages']} stages")
 
-        # Populate patterns_cache with filtered patterns (use flattened version for matching)
-        # The executor has already cached pattern_data during database queries
-        self.patterns_cache = {}
+        # Flattened sequences of the filtered patterns, for matching. The executor
+        # has already cached pattern_data during database queries; these are
+        # references into the process-wide pattern data cache, not copies
+        sequences = {}
         for pattern_name in candidates:
-            pattern_dict = self.filter_executor.patterns_cache.get(pattern_name, {})
-            # Use pattern_data_flat for similarity matching (flattened list)
+            pattern_dict = executor.patterns_cache.get(pattern_name, {})
             pattern_data_flat = pattern_dict.get('pattern_data_flat')
             if pattern_data_flat:
-                self.patterns_cache[pattern_name] = pattern_data_flat
-                logger.debug(f"Loaded pattern {pattern_name[:20]}... with pattern_data_flat type={type(pattern_data_flat)}, "
-                           f"len={len(pattern_data_flat) if pattern_data_flat else 0}, sample={pattern_data_flat[:3] if pattern_data_flat else None}")
+                sequences[pattern_name] = pattern_data_flat
 
-        self.patterns_count = len(self.patterns_cache)
-        logger.info(f"Loaded {self.patterns_count} filtered patterns into cache")
+        logger.info(f"Loaded {len(sequences)} filtered patterns for matching")
 
-        return candidates
+        return candidates, sequences, executor
 
     def assignNewlyLearnedToWorkers(self, index: int, pattern_name: str,
                                    new_pattern: list[str]) -> None:
@@ -688,6 +767,26 @@ class PatternSearcher:
             pattern_name: Unique pattern identifier (e.g., 'PTRN|<hash>').
             new_pattern: Pattern data as flattened list of symbols.
         """
+        self._add_to_indices(pattern_name, new_pattern)
+        self._invalidate_pattern_cache()
+        self._record_kb_write(new_pattern[:1])
+        logger.debug(f"Added new pattern {pattern_name} to indices")
+
+    def assignNewlyLearnedBatch(self, patterns: list[tuple[str, list[str]]]) -> None:
+        """
+        Add many newly learned patterns to indices (bulk learn).
+
+        Args:
+            patterns: List of (pattern_name, flattened symbols) tuples.
+        """
+        for pattern_name, new_pattern in patterns:
+            self._add_to_indices(pattern_name, new_pattern)
+        if patterns:
+            self._invalidate_pattern_cache()
+            self._record_kb_write({pattern[0] for _, pattern in patterns if pattern})
+        logger.debug(f"Added {len(patterns)} new patterns to indices")
+
+    def _add_to_indices(self, pattern_name: str, new_pattern: list[str]) -> None:
         self.patterns_count += 1
         self.patterns_cache[pattern_name] = new_pattern
 
@@ -697,7 +796,8 @@ class PatternSearcher:
         if self.index_manager:
             self.index_manager.add_pattern(pattern_name, new_pattern)
 
-        # Invalidate Redis cache when new patterns are learned
+    def _invalidate_pattern_cache(self) -> None:
+        """Invalidate the Redis pattern cache after new patterns are learned."""
         if self.redis_cache:
             try:
                 import asyncio
@@ -711,7 +811,20 @@ class PatternSearcher:
             except Exception as e:
                 logger.warning(f"Failed to invalidate pattern cache: {e}")
 
-        logger.debug(f"Added new pattern {pattern_name} to indices")
+    def _record_kb_write(self, first_symbols: Optional[Iterable[str]] = None) -> None:
+        """
+        Invalidate results cached on this kb's contents (in all processes).
+
+        Args:
+            first_symbols: First symbols of newly learned patterns, whose
+                single-symbol predictions changed; None when patterns were
+                deleted or cleared
+        """
+        get_candidate_cache().bump(self.kb_id, self.redis_client)
+        if first_symbols is None:
+            get_single_symbol_predictions().invalidate_kb(self.kb_id, self.redis_client)
+        else:
+            get_single_symbol_predictions().invalidate(self.kb_id, first_symbols, self.redis_client)
 
     def delete_pattern(self, name: str) -> bool:
         """
@@ -723,6 +836,11 @@ class PatternSearcher:
         Returns:
             True if pattern was found and deleted
         """
+        get_pattern_data_cache().discard(self.kb_id, name)
+        self._record_kb_write()
+        if self.filter_executor is not None:
+            self.filter_executor.patterns_cache.pop(name, None)
+
         if name not in self.patterns_cache:
             return False
 
@@ -736,6 +854,9 @@ class PatternSearcher:
         if self.index_manager:
             self.index_manager.remove_pattern(name)
 
+        if self.extractor.int_matcher is not None:
+            self.extractor.int_matcher.forget(name)
+
         # Note: fast_matcher doesn't have efficient delete, would need rebuild
 
         logger.debug(f"Deleted pattern {name}")
@@ -752,6 +873,14 @@ class PatternSearcher:
         self._pattern_strings_cache.clear()  # Clear RapidFuzz string cache
         self.patterns_cache.clear()
 
+        # Drop this kb's rows from the shared pattern data cache, the stage
+        # statistics learned on its former contents and its candidate sets
+        get_pattern_data_cache().drop_kb(self.kb_id)
+        get_filter_stage_stats().drop_kb(self.kb_id)
+        self._record_kb_write()
+        if self.filter_executor is not None:
+            self.filter_executor.patterns_cache = {}
+
         if self.fast_matcher:
             self.fast_matcher.clear()
 
@@ -759,6 +888,14 @@ class PatternSearcher:
             # Recreate clean index manager
             self.index_manager = IndexManager()
 
+        if self.extractor.int_matcher is not None:
+            self.extractor.int_matcher.clear()
+
+        # Release this kb's shared-memory arena in the matcher pool
+        matcher_pool = get_matcher_pool()
+        if matcher_pool is not None:
+            matcher_pool.drop_arena(self.kb_id)
+
     def causalBelief(self, state: list[str],
                     target_class_candidates: Optional[list[str]] = None,
                     stm_events: Optional[list[list[str]]] = None) -> list[dict[str, Any]]:
@@ -857,7 +994,7 @@ class PatternSearcher:
                 if self.filter_executor is None:
                     raise RuntimeError("FilterPipelineExecutor not initialized - hybrid architecture required")
 
-                pattern_data = self.filter_executor.patterns_cache.get(pattern_hash, {})
+                pattern_data = self.filter_executor.get_pattern(pattern_hash)
 
                 if pattern_data:
                     pred = Prediction(
@@ -919,6 +1056,10 @@ class PatternSearcher:
             candidates: Candidate pattern IDs
             results: Output list for results
         """
+        if self._use_int_matching():
+            results.extend(self._process_batch_int(state, candidates, self.affinity_weights))
+            return
+
         # Prepare choices based on matching mode
         choices = {}
 
@@ -966,6 +1107,7 @@ class PatternSearcher:
             )
 
             # Process matches above threshold
+            engine = AlignmentEngine(state)
             for _choice_str, score, pattern_id in matches:
                 similarity = score / 100.0
 
@@ -982,7 +1124,7 @@ class PatternSearcher:
                     info = self.extractor.extract_prediction_info(
                         pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold,
                         precomputed_similarity=similarity,
-                        weights=self.affinity_weights)
+                        weights=self.affinity_weights, alignment_engine=engine)
 
                     logger.debug(f"extract_prediction_info returned info={'NOT_NONE' if info else 'NONE'} for pattern_id={pattern_id[:20]}...")
 
@@ -992,73 +1134,34 @@ class PatternSearcher:
     def _process_with_original(self, state: list[str],
                               candidates: list[str], results: list):
         """
-        Process candidates using original SequenceMatcher.
+        Process candidates using the SequenceMatcher-compatible alignment engine.
 
         Args:
             state: Current state
             candidates: Candidate pattern IDs
             results: Output list for results
         """
-        pattern_matcher = difflib.SequenceMatcher()
-        pattern_matcher.set_seq2(state)
+        engine = AlignmentEngine(state)
 
         for pattern_id in candidates:
             if pattern_id in self.patterns_cache:
                 pattern_seq = self.patterns_cache[pattern_id]
 
-                # Use original extraction logic
-                pattern_matcher.set_seq1(pattern_seq)
-                similarity = pattern_matcher.ratio()
+                # One alignment gives the similarity and all extracted fields
+                alignment = engine.align(pattern_seq)
+                similarity = alignment.similarity
 
                 if similarity >= (self.recall_threshold if self.recall_threshold is not None else 0.1):
-                    # Extract detailed information
-                    matching_intersection = []
-                    matching_blocks = pattern_matcher.get_matching_blocks()
-
-                    for block in matching_blocks[:-1]:
-                        (i, j, n) = tuple(block)
-                        matching_intersection += state[j:j+n]
-
-                    # Extract temporal regions (same as original)
-                    # matching_blocks includes a terminator at the end, so actual matches = len(matching_blocks) - 1
-                    num_actual_blocks = len(matching_blocks) - 1
-
-                    if num_actual_blocks >= 1:  # Changed from >= 2 to handle single blocks
-                        if num_actual_blocks == 1:
-                            # Single matching block case
-                            (i0, j0, n0) = tuple(matching_blocks[0])
-
-                            past = pattern_seq[:i0]
-                            present = pattern_seq[i0:i0+n0]
+                    number_of_blocks = alignment.number_of_blocks
 
-                            # For single block, set values for consistency
-                            (i1, j1, n1) = (i0, j0, n0)  # Set for consistency
-                        else:
-                            # Multiple matching blocks (2+)
-                            (i0, j0, n0) = tuple(matching_blocks[0])
-                            (i1, j1, n1) = tuple(matching_blocks[-2])  # Last actual match (before terminator)
+                    if number_of_blocks >= 1:
+                        matching_intersection = alignment.matching_intersection(state)
+                        past = pattern_seq[slice(*alignment.past)]
+                        present = pattern_seq[slice(*alignment.present)]
 
-                            past = pattern_seq[:i0]
-                            present = pattern_seq[i0:i1+n1] if i1+n1 > i0 else pattern_seq[i0:]
-
-
-                        number_of_blocks = num_actual_blocks
-
-                        # Extract anomalies using original approach
-                        # The original code compared present against the full state
-                        missing = []
-                        extras = []
-
-                        pattern_matcher.set_seq1(present)
-                        # seq2 already has the full state from earlier
-                        # pattern_matcher.set_seq2(state) was already done above
-
-                        diffs = list(pattern_matcher.compare())
-                        for diff in diffs:
-                            if diff.startswith("- "):
-                                missing.append(diff[2:])
-                            elif diff.startswith("+ "):
-                                extras.append(diff[2:])
+                        # Unmatched symbols of present and of the full state
+                        missing = alignment.missing(pattern_seq)
+                        extras = alignment.extras(state)
 
                         # Compute affinity-weighted similarity if weights available
                         _weighted_sim = None
@@ -1084,7 +1187,7 @@ class PatternSearcher:
                         number_of_blocks = 0
 
                         results.append((
-                            pattern_id, pattern_seq, matching_intersection,
+                            pattern_id, pattern_seq, [],
                             past, present, missing, extras,
                             similarity, number_of_blocks, [],  # anomalies (empty for non-fuzzy matching)
                             None  # weighted_similarity (no matches to weight)
@@ -1094,7 +1197,10 @@ class PatternSearcher:
                                target_class_candidates: Optional[list[str]] = None,
                                stm_events: Optional[list[list[str]]] = None,
                                max_workers: Optional[int] = None,
-                               batch_size: int = 100) -> list[dict[str, Any]]:
+                               batch_size: int = 100,
+                               affinity_weights: Optional[dict[str, float]] = None,
+                               top_k: Optional[int] = None,
+                               sketch: Optional[Any] = None) -> list[dict[str, Any]]:
         """
         Async parallel version of causalBelief for high-performance pattern matching.
 
@@ -1109,23 +1215,44 @@ class PatternSearcher:
             target_class_candidates: Optional list of specific pattern names
             max_workers: Max thread pool workers (defaults to CPU count)
             batch_size: Number of patterns per batch for parallel processing
+            affinity_weights: Per-symbol match weights for this call; defaults to
+                self.affinity_weights. Passing them keeps concurrent callers
+                sharing this searcher from seeing each other's weights.
+            top_k: Number of predictions the caller keeps by pre_potential().
+                With KATO_TOPK_BOUNDED_MATCHING, candidates that cannot reach
+                the top_k are not aligned; every prediction tied with or above
+                the top_k-th pre-potential is still returned.
+            sketch: Optional StmSketch of stm_events for the filter pipeline
 
         Returns:
-            List of prediction dictionaries sorted by potential/relevance.
+            LeanPredictions sorted by potential/relevance; callers materialize()
+            the ones they keep.
         """
+        if affinity_weights is None:
+            affinity_weights = self.affinity_weights
+        # Candidate sequences and pattern data of this call; the filter pipeline
+        # gives each call its own, so concurrent callers never see each other's
+        sequences = self.patterns_cache
+        filter_executor = self.filter_executor
         logger.info(f"*** causalBeliefAsync called with state={state}, target_class_candidates={target_class_candidates}")
 
         # Use ClickHouse/Redis hybrid architecture if available and no target candidates specified
         if self.use_hybrid_architecture and not target_class_candidates:
             logger.info("Using ClickHouse/Redis filter pipeline for candidate selection (async)")
             # No fallback - fail fast if filter pipeline fails
-            candidate_set = self.getCandidatesViaFilterPipeline(state)
+            if get_request_coalescer().enabled:
+                # Off the event loop, so concurrent requests can join this one's batch
+                candidate_set, sequences, filter_executor = await asyncio.to_thread(
+                    self._run_filter_pipeline, state, sketch)
+            else:
+                candidate_set, sequences, filter_executor = self._run_filter_pipeline(state, sketch)
             candidates = list(candidate_set)
             logger.info(f"Filter pipeline returned {len(candidates)} candidates (async)")
         else:
             # MongoDB mode - load all patterns if not already loaded
             if self.patterns_count == 0:
                 await self.getPatternsAsync()
+                sequences = self.patterns_cache
             candidates = None
 
         # Default max_workers to CPU count
@@ -1141,7 +1268,7 @@ class PatternSearcher:
             # Convert set to list for slicing
             candidates = list(candidates)
         elif candidates is None:
-            candidates = target_class_candidates if target_class_candidates else list(self.patterns_cache.keys())
+            candidates = target_class_candidates if target_class_candidates else list(sequences.keys())
 
         # Split candidates into batches for parallel processing
         candidate_batches = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
@@ -1152,22 +1279,40 @@ class PatternSearcher:
         fuzzy_token_threshold = getattr(self.session_config, 'fuzzy_token_threshold', 0.0) if self.session_config else 0.0
 
         all_results = []
-        if use_process_pool:
+        matcher_pool = get_matcher_pool()
+        recall_threshold = self.recall_threshold if self.recall_threshold is not None else 0.1
+        # Bounds assume exact token matching; fuzzy matches can exceed them
+        bounded = (TOPK_BOUNDED_MATCHING and top_k is not None and top_k > 0
+                   and not fuzzy_token_threshold and len(candidates) > top_k)
+        if bounded:
+            active_list = await self._match_top_k(state, candidates, top_k, stm_events,
+                                                  affinity_weights, batch_size,
+                                                  sequences, filter_executor)
+        elif use_process_pool and matcher_pool is not None and matcher_pool.running:
+            # Persistent pool: workers already hold this kb's patterns in shared
+            # memory, so only candidate indices and the STM cross the boundary
+            logger.debug(f"Using MatcherPool ({matcher_pool.workers} workers) for {len(candidates)} candidates")
+            all_results = await matcher_pool.match(
+                self.kb_id, candidates, sequences, state,
+                recall_threshold, self.use_token_matching, fuzzy_token_threshold,
+                weights=affinity_weights, batch_size=batch_size
+            )
+        elif use_process_pool:
             # ProcessPoolExecutor: true CPU parallelism for GIL-bound extract_prediction_info
             # Use fewer workers than ThreadPool due to higher per-process overhead
             process_workers = min(multiprocessing.cpu_count(), 4)
             logger.debug(f"Using ProcessPoolExecutor with {process_workers} workers for {len(candidates)} candidates")
 
             # Prepare batch data: extract pattern sequences from cache (must be picklable)
-            recall_threshold = self.recall_threshold if self.recall_threshold is not None else 0.1
             with concurrent.futures.ProcessPoolExecutor(max_workers=process_workers) as executor:
                 futures = []
                 for batch in candidate_batches:
-                    batch_data = [(pid, self.patterns_cache[pid]) for pid in batch if pid in self.patterns_cache]
+                    batch_data = [(pid, sequences[pid]) for pid in batch if pid in sequences]
                     if batch_data:
                         future = executor.submit(
                             _process_batch_worker, state, batch_data,
-                            recall_threshold, self.use_token_matching, fuzzy_token_threshold
+                            recall_threshold, self.use_token_matching, fuzzy_token_threshold,
+                            affinity_weights
                         )
                         futures.append(future)
 
@@ -1184,9 +1329,11 @@ class PatternSearcher:
                 futures = []
                 for batch in candidate_batches:
                     if self.use_fast_matching and RAPIDFUZZ_AVAILABLE:
-                        future = executor.submit(self._process_batch_rapidfuzz, state, batch)
+                        future = executor.submit(self._process_batch_rapidfuzz, state, batch,
+                                                 affinity_weights, sequences)
                     else:
-                        future = executor.submit(self._process_batch_original, state, batch)
+                        future = executor.submit(self._process_batch_original, state, batch,
+                                                 affinity_weights, sequences)
                     futures.append(future)
 
                 for future in concurrent.futures.as_completed(futures):
@@ -1198,10 +1345,12 @@ class PatternSearcher:
                         logger.error(f"Error processing batch: {e}")
                         logger.error(f"Traceback: {traceback.format_exc()}")
 
-        logger.debug(f"Found {len(all_results)} matches above threshold (async parallel)")
+        if not bounded:
+            logger.debug(f"Found {len(all_results)} matches above threshold (async parallel)")
 
-        # Build Prediction objects asynchronously
-        active_list = await self._build_predictions_async(all_results, max_workers, stm_events)
+            # Build LeanPrediction objects asynchronously
+            active_list = await self._build_predictions_async(all_results, max_workers, stm_events,
+                                                              filter_executor)
 
         # Final threshold validation with defensive logging
         filtered_list = []
@@ -1234,17 +1383,125 @@ class PatternSearcher:
             # Fallback if potential is missing
             return sorted(filtered_list, key=lambda x: x.get('similarity', 0), reverse=True)
 
-    def _process_batch_rapidfuzz(self, state: list[str], candidates: list[str]) -> list:
+    async def _match_top_k(self, state: list[str], candidates: list[str], top_k: int,
+                           stm_events: Optional[list[list[str]]] = None,
+                           weights: Optional[dict[str, float]] = None,
+                           batch_size: int = 100,
+                           sequences: Optional[dict[str, list[str]]] = None,
+                           filter_executor: Optional[Any] = None) -> list[dict[str, Any]]:
+        """
+        Build predictions only for candidates that can reach the top_k by pre-potential.
+
+        Candidates are aligned in batches, in descending pre_potential_upper_bound()
+        order, while a min-heap holds the top_k pre-potentials seen so far. Once
+        the heap is full, a candidate whose bound is below its minimum cannot
+        enter, and neither can any after it, so matching stops there. The result
+        holds every prediction exhaustive matching would rank at or above the
+        top_k-th pre-potential (ties included), so predictPattern's pruning keeps
+        the same predictions.
+
+        Args:
+            state: Current state
+            candidates: Candidate pattern IDs from the filter pipeline
+            top_k: Number of predictions the caller keeps
+            stm_events: Original event-structured STM
+            weights: Affinity weights for this prediction
+            batch_size: Candidates aligned per batch
+            sequences: Candidate sequences of this call (default patterns_cache)
+            filter_executor: Executor holding the candidates' pattern data
+                (default self.filter_executor)
+
+        Returns:
+            List of LeanPredictions
+        """
+        # Batches await between each other; another caller of this searcher may
+        # replace patterns_cache meanwhile, so every batch reads this call's map
+        if sequences is None:
+            sequences = self.patterns_cache
+        if filter_executor is None:
+            filter_executor = self.filter_executor
+        bounds = self._pre_potential_bounds(state, candidates, sequences)
+        bounds.sort(key=itemgetter(0), reverse=True)
+
+        if self._use_int_matching():
+            process_batch = self._process_batch_int
+        elif self.use_fast_matching and RAPIDFUZZ_AVAILABLE:
+            process_batch = self._process_batch_rapidfuzz
+        else:
+            process_batch = self._process_batch_original
+
+        heap: list[float] = []
+        kept = []
+        aligned = 0
+        for start in range(0, len(bounds), batch_size):
+            batch = [pid for bound, pid in bounds[start:start + batch_size]
+                     if len(heap) < top_k or bound >= heap[0]]
+            if not batch:
+                break
+            aligned += len(batch)
+            results = await asyncio.to_thread(process_batch, state, batch, weights, sequences)
+            for pred in await self._build_predictions_batch(results, stm_events, filter_executor):
+                value = pre_potential(pred)
+                kept.append((value, pred))
+                if len(heap) < top_k:
+                    heapq.heappush(heap, value)
+                elif value > heap[0]:
+                    heapq.heapreplace(heap, value)
+
+        floor = heap[0] if len(heap) == top_k else float('-inf')
+        logger.debug(f"Top-K bounded matching: aligned {aligned} of {len(candidates)} candidates "
+                     f"({len(bounds)} above threshold) for top {top_k}")
+        return [pred for value, pred in kept if value >= floor]
+
+    def _pre_potential_bounds(self, state: list[str], candidates: list[str],
+                              sequences: dict[str, list[str]]) -> list[tuple[float, str]]:
+        """
+        pre_potential_upper_bound() of each candidate, as (bound, pattern_id).
+
+        With RapidFuzz token matching the similarity is computed first (it is
+        much cheaper than alignment), candidates below the recall threshold are
+        dropped and the LCS tightens the bound; otherwise bounds use lengths and
+        the state symbols missing from each pattern only.
+        """
+        state_length = len(state)
+        state_counts = Counter(state)
+
+        def unmatched(pattern_seq):
+            symbols = set(pattern_seq)
+            return sum(n for symbol, n in state_counts.items() if symbol not in symbols)
+
+        if self.use_token_matching and self.use_fast_matching and RAPIDFUZZ_AVAILABLE:
+            choices = {pid: sequences[pid] for pid in candidates if pid in sequences}
+            recall_threshold = self.recall_threshold if self.recall_threshold is not None else 0.1
+            matches = process.extract(state, choices, scorer=_lcs_ratio_scorer,
+                                      score_cutoff=recall_threshold * 100 - 1e-6, limit=None)
+            return [(pre_potential_upper_bound(len(pattern_seq), state_length, score / 100.0,
+                                               unmatched(pattern_seq)), pid)
+                    for pattern_seq, score, pid in matches]
+        return [(pre_potential_upper_bound(len(sequences[pid]), state_length,
+                                           unmatched=unmatched(sequences[pid])), pid)
+                for pid in candidates if pid in sequences]
+
+    def _process_batch_rapidfuzz(self, state: list[str], candidates: list[str],
+                                 weights: Optional[dict[str, float]] = None,
+                                 sequences: Optional[dict[str, list[str]]] = None) -> list:
         """
         Process a batch of candidates using RapidFuzz (thread-safe).
 
         Args:
             state: Current state
             candidates: Batch of candidate pattern IDs
+            weights: Affinity weights for this prediction
+            sequences: Candidate sequences to match against (default patterns_cache)
 
         Returns:
             List of match results for this batch
         """
+        if sequences is None:
+            sequences = self.patterns_cache
+        if self._use_int_matching():
+            return self._process_batch_int(state, candidates, weights, sequences)
+
         batch_results = []
 
         # Prepare choices based on matching mode
@@ -1252,10 +1509,10 @@ class PatternSearcher:
             # Token-level: Use lists directly
             choices = {}
             for pattern_id in candidates:
-                if pattern_id in self.patterns_cache:
-                    choices[pattern_id] = self.patterns_cache[pattern_id]
+                if pattern_id in sequences:
+                    choices[pattern_id] = sequences[pattern_id]
             logger.debug(f"_process_batch_rapidfuzz: candidates={len(candidates)}, "
-                       f"patterns_cache_size={len(self.patterns_cache)}, choices={len(choices)}, "
+                       f"sequences={len(sequences)}, choices={len(choices)}, "
                        f"use_token_matching={self.use_token_matching}")
             if choices:
                 sample_key = list(choices.keys())[0]
@@ -1268,8 +1525,8 @@ class PatternSearcher:
             state_str = ' '.join(state)
             choices = {}
             for pattern_id in candidates:
-                if pattern_id in self.patterns_cache:
-                    pattern_seq = self.patterns_cache[pattern_id]
+                if pattern_id in sequences:
+                    pattern_seq = sequences[pattern_id]
                     choices[pattern_id] = ' '.join(pattern_seq)
             scorer = fuzz.ratio
             query = state_str
@@ -1294,11 +1551,12 @@ class PatternSearcher:
             )
             logger.debug(f"Rapidfuzz returned {len(matches)} matches")
 
+            engine = AlignmentEngine(state)
             for _choice_str, score, pattern_id in matches:
                 similarity = score / 100.0
                 # Double-check threshold (should be redundant with score_cutoff)
                 if similarity >= (self.recall_threshold if self.recall_threshold is not None else 0.1):
-                    pattern_seq = self.patterns_cache[pattern_id]
+                    pattern_seq = sequences[pattern_id]
 
                     # Get fuzzy_token_threshold from session config
                     fuzzy_token_threshold = getattr(self.session_config, 'fuzzy_token_threshold', 0.0) if self.session_config else 0.0
@@ -1309,7 +1567,7 @@ class PatternSearcher:
                     info = self.extractor.extract_prediction_info(
                         pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold,
                         precomputed_similarity=similarity,
-                        weights=self.affinity_weights)
+                        weights=weights, alignment_engine=engine)
 
                     logger.debug(f"extract_prediction_info returned info={'NOT_NONE' if info else 'NONE'} for pattern_id={pattern_id[:20]}...")
 
@@ -1323,22 +1581,62 @@ class PatternSearcher:
 
         return batch_results
 
-    def _process_batch_original(self, state: list[str], candidates: list[str]) -> list:
+    def _use_int_matching(self) -> bool:
+        """Whether token-level batches go through the integer-encoded matcher."""
+        if self.extractor.int_matcher is None or not self.use_token_matching:
+            return False
+        # Fuzzy token matching compares token strings
+        fuzzy_token_threshold = getattr(self.session_config, 'fuzzy_token_threshold', 0.0) if self.session_config else 0.0
+        return not fuzzy_token_threshold
+
+    def _process_batch_int(self, state: list[str], candidates: list[str],
+                           weights: Optional[dict[str, float]] = None,
+                           sequences: Optional[dict[str, list[str]]] = None) -> list:
+        """
+        Process a batch of candidates on integer-encoded sequences (thread-safe).
+
+        Produces the same result tuples, in the same order, as the RapidFuzz
+        token-level path.
+
+        Args:
+            state: Current state
+            candidates: Batch of candidate pattern IDs
+            weights: Affinity weights for this prediction
+            sequences: Candidate sequences to match against (default patterns_cache)
+
+        Returns:
+            List of match results for this batch
+        """
+        if sequences is None:
+            sequences = self.patterns_cache
+        batch = [(pid, sequences[pid]) for pid in candidates if pid in sequences]
+        recall_threshold_safe = self.recall_threshold if self.recall_threshold is not None else 0.1
+        return self.extractor.int_matcher.match_batch(state, batch, recall_threshold_safe,
+                                                      _lcs_ratio_scorer, weights)
+
+    def _process_batch_original(self, state: list[str], candidates: list[str],
+                                weights: Optional[dict[str, float]] = None,
+                                sequences: Optional[dict[str, list[str]]] = None) -> list:
         """
         Process a batch of candidates using original algorithm (thread-safe).
 
         Args:
             state: Current state
             candidates: Batch of candidate pattern IDs
+            weights: Affinity weights for this prediction
+            sequences: Candidate sequences to match against (default patterns_cache)
 
         Returns:
             List of match results for this batch
         """
+        if sequences is None:
+            sequences = self.patterns_cache
         batch_results = []
+        engine = AlignmentEngine(state)
 
         for pattern_id in candidates:
-            if pattern_id in self.patterns_cache:
-                pattern_seq = self.patterns_cache[pattern_id]
+            if pattern_id in sequences:
+                pattern_seq = sequences[pattern_id]
 
                 # Get fuzzy_token_threshold from session config
                 fuzzy_token_threshold = getattr(self.session_config, 'fuzzy_token_threshold', 0.0) if self.session_config else 0.0
@@ -1348,7 +1646,7 @@ class PatternSearcher:
                 recall_threshold_safe = self.recall_threshold if self.recall_threshold is not None else 0.1
                 info = self.extractor.extract_prediction_info(
                     pattern_seq, state, recall_threshold_safe, fuzzy_token_threshold,
-                    weights=self.affinity_weights)
+                    weights=weights, alignment_engine=engine)
 
                 if info and len(info) >= 9:
                     similarity = info[6] if len(info) > 6 else 0.0
@@ -1362,17 +1660,19 @@ class PatternSearcher:
 
         return batch_results
 
-    async def _build_predictions_async(self, results: list, max_workers: int, stm_events: Optional[list[list[str]]] = None) -> list[dict[str, Any]]:
+    async def _build_predictions_async(self, results: list, max_workers: int, stm_events: Optional[list[list[str]]] = None,
+                                       filter_executor: Optional[Any] = None) -> list[dict[str, Any]]:
         """
-        Build Prediction objects from results asynchronously.
+        Build LeanPrediction objects from results asynchronously.
 
         Args:
             results: List of match results
             max_workers: Maximum concurrent workers
             stm_events: Original event-structured STM for calculating event-aligned missing/extras
+            filter_executor: Executor holding the patterns' data (default self.filter_executor)
 
         Returns:
-            List of prediction dictionaries
+            List of LeanPredictions
         """
         if not results:
             return []
@@ -1384,7 +1684,7 @@ class PatternSearcher:
         # Process batches concurrently
         tasks = []
         for batch in result_batches:
-            task = asyncio.create_task(self._build_predictions_batch(batch, stm_events))
+            task = asyncio.create_task(self._build_predictions_batch(batch, stm_events, filter_executor))
             tasks.append(task)
 
         # Gather all predictions
@@ -1400,7 +1700,8 @@ class PatternSearcher:
 
         return active_list
 
-    async def _build_predictions_batch(self, batch: list, stm_events: Optional[list[list[str]]] = None) -> list[dict[str, Any]]:
+    async def _build_predictions_batch(self, batch: list, stm_events: Optional[list[list[str]]] = None,
+                                       filter_executor: Optional[Any] = None) -> list[dict[str, Any]]:
         """
         Build predictions for a batch of results.
 
@@ -1409,9 +1710,10 @@ class PatternSearcher:
         Args:
             batch: Batch of match results
             stm_events: Original event-structured STM for calculating event-aligned missing/extras
+            filter_executor: Executor holding the patterns' data (default self.filter_executor)
 
         Returns:
-            List of prediction dictionaries for this batch
+            List of LeanPredictions for this batch
         """
         predictions = []
 
@@ -1426,7 +1728,9 @@ class PatternSearcher:
         if self.redis_client:
             redis_writer = RedisWriter(self.kb_id, self.redis_client)
 
-        if self.filter_executor is None:
+        if filter_executor is None:
+            filter_executor = self.filter_executor
+        if filter_executor is None:
             raise RuntimeError("FilterPipelineExecutor not initialized - hybrid architecture required")
 
         # Pre-load all pattern metadata in a single batch call
@@ -1446,7 +1750,7 @@ class PatternSearcher:
                 weighted_similarity = result[10] if len(result) > 10 else None
 
                 # Hybrid architecture: pattern data already in filter_executor cache from pipeline
-                pattern_dict = self.filter_executor.patterns_cache.get(pattern_hash, {})
+                pattern_dict = filter_executor.get_pattern(pattern_hash)
                 if pattern_dict:
                     # Use pre-loaded metadata from batch call
                     metadata = metadata_batch.get(pattern_hash, {'name': pattern_hash, 'frequency': 1})
@@ -1470,7 +1774,7 @@ class PatternSearcher:
                         'metadata': metadata.get('metadata', {})
                     }
 
-                    pred = Prediction(
+                    pred = LeanPrediction(
                         pattern_data,
                         matching_intersection,
                         past, present,
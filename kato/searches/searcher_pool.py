@@ -0,0 +1,167 @@
+"""
+Pool of PatternSearcher instances keyed by matching configuration.
+
+PatternProcessor matches observations and get_predictions_async calls
+with the session's configuration (recall threshold, prediction limit,
+filter pipeline, ...) without touching the processor's own searcher. Building a PatternSearcher
+per call means every prediction starts with a fresh filter executor,
+string cache and extractor. The pool keeps idle searchers per
+configuration hash instead, so sessions with the same effective matching
+configuration reuse warm searchers.
+
+A searcher holds per-call state (its working set of candidates) while a
+prediction runs, so it is leased exclusively: a concurrent call with the
+same configuration gets another idle searcher or builds a new one. At most
+max_size idle searchers are kept per pool (one pool per processor, i.e. per
+node); the least recently used configurations are dropped first.
+
+Configuration:
+    KATO_SEARCHER_POOL_SIZE  idle searchers kept per node (default 16, 0 disables)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from os import environ
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger('kato.searches.searcher_pool')
+
+SEARCHER_POOL_SIZE = int(environ.get('KATO_SEARCHER_POOL_SIZE', '16'))
+
+
+def matching_config_key(max_predictions: int, recall_threshold: float,
+                        use_token_matching: bool, session_config: Any = None) -> str:
+    """
+    Hash of the configuration a PatternSearcher matches with.
+
+    Args:
+        max_predictions: Prediction limit passed to the searcher
+        recall_threshold: Recall threshold passed to the searcher
+        use_token_matching: Token- vs character-level matching
+        session_config: SessionConfiguration whose set parameters (filter
+            pipeline and filter parameters, fuzzy threshold, ...) the
+            searcher reads
+
+    Returns:
+        Hex digest identifying the configuration
+    """
+    config = session_config.get_config_only() if session_config is not None else {}
+    config.update(max_predictions=max_predictions, recall_threshold=recall_threshold,
+                  use_token_matching=use_token_matching)
+    encoded = json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class SearcherPool:
+    """Thread-safe pool of idle PatternSearchers per configuration key."""
+
+    def __init__(self, max_size: int = SEARCHER_POOL_SIZE):
+        self.max_size = max_size
+        self._idle: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._size = 0
+        self._leased = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by clear(); searchers leased before it are not returned to the pool
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Lease an idle searcher for key, or build one with factory().
+
+        Args:
+            key: matching_config_key() of the caller's configuration
+            factory: Builds a PatternSearcher for this configuration
+
+        Returns:
+            A searcher no other caller holds until release()
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                searcher = idle.pop()
+                self._size -= 1
+                if not idle:
+                    del self._idle[key]
+                self.hits += 1
+                self._leased += 1
+                return searcher
+            self.misses += 1
+            self._leased += 1
+
+        try:
+            return factory()
+        except Exception:
+            with self._lock:
+                self._leased -= 1
+            raise
+
+    def release(self, key: str, searcher: Any, generation: Optional[int] = None) -> None:
+        """
+        Return a leased searcher to the pool, dropping the oldest idle ones over max_size.
+
+        Args:
+            key: Key the searcher was acquired with
+            searcher: The leased searcher
+            generation: self.generation when it was acquired; searchers
+                leased before a clear() are discarded
+        """
+        with self._lock:
+            self._leased -= 1
+            if self.max_size <= 0 or (generation is not None and generation != self._generation):
+                return
+            self._idle.setdefault(key, []).append(searcher)
+            self._idle.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_size:
+                oldest_key, oldest = next(iter(self._idle.items()))
+                oldest.pop(0)
+                self._size -= 1
+                self.evictions += 1
+                if not oldest:
+                    del self._idle[oldest_key]
+                logger.debug(f"Searcher pool over {self.max_size} idle searchers, dropped one for {oldest_key[:12]}")
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @contextmanager
+    def lease(self, key: str, factory: Callable[[], Any]) -> Iterator[Any]:
+        """Context manager around acquire() and release()."""
+        generation = self._generation
+        searcher = self.acquire(key, factory)
+        try:
+            yield searcher
+        finally:
+            self.release(key, searcher, generation)
+
+    def clear(self) -> int:
+        """Drop all idle searchers (e.g. after patterns are deleted); returns how many."""
+        with self._lock:
+            dropped = self._size
+            self._generation += 1
+            self._idle.clear()
+            self._size = 0
+            return dropped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool size and reuse metrics."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'configs': len(self._idle),
+                'leased': self._leased,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reuse_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+            }
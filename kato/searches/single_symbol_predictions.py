@@ -0,0 +1,237 @@
+"""
+Materialized single-symbol predictions.
+
+A one-symbol STM is predicted from the patterns whose first token is that
+symbol (PatternProcessor._predict_single_symbol_fast). Apart from each
+pattern's frequency and emotives, read from Redis per call, the
+predictions and their order by potential depend only on the kb's patterns
+starting with the symbol and on the matching mode. They are kept here per
+(kb_id, symbol, use_token_matching), built on the first prediction of the
+symbol, so later predictions are a lookup plus one metadata read for the
+returned predictions instead of a ClickHouse scan and an alignment per
+matching pattern.
+
+Invalidation is incremental: learning a new pattern bumps the write
+version (kato.storage.kb_write_versions) of its first symbol only;
+deleting patterns or clearing the kb bumps the kb's. For
+KATO_SINGLE_SYMBOL_SETTLE_MS after a write the affected symbols are
+predicted without storing the result.
+
+Entries keep the KATO_SINGLE_SYMBOL_DEPTH best predictions (more when a
+caller asks for more) and are evicted least recently used once the
+process holds KATO_SINGLE_SYMBOL_MAX_PREDICTIONS predictions.
+
+With KATO_SINGLE_SYMBOL_TOP_K set, a symbol is predicted from only its K
+most frequent patterns, selected in ClickHouse through the token index
+(kato.storage.token_index), instead of from every pattern it starts.
+
+Configuration:
+    KATO_SINGLE_SYMBOL_MAX_PREDICTIONS  predictions kept per process (default 200000, 0 disables)
+    KATO_SINGLE_SYMBOL_DEPTH            predictions kept per symbol (default 1000)
+    KATO_SINGLE_SYMBOL_SETTLE_MS        results not stored this long after a write (default 1000)
+    KATO_SINGLE_SYMBOL_TOP_K            most frequent patterns predicted from (default 0, all)
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from os import environ
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from kato.storage.kb_write_versions import KB_FIELD, KbWriteVersions, WriteVersion
+
+logger = logging.getLogger('kato.searches.single_symbol_predictions')
+
+SINGLE_SYMBOL_MAX_PREDICTIONS = int(environ.get('KATO_SINGLE_SYMBOL_MAX_PREDICTIONS', '200000'))
+SINGLE_SYMBOL_DEPTH = int(environ.get('KATO_SINGLE_SYMBOL_DEPTH', '1000'))
+SINGLE_SYMBOL_SETTLE_MS = float(environ.get('KATO_SINGLE_SYMBOL_SETTLE_MS', '1000'))
+SINGLE_SYMBOL_TOP_K = int(environ.get('KATO_SINGLE_SYMBOL_TOP_K', '0'))
+
+
+class SingleSymbolPredictions:
+    """
+    Thread-safe store of ranked single-symbol predictions.
+
+    Entries are lists of prediction dicts without 'frequency' and
+    'emotives', sorted by potential (descending), plus whether the list
+    holds every prediction of the symbol.
+    """
+
+    def __init__(self, max_predictions: int = SINGLE_SYMBOL_MAX_PREDICTIONS,
+                 depth: int = SINGLE_SYMBOL_DEPTH,
+                 settle_ms: float = SINGLE_SYMBOL_SETTLE_MS):
+        """
+        Initialize the store.
+
+        Args:
+            max_predictions: Predictions kept across all entries; 0 disables the store
+            depth: Predictions kept per entry (at least the caller's limit)
+            settle_ms: After a write, results of affected symbols are not stored this long
+        """
+        self.max_predictions = max(0, max_predictions)
+        self.depth = depth
+        self.versions = KbWriteVersions('single_symbol', settle_ms)
+        self._lock = threading.Lock()
+
+        # (kb_id, symbol, variant) -> (versions, ranked predictions, complete)
+        self._entries: 'OrderedDict[Tuple[str, str, Any], tuple]' = OrderedDict()
+        self.predictions = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.unsettled = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_predictions > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def begin(self, kb_id: str, symbol: str, redis_client: Any = None) -> Optional[WriteVersion]:
+        """
+        Read the versions a prediction of symbol is checked and stored against.
+
+        Returns:
+            Versions (the ticket) for get() and put(), or None when the
+            store is disabled or the Redis versions cannot be read
+        """
+        if not self.enabled:
+            return None
+        return self.versions.read(kb_id, [symbol], redis_client)
+
+    def get(self, kb_id: str, symbol: str, variant: Any, ticket: Optional[WriteVersion],
+            limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        The limit best predictions of symbol, or None if not materialized.
+
+        Returned dicts and their lists are the stored ones and must not be
+        modified; callers copy them before adding fields.
+        """
+        if ticket is None:
+            return None
+        key = (kb_id, symbol, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != ticket.shared:
+                # Invalidated through another process
+                self._remove(key)
+                entry = None
+            if entry is None or (len(entry[1]) < limit and not entry[2]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1][:limit]
+
+    def put(self, kb_id: str, symbol: str, variant: Any, ticket: Optional[WriteVersion],
+            ranked: Sequence[Dict[str, Any]], limit: int) -> None:
+        """
+        Store the ranked predictions computed after begin() returned ticket.
+
+        Not stored while the symbol settles after a write, or when the kb was
+        written in this process since begin().
+        """
+        if ticket is None:
+            return
+        depth = max(self.depth, limit)
+        kept = list(ranked[:depth])
+        with self._lock:
+            if not ticket.settled or self.versions.written_since(kb_id, ticket):
+                self.unsettled += 1
+                return
+            if len(kept) > self.max_predictions:
+                return
+            key = (kb_id, symbol, variant)
+            self._remove(key)
+            self._entries[key] = (ticket.shared, kept, len(ranked) <= depth)
+            self.predictions += len(kept)
+            self.stores += 1
+            while self.predictions > self.max_predictions:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, kb_id: str, symbols: Iterable[str], redis_client: Any = None) -> None:
+        """Invalidate the symbols new patterns of the kb start with (call after the write)."""
+        symbols = set(symbols)
+        if symbols:
+            self._write(kb_id, symbols, redis_client)
+
+    def invalidate_kb(self, kb_id: str, redis_client: Any = None) -> None:
+        """Invalidate every symbol of the kb (patterns deleted or cleared)."""
+        self._write(kb_id, {KB_FIELD}, redis_client)
+
+    def clear(self) -> None:
+        """Remove all entries (metrics and versions are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.predictions = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, occupancy and invalidation counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'max_predictions': self.max_predictions,
+                'depth': self.depth,
+                'predictions': self.predictions,
+                'symbols': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'unsettled': self.unsettled,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'errors': self.versions.errors,
+            }
+
+    def _write(self, kb_id: str, fields: set, redis_client: Any) -> None:
+        if not self.enabled:
+            return
+        # Bump first: a put() that started before the write is then rejected
+        # or its entry removed below
+        self.versions.bump(kb_id, fields, redis_client)
+        with self._lock:
+            self.invalidations += 1
+            if KB_FIELD in fields:
+                for key in [key for key in self._entries if key[0] == kb_id]:
+                    self._remove(key)
+            else:
+                for key in [key for key in self._entries if key[0] == kb_id and key[1] in fields]:
+                    self._remove(key)
+
+    def _remove(self, key: Tuple[str, str, Any]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.predictions -= len(entry[1])
+
+
+# Global single-symbol prediction store
+_single_symbol_predictions: Optional[SingleSymbolPredictions] = None
+_single_symbol_predictions_lock = threading.Lock()
+
+
+def get_single_symbol_predictions() -> SingleSymbolPredictions:
+    """Get or create the process-wide single-symbol prediction store."""
+    global _single_symbol_predictions
+
+    if _single_symbol_predictions is None:
+        with _single_symbol_predictions_lock:
+            if _single_symbol_predictions is None:
+                _single_symbol_predictions = SingleSymbolPredictions()
+
+    return _single_symbol_predictions
+
+
+def reset_single_symbol_predictions(**kwargs: Any) -> SingleSymbolPredictions:
+    """Replace the process-wide store (tests and benchmarks)."""
+    global _single_symbol_predictions
+
+    with _single_symbol_predictions_lock:
+        _single_symbol_predictions = SingleSymbolPredictions(**kwargs)
+    return _single_symbol_predictions
@@ -255,6 +255,15 @@ async def startup_event():
         eviction_ttl_seconds=settings.session.session_ttl
     )
 
+    # Start the persistent matcher pool (shared-memory pattern arenas)
+    if settings.performance.matcher_pool_enabled:
+        from kato.searches.matcher_pool import start_matcher_pool
+        try:
+            await asyncio.to_thread(start_matcher_pool, settings.performance.matcher_pool_workers,
+                                    arena_max_bytes=settings.performance.matcher_pool_arena_max_mb * 1024 * 1024)
+        except Exception as e:
+            logger.error(f"Failed to start matcher pool, using per-request process pools: {e}")
+
     # Initialize v2 monitoring
     metrics_collector = get_metrics_collector()
     app_state.metrics_collector = metrics_collector
@@ -297,6 +306,13 @@ async def shutdown_event():
         except Exception as e:
             logger.error(f"Error shutting down processor manager: {e}")
 
+    # Stop matcher pool workers and unlink shared-memory arenas
+    from kato.searches.matcher_pool import shutdown_matcher_pool
+    try:
+        shutdown_matcher_pool()
+    except Exception as e:
+        logger.error(f"Error shutting down matcher pool: {e}")
+
     # Stop metrics collection
     if hasattr(app_state, 'metrics_collector') and app_state.metrics_collector:
         try:
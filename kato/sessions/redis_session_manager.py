@@ -11,6 +11,7 @@ import asyncio
 import json
 import logging
 import uuid
+from collections.abc import Iterable
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
@@ -20,6 +21,23 @@ import redis.asyncio as redis
 import kato.sessions.session_manager as session_manager_module
 from kato.config.session_config import SessionConfiguration
 
+from .session_layout import (
+    BLOB_PARTS,
+    LIST_PARTS,
+    LOAD_SESSION_LUA,
+    PART_ATTRIBUTES,
+    REWRITE,
+    SAVE_SESSION_LUA,
+    SESSION_PARTS,
+    USE_COMPACT_SESSIONS,
+    build_save_args,
+    decode_blob,
+    decode_item,
+    encode_blob,
+    encode_item,
+    list_delta,
+    session_keys,
+)
 from .session_manager import SessionState
 import contextlib
 
@@ -45,7 +63,8 @@ class RedisSessionManager(session_manager_module.SessionManager):
         redis_url: str = "redis://localhost:6379",
         default_ttl_seconds: int = 3600,
         key_prefix: str = "kato:session:",
-        auto_extend: bool = True
+        auto_extend: bool = True,
+        compact_layout: bool = USE_COMPACT_SESSIONS
     ):
         """
         Initialize Redis session manager.
@@ -55,12 +74,19 @@ class RedisSessionManager(session_manager_module.SessionManager):
             default_ttl_seconds: Default session TTL
             key_prefix: Prefix for Redis keys
             auto_extend: Automatically extend session TTL on access (sliding window)
+            compact_layout: Write sessions in the delta-based layout of
+                session_layout.py instead of one JSON document
         """
         super().__init__(default_ttl_seconds)
         self.redis_url = redis_url
         self.key_prefix = key_prefix
         self.auto_extend = auto_extend
+        self.compact_layout = compact_layout
         self.redis_client: Optional[redis.Redis] = None
+        # Binary client for session data (compressed parts are not UTF-8)
+        self.data_client: Optional[redis.Redis] = None
+        self._load_script = None
+        self._save_script = None
         self._connected = False
         self._init_lock = asyncio.Lock()  # CRITICAL FIX: Lock for thread-safe initialization
         # Active session index (SET of active session_ids). SCARD avoids the
@@ -152,6 +178,13 @@ class RedisSessionManager(session_manager_module.SessionManager):
                     decode_responses=True,
                     max_connections=50
                 )
+                self.data_client = redis.from_url(
+                    self.redis_url,
+                    decode_responses=False,
+                    max_connections=50
+                )
+                self._load_script = self.data_client.register_script(LOAD_SESSION_LUA)
+                self._save_script = self.data_client.register_script(SAVE_SESSION_LUA)
 
                 # Test connection
                 await self.redis_client.ping()
@@ -189,7 +222,9 @@ class RedisSessionManager(session_manager_module.SessionManager):
             session_ids: list[str] = []
             match = f"{self.key_prefix}session-*"
             async for key in self.redis_client.scan_iter(match=match, count=1000):
-                session_ids.append(key[len(self.key_prefix):])
+                session_id = key[len(self.key_prefix):]
+                if ':' not in session_id:  # skip the per-session list keys
+                    session_ids.append(session_id)
 
             if not session_ids:
                 logger.info("No existing session keys found — active sessions index left empty")
@@ -344,13 +379,17 @@ class RedisSessionManager(session_manager_module.SessionManager):
 
         return session
 
-    async def get_session(self, session_id: str, check_only: bool = False) -> Optional[SessionState]:
+    async def get_session(self, session_id: str, check_only: bool = False,
+                          parts: Optional[Iterable[str]] = None) -> Optional[SessionState]:
         """
         Get session from Redis.
 
         Args:
             session_id: Session identifier
             check_only: If True, retrieve without auto-extending (for testing expiration)
+            parts: Session parts the caller needs (see session_layout.SESSION_PARTS);
+                None reads all. Parts not read are left empty and are not
+                written back by update_session unless the caller assigns them.
 
         Returns:
             SessionState if found and not expired, None otherwise
@@ -360,37 +399,19 @@ class RedisSessionManager(session_manager_module.SessionManager):
             logger.debug("Not connected, initializing Redis connection")
             await self.initialize()
 
-        key = f"{self.key_prefix}{session_id}"
-        logger.debug(f"Looking for Redis key: {key}")
-
         try:
-            # Get session data from Redis
-            session_data = await self.redis_client.get(key)
-            logger.debug(f"Redis GET returned: {'DATA' if session_data else 'NULL'} for {key}")
-
-            if not session_data:
-                logger.debug(f"Session {session_id} NOT FOUND in Redis")
-                return None
-
-            # Deserialize session
+            # Read session data; the TTL of all session keys is refreshed in the same call
             try:
-                session_dict = json.loads(session_data)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to decode JSON for session {session_id}: {e}")
-                logger.error(f"Raw data: {session_data}")
-                return None
+                session = await self._load_session(
+                    session_id, parts, extend=self.auto_extend and not check_only)
             except Exception as e:
-                logger.error(f"Unexpected error loading JSON for session {session_id}: {e}")
+                logger.error(f"Failed to load session {session_id}: {e}")
                 import traceback
                 logger.error(f"Traceback: {traceback.format_exc()}")
                 return None
-            try:
-                session = self._deserialize_session(session_dict)
-            except Exception as e:
-                logger.error(f"Failed to deserialize session {session_id}: {e}")
-                logger.error(f"Session dict: {session_dict}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+
+            if session is None:
+                logger.debug(f"Session {session_id} NOT FOUND in Redis")
                 return None
 
             # Check if expired
@@ -407,20 +428,10 @@ class RedisSessionManager(session_manager_module.SessionManager):
 
                 # Auto-extend session TTL on access (sliding window)
                 if self.auto_extend:
-                    # Reset expiration to now + session's TTL (sliding window)
+                    # Reset expiration to now + session's TTL (sliding window). The Redis
+                    # TTL was already extended by the load, without rewriting session data
                     session.expires_at = datetime.now(timezone.utc) + timedelta(seconds=session.ttl_seconds)
-                    logger.debug(f"Auto-extending session {session_id} by {session.ttl_seconds}s (TTL-only update)")
-
-                    # CRITICAL FIX: Extend TTL immediately without overwriting session data
-                    # This prevents session expiration during long-running operations while avoiding race conditions
-                    # Uses EXPIRE command which only updates TTL, not the entire session state
-                    try:
-                        key = f"{self.key_prefix}{session_id}"
-                        await self.redis_client.expire(key, session.ttl_seconds)
-                        logger.debug(f"Session {session_id} TTL extended to {session.ttl_seconds}s in Redis")
-                    except Exception as expire_error:
-                        logger.error(f"Failed to extend TTL for {session_id}: {expire_error}")
-                        # Don't fail the request - session will retry on next access
+                    logger.debug(f"Auto-extended session {session_id} by {session.ttl_seconds}s (TTL-only update)")
 
             # Ensure lock exists (atomic operation)
             self.session_locks.setdefault(session_id, asyncio.Lock())
@@ -489,8 +500,8 @@ class RedisSessionManager(session_manager_module.SessionManager):
 
         key = f"{self.key_prefix}{session_id}"
 
-        # Delete session from Redis
-        deleted = await self.redis_client.delete(key)
+        # Delete session (hash or legacy document, plus its list keys) from Redis
+        deleted = await self.redis_client.delete(*session_keys(key))
 
         # Drop from active-sessions index regardless of whether the key was
         # found (handles cleanup after TTL expiry without a prior delete call).
@@ -673,6 +684,8 @@ class RedisSessionManager(session_manager_module.SessionManager):
 
             for key in keys:
                 session_id = key.replace(self.key_prefix, "")
+                if ':' in session_id:  # node keys, index and per-session list keys
+                    continue
                 session = await self.get_session(session_id)
                 if session:
                     sessions.append(session)
@@ -729,24 +742,162 @@ class RedisSessionManager(session_manager_module.SessionManager):
             with contextlib.suppress(asyncio.CancelledError):
                 await self._cleanup_task
 
-        # Close Redis connection
+        # Close Redis connections
+        if self.data_client:
+            await self.data_client.close()
         if self.redis_client:
             await self.redis_client.close()
             self._connected = False
 
         logger.info("RedisSessionManager shutdown complete")
 
+    async def _load_session(self, session_id: str, parts: Optional[Iterable[str]],
+                            extend: bool) -> Optional[SessionState]:
+        """
+        Read a session's core fields and the requested parts in one script call.
+
+        Args:
+            session_id: Session identifier
+            parts: Parts to read (None for all)
+            extend: Refresh the TTL of all session keys
+
+        Returns:
+            SessionState, or None if the session does not exist
+        """
+        parts = SESSION_PARTS if parts is None else tuple(parts)
+        keys = session_keys(f"{self.key_prefix}{session_id}")
+        fields = ['core', 'config'] + [part for part in BLOB_PARTS if part in parts]
+        args = [int(extend), len(fields), *fields, *(int(part in parts) for part in LIST_PARTS)]
+        result = await self._load_script(keys=keys, args=args)
+        if result is None:
+            return None
+
+        if result[0] == 0:
+            # Session stored by an older build as one JSON document
+            session = self._deserialize_session(json.loads(result[1]))
+            if extend:
+                await self.data_client.expire(keys[0], session.ttl_seconds)
+            return session
+
+        values = dict(zip(['ttl'] + fields, result[1]))
+        if values['core'] is None:
+            return None
+        session_dict = decode_item(values['core'])
+        session_dict['session_config'] = decode_item(values['config']) if values['config'] else None
+
+        # Parts not read get a placeholder, which _save_session leaves untouched
+        stored_lists, placeholders = {}, {}
+        for part, items in zip(LIST_PARTS, result[2:]):
+            attribute = PART_ATTRIBUTES[part]
+            if part in parts:
+                stored_lists[part] = items
+                session_dict[attribute] = [decode_item(item) for item in items]
+            else:
+                session_dict[attribute] = placeholders[attribute] = []
+        for part in BLOB_PARTS:
+            attribute = PART_ATTRIBUTES[part]
+            empty = {} if part == 'percept' else []
+            if part in parts:
+                session_dict[attribute] = decode_blob(values[part]) if values[part] else empty
+            else:
+                session_dict[attribute] = placeholders[attribute] = empty
+
+        session = self._deserialize_session(session_dict)
+        session._stored = {
+            'fields': {name: value for name, value in values.items() if value is not None},
+            'lists': stored_lists,
+            'placeholders': placeholders,
+        }
+        return session
+
+    def _encode_session(self, session: SessionState) -> tuple[dict[str, bytes], dict[str, Optional[list[bytes]]]]:
+        """
+        Encode a session's hash fields and list items.
+
+        Parts still holding the placeholder they were loaded with (not read,
+        not assigned) are omitted from the fields, and their list is None.
+        """
+        placeholders = getattr(session, '_stored', {}).get('placeholders', {})
+
+        def untouched(part: str) -> bool:
+            attribute = PART_ATTRIBUTES[part]
+            value = getattr(session, attribute)
+            return attribute in placeholders and value is placeholders[attribute] and not value
+
+        core = {
+            'session_id': session.session_id,
+            'node_id': session.node_id,
+            'created_at': session.created_at.isoformat(),
+            'last_accessed': session.last_accessed.isoformat(),
+            'expires_at': session.expires_at.isoformat(),
+            'ttl_seconds': session.ttl_seconds,
+            'time': session.time,
+            'metadata': session.metadata,
+            'access_count': session.access_count,
+            'max_stm_size': session.max_stm_size,
+            'max_emotives_size': session.max_emotives_size,
+            'max_metadata_size': session.max_metadata_size,
+        }
+        fields = {
+            'ttl': str(session.ttl_seconds).encode(),
+            'core': encode_item(core),
+            'config': encode_item(self._serialize_session_config(session.session_config) if session.session_config else None),
+        }
+        for part in BLOB_PARTS:
+            if not untouched(part):
+                fields[part] = encode_blob(getattr(session, PART_ATTRIBUTES[part]))
+        lists = {part: None if untouched(part) else [encode_item(item) for item in getattr(session, PART_ATTRIBUTES[part])]
+                 for part in LIST_PARTS}
+        return fields, lists
+
     async def _save_session(self, session: SessionState, ttl_seconds: int):
         """
         Save session to Redis with TTL.
 
+        Only hash fields whose encoding changed and list deltas relative to
+        what was read are sent (see session_layout.py), in one script call.
+
         Args:
             session: Session to save
             ttl_seconds: TTL in seconds
         """
+        if not self.compact_layout:
+            await self._save_session_document(session, ttl_seconds)
+            return
+
         key = f"{self.key_prefix}{session.session_id}"
-        logger.debug(f"Saving session {session.session_id} to Redis key: {key}")
+        keys = session_keys(key)
+        stored = getattr(session, '_stored', None) or {'fields': {}, 'lists': {}, 'placeholders': {}}
+        fields, lists = self._encode_session(session)
+
+        changed = {name: value for name, value in fields.items() if stored['fields'].get(name) != value}
+        deltas = [None if lists[part] is None else list_delta(stored['lists'].get(part), lists[part])
+                  for part in LIST_PARTS]
+        saved = await self._save_script(keys=keys, args=build_save_args(ttl_seconds, changed, deltas))
+        if not saved:
+            # A list changed since this session was read (another writer): rewrite what we hold
+            logger.warning(f"Session {session.session_id} changed since it was read; rewriting it")
+            deltas = [None if lists[part] is None else (REWRITE, 0, lists[part]) for part in LIST_PARTS]
+            await self._save_script(keys=keys, args=build_save_args(ttl_seconds, fields, deltas))
+        logger.debug(f"Saved session {session.session_id}: {len(changed)} fields, "
+                     f"{sum(len(d[2]) for d in deltas if d)} list items")
+
+        session._stored = {
+            'fields': {**stored['fields'], **fields},
+            'lists': {part: items for part, items in lists.items() if items is not None},
+            'placeholders': stored['placeholders'],
+        }
 
+    async def _save_session_document(self, session: SessionState, ttl_seconds: int):
+        """
+        Save session to Redis as one JSON document (compact_layout=False).
+
+        Args:
+            session: Session to save
+            ttl_seconds: TTL in seconds
+        """
+        key = f"{self.key_prefix}{session.session_id}"
+        logger.debug(f"Saving session {session.session_id} to Redis key: {key}")
         # Convert session to dict for serialization
         session_dict = {
             'session_id': session.session_id,
@@ -0,0 +1,192 @@
+"""
+Compact, delta-based Redis layout for session state.
+
+A session used to be one JSON document: every observe re-serialized and
+SETEX-ed the whole SessionState (STM, accumulators, percept data and the
+full predictions list) and verified the write with EXISTS, and every read
+decoded all of it and sent a separate EXPIRE. The layout here splits a
+session into four keys:
+
+- {prefix}{session_id}           HASH  core, config, percept, predictions
+- {prefix}{session_id}:stm       LIST  one encoded STM event per element
+- {prefix}{session_id}:emotives  LIST  one encoded emotives entry per element
+- {prefix}{session_id}:metadata  LIST  one encoded metadata entry per element
+
+Encoding: list elements, core and config are compact JSON bytes (no
+whitespace); percept and predictions are zlib-compressed compact JSON.
+Only the standard library is used.
+
+Reads (LOAD_SESSION_LUA) fetch the core hash fields plus the parts a
+request asks for, and refresh the TTL of all four keys, in one call.
+Writes (SAVE_SESSION_LUA) HSET the hash fields whose encoding changed,
+bring lists up to date by dropping a prefix (LTRIM) and appending a suffix
+(RPUSH) relative to what was read, and set the TTL of all keys, atomically
+in one call. An observe therefore ships the new STM event and accumulator
+entries, not the session. If a list's length is not what the writer read
+(another instance wrote in between), the script changes nothing and
+returns 0; the manager then rewrites the parts it holds in full.
+
+Sessions stored by older builds (a JSON string at the base key) are still
+read, and are converted to this layout by their next write.
+"""
+
+import json
+import zlib
+from os import environ
+from typing import Any, Optional
+
+USE_COMPACT_SESSIONS = environ.get('KATO_COMPACT_SESSIONS', 'true').lower() == 'true'
+
+# Optional session parts; core fields and the session config are always read
+LIST_PARTS = ('stm', 'emotives', 'metadata')
+BLOB_PARTS = ('percept', 'predictions')
+SESSION_PARTS = LIST_PARTS + BLOB_PARTS
+
+# SessionState attribute holding each part
+PART_ATTRIBUTES = {
+    'stm': 'stm',
+    'emotives': 'emotives_accumulator',
+    'metadata': 'metadata_accumulator',
+    'percept': 'percept_data',
+    'predictions': 'predictions',
+}
+
+# Delta "expected length" markers: rewrite the list / leave it untouched
+REWRITE = -1
+UNTOUCHED = -2
+
+# KEYS: hash, stm, emotives, metadata
+# ARGV: ttl, field count, (field, value) pairs,
+#       then per list: expected length, trim count, push count, items
+SAVE_SESSION_LUA = r"""
+local ttl = tonumber(ARGV[1])
+local n_fields = tonumber(ARGV[2])
+local pos = 3 + 2 * n_fields
+local deltas = {}
+for i = 2, 4 do
+    local expected = tonumber(ARGV[pos])
+    local n_push = tonumber(ARGV[pos + 2])
+    if expected >= 0 and redis.call('LLEN', KEYS[i]) ~= expected then
+        return 0
+    end
+    deltas[i] = {expected, tonumber(ARGV[pos + 1]), pos + 3, n_push}
+    pos = pos + 3 + n_push
+end
+
+-- A session stored by an older build is a JSON string at the hash key
+if redis.call('TYPE', KEYS[1]).ok == 'string' then
+    redis.call('DEL', KEYS[1])
+end
+if n_fields > 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3, 2 + 2 * n_fields))
+end
+
+for i = 2, 4 do
+    local expected, trim, first, n_push = deltas[i][1], deltas[i][2], deltas[i][3], deltas[i][4]
+    if expected == -1 or (expected > 0 and trim >= expected) then
+        redis.call('DEL', KEYS[i])
+    elseif trim > 0 then
+        redis.call('LTRIM', KEYS[i], trim, -1)
+    end
+    local last = first + n_push - 1
+    while first <= last do
+        local stop = math.min(first + 999, last)
+        redis.call('RPUSH', KEYS[i], unpack(ARGV, first, stop))
+        first = stop + 1
+    end
+end
+
+for i = 1, 4 do
+    redis.call('EXPIRE', KEYS[i], ttl)
+end
+return 1
+"""
+
+# KEYS: hash, stm, emotives, metadata
+# ARGV: extend (1/0), field count, fields, then a 1/0 flag per list
+# Returns nil (no session), {0, json} (older build's document) or
+# {1, {ttl, fields...}, stm, emotives, metadata}; TTLs are refreshed
+# from the stored ttl field when extend is 1
+LOAD_SESSION_LUA = r"""
+local kind = redis.call('TYPE', KEYS[1]).ok
+if kind == 'none' then
+    return false
+end
+if kind == 'string' then
+    return {0, redis.call('GET', KEYS[1])}
+end
+local n_fields = tonumber(ARGV[2])
+local values = redis.call('HMGET', KEYS[1], 'ttl', unpack(ARGV, 3, 2 + n_fields))
+local result = {1, values}
+for i = 1, 3 do
+    if ARGV[2 + n_fields + i] == '1' then
+        result[2 + i] = redis.call('LRANGE', KEYS[1 + i], 0, -1)
+    else
+        result[2 + i] = {}
+    end
+end
+if ARGV[1] == '1' and values[1] then
+    for i = 1, 4 do
+        redis.call('EXPIRE', KEYS[i], values[1])
+    end
+end
+return result
+"""
+
+
+def session_keys(base_key: str) -> list[str]:
+    """Hash key and the STM, emotives and metadata list keys of a session."""
+    return [base_key] + [f"{base_key}:{part}" for part in LIST_PARTS]
+
+
+def encode_item(value: Any) -> bytes:
+    """Compact JSON bytes of one list element or hash field."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def decode_item(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def encode_blob(value: Any) -> bytes:
+    """zlib-compressed compact JSON, for percept data and predictions."""
+    return zlib.compress(encode_item(value), 1)
+
+
+def decode_blob(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+def list_delta(stored: Optional[list[bytes]], current: list[bytes]) -> tuple[int, int, list[bytes]]:
+    """
+    Smallest change turning the stored list into the current one.
+
+    Finds the shortest prefix of the stored list to drop so that the rest is
+    a prefix of the current list (append: 0, rolling window: 1, cleared:
+    everything), and returns (expected stored length, prefix length, items to
+    append). Without a stored list the whole current list is rewritten.
+    """
+    if stored is None:
+        return REWRITE, 0, current
+    n = len(stored)
+    for trim in range(n + 1):
+        kept = n - trim
+        if kept <= len(current) and (kept == 0 or stored[trim] == current[0]) and stored[trim:] == current[:kept]:
+            return n, trim, current[kept:]
+    return n, n, current
+
+
+def build_save_args(ttl_seconds: int, fields: dict[str, bytes],
+                    deltas: list[Optional[tuple[int, int, list[bytes]]]]) -> list:
+    """ARGV for SAVE_SESSION_LUA; a None delta leaves that list untouched."""
+    args: list = [ttl_seconds, len(fields)]
+    for name, value in fields.items():
+        args.extend((name, value))
+    for delta in deltas:
+        if delta is None:
+            args.extend((UNTOUCHED, 0, 0))
+        else:
+            expected, trim, items = delta
+            args.extend((expected, trim, len(items)))
+            args.extend(items)
+    return args
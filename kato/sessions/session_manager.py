@@ -12,6 +12,7 @@ import asyncio
 import logging
 import time
 import uuid
+from collections.abc import Iterable
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
@@ -192,12 +193,15 @@ class SessionManager:
 
         return session
 
-    async def get_session(self, session_id: str) -> Optional[SessionState]:
+    async def get_session(self, session_id: str,
+                          parts: Optional[Iterable[str]] = None) -> Optional[SessionState]:
         """
         Retrieve session by ID.
 
         Args:
             session_id: Session identifier
+            parts: Session parts the caller needs; in-memory sessions are
+                always complete, so this only matters for Redis storage
 
         Returns:
             SessionState if found and not expired, None otherwise
@@ -10,6 +10,8 @@ from typing import Any, Optional
 
 from typing import Any as Collection  # Was pymongo.Collection; now duck-typed interface from knowledge_base.py
 
+from .symbol_table import USE_INCREMENTAL_SYMBOL_TABLE
+
 logger = logging.getLogger(__name__)
 
 
@@ -244,10 +246,22 @@ class OptimizedQueryManager:
         self._cache_valid = False
 
     def invalidate_caches(self):
-        """Invalidate internal caches when data changes."""
+        """
+        Invalidate internal caches when data changes.
+
+        The incremental symbol table is not reset here: it tracks learns
+        through the symbols version and change log.
+        """
         self._symbol_cache = {}
         self._cache_valid = False
 
+    def _symbol_table(self):
+        """The kb's incremental symbol table, or None when disabled/unavailable."""
+        if not USE_INCREMENTAL_SYMBOL_TABLE:
+            return None
+        redis_writer = getattr(self.superkb, 'redis_writer', None)
+        return redis_writer.symbol_table if redis_writer is not None else None
+
     def get_patterns_optimized(self, limit: Optional[int] = None) -> dict[str, list[str]]:
         """
         Get patterns using optimized aggregation pipeline.
@@ -275,14 +289,21 @@ class OptimizedQueryManager:
         """
         Get all symbols with caching.
 
-        Returns cached symbols if available. Cache is invalidated when
-        patterns are learned (via invalidate_caches()).
+        With the incremental symbol table (KATO_INCREMENTAL_SYMBOL_TABLE, default
+        on) this returns the in-process table, which applies learn deltas and
+        catches up from the Redis change log. Otherwise returns cached symbols
+        if available; that cache is invalidated when patterns are learned (via
+        invalidate_caches()).
 
         Args:
             collection: Symbol collection to query (used on cache miss)
 
         Returns: Dict mapping symbol names to symbol documents
         """
+        table = self._symbol_table()
+        if table is not None:
+            return table.get_all()
+
         if self._cache_valid and self._symbol_cache:
             logger.debug(f"Returning cached symbol table ({len(self._symbol_cache)} symbols)")
             return self._symbol_cache
@@ -299,16 +320,12 @@ class OptimizedQueryManager:
         Returns: Dict mapping symbol names to frequencies
         """
         # No fallback - fail fast if Redis is unavailable
-        if not self._cache_valid:
-            self._symbol_cache = self.pipelines.get_all_symbols_optimized(
-                self.superkb.symbols_kb
-            )
-            self._cache_valid = True
+        symbol_cache = self.get_all_symbols_optimized(self.superkb.symbols_kb)
 
         result = {}
         for symbol in symbols:
-            if symbol in self._symbol_cache:
-                result[symbol] = self._symbol_cache[symbol].get("frequency", 0)
+            if symbol in symbol_cache:
+                result[symbol] = symbol_cache[symbol].get("frequency", 0)
             else:
                 result[symbol] = 0
 
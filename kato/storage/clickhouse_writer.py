@@ -5,11 +5,14 @@ Handles writing pattern data to ClickHouse patterns_data table with:
 - Pattern data and metadata
 - MinHash signatures for LSH
 - LSH bands for fast similarity search
-- Token sets for filtering
+- LSH band buckets (lsh_buckets table) for point-lookup candidate retrieval
+- First/last token index (pattern_token_index table) with mirrored frequencies
+- Token sets for filtering (as dictionary IDs with a TokenDictionary, schema v2)
 - Buffered batch inserts for high-throughput learning
 """
 
 import logging
+import threading
 from datetime import datetime
 from itertools import chain
 from os import environ
@@ -17,6 +20,8 @@ from typing import Any
 
 from datasketch import MinHash
 
+from kato.storage.token_index import POSITIONS, TOKEN_INDEX_COLUMNS, USE_TOKEN_INDEX, token_index_rows
+
 # Optional xxhash for faster MinHash computation (~3-5x speedup)
 try:
     import xxhash
@@ -40,6 +45,48 @@ def _get_minhash_hashfunc():
 
 _MINHASH_HASHFUNC = _get_minhash_hashfunc()
 
+# MinHash signature and LSH banding: LSH_BANDS bands of LSH_ROWS_PER_BAND rows
+MINHASH_NUM_PERM = 100
+LSH_BANDS = 20
+LSH_ROWS_PER_BAND = MINHASH_NUM_PERM // LSH_BANDS
+
+# Column order for kato.lsh_buckets inserts (one row per LSH band per pattern).
+# pattern_length lets the MinHash stage look patterns up by the patterns_data
+# sort key (kb_id, length, name) instead of scanning the kb's names.
+LSH_BUCKET_COLUMNS = ['kb_id', 'band_index', 'band_hash', 'pattern_name', 'pattern_length']
+
+# Brings lsh_buckets tables created before pattern_length up to date; their
+# rows read pattern_length 0 until scripts/backfill_lsh_buckets.py rebuilds them
+LSH_BUCKETS_SCHEMA = (
+    "ALTER TABLE kato.lsh_buckets ADD COLUMN IF NOT EXISTS pattern_length UInt32 DEFAULT 0",
+)
+_bucket_schema_lock = threading.Lock()
+_bucket_schema_checked = False
+
+# Rows per INSERT block for bulk learning
+BULK_INSERT_BLOCK_SIZE = int(environ.get('KATO_BULK_INSERT_BLOCK_SIZE', '50000'))
+
+
+def ensure_lsh_bucket_schema(client) -> None:
+    """Run LSH_BUCKETS_SCHEMA once per process, before the first bucket insert."""
+    global _bucket_schema_checked
+    with _bucket_schema_lock:
+        if _bucket_schema_checked:
+            return
+        _bucket_schema_checked = True
+        try:
+            for statement in LSH_BUCKETS_SCHEMA:
+                client.command(statement)
+        except Exception as e:
+            logger.warning(f"Cannot update the lsh_buckets schema (run scripts/backfill_lsh_buckets.py): {e}")
+
+
+def _is_missing(error: Exception) -> bool:
+    """Whether a ClickHouse error means the table or partition does not exist."""
+    message = str(error).lower()
+    return any(marker in message for marker in
+               ("doesn't exist", "does not exist", "not found", "unknown_table", "code: 60."))
+
 
 class ClickHouseWriter:
     """Writes pattern data to ClickHouse.
@@ -56,7 +103,8 @@ class ClickHouseWriter:
     # actual batching across all callers.
     DEFAULT_BATCH_SIZE = 1
 
-    def __init__(self, kb_id: str, clickhouse_client, batch_size: int = None):
+    def __init__(self, kb_id: str, clickhouse_client, batch_size: int = None,
+                 token_dictionary=None, token_index: bool = None):
         """
         Initialize ClickHouse writer.
 
@@ -64,15 +112,23 @@ class ClickHouseWriter:
             kb_id: Knowledge base identifier (used for partitioning)
             clickhouse_client: ClickHouse client from connection manager
             batch_size: Number of patterns to buffer before auto-flush (default: 50)
+            token_dictionary: Optional TokenDictionary; token sets are then
+                written as token_ids (schema v2) and token_set is left empty
+            token_index: Maintain kato.pattern_token_index rows (default
+                KATO_USE_TOKEN_INDEX); switched off if the table does not exist
         """
         self.kb_id = kb_id
         self.client = clickhouse_client
+        self.token_dictionary = token_dictionary
+        self.token_index = USE_TOKEN_INDEX if token_index is None else token_index
         self.batch_size = batch_size or self.DEFAULT_BATCH_SIZE
         self.max_buffer_size = self.batch_size * 10  # Cap buffer to prevent OOM on persistent flush failures
 
         # Write buffer for batch inserts
         self._write_buffer: list[list] = []
         self._column_names: list[str] | None = None
+        self._bucket_buffer: list[list] = []
+        self._token_buffer: list[list] = []
 
         if not self.client:
             raise RuntimeError("ClickHouse client is required but was None")
@@ -134,19 +190,19 @@ class ClickHouseWriter:
         all_tokens = list(chain(*pattern_object.pattern_data))
         encoded_tokens = [token.encode('utf8') for token in all_tokens]
 
-        # Compute MinHash signature for LSH (100 permutations)
+        # Compute MinHash signature for LSH (MINHASH_NUM_PERM permutations)
         if _MINHASH_HASHFUNC:
-            minhash = MinHash(num_perm=100, hashfunc=_MINHASH_HASHFUNC)
+            minhash = MinHash(num_perm=MINHASH_NUM_PERM, hashfunc=_MINHASH_HASHFUNC)
         else:
-            minhash = MinHash(num_perm=100)
+            minhash = MinHash(num_perm=MINHASH_NUM_PERM)
         for encoded_token in encoded_tokens:
             minhash.update(encoded_token)
         minhash_sig = list(minhash.hashvalues)
 
-        # Compute LSH bands (20 bands, 5 rows each)
+        # Compute LSH bands (LSH_BANDS bands, LSH_ROWS_PER_BAND rows each)
         lsh_bands = []
-        for i in range(20):
-            band = minhash_sig[i*5:(i+1)*5]
+        for i in range(LSH_BANDS):
+            band = minhash_sig[i * LSH_ROWS_PER_BAND:(i + 1) * LSH_ROWS_PER_BAND]
             band_hash = abs(hash(tuple(band)))
             lsh_bands.append(band_hash)
 
@@ -159,7 +215,7 @@ class ClickHouseWriter:
 
         now = datetime.now()
 
-        return {
+        row = {
             'kb_id': self.kb_id,
             'name': pattern_object.name,
             'pattern_data': pattern_object.pattern_data,
@@ -173,6 +229,30 @@ class ClickHouseWriter:
             'created_at': now,
             'updated_at': now
         }
+        if self.token_dictionary is not None:
+            row['token_ids'] = self.token_dictionary.encode_set(token_set, assign=True)
+            row['token_set'] = []
+        return row
+
+    def _bucket_rows(self, row: dict) -> list[list]:
+        """
+        Build kato.lsh_buckets rows for a prepared pattern row (one row per LSH band).
+
+        Args:
+            row: Row from _prepare_row (name, length and lsh_bands are read)
+
+        Returns:
+            List of rows in LSH_BUCKET_COLUMNS order
+        """
+        return [
+            [self.kb_id, band_index, band_hash, row['name'], row['length']]
+            for band_index, band_hash in enumerate(row['lsh_bands'])
+        ]
+
+    def _token_rows(self, row: dict) -> list[list]:
+        """Build kato.pattern_token_index rows for a prepared pattern row."""
+        return token_index_rows(self.kb_id, row['name'], row['length'],
+                                row['first_token'], row['last_token'])
 
     def write_pattern(self, pattern_object) -> bool:
         """
@@ -199,6 +279,9 @@ class ClickHouseWriter:
                 self._column_names = list(row.keys())
 
             self._write_buffer.append(list(row.values()))
+            self._bucket_buffer.extend(self._bucket_rows(row))
+            if self.token_index:
+                self._token_buffer.extend(self._token_rows(row))
 
             # Auto-flush when buffer is full
             if len(self._write_buffer) >= self.batch_size:
@@ -245,9 +328,22 @@ class ClickHouseWriter:
                     'wait_for_async_insert': 0,
                 },
             )
+            # Band buckets follow the pattern rows so that a bucket hit always
+            # resolves to a pattern row once both async batches are visible.
+            if self._bucket_buffer:
+                ensure_lsh_bucket_schema(self.client)
+                self.client.insert(
+                    'kato.lsh_buckets',
+                    self._bucket_buffer,
+                    column_names=LSH_BUCKET_COLUMNS,
+                    settings={
+                        'async_insert': 1,
+                        'wait_for_async_insert': 0,
+                    },
+                )
             logger.debug(f"Flushed {count} patterns to ClickHouse (kb_id={self.kb_id})")
             self._write_buffer.clear()
-            return count
+            self._bucket_buffer.clear()
         except Exception as e:
             import traceback
             logger.error(f"Failed to flush {count} patterns to ClickHouse: {type(e).__name__}: {e}")
@@ -256,12 +352,106 @@ class ClickHouseWriter:
             if len(self._write_buffer) > self.max_buffer_size:
                 dropped = len(self._write_buffer) - self.max_buffer_size
                 self._write_buffer = self._write_buffer[dropped:]
+                self._bucket_buffer = self._bucket_buffer[dropped * LSH_BANDS:]  # one row per band
                 logger.error(f"Write buffer exceeded max size, dropped {dropped} oldest entries (kept {self.max_buffer_size})")
             raise
 
+        # The patterns are stored: an index failure must not fail the flush,
+        # or a retry would insert the same patterns_data rows again. Index
+        # rows are kept for the next flush (re-inserting them is idempotent).
+        try:
+            self._insert_token_index(self._token_buffer, {'async_insert': 1, 'wait_for_async_insert': 0})
+            self._token_buffer.clear()
+        except Exception as e:
+            logger.warning(f"Failed to insert token index rows (kb_id={self.kb_id}), "
+                           f"retrying with the next flush: {type(e).__name__}: {e}")
+            max_rows = self.max_buffer_size * len(POSITIONS)
+            if len(self._token_buffer) > max_rows:
+                logger.error(f"Token index buffer exceeded max size, dropped "
+                             f"{len(self._token_buffer) - max_rows} oldest rows "
+                             f"(repair with scripts/migrate_token_index.py)")
+                self._token_buffer = self._token_buffer[-max_rows:]
+        return count
+
+    def _insert_token_index(self, rows: list[list], settings: dict) -> None:
+        """
+        Insert kato.pattern_token_index rows.
+
+        A missing table (deployments that have not run
+        scripts/migrate_token_index.py) switches index writes off for this
+        writer instead of failing; the rows are discarded.
+
+        Raises:
+            Exception: If the insert fails for any other reason
+        """
+        if not self.token_index or not rows:
+            return
+        try:
+            self.client.insert('kato.pattern_token_index', rows,
+                               column_names=TOKEN_INDEX_COLUMNS, settings=settings)
+        except Exception as e:
+            if not _is_missing(e):
+                raise
+            logger.warning(f"kato.pattern_token_index is unavailable, disabling token index writes "
+                           f"for kb_id={self.kb_id} (run scripts/migrate_token_index.py): {e}")
+            self.token_index = False
+
+    def write_patterns_bulk(self, pattern_objects: list, block_size: int = None) -> int:
+        """
+        Insert many patterns directly, in large blocks.
+
+        Bypasses the write buffer and async_insert: each block is one
+        synchronous native-format INSERT into patterns_data followed by its
+        lsh_buckets and pattern_token_index rows, so the patterns are
+        queryable when this returns.
+
+        Args:
+            pattern_objects: Pattern objects with name, pattern_data, length
+            block_size: Rows per INSERT (default BULK_INSERT_BLOCK_SIZE)
+
+        Returns:
+            Number of patterns written
+
+        Raises:
+            Exception: If row preparation or an insert fails
+        """
+        block_size = block_size or BULK_INSERT_BLOCK_SIZE
+        written = 0
+        try:
+            for start in range(0, len(pattern_objects), block_size):
+                if self.token_dictionary is not None:
+                    # One dictionary round trip per block; rows then hit the cache
+                    self.token_dictionary.assign(chain.from_iterable(
+                        chain(*p.pattern_data) for p in pattern_objects[start:start + block_size]))
+                rows, bucket_rows, token_rows = [], [], []
+                for pattern_object in pattern_objects[start:start + block_size]:
+                    row = self._prepare_row(pattern_object)
+                    if self._column_names is None:
+                        self._column_names = list(row.keys())
+                    rows.append(list(row.values()))
+                    bucket_rows.extend(self._bucket_rows(row))
+                    if self.token_index:
+                        token_rows.extend(self._token_rows(row))
+
+                self.client.insert('kato.patterns_data', rows, column_names=self._column_names,
+                                   settings={'async_insert': 0})
+                ensure_lsh_bucket_schema(self.client)
+                self.client.insert('kato.lsh_buckets', bucket_rows, column_names=LSH_BUCKET_COLUMNS,
+                                   settings={'async_insert': 0})
+                self._insert_token_index(token_rows, {'async_insert': 0})
+                written += len(rows)
+                logger.debug(f"Bulk inserted {len(rows)} patterns to ClickHouse (kb_id={self.kb_id})")
+            return written
+
+        except Exception as e:
+            logger.error(f"Failed bulk insert after {written} of {len(pattern_objects)} patterns: "
+                         f"{type(e).__name__}: {e}")
+            raise
+
     def delete_all_patterns(self) -> bool:
         """
-        Drop entire partition for this kb_id.
+        Drop entire partition for this kb_id (patterns_data, lsh_buckets and,
+        with the token index enabled, pattern_token_index).
 
         This is much faster than deleting individual rows,
         as ClickHouse can drop the entire partition atomically.
@@ -276,16 +466,193 @@ class ClickHouseWriter:
             # Drop partition by kb_id (specify database name)
             self.client.command(f"ALTER TABLE kato.patterns_data DROP PARTITION '{self.kb_id}'")
             logger.info(f"Dropped ClickHouse partition for kb_id: {self.kb_id}")
-            return True
-
         except Exception as e:
             # Partition might not exist if no patterns were ever written
-            if "doesn't exist" in str(e).lower() or "not found" in str(e).lower():
+            if _is_missing(e):
                 logger.debug(f"Partition {self.kb_id} doesn't exist, nothing to drop")
+            else:
+                logger.error(f"Failed to drop partition {self.kb_id}: {e}")
+                raise
+
+        try:
+            self.client.command(f"ALTER TABLE kato.lsh_buckets DROP PARTITION '{self.kb_id}'")
+            logger.info(f"Dropped LSH bucket partition for kb_id: {self.kb_id}")
+
+        except Exception as e:
+            # Partition might not exist if no patterns were ever written
+            if _is_missing(e):
+                logger.debug(f"LSH bucket partition {self.kb_id} doesn't exist, nothing to drop")
+            else:
+                logger.error(f"Failed to drop LSH bucket partition {self.kb_id}: {e}")
+                raise
+
+        if not self.token_index:
+            return True
+        try:
+            self.client.command(f"ALTER TABLE kato.pattern_token_index DROP PARTITION '{self.kb_id}'")
+            logger.info(f"Dropped token index partition for kb_id: {self.kb_id}")
+            return True
+
+        except Exception as e:
+            # Partition (or, before migrate_token_index.py, the table) might not exist
+            if _is_missing(e):
+                logger.debug(f"Token index partition {self.kb_id} doesn't exist, nothing to drop")
                 return True
-            logger.error(f"Failed to drop partition {self.kb_id}: {e}")
+            logger.error(f"Failed to drop token index partition {self.kb_id}: {e}")
             raise
 
+    def count_lsh_buckets(self) -> int:
+        """
+        Count LSH bucket rows for this kb_id.
+
+        Returns:
+            Number of rows in kato.lsh_buckets for this kb_id
+        """
+        try:
+            result = self.client.query(
+                f"SELECT COUNT(*) FROM kato.lsh_buckets WHERE kb_id = '{self.kb_id}'"
+            )
+            return result.result_rows[0][0] if result.result_rows else 0
+
+        except Exception as e:
+            logger.error(f"Failed to count LSH buckets for {self.kb_id}: {e}")
+            return 0
+
+    def backfill_lsh_buckets(self) -> int:
+        """
+        Rebuild kato.lsh_buckets for this kb_id from patterns_data.lsh_bands.
+
+        Knowledge bases written before the writer maintained band buckets (or
+        their pattern lengths) have no usable rows in lsh_buckets, so the
+        MinHash stage scans patterns_data.lsh_bands for them. This adds the
+        pattern_length column if needed, drops the kb_id's bucket partition and
+        regenerates it server-side with a single INSERT ... SELECT (no data
+        leaves ClickHouse). Safe to re-run.
+
+        Returns:
+            Number of bucket rows written
+
+        Raises:
+            Exception: If the partition drop or INSERT ... SELECT fails
+        """
+        for statement in LSH_BUCKETS_SCHEMA:
+            self.client.command(statement)
+        try:
+            self.client.command(f"ALTER TABLE kato.lsh_buckets DROP PARTITION '{self.kb_id}'")
+        except Exception as e:
+            if not _is_missing(e):
+                logger.error(f"Failed to drop LSH bucket partition {self.kb_id}: {e}")
+                raise
+
+        self.client.command(
+            f"INSERT INTO kato.lsh_buckets ({', '.join(LSH_BUCKET_COLUMNS)}) "
+            f"SELECT kb_id, toUInt8(band.1 - 1), band.2, name, length "
+            f"FROM kato.patterns_data "
+            f"ARRAY JOIN arrayZip(arrayEnumerate(lsh_bands), lsh_bands) AS band "
+            f"WHERE kb_id = '{self.kb_id}'"
+        )
+
+        count = self.count_lsh_buckets()
+        logger.info(f"Backfilled {count} LSH bucket rows for kb_id: {self.kb_id}")
+        return count
+
+    def count_token_index(self) -> int:
+        """
+        Count token index rows for this kb_id.
+
+        Returns:
+            Number of rows in kato.pattern_token_index for this kb_id
+        """
+        try:
+            result = self.client.query(
+                f"SELECT COUNT(*) FROM kato.pattern_token_index FINAL WHERE kb_id = '{self.kb_id}'"
+            )
+            return result.result_rows[0][0] if result.result_rows else 0
+
+        except Exception as e:
+            logger.error(f"Failed to count token index rows for {self.kb_id}: {e}")
+            return 0
+
+    def backfill_token_index(self) -> int:
+        """
+        Rebuild kato.pattern_token_index for this kb_id from patterns_data.
+
+        Knowledge bases written before the writer maintained the token index
+        have no rows in it, so token lookups through the index find nothing.
+        This drops the kb_id's index partition and regenerates the first and
+        last token rows server-side with one INSERT ... SELECT, at frequency
+        1 (follow with mirror_frequencies). Safe to re-run.
+
+        Returns:
+            Number of index rows written
+
+        Raises:
+            Exception: If the partition drop or INSERT ... SELECT fails
+        """
+        try:
+            self.client.command(f"ALTER TABLE kato.pattern_token_index DROP PARTITION '{self.kb_id}'")
+        except Exception as e:
+            if not _is_missing(e):
+                logger.error(f"Failed to drop token index partition {self.kb_id}: {e}")
+                raise
+
+        self.client.command(
+            f"INSERT INTO kato.pattern_token_index ({', '.join(TOKEN_INDEX_COLUMNS)}) "
+            f"SELECT kb_id, position, if(position = 'first', first_token, last_token), name, length, 1 "
+            f"FROM kato.patterns_data "
+            f"ARRAY JOIN ['first', 'last'] AS position "
+            f"WHERE kb_id = '{self.kb_id}'"
+        )
+
+        count = self.count_token_index()
+        logger.info(f"Backfilled {count} token index rows for kb_id: {self.kb_id}")
+        return count
+
+    def mirror_frequencies(self, redis_client, batch_size: int = 10000) -> int:
+        """
+        Copy this kb_id's pattern frequencies from Redis into the token index.
+
+        Frequencies live in Redis ({kb_id}:frequency:{name}) and change on
+        every re-learn; the index keeps a mirror so token lookups can rank by
+        frequency in ClickHouse. Only rows whose frequency changed are
+        re-inserted (ReplacingMergeTree keeps the newest row per key).
+        Patterns without a Redis frequency keep their mirrored value.
+
+        Args:
+            redis_client: Redis client holding the kb's frequencies
+            batch_size: Frequencies read per MGET
+
+        Returns:
+            Number of index rows updated
+
+        Raises:
+            Exception: If reading the index or Redis, or the insert fails
+        """
+        result = self.client.query(
+            f"SELECT position, token, name, length, frequency "
+            f"FROM kato.pattern_token_index FINAL WHERE kb_id = '{self.kb_id}'"
+        )
+        rows = result.result_rows
+        names = list({row[2] for row in rows})
+
+        frequencies = {}
+        for start in range(0, len(names), batch_size):
+            chunk = names[start:start + batch_size]
+            values = redis_client.mget([f"{self.kb_id}:frequency:{name}" for name in chunk])
+            frequencies.update((name, int(value)) for name, value in zip(chunk, values) if value is not None)
+
+        changed = [
+            [self.kb_id, position, token, name, length, frequencies[name]]
+            for position, token, name, length, frequency in rows
+            if name in frequencies and frequencies[name] != frequency
+        ]
+        for start in range(0, len(changed), BULK_INSERT_BLOCK_SIZE):
+            self.client.insert('kato.pattern_token_index', changed[start:start + BULK_INSERT_BLOCK_SIZE],
+                               column_names=TOKEN_INDEX_COLUMNS, settings={'async_insert': 0})
+
+        logger.info(f"Mirrored {len(changed)} token index frequencies for kb_id: {self.kb_id}")
+        return len(changed)
+
     def count_patterns(self) -> int:
         """
         Count patterns for this kb_id.
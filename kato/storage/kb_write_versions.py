@@ -0,0 +1,125 @@
+"""
+Write versions of knowledge bases, for caches of results derived from them.
+
+Caches of filter candidates and of predictions must not serve results
+computed before patterns were learned, deleted or cleared. Each cache owns
+a KbWriteVersions that counts writes per kb, optionally per field (for
+example the first symbol of the learned patterns, '' standing for the whole
+kb). Cached results are tagged with the versions read before computing them
+and dropped when the versions change.
+
+Versions are counted in this process and, when a Redis client is
+available, in the Redis hash kato:<namespace>:versions:<kb_id> (one field
+per counted field), so a write through any KATO process invalidates every
+process's results. ClickHouse makes inserts and deletes visible
+asynchronously (async_insert, mutations), so after a write the written
+fields settle for settle_ms: results computed meanwhile may miss the write
+and are neither served nor stored. The settle window is kept in this
+process and in the Redis key kato:<namespace>:settling:<kb_id>:<field>
+(expiring after settle_ms).
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger('kato.storage.kb_write_versions')
+
+# Field counting writes to the whole kb (deletes and clears)
+KB_FIELD = ''
+
+# Versions read before computing a result: the Redis versions of the kb and
+# of each requested field, this process's write count for the kb, and
+# whether no read field is settling after a write
+WriteVersion = namedtuple('WriteVersion', ['shared', 'local', 'settled'])
+
+
+class KbWriteVersions:
+    """Thread-safe per-kb write versions and settle windows."""
+
+    def __init__(self, namespace: str, settle_ms: float):
+        """
+        Initialize the versions.
+
+        Args:
+            namespace: Redis key namespace of the owning cache
+            settle_ms: After a write, the written fields settle this long
+        """
+        self.namespace = namespace
+        self.settle_ms = settle_ms
+        self.versions_key = f"kato:{namespace}:versions:{{kb_id}}"
+        self.settling_key = f"kato:{namespace}:settling:{{kb_id}}:{{field}}"
+        self._lock = threading.Lock()
+
+        self._writes: Dict[str, int] = {}
+        self._settle_until: Dict[Tuple[str, str], float] = {}
+        self.errors = 0
+
+    def read(self, kb_id: str, fields: Iterable[str] = (),
+             redis_client: Any = None) -> Optional[WriteVersion]:
+        """
+        Read the versions of the kb and of fields.
+
+        Returns:
+            WriteVersion, or None when the Redis versions cannot be read.
+            Redis is not read while the fields settle in this process.
+        """
+        fields = (KB_FIELD, *(field for field in fields if field != KB_FIELD))
+        now = time.monotonic()
+        with self._lock:
+            local = self._writes.get(kb_id, 0)
+            settled = all(now >= self._settle_until.get((kb_id, field), 0.0) for field in fields)
+        if redis_client is None or not settled:
+            return WriteVersion((0,) * len(fields), local, settled)
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hmget(self.versions_key.format(kb_id=kb_id), list(fields))
+            pipe.exists(*(self.settling_key.format(kb_id=kb_id, field=field) for field in fields))
+            shared, settling = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cannot read {self.namespace} write versions of {kb_id}: {e}")
+            self._error()
+            return None
+        return WriteVersion(tuple(int(version or 0) for version in shared), local, not settling)
+
+    def written_since(self, kb_id: str, version: WriteVersion) -> bool:
+        """Whether this process wrote the kb since version was read."""
+        with self._lock:
+            return self._writes.get(kb_id, 0) != version.local
+
+    def bump(self, kb_id: str, fields: Optional[Iterable[str]] = None,
+             redis_client: Any = None) -> None:
+        """
+        Record a write to fields of the kb (the whole kb when fields is None).
+
+        Call after the write reached ClickHouse.
+        """
+        fields = {KB_FIELD} if fields is None else set(fields)
+        now = time.monotonic()
+        with self._lock:
+            self._writes[kb_id] = self._writes.get(kb_id, 0) + 1
+            if len(self._settle_until) > 1024:
+                self._settle_until = {k: t for k, t in self._settle_until.items() if t > now}
+            for field in fields:
+                self._settle_until[(kb_id, field)] = now + self.settle_ms / 1000
+
+        if redis_client is not None:
+            try:
+                pipe = redis_client.pipeline()
+                for field in fields:
+                    pipe.hincrby(self.versions_key.format(kb_id=kb_id), field, 1)
+                    if self.settle_ms > 0:
+                        pipe.set(self.settling_key.format(kb_id=kb_id, field=field), 1,
+                                 px=max(1, int(self.settle_ms)))
+                pipe.execute()
+            except Exception as e:
+                # Other processes keep serving their results until the next bump
+                logger.error(f"Failed to bump {self.namespace} write versions of {kb_id}: {e}")
+                self._error()
+
+    def _error(self) -> None:
+        with self._lock:
+            self.errors += 1
@@ -0,0 +1,201 @@
+"""
+Server-side Redis script for the Redis half of learnPattern.
+
+A learn used to take 4-6 round trips: SETNX the frequency key, INCR on
+re-learn, GET + SET of emotives/metadata, the symbol stats MULTI and the
+affinity pipeline. LEARN_PATTERN_LUA does the counters in one EVALSHA, so
+the claim, the emotives window and the counters commit atomically:
+
+- SET frequency 1 NX decides new vs re-learn (INCR otherwise)
+- new pattern: emotives/metadata documents are written as prepared in Python
+- re-learn: emotives are appended to the stored rolling window and trimmed to
+  the persistence
+- symbol counters, global counters, symbols version/epoch/change log entry
+  (see symbol_table.py) and per-symbol affinity sums
+
+Emotive entries are spliced into the stored JSON array as text, so stored
+emotives are byte-identical to json.dumps() of the merged list. The metadata
+of a re-learn is merged by the caller in Python (knowledge_base._merge_metadata
+through RedisWriter.update_metadata), the same merge the step-by-step learn
+uses.
+"""
+
+import json
+import uuid
+from os import environ
+from typing import Any
+
+from kato.storage.symbol_table import symbol_table_keys
+
+USE_SINGLE_ROUND_TRIP_LEARN = environ.get('KATO_SINGLE_ROUND_TRIP_LEARN', 'true').lower() == 'true'
+
+# KEYS: 11 fixed keys, then (symbol_to_patterns, affinity) per symbol
+# ARGV: 9 fixed args, then emotive entries, (symbol, count) pairs,
+#       affinity count and (emotive, value) pairs
+LEARN_PATTERN_LUA = r"""
+local function trim(s)
+    return string.match(s, '^%s*(.-)%s*$')
+end
+
+-- Top-level element texts of a JSON array; {} if the document is not an array
+local function split_array(doc)
+    local items = {}
+    if not doc or string.sub(doc, 1, 1) ~= '[' then
+        return items
+    end
+    local depth, in_string, escaped, start = 0, false, false, 2
+    for i = 1, #doc do
+        local c = string.byte(doc, i)
+        if in_string then
+            if escaped then
+                escaped = false
+            elseif c == 92 then
+                escaped = true
+            elseif c == 34 then
+                in_string = false
+            end
+        elseif c == 34 then
+            in_string = true
+        elseif c == 91 or c == 123 then
+            depth = depth + 1
+        elseif c == 93 or c == 125 then
+            depth = depth - 1
+            if depth == 0 then
+                local item = trim(string.sub(doc, start, i - 1))
+                if item ~= '' then
+                    items[#items + 1] = item
+                end
+                break
+            end
+        elseif c == 44 and depth == 1 then
+            items[#items + 1] = trim(string.sub(doc, start, i - 1))
+            start = i + 1
+        end
+    end
+    return items
+end
+
+local is_new = redis.call('SET', KEYS[1], 1, 'NX') and true or false
+local n_emotives = tonumber(ARGV[9])
+
+if is_new then
+    redis.call('SET', KEYS[2], ARGV[7])
+    redis.call('SET', KEYS[3], ARGV[8])
+else
+    redis.call('INCR', KEYS[1])
+    if n_emotives > 0 then
+        local items = split_array(redis.call('GET', KEYS[2]) or '[]')
+        for i = 1, n_emotives do
+            items[#items + 1] = ARGV[9 + i]
+        end
+        local persistence = tonumber(ARGV[2])
+        if persistence > 0 and #items > persistence then
+            local window = {}
+            for i = #items - persistence + 1, #items do
+                window[#window + 1] = items[i]
+            end
+            items = window
+        end
+        redis.call('SET', KEYS[2], '[' .. table.concat(items, ', ') .. ']')
+    end
+end
+
+local n_symbols = (#KEYS - 11) / 2
+local arg = 10 + n_emotives
+for i = 1, n_symbols do
+    local symbol = ARGV[arg]
+    redis.call('HINCRBY', KEYS[4], symbol, ARGV[arg + 1])
+    redis.call('SADD', KEYS[10 + 2 * i], ARGV[1])
+    if is_new then
+        redis.call('HINCRBY', KEYS[5], symbol, 1)
+    end
+    arg = arg + 2
+end
+
+redis.call('INCRBY', KEYS[6], ARGV[3])
+if is_new then
+    redis.call('INCRBY', KEYS[7], 1)
+    redis.call('INCRBY', KEYS[8], 1)
+end
+
+local version = redis.call('INCR', KEYS[9])
+redis.call('SET', KEYS[10], ARGV[4], 'NX')
+local epoch = redis.call('GET', KEYS[10])
+local entry_id = redis.call('XADD', KEYS[11], 'MAXLEN', '~', ARGV[5], '*',
+                            'd', ARGV[6], 'n', is_new and '1' or '0')
+
+local n_affinity = tonumber(ARGV[arg])
+arg = arg + 1
+for _ = 1, n_affinity do
+    for i = 1, n_symbols do
+        redis.call('HINCRBYFLOAT', KEYS[11 + 2 * i], ARGV[arg], ARGV[arg + 1])
+    end
+    arg = arg + 2
+end
+
+return {is_new and 1 or 0, version, epoch, entry_id}
+"""
+
+
+def build_learn_args(kb_id: str, pattern_name: str, symbol_counts: dict[str, int],
+                     total_symbol_count: int, emotives: Any, metadata: dict,
+                     persistence: int, averaged_emotives: dict[str, float],
+                     changelog_maxlen: int) -> tuple[list[str], list]:
+    """
+    Build KEYS and ARGV for LEARN_PATTERN_LUA.
+
+    Both learn branches are prepared up front since the script decides which
+    one applies. The new-pattern documents follow learnPattern: emotives
+    trimmed to the last `persistence` entries, metadata stored as given (a
+    re-learn's metadata is merged by the caller).
+
+    Returns:
+        (keys, args) for the script call
+    """
+    version_key, epoch_key, changelog_key = symbol_table_keys(kb_id)
+    keys = [
+        f"{kb_id}:frequency:{pattern_name}",
+        f"{kb_id}:emotives:{pattern_name}",
+        f"{kb_id}:metadata:{pattern_name}",
+        f"{kb_id}:symbols:freq",
+        f"{kb_id}:symbols:pmf",
+        f"{kb_id}:global:total_symbols_in_patterns_frequencies",
+        f"{kb_id}:global:total_pattern_frequencies",
+        f"{kb_id}:global:total_unique_patterns",
+        version_key,
+        epoch_key,
+        changelog_key,
+    ]
+    for symbol in symbol_counts:
+        keys.append(f"{kb_id}:symbol_to_patterns:{symbol}")
+        keys.append(f"{kb_id}:affinity:{symbol}")
+
+    new_emotives = emotives if emotives else []
+    if isinstance(new_emotives, list) and len(new_emotives) > persistence:
+        new_emotives = new_emotives[-persistence:]
+
+    if not emotives:
+        entries = []
+    elif isinstance(emotives, list):
+        entries = [json.dumps(e) for e in emotives]
+    else:
+        entries = [json.dumps(emotives)]
+
+    args = [
+        pattern_name,
+        persistence,
+        total_symbol_count,
+        uuid.uuid4().hex,
+        changelog_maxlen,
+        json.dumps(symbol_counts),
+        json.dumps(new_emotives),
+        json.dumps(metadata if metadata else {}),
+        len(entries),
+        *entries,
+    ]
+    for symbol, count in symbol_counts.items():
+        args.extend((symbol, count))
+    args.append(len(averaged_emotives))
+    for emotive_name, value in averaged_emotives.items():
+        args.extend((emotive_name, repr(float(value))))
+    return keys, args
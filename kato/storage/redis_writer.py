@@ -11,7 +11,13 @@ All keys are namespaced by kb_id for complete isolation.
 
 import json
 import logging
-from typing import Any, Optional
+from typing import Any, Callable, Optional
+
+from redis.exceptions import WatchError
+
+import kato.storage.symbol_table as symbol_table_module
+from kato.storage.learn_script import LEARN_PATTERN_LUA, build_learn_args
+from kato.storage.symbol_table import SymbolTable, get_symbol_table, queue_symbol_delta
 
 logger = logging.getLogger('kato.storage.redis_writer')
 
@@ -29,12 +35,18 @@ class RedisWriter:
         """
         self.kb_id = kb_id
         self.client = redis_client
+        self._learn_script = None
 
         if not self.client:
             raise RuntimeError("Redis client is required but was None")
 
         logger.debug(f"RedisWriter initialized for kb_id: {kb_id}")
 
+    @property
+    def symbol_table(self) -> SymbolTable:
+        """Process-wide incremental symbol table for this kb_id."""
+        return get_symbol_table(self.kb_id, self.client)
+
     def write_metadata(self, pattern_name: str, frequency: Optional[int] = None,
                       emotives: Optional[list[dict]] = None,
                       metadata: Optional[dict] = None) -> bool:
@@ -82,6 +94,43 @@ class RedisWriter:
             logger.error(f"Failed to write metadata for pattern {pattern_name}: {e}")
             raise
 
+    def update_metadata(self, pattern_name: str, update: Callable[[dict], dict]) -> dict:
+        """
+        Replace a pattern's metadata document with update(stored metadata), atomically.
+
+        The read-modify-write runs under WATCH and is retried when another
+        worker changes the document in between, so concurrent re-learns
+        never lose each other's metadata.
+
+        Args:
+            pattern_name: Pattern name (hash)
+            update: Function from the stored metadata dict ({} if none) to the new one
+
+        Returns:
+            The metadata written
+
+        Raises:
+            Exception: If reading or writing fails, or update raises
+        """
+        metadata_key = f"{self.kb_id}:metadata:{pattern_name}"
+        try:
+            with self.client.pipeline() as pipe:
+                while True:
+                    try:
+                        pipe.watch(metadata_key)
+                        stored = pipe.get(metadata_key)
+                        updated = update(json.loads(stored) if stored else {})
+                        pipe.multi()
+                        pipe.set(metadata_key, json.dumps(updated))
+                        pipe.execute()
+                        return updated
+                    except WatchError:
+                        logger.debug(f"Metadata of {pattern_name} changed concurrently, retrying merge")
+
+        except Exception as e:
+            logger.error(f"Failed to update metadata for pattern {pattern_name}: {e}")
+            raise
+
     def increment_frequency(self, pattern_name: str) -> int:
         """
         Increment pattern frequency counter.
@@ -241,7 +290,9 @@ class RedisWriter:
 
         Replaces per-symbol loops of increment_symbol_frequency,
         increment_pattern_member_frequency, and add_symbol_to_pattern_mapping
-        plus global counter updates.
+        plus global counter updates. The same MULTI bumps the symbols version
+        and appends this delta to the symbols change log, and the delta is
+        applied to the in-process symbol table.
 
         Args:
             symbol_counts: Dict mapping symbol -> count in pattern
@@ -250,7 +301,8 @@ class RedisWriter:
             total_symbol_count: Total number of symbols (sum of counts)
         """
         try:
-            pipe = self.client.pipeline(transaction=False)
+            # MULTI: symbol counters, version and change log entry commit together
+            pipe = self.client.pipeline(transaction=True)
 
             for symbol, count in symbol_counts.items():
                 # Increment symbol frequency by count (HASH field per symbol)
@@ -273,14 +325,185 @@ class RedisWriter:
                 # (not unique count, since pattern already exists)
                 pass
 
-            pipe.execute()
+            queue_symbol_delta(pipe, self.kb_id, symbol_counts, is_new_pattern)
+
+            version, _, epoch, entry_id = pipe.execute()[-4:]
+            self.symbol_table.apply_local(version, epoch, entry_id, symbol_counts, is_new_pattern)
             logger.debug(f"Batch updated symbol stats: {len(symbol_counts)} symbols, "
-                        f"is_new={is_new_pattern}, total_symbols={total_symbol_count}")
+                        f"is_new={is_new_pattern}, total_symbols={total_symbol_count}, version={version}")
 
         except Exception as e:
             logger.error(f"Failed to batch update symbol stats for pattern {pattern_name}: {e}")
             raise
 
+    def learn_pattern(self, pattern_name: str, symbol_counts: dict[str, int],
+                      total_symbol_count: int, emotives: Any, metadata: dict,
+                      persistence: int, averaged_emotives: dict[str, float]) -> bool:
+        """
+        Apply the whole Redis side of a learn in one round trip.
+
+        Runs LEARN_PATTERN_LUA (see learn_script.py): the SETNX new-pattern
+        claim or INCR, the emotives/metadata write of a new pattern or the
+        emotives append of a re-learn, symbol stats with the symbols version
+        and change log entry, and symbol affinity, all atomically. The delta
+        is applied to the in-process symbol table. The metadata of a
+        re-learn is not merged here (see update_metadata).
+
+        Args:
+            pattern_name: Pattern name hash
+            symbol_counts: Dict mapping symbol -> count in pattern
+            total_symbol_count: Total number of symbols (sum of counts)
+            emotives: Rolling-window emotives list for this learn
+            metadata: Metadata dict for this learn
+            persistence: Emotives rolling window size
+            averaged_emotives: Averaged emotives added to each symbol's affinity
+
+        Returns:
+            True if this call created the pattern, False if it already existed
+        """
+        try:
+            if self._learn_script is None:
+                self._learn_script = self.client.register_script(LEARN_PATTERN_LUA)
+            keys, args = build_learn_args(
+                self.kb_id, pattern_name, symbol_counts, total_symbol_count,
+                emotives, metadata, persistence, averaged_emotives,
+                symbol_table_module.SYMBOL_CHANGELOG_MAXLEN)
+            is_new, version, epoch, entry_id = self._learn_script(keys=keys, args=args)
+            is_new = bool(is_new)
+
+            self.symbol_table.apply_local(version, epoch, entry_id, symbol_counts, is_new)
+            logger.debug(f"Learned {pattern_name} in one round trip: is_new={is_new}, "
+                        f"{len(symbol_counts)} symbols, version={version}")
+            return is_new
+
+        except Exception as e:
+            logger.error(f"Failed to learn pattern {pattern_name} in Redis: {e}")
+            raise
+
+    def claim_patterns(self, pattern_counts: list[tuple[str, int]]) -> list[bool]:
+        """
+        Count several learns of many patterns in two pipeline calls.
+
+        Uses the same SETNX claim as learnPattern (SET frequency 1 NX), then
+        INCRBY for the remaining learns: count - 1 for patterns this call
+        created, count for patterns that already existed.
+
+        Args:
+            pattern_counts: List of (pattern_name, number of learns)
+
+        Returns:
+            One flag per entry, True if this call created the pattern
+        """
+        if not pattern_counts:
+            return []
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name, _ in pattern_counts:
+                pipe.set(f"{self.kb_id}:frequency:{name}", 1, nx=True)
+            claimed = [bool(result) for result in pipe.execute()]
+
+            pipe = self.client.pipeline(transaction=False)
+            for (name, count), is_new in zip(pattern_counts, claimed):
+                increment = count - 1 if is_new else count
+                if increment:
+                    pipe.incrby(f"{self.kb_id}:frequency:{name}", increment)
+            pipe.execute()
+            return claimed
+
+        except Exception as e:
+            logger.error(f"Failed to claim {len(pattern_counts)} patterns: {e}")
+            raise
+
+    def write_metadata_batch(self, documents: dict[str, tuple[Any, dict]]) -> None:
+        """
+        Write emotives and metadata for many patterns in a single pipeline call.
+
+        Args:
+            documents: Dict mapping pattern_name -> (emotives, metadata)
+        """
+        if not documents:
+            return
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name, (emotives, metadata) in documents.items():
+                pipe.set(f"{self.kb_id}:emotives:{name}", json.dumps(emotives))
+                pipe.set(f"{self.kb_id}:metadata:{name}", json.dumps(metadata))
+            pipe.execute()
+            logger.debug(f"Batch wrote emotives/metadata for {len(documents)} patterns")
+
+        except Exception as e:
+            logger.error(f"Failed to batch write metadata for {len(documents)} patterns: {e}")
+            raise
+
+    def bulk_update_symbol_stats(self, symbol_counts: dict[str, int],
+                                 pmf_counts: dict[str, int],
+                                 symbol_patterns: dict[str, list[str]],
+                                 total_symbol_count: int,
+                                 new_pattern_count: int) -> None:
+        """
+        Apply the combined symbol statistics of a bulk learn in one MULTI.
+
+        Equivalent to batch_update_symbol_stats once per learn, with the
+        deltas summed: one symbols version bump and one change log entry
+        carrying both the frequency and pattern_member_frequency deltas.
+
+        Args:
+            symbol_counts: Dict mapping symbol -> total occurrences added
+            pmf_counts: Dict mapping symbol -> number of new patterns containing it
+            symbol_patterns: Dict mapping symbol -> pattern names containing it
+            total_symbol_count: Total number of symbols learned
+            new_pattern_count: Number of patterns created
+        """
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            for symbol, count in symbol_counts.items():
+                pipe.hincrby(f"{self.kb_id}:symbols:freq", symbol, count)
+            for symbol, count in pmf_counts.items():
+                pipe.hincrby(f"{self.kb_id}:symbols:pmf", symbol, count)
+            for symbol, names in symbol_patterns.items():
+                pipe.sadd(f"{self.kb_id}:symbol_to_patterns:{symbol}", *names)
+
+            pipe.incrby(f"{self.kb_id}:global:total_symbols_in_patterns_frequencies", total_symbol_count)
+            if new_pattern_count:
+                pipe.incrby(f"{self.kb_id}:global:total_pattern_frequencies", new_pattern_count)
+                pipe.incrby(f"{self.kb_id}:global:total_unique_patterns", new_pattern_count)
+
+            queue_symbol_delta(pipe, self.kb_id, symbol_counts, False, pmf_counts)
+
+            version, _, epoch, entry_id = pipe.execute()[-4:]
+            self.symbol_table.apply_local(version, epoch, entry_id, symbol_counts, False, pmf_counts)
+            logger.debug(f"Bulk updated symbol stats: {len(symbol_counts)} symbols, "
+                        f"+{new_pattern_count} patterns, total_symbols={total_symbol_count}, version={version}")
+
+        except Exception as e:
+            logger.error(f"Failed to bulk update symbol stats: {e}")
+            raise
+
+    def batch_add_symbol_affinity(self, affinity: dict[str, dict[str, float]]) -> None:
+        """
+        Add per-symbol emotive sums to the affinity hashes in one pipeline call.
+
+        Args:
+            affinity: Dict mapping symbol -> {emotive name -> value to add}
+        """
+        if not affinity:
+            return
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for symbol, sums in affinity.items():
+                affinity_key = f"{self.kb_id}:affinity:{symbol}"
+                for emotive_name, value in sums.items():
+                    pipe.hincrbyfloat(affinity_key, emotive_name, value)
+            pipe.execute()
+            logger.debug(f"Batch added affinity for {len(affinity)} symbols")
+
+        except Exception as e:
+            logger.error(f"Failed to batch add symbol affinity: {e}")
+            raise
+
     def delete_all_metadata(self) -> int:
         """
         Delete all keys for this kb_id.
@@ -0,0 +1,250 @@
+"""
+Incremental in-process symbol table for a knowledge base.
+
+Replaces "invalidate and HGETALL everything" after each learn. Every learn
+writes its symbol deltas to Redis together with a change log entry:
+
+    {kb}:symbols:freq / {kb}:symbols:pmf   HASH counters (unchanged)
+    {kb}:symbols:version                   INCR'd once per learn
+    {kb}:symbols:epoch                     random token, set when missing
+    {kb}:symbols:changelog                 STREAM of per-learn deltas (capped)
+
+all inside one MULTI, so a version always corresponds to exactly the log
+entries written so far. The table keeps (epoch, version, last log entry ID)
+next to the symbol dict:
+
+- Local learns apply their own delta directly when no other writer got in
+  between (the version they produced is ours + 1).
+- Reads check MGET(version, epoch): one small round trip. If another worker
+  wrote, the missing entries are read from the change log and applied.
+- A full reload (HGETALL) is needed only on first use, when the log has been
+  trimmed past our position, or after the kb was cleared (new epoch).
+"""
+
+import json
+import logging
+import threading
+import uuid
+from os import environ
+from typing import Any, Optional
+
+logger = logging.getLogger('kato.storage.symbol_table')
+
+USE_INCREMENTAL_SYMBOL_TABLE = environ.get('KATO_INCREMENTAL_SYMBOL_TABLE', 'true').lower() == 'true'
+
+# Approximate number of per-learn deltas kept in the change log
+SYMBOL_CHANGELOG_MAXLEN = int(environ.get('KATO_SYMBOL_CHANGELOG_MAXLEN', '10000'))
+
+
+def _str(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def symbol_table_keys(kb_id: str) -> tuple[str, str, str]:
+    """Return the (version, epoch, changelog) keys for a kb."""
+    return (f"{kb_id}:symbols:version",
+            f"{kb_id}:symbols:epoch",
+            f"{kb_id}:symbols:changelog")
+
+
+def queue_symbol_delta(pipe, kb_id: str, symbol_counts: dict[str, int], is_new_pattern: bool,
+                       pmf_counts: Optional[dict[str, int]] = None) -> None:
+    """
+    Queue the version bump and change log entry for one learn on a MULTI pipeline.
+
+    Appends four results to the pipeline: INCR version, SET epoch NX, GET epoch
+    and the XADD entry ID. A bulk learn logs its combined delta as one entry
+    with explicit pattern_member_frequency increments (pmf_counts).
+    """
+    version_key, epoch_key, changelog_key = symbol_table_keys(kb_id)
+    fields = {'d': json.dumps(symbol_counts), 'n': '1' if is_new_pattern else '0'}
+    if pmf_counts is not None:
+        fields['p'] = json.dumps(pmf_counts)
+    pipe.incr(version_key)
+    pipe.set(epoch_key, uuid.uuid4().hex, nx=True)
+    pipe.get(epoch_key)
+    pipe.xadd(changelog_key, fields, maxlen=SYMBOL_CHANGELOG_MAXLEN, approximate=True)
+
+
+class SymbolTable:
+    """
+    In-process copy of a kb's symbol statistics kept current from learn deltas.
+
+    Attributes:
+        kb_id: Knowledge base identifier.
+        symbols: Dict mapping symbol -> {'name', 'frequency', 'pattern_member_frequency'},
+            the same shape as RedisWriter.get_all_symbols_batch().
+        version: Redis symbols version this table reflects (None until loaded).
+    """
+
+    def __init__(self, kb_id: str, redis_client) -> None:
+        self.kb_id = kb_id
+        self.client = redis_client
+        self.symbols: dict[str, dict[str, Any]] = {}
+        self._snapshot_symbols: Optional[dict[str, dict[str, Any]]] = None
+        self.version: Optional[int] = None
+        self.epoch: Optional[str] = None
+        self._last_entry_id = '0-0'
+        self._lock = threading.RLock()
+        self._version_key, self._epoch_key, self._changelog_key = symbol_table_keys(kb_id)
+
+        self.full_reloads = 0
+        self.catch_ups = 0
+        self.entries_applied = 0
+        self.local_applies = 0
+
+    def _apply(self, symbol_counts: dict[str, int], is_new_pattern: bool,
+               pmf_counts: Optional[dict[str, int]] = None) -> None:
+        symbols = self.symbols
+        self._snapshot_symbols = None
+        for symbol, count in symbol_counts.items():
+            entry = symbols.get(symbol)
+            if entry is None:
+                entry = symbols[symbol] = {'name': symbol, 'frequency': 0, 'pattern_member_frequency': 0}
+            entry['frequency'] += count
+            if pmf_counts is not None:
+                entry['pattern_member_frequency'] += pmf_counts.get(symbol, 0)
+            elif is_new_pattern:
+                entry['pattern_member_frequency'] += 1
+
+    def _same_epoch(self, epoch: Optional[str]) -> bool:
+        # An empty table from before the kb's first learn has no epoch yet
+        return epoch == self.epoch or (self.epoch is None and self.version == 0)
+
+    def _reload(self) -> None:
+        """Load the whole table and its version/epoch/log position atomically."""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.mget(self._version_key, self._epoch_key)
+        pipe.hgetall(f"{self.kb_id}:symbols:freq")
+        pipe.hgetall(f"{self.kb_id}:symbols:pmf")
+        pipe.xrevrange(self._changelog_key, count=1)
+        (version, epoch), freq_data, pmf_data, last = pipe.execute()
+
+        pmf = {_str(k): v for k, v in pmf_data.items()}
+        symbols = {}
+        for symbol_name, freq_val in freq_data.items():
+            name = _str(symbol_name)
+            pmf_val = pmf.get(name, 0)
+            symbols[name] = {
+                'name': name,
+                'frequency': int(freq_val) if freq_val else 0,
+                'pattern_member_frequency': int(pmf_val) if pmf_val else 0
+            }
+
+        self.symbols = symbols
+        self._snapshot_symbols = None
+        self.version = int(version) if version else 0
+        self.epoch = _str(epoch) if epoch else None
+        self._last_entry_id = _str(last[0][0]) if last else '0-0'
+        self.full_reloads += 1
+        logger.debug(f"Reloaded symbol table for {self.kb_id}: {len(symbols)} symbols, version {self.version}")
+
+    def _catch_up(self) -> bool:
+        """Apply change log entries after our position. False if the log has a gap."""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.mget(self._version_key, self._epoch_key)
+        pipe.xrange(self._changelog_key, min=f"({self._last_entry_id}")
+        (version, epoch), entries = pipe.execute()
+
+        version = int(version) if version else 0
+        epoch = _str(epoch) if epoch else None
+        if not self._same_epoch(epoch) or self.version + len(entries) != version:
+            return False
+
+        for entry_id, fields in entries:
+            fields = {_str(k): _str(v) for k, v in fields.items()}
+            pmf_counts = json.loads(fields['p']) if 'p' in fields else None
+            self._apply(json.loads(fields['d']), fields['n'] == '1', pmf_counts)
+            self._last_entry_id = _str(entry_id)
+        self.version = version
+        self.epoch = epoch
+        self.entries_applied += len(entries)
+        self.catch_ups += 1
+        logger.debug(f"Symbol table for {self.kb_id} caught up {len(entries)} entries to version {version}")
+        return True
+
+    def get_all(self) -> dict[str, dict[str, Any]]:
+        """
+        Return the current symbol table, syncing with Redis if another writer changed it.
+
+        Returns:
+            Dict mapping symbol names to their statistics. It is a snapshot
+            taken under the table's lock (catch-ups update the live entries in
+            place), shared by readers until the table changes: treat it as
+            read-only.
+        """
+        with self._lock:
+            if self.version is None:
+                self._reload()
+                return self._snapshot()
+
+            version, epoch = self.client.mget(self._version_key, self._epoch_key)
+            version = int(version) if version else 0
+            epoch = _str(epoch) if epoch else None
+            if version == self.version and epoch == self.epoch:
+                return self._snapshot()
+
+            if not self._same_epoch(epoch) or version < self.version or not self._catch_up():
+                self._reload()
+            return self._snapshot()
+
+    def _snapshot(self) -> dict[str, dict[str, Any]]:
+        # Copied once per change of the table, not once per read
+        if self._snapshot_symbols is None:
+            self._snapshot_symbols = {name: dict(entry) for name, entry in self.symbols.items()}
+        return self._snapshot_symbols
+
+    def apply_local(self, version: int, epoch, entry_id,
+                    symbol_counts: dict[str, int], is_new_pattern: bool,
+                    pmf_counts: Optional[dict[str, int]] = None) -> None:
+        """
+        Apply the delta of a learn this process just committed.
+
+        Applied directly only if it is the next version after ours in the same
+        epoch; otherwise the next get_all() catches up from the change log
+        (which includes it) or reloads.
+        """
+        with self._lock:
+            epoch = _str(epoch) if epoch else None
+            if self.version is None or not self._same_epoch(epoch) or version != self.version + 1:
+                return
+            self._apply(symbol_counts, is_new_pattern, pmf_counts)
+            self.version = version
+            self.epoch = epoch
+            self._last_entry_id = _str(entry_id)
+            self.local_applies += 1
+
+    def invalidate(self) -> None:
+        """Force a full reload on next access."""
+        with self._lock:
+            self.symbols = {}
+            self._snapshot_symbols = None
+            self.version = None
+            self.epoch = None
+            self._last_entry_id = '0-0'
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'kb_id': self.kb_id,
+            'symbols': len(self.symbols),
+            'version': self.version,
+            'full_reloads': self.full_reloads,
+            'catch_ups': self.catch_ups,
+            'entries_applied': self.entries_applied,
+            'local_applies': self.local_applies
+        }
+
+
+_tables: dict[str, SymbolTable] = {}
+_tables_lock = threading.Lock()
+
+
+def get_symbol_table(kb_id: str, redis_client) -> SymbolTable:
+    """Get the process-wide symbol table for a kb (created on first use)."""
+    table = _tables.get(kb_id)
+    if table is None or table.client is not redis_client:
+        with _tables_lock:
+            table = _tables.get(kb_id)
+            if table is None or table.client is not redis_client:
+                table = _tables[kb_id] = SymbolTable(kb_id, redis_client)
+    return table
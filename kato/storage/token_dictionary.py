@@ -0,0 +1,171 @@
+"""
+Kb-scoped token dictionary for the integer token schema (schema v2).
+
+patterns_data.token_set stores each pattern's distinct tokens as strings, so
+the Jaccard stage intersects string arrays for every row, against tokens
+interpolated as quoted literals. With KATO_TOKEN_IDS=true the writer stores
+the set as patterns_data.token_ids, sorted UInt32 IDs, instead (token_set is
+written empty), and the Jaccard stage compares integer arrays. An added
+hasAny() conjunct lets the idx_token_ids_bloom skip index drop granules
+without a shared token.
+
+IDs are assigned at learn time and never change, so every process caches
+them without invalidation. They live in Redis:
+
+    kato:token_ids:{kb_id}      HASH token -> ID (HSETNX: first writer wins)
+    kato:token_ids:{kb_id}:seq  counter reserving ID ranges (INCRBY)
+
+The keys sit outside the {kb_id}:* namespace that clearing a kb deletes:
+IDs stay valid after a clear, so cached IDs never go stale. Lost HSETNX
+races leave unused IDs, which are harmless gaps.
+
+pattern_data keeps its String type: every prediction returns it verbatim,
+so integer sequences would be decoded on every read.
+
+Existing knowledge bases are migrated with scripts/migrate_token_ids.py.
+
+Configuration:
+    KATO_TOKEN_IDS  store and filter token sets as dictionary IDs (default false)
+"""
+
+import logging
+import threading
+from os import environ
+from typing import Any, Iterable
+
+logger = logging.getLogger('kato.storage.token_dictionary')
+
+USE_TOKEN_IDS = environ.get('KATO_TOKEN_IDS', 'false').lower() == 'true'
+
+
+# Schema v2 columns, as in config/clickhouse/init.sql (for deployments created before it)
+TOKEN_IDS_SCHEMA = (
+    "ALTER TABLE kato.patterns_data ADD COLUMN IF NOT EXISTS token_ids Array(UInt32) AFTER token_count",
+    "ALTER TABLE kato.patterns_data ADD INDEX IF NOT EXISTS idx_token_ids_bloom token_ids "
+    "TYPE bloom_filter(0.01) GRANULARITY 4",
+)
+
+
+def _str(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def token_dictionary_keys(kb_id: str) -> tuple[str, str]:
+    """Return the (dictionary hash, ID counter) keys for a kb."""
+    return f"kato:token_ids:{kb_id}", f"kato:token_ids:{kb_id}:seq"
+
+
+class TokenDictionary:
+    """
+    Token -> UInt32 ID mapping of one knowledge base, cached in process.
+
+    Lookups only read IDs; learning assigns IDs to new tokens.
+    """
+
+    def __init__(self, kb_id: str, redis_client) -> None:
+        self.kb_id = kb_id
+        self.client = redis_client
+        self._hash_key, self._seq_key = token_dictionary_keys(kb_id)
+        self._ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reads = 0
+        self.assigned = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def lookup(self, tokens: Iterable[str]) -> dict[str, int]:
+        """
+        IDs of the tokens that have one.
+
+        Tokens without an ID occur in no learned pattern of the kb.
+        """
+        ids, missing = self._cached(tokens)
+        if missing:
+            ids.update(self._read(missing))
+        return ids
+
+    def assign(self, tokens: Iterable[str]) -> dict[str, int]:
+        """
+        IDs of the tokens, assigning new IDs to unseen tokens.
+
+        Raises:
+            Exception: If Redis cannot be read or written
+        """
+        ids, missing = self._cached(tokens)
+        if not missing:
+            return ids
+        ids.update(self._read(missing))
+        new = [token for token in missing if token not in ids]
+        if not new:
+            return ids
+
+        # Reserve a contiguous ID range, then claim each token; a token claimed
+        # concurrently by another writer keeps the winner's ID
+        last = int(self.client.incrby(self._seq_key, len(new)))
+        pipe = self.client.pipeline()
+        for offset, token in enumerate(new):
+            pipe.hsetnx(self._hash_key, token, last - len(new) + 1 + offset)
+        claimed = pipe.execute()
+
+        won = {token: last - len(new) + 1 + offset
+               for offset, (token, ok) in enumerate(zip(new, claimed)) if ok}
+        lost = [token for token, ok in zip(new, claimed) if not ok]
+        with self._lock:
+            self._ids.update(won)
+            self.assigned += len(won)
+        ids.update(won)
+        if lost:
+            ids.update(self._read(lost))
+        return ids
+
+    def encode_set(self, tokens: Iterable[str], assign: bool = False) -> list[int]:
+        """Sorted distinct IDs of tokens (tokens without an ID are left out)."""
+        ids = self.assign(tokens) if assign else self.lookup(tokens)
+        return sorted(set(ids.values()))
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'kb_id': self.kb_id,
+                'cached_tokens': len(self._ids),
+                'hits': self.hits,
+                'redis_reads': self.reads,
+                'assigned': self.assigned,
+            }
+
+    def _cached(self, tokens: Iterable[str]) -> tuple[dict[str, int], list[str]]:
+        ids, missing = {}, []
+        with self._lock:
+            for token in dict.fromkeys(tokens):
+                token_id = self._ids.get(token)
+                if token_id is None:
+                    missing.append(token)
+                else:
+                    ids[token] = token_id
+            self.hits += len(ids)
+        return ids, missing
+
+    def _read(self, tokens: list[str]) -> dict[str, int]:
+        values = self.client.hmget(self._hash_key, tokens)
+        found = {token: int(_str(value)) for token, value in zip(tokens, values) if value is not None}
+        with self._lock:
+            self._ids.update(found)
+            self.reads += 1
+        return found
+
+
+_dictionaries: dict[str, TokenDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_token_dictionary(kb_id: str, redis_client) -> TokenDictionary:
+    """Get the process-wide token dictionary for a kb (created on first use)."""
+    dictionary = _dictionaries.get(kb_id)
+    if dictionary is None or dictionary.client is not redis_client:
+        with _dictionaries_lock:
+            dictionary = _dictionaries.get(kb_id)
+            if dictionary is None or dictionary.client is not redis_client:
+                dictionary = _dictionaries[kb_id] = TokenDictionary(kb_id, redis_client)
+    return dictionary
@@ -0,0 +1,94 @@
+"""
+Token index: patterns of a kb ordered by first and last token.
+
+patterns_data is ordered by (kb_id, length, name), so a lookup by its
+first_token or last_token column reads the kb's whole partition. The
+companion table kato.pattern_token_index holds one row per pattern and
+position ('first', 'last'), ordered by (kb_id, position, token, name),
+with the pattern's length and its frequency mirrored from Redis. A token
+lookup reads one key range of the index and then only the matching
+patterns_data rows, by primary key (kb_id, length, name). With a top-K
+limit the lookup returns the K most frequent patterns
+(ORDER BY frequency DESC LIMIT K) instead of every match.
+
+With the index enabled, ClickHouseWriter inserts index rows with each
+pattern (frequency 1) and ClickHouseWriter.mirror_frequencies() copies a
+kb's Redis frequencies into the index. scripts/migrate_token_index.py
+creates and backfills the table and runs the mirror periodically; enable
+the index once it has run for every kb_id. Patterns learned while the index
+is disabled are only indexed by a later backfill.
+
+Configuration:
+    KATO_USE_TOKEN_INDEX  maintain the index and look patterns up by token
+                          through it (default false)
+"""
+
+from os import environ
+
+# Off until scripts/migrate_token_index.py has created and backfilled the
+# table; token lookups then scan patterns_data.first_token
+USE_TOKEN_INDEX = environ.get('KATO_USE_TOKEN_INDEX', 'false').lower() == 'true'
+
+# Column order for kato.pattern_token_index inserts (two rows per pattern)
+TOKEN_INDEX_COLUMNS = ['kb_id', 'position', 'token', 'name', 'length', 'frequency']
+
+POSITIONS = ('first', 'last')
+
+# Same definition as config/clickhouse/init.sql, for deployments created before it
+CREATE_TOKEN_INDEX_TABLE = """
+CREATE TABLE IF NOT EXISTS kato.pattern_token_index (
+    kb_id String,
+    position Enum8('first' = 1, 'last' = 2),
+    token String,
+    name String,
+    length UInt32,
+    frequency UInt64 DEFAULT 1,
+    updated_at DateTime64(3) DEFAULT now64(3)
+) ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY kb_id
+ORDER BY (kb_id, position, token, name)
+"""
+
+
+def token_index_rows(kb_id: str, name: str, length: int, first_token: str,
+                     last_token: str, frequency: int = 1) -> list[list]:
+    """
+    Build kato.pattern_token_index rows for a pattern.
+
+    Returns:
+        One row per position, in TOKEN_INDEX_COLUMNS order
+    """
+    return [
+        [kb_id, 'first', first_token, name, length, frequency],
+        [kb_id, 'last', last_token, name, length, frequency],
+    ]
+
+
+def patterns_by_token_query(kb_id: str, token: str, position: str = 'first',
+                            top_k: int = 0, columns: str = 'name, pattern_data, length') -> str:
+    """
+    Query the patterns of a kb whose first or last token is token.
+
+    Args:
+        kb_id: Knowledge base identifier
+        token: Token to look up
+        position: 'first' or 'last'
+        top_k: Only the top_k most frequent patterns (0 returns every match)
+        columns: patterns_data columns to select
+
+    Returns:
+        SQL reading one index key range and the matching patterns_data rows
+    """
+    if position not in POSITIONS:
+        raise ValueError(f"position must be one of {POSITIONS}, got {position!r}")
+    token = token.replace("\\", "\\\\").replace("'", "\\'")
+
+    # Without a limit, duplicate index rows (frequency updates not yet merged)
+    # collapse in the IN set; ranking by frequency needs the latest row of each
+    lookup = (f"SELECT length, name FROM kato.pattern_token_index{' FINAL' if top_k else ''} "
+              f"WHERE kb_id = '{kb_id}' AND position = '{position}' AND token = '{token}'")
+    if top_k:
+        lookup += f" ORDER BY frequency DESC, name LIMIT {int(top_k)}"
+
+    return (f"SELECT {columns} FROM kato.patterns_data "
+            f"WHERE kb_id = '{kb_id}' AND (length, name) IN ({lookup})")
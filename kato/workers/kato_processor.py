@@ -2,7 +2,8 @@
 import asyncio
 import logging
 import os
-from multiprocessing import Lock, cpu_count
+from multiprocessing import cpu_count
+from typing import Optional
 
 from kato.config.session_config import SessionConfiguration
 from kato.config.settings import get_settings
@@ -70,8 +71,6 @@ class KatoProcessor:
         self.distributed_stm_manager = None
         self._async_initialization_pending = True
 
-        self.processing_lock = Lock()
-
         # Initialize extracted modules
         self.memory_manager = MemoryManager(self.pattern_processor, self.vector_processor)
         self.pattern_operations = PatternOperations(
@@ -186,24 +185,38 @@ class KatoProcessor:
             - pattern_name: Name of learned pattern (or None if learning failed)
             - new_stm: Updated STM after learning
         """
-        # BRIDGE: Load session STM into pattern processor temporarily
-        self.memory_manager.set_stm_in_pattern_processor(
-            self.pattern_processor,
-            session_state.stm
+        # Session STM and accumulators are passed explicitly; the shared
+        # pattern processor's STM is never loaded, so sessions don't interleave
+        return self.pattern_operations.learn_events(
+            list(session_state.stm),
+            session_state.emotives_accumulator,
+            session_state.metadata_accumulator,
+            keep_tail=keep_tail
         )
 
-        # BRIDGE: Load emotives and metadata accumulators from session state
-        self.pattern_processor.emotives = session_state.emotives_accumulator
-        self.pattern_processor.metadata = session_state.metadata_accumulator
+    def learn_bulk(
+        self,
+        sequences: list[dict],
+        *,
+        config: Optional[SessionConfiguration] = None
+    ) -> list[dict]:
+        """
+        Learn many pattern sequences directly into this node's knowledge base.
 
-        # TODO (Phase 1.7): Update pattern_operations to be stateless
-        # For now, it reads from pattern_processor.STM and mutates it
-        pattern_name = self.pattern_operations.learn_pattern(keep_tail=keep_tail)
+        Bypasses STM: each sequence is stored as if observed and learned.
+        Delegates to pattern_processor.learn_bulk().
 
-        # Extract new STM after learning
-        new_stm = MemoryManager.get_stm_from_pattern_processor(self.pattern_processor)
+        Args:
+            sequences: Dicts with 'events', optional 'emotives' and 'metadata'
+            config: Session configuration (sort_symbols override)
 
-        return pattern_name, new_stm
+        Returns:
+            Per-sequence dicts with 'pattern_name' and 'status'
+        """
+        sort_symbols = self.observation_processor.sort_symbols
+        if config and config.sort_symbols is not None:
+            sort_symbols = config.sort_symbols
+        return self.pattern_processor.learn_bulk(sequences, sort_symbols=sort_symbols)
 
     async def finalize_training(self) -> dict:
         """
@@ -230,7 +243,8 @@ class KatoProcessor:
         observation: dict,
         *,
         session_state: 'SessionState',
-        config: SessionConfiguration
+        config: SessionConfiguration,
+        predict: bool = True
     ) -> dict:
         """
         Process incoming observations and return updated session state.
@@ -248,6 +262,8 @@ class KatoProcessor:
             observation: Observation data (strings, vectors, emotives, metadata)
             session_state: Current session state (SessionState from Redis)
             config: SessionConfiguration for session-specific behavior (REQUIRED)
+            predict: False skips predictions for this observation ('predictions'
+                is empty); STM, auto-learning and accumulators update as usual
 
         Returns:
             Dictionary with updated state:
@@ -265,19 +281,12 @@ class KatoProcessor:
                 'instance_id': str
             }
         """
-        # BRIDGE: Load session STM into pattern processor temporarily
-        # (Until observation_processor is made stateless in Phase 1.6)
-        self.memory_manager.set_stm_in_pattern_processor(
-            self.pattern_processor,
-            session_state.stm
-        )
-
-        # TODO (Phase 1.6): Update observation_processor to accept session_state
-        # For now, it will mutate memory_manager state (legacy behavior)
-        result = await self.observation_processor.process_observation(observation, config=config)
+        # Session STM is passed in and the new STM returned: nothing session-scoped
+        # is stored on the shared processors, so sessions observe concurrently
+        result = await self.observation_processor.process_observation(
+            observation, config=config, stm=session_state.stm, predict=predict)
 
-        # BRIDGE: Extract new state from pattern processor and helpers
-        new_stm = MemoryManager.get_stm_from_pattern_processor(self.pattern_processor)
+        new_stm = result['stm']
         new_time = MemoryManager.increment_time(session_state.time)
 
         # Process emotives using stateless helper
@@ -351,15 +360,32 @@ class KatoProcessor:
             # Retrieve stored predictions from database (no state needed)
             return self.pattern_operations.get_predictions(unique_id)
 
-        # Generate new predictions from current STM
-        # BRIDGE: Load session STM into pattern processor temporarily
-        self.memory_manager.set_stm_in_pattern_processor(
-            self.pattern_processor,
-            session_state.stm
+        predictions, _ = await self.get_predictions_with_potentials(
+            session_state=session_state,
+            config=config
         )
+        return predictions
 
-        # TODO (Phase 1.7): Update pattern_operations to accept session_state
-        # For now, use get_predictions_with_config which reads from pattern_processor.STM
+    async def get_predictions_with_potentials(
+        self,
+        *,
+        session_state: 'SessionState',
+        config: SessionConfiguration
+    ) -> tuple:
+        """
+        Get predictions and their aggregated future potentials based on session STM.
+
+        STATELESS: Both are returned rather than kept on the processor, which
+        concurrent sessions share.
+
+        Args:
+            session_state: Current session state
+            config: Session configuration (recall threshold, max predictions, etc.)
+
+        Returns:
+            Tuple of (prediction objects, future potentials)
+        """
+        # Generate new predictions from the session STM (passed explicitly)
         return await self.pattern_operations.get_predictions_with_config(
             stm=session_state.stm,
             config=config
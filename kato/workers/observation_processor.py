@@ -5,7 +5,6 @@ Extracted from KatoProcessor for better modularity.
 """
 
 import logging
-from multiprocessing import Lock
 from typing import Any, Optional
 
 from kato.exceptions import ObservationError, ValidationError
@@ -49,8 +48,9 @@ class ObservationProcessor:
         self.max_pattern_length = max_pattern_length
         self.process_predictions = process_predictions
 
-        # Processing lock for thread safety
-        self.processing_lock = Lock()
+        # No node-wide lock: session STM is passed in and returned, so
+        # observations of different sessions run concurrently. Per-session
+        # ordering is enforced by the session manager's session locks.
 
         logger.debug("ObservationProcessor initialized")
 
@@ -241,7 +241,8 @@ class ObservationProcessor:
         if metadata_data:
             logger.debug(f"Processed {len(metadata_data)} metadata keys")
 
-    def check_auto_learning(self, max_pattern_length: int, stm_mode: str) -> Optional[str]:
+    def check_auto_learning(self, max_pattern_length: int, stm_mode: str,
+                            stm: list[list[str]]) -> tuple[Optional[str], list[list[str]]]:
         """
         Check if auto-learning should be triggered and perform it if needed.
 
@@ -252,19 +253,18 @@ class ObservationProcessor:
         Args:
             max_pattern_length: Maximum pattern length for auto-learning (0 = disabled)
             stm_mode: STM mode ('CLEAR' or 'ROLLING')
+            stm: Session STM including the current event
 
         Returns:
-            Pattern name if auto-learning occurred, None otherwise
+            Tuple of (pattern name if auto-learning occurred else None, new STM)
         """
         logger.debug(f"check_auto_learning: max_pattern_length={max_pattern_length}")
         if max_pattern_length <= 0:
             logger.debug(f"Auto-learning disabled (max_pattern_length={max_pattern_length})")
-            return None
+            return None, stm
 
-        # Use static method to get STM length
         from kato.workers.memory_manager import MemoryManager
-        stm_state = MemoryManager.get_stm_from_pattern_processor(self.pattern_processor)
-        stm_length = MemoryManager.get_stm_length(stm_state)
+        stm_length = MemoryManager.get_stm_length(stm)
 
         # Normalize invalid modes to CLEAR
         if stm_mode not in ['CLEAR', 'ROLLING']:
@@ -277,39 +277,37 @@ class ObservationProcessor:
 
             if stm_length > 1:
                 if stm_mode == 'ROLLING':
-                    # ROLLING mode: Save the last N-1 events before learning
+                    # ROLLING mode: Keep the last N-1 events as the new STM
                     window_size = max_pattern_length - 1
-                    events_to_restore = stm_state[-window_size:] if len(stm_state) > window_size else stm_state[1:]
+                    events_to_restore = stm[-window_size:] if len(stm) > window_size else stm[1:]
 
-                    # Learn pattern (this clears STM)
-                    pattern_name = self.pattern_operations.learn_pattern(keep_stm_for_rolling=True)
-
-                    # Restore the rolling window events
-                    if events_to_restore:
-                        self.pattern_processor.setSTM(events_to_restore)
-                        logger.debug(f"Restored rolling window events: {events_to_restore}")
+                    pattern_name, _ = self.pattern_operations.learn_events(stm)
+                    logger.debug(f"Restored rolling window events: {events_to_restore}")
 
                     if pattern_name:
                         logger.info(f"Auto-learned pattern in ROLLING mode: {pattern_name}")
-                        return pattern_name
-                else:
-                    # CLEAR mode: Learn pattern and clear STM completely (original behavior)
-                    pattern_name = self.pattern_operations.learn_pattern(keep_tail=False)
-
-                    if pattern_name:
-                        logger.info(f"Auto-learned pattern in CLEAR mode: {pattern_name}")
-                        return pattern_name
+                        return pattern_name, list(events_to_restore)
+                    return None, list(events_to_restore)
 
-            elif stm_length == 1:
-                # Only one event: learn it regardless of mode
-                pattern_name = self.pattern_operations.learn_pattern(keep_tail=False)
+                # CLEAR mode: Learn pattern and clear STM completely (original behavior)
+                pattern_name, new_stm = self.pattern_operations.learn_events(stm)
                 if pattern_name:
-                    logger.info(f"Auto-learned single-event pattern: {pattern_name}")
-                    return pattern_name
-
-        return None
-
-    async def process_observation(self, data: dict[str, Any], config=None) -> dict[str, Any]:
+                    logger.info(f"Auto-learned pattern in CLEAR mode: {pattern_name}")
+                    return pattern_name, new_stm
+                return None, new_stm
+
+            # Only one event: learn it regardless of mode
+            pattern_name, new_stm = self.pattern_operations.learn_events(stm)
+            if pattern_name:
+                logger.info(f"Auto-learned single-event pattern: {pattern_name}")
+                return pattern_name, new_stm
+            return None, new_stm
+
+        return None, stm
+
+    async def process_observation(self, data: dict[str, Any], config=None,
+                                  stm: Optional[list[list[str]]] = None,
+                                  predict: bool = True) -> dict[str, Any]:
         """
         Process a complete observation including strings, vectors, and emotives.
 
@@ -331,6 +329,10 @@ class ObservationProcessor:
                 - path: Processing path (optional)
                 - metadata: Additional metadata (optional)
             config: Optional SessionConfiguration for session-specific behavior
+            stm: Session STM before this observation. Not mutated. If omitted,
+                the pattern processor's STM is used and updated (legacy mode).
+            predict: False skips predictions for this observation only (lazy
+                sequence observation); STM and auto-learning are unaffected
 
         Returns:
             Dictionary containing:
@@ -338,94 +340,104 @@ class ObservationProcessor:
                 - auto_learned_pattern: Pattern name if auto-learning occurred
                 - symbols: Combined list of processed symbols
                 - predictions: Generated predictions (if any)
+                - stm: Session STM after this observation
 
         Raises:
             ObservationError: If observation processing fails
             ValidationError: If input validation fails
         """
-        with self.processing_lock:
-            try:
-                # Validate input
-                self.validate_observation(data)
-
-                # Extract config values (use provided config or fallback to instance defaults)
-                max_pattern_length = config.max_pattern_length if config and config.max_pattern_length is not None else self.max_pattern_length
-                process_predictions = config.process_predictions if config and config.process_predictions is not None else self.process_predictions
-                stm_mode = config.stm_mode if config and config.stm_mode is not None else getattr(self.pattern_processor, 'stm_mode', 'CLEAR')
-                sort_symbols = config.sort_symbols if config and config.sort_symbols is not None else self.sort_symbols
-
-                unique_id = data['unique_id']
-                string_data = data.get('strings', [])
-                vector_data = data.get('vectors', [])
-                emotives_data = data.get('emotives', {})
-                metadata_data = data.get('metadata', {})
-
-                # Add processing path
-                if 'path' not in data:
-                    data['path'] = []
-                # Get processor info from pattern processor's genome manifest
-                processor_name = getattr(self.pattern_processor, 'name', 'kato')
-                processor_id = getattr(self.pattern_processor, 'id', 'unknown')
-                data['path'] += [f'{processor_name}-{processor_id}-process']
-
-                # NOTE: percept_data, time, emotives, metadata are now handled in KatoProcessor.observe()
-                # This processor only handles symbolic processing and predictions
-
-                # Process different data types
-                v_identified = self.process_vectors(vector_data) if vector_data else []
-                symbols = self.process_strings(string_data) if string_data else []
-
-                if emotives_data:
-                    self.process_emotives(emotives_data)  # Deprecated, just logs
-
-                if metadata_data:
-                    self.process_metadata(metadata_data)  # Deprecated, just logs
-
-                # Combine all symbols
-                combined_symbols = v_identified + symbols
-
-                # Only trigger predictions if we have actual symbolic content
-                predictions = []
-                if vector_data or string_data:
-                    # Only trigger predictions if enabled
-                    self.pattern_processor.trigger_predictions = process_predictions
-
-                    # Add current symbols to STM
-                    self.pattern_processor.setCurrentEvent(combined_symbols)
-
-                    # Generate predictions ONLY if enabled
-                    if process_predictions:
-                        predictions = await self.pattern_processor.processEvents(unique_id)
-                        logger.debug(f"Generated {len(predictions)} predictions (process_predictions=True)")
-                    else:
-                        logger.debug("Skipping prediction computation (process_predictions=False)")
-
-                    # Check for auto-learning AFTER adding current event
-                    # Pass config values to check_auto_learning
-                    logger.debug(f"About to check auto-learning with max_pattern_length={max_pattern_length}")
-                    auto_learned_pattern = self.check_auto_learning(
-                        max_pattern_length=max_pattern_length,
-                        stm_mode=stm_mode
-                    )
-                    logger.debug(f"Auto-learning result: {auto_learned_pattern}")
+        from kato.workers.memory_manager import MemoryManager
+
+        legacy_stm = stm is None
+        stm = MemoryManager.get_stm_from_pattern_processor(self.pattern_processor) if legacy_stm else list(stm)
+
+        try:
+            # Validate input
+            self.validate_observation(data)
+
+            # Extract config values (use provided config or fallback to instance defaults)
+            max_pattern_length = config.max_pattern_length if config and config.max_pattern_length is not None else self.max_pattern_length
+            process_predictions = config.process_predictions if config and config.process_predictions is not None else self.process_predictions
+            stm_mode = config.stm_mode if config and config.stm_mode is not None else getattr(self.pattern_processor, 'stm_mode', 'CLEAR')
+            sort_symbols = config.sort_symbols if config and config.sort_symbols is not None else self.sort_symbols
+
+            unique_id = data['unique_id']
+            string_data = data.get('strings', [])
+            vector_data = data.get('vectors', [])
+            emotives_data = data.get('emotives', {})
+            metadata_data = data.get('metadata', {})
+
+            # Add processing path
+            if 'path' not in data:
+                data['path'] = []
+            # Get processor info from pattern processor's genome manifest
+            processor_name = getattr(self.pattern_processor, 'name', 'kato')
+            processor_id = getattr(self.pattern_processor, 'id', 'unknown')
+            data['path'] += [f'{processor_name}-{processor_id}-process']
+
+            # NOTE: percept_data, time, emotives, metadata are now handled in KatoProcessor.observe()
+            # This processor only handles symbolic processing and predictions
+
+            # Process different data types
+            v_identified = self.process_vectors(vector_data) if vector_data else []
+            symbols = self.process_strings(string_data) if string_data else []
+
+            if emotives_data:
+                self.process_emotives(emotives_data)  # Deprecated, just logs
+
+            if metadata_data:
+                self.process_metadata(metadata_data)  # Deprecated, just logs
+
+            # Combine all symbols
+            combined_symbols = v_identified + symbols
+
+            # Only trigger predictions if we have actual symbolic content
+            predictions = []
+            if vector_data or string_data:
+                # Add current symbols to STM
+                if combined_symbols:
+                    stm.append(combined_symbols)
+
+                # Generate predictions ONLY if enabled and requested for this observation
+                if process_predictions and predict:
+                    predictions = await self.pattern_processor.processEvents(
+                        unique_id, stm=stm, trigger_predictions=process_predictions,
+                        session_id=getattr(config, 'session_id', None), config=config)
+                    logger.debug(f"Generated {len(predictions)} predictions (process_predictions=True)")
                 else:
-                    logger.debug("No data to process, skipping auto-learning check")
-                    auto_learned_pattern = None
-
-                return {
-                    'unique_id': unique_id,
-                    'auto_learned_pattern': auto_learned_pattern,
-                    'symbols': combined_symbols,
-                    'predictions': predictions
-                }
-
-            except (ValidationError, ObservationError):
-                # Re-raise known exceptions
-                raise
-            except Exception as e:
-                # Wrap unknown exceptions
-                raise ObservationError(
-                    f"Failed to process observation: {str(e)}",
-                    observation_id=data.get('unique_id'),
-                    observation_data=data
+                    logger.debug(f"Skipping prediction computation (process_predictions={process_predictions}, predict={predict})")
+
+                # Check for auto-learning AFTER adding current event
+                # Pass config values to check_auto_learning
+                logger.debug(f"About to check auto-learning with max_pattern_length={max_pattern_length}")
+                auto_learned_pattern, stm = self.check_auto_learning(
+                    max_pattern_length=max_pattern_length,
+                    stm_mode=stm_mode,
+                    stm=stm
                 )
+                logger.debug(f"Auto-learning result: {auto_learned_pattern}")
+            else:
+                logger.debug("No data to process, skipping auto-learning check")
+                auto_learned_pattern = None
+
+            if legacy_stm:
+                self.pattern_processor.setSTM(stm)
+
+            return {
+                'unique_id': unique_id,
+                'auto_learned_pattern': auto_learned_pattern,
+                'symbols': combined_symbols,
+                'predictions': predictions,
+                'stm': stm
+            }
+
+        except (ValidationError, ObservationError):
+            # Re-raise known exceptions
+            raise
+        except Exception as e:
+            # Wrap unknown exceptions
+            raise ObservationError(
+                f"Failed to process observation: {str(e)}",
+                observation_id=data.get('unique_id'),
+                observation_data=data
+            )
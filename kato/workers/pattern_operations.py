@@ -106,6 +106,52 @@ class PatternOperations:
                 auto_learn=False
             )
 
+    def learn_events(self, stm_events: list[list[str]],
+                     emotives: Optional[list[dict[str, float]]] = None,
+                     metadata: Optional[list[dict[str, Any]]] = None,
+                     keep_tail: bool = False) -> tuple[str, list[list[str]]]:
+        """
+        Learn a new pattern from a session's STM passed in explicitly.
+
+        Stateless counterpart of learn_pattern(): the pattern processor's own
+        STM, emotives and metadata are neither read nor cleared, so sessions
+        sharing this processor can learn concurrently.
+
+        Args:
+            stm_events: Session STM to learn
+            emotives: Session emotives accumulator
+            metadata: Session metadata accumulator
+            keep_tail: If True, the returned STM keeps the last event as context
+
+        Returns:
+            Tuple of (pattern_name, new_stm): pattern_name is "PTRN|<hash>" or
+            empty string if nothing was learned; new_stm is the STM after learning
+
+        Raises:
+            LearningError: If pattern learning fails
+        """
+        try:
+            # Learn vectors first (if any)
+            self.vector_processor.learn()
+
+            pattern_name = self.pattern_processor.learn_events(stm_events, emotives, metadata)
+            new_stm = [stm_events[-1]] if keep_tail and len(stm_events) > 1 else []
+
+            if pattern_name:
+                full_name = f"PTRN|{pattern_name}"
+                logger.info(f"Learned new pattern: {full_name}")
+                return full_name, new_stm
+
+            logger.debug("No pattern learned (STM empty or single event)")
+            return "", new_stm
+
+        except Exception as e:
+            raise LearningError(
+                f"Failed to learn pattern: {str(e)}",
+                stm_state=list(stm_events),
+                auto_learn=False
+            )
+
     def get_pattern(self, pattern_id: str) -> dict[str, Any]:
         """
         Retrieve pattern information by pattern ID.
@@ -276,8 +322,9 @@ class PatternOperations:
         """
         Retrieve predictions for a specific observation ID.
 
-        If no ID provided, returns the most recent predictions from memory.
-        Otherwise queries the database for stored predictions.
+        Predictions are returned by each observation and kept in its
+        session, not on the shared processor; without an ID there are no
+        stored predictions to return.
 
         Args:
             unique_id: Observation unique ID (optional)
@@ -287,10 +334,7 @@ class PatternOperations:
         """
         predictions = []
 
-        if not unique_id:
-            # Return current predictions from memory
-            predictions = self.pattern_processor.predictions
-        else:
+        if unique_id:
             # Query database for predictions by unique_id
             pred_results = self.predictions_kb.find({'unique_id': unique_id})
             for pred in pred_results:
@@ -300,7 +344,8 @@ class PatternOperations:
 
         return predictions
 
-    async def get_predictions_with_config(self, stm: list, config) -> list[dict[str, Any]]:
+    async def get_predictions_with_config(self, stm: list, config
+                                          ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
         """
         Generate predictions with session-specific configuration.
 
@@ -311,10 +356,10 @@ class PatternOperations:
             config: SessionConfiguration with prediction parameters
 
         Returns:
-            List of prediction dictionaries
+            Tuple of (prediction dictionaries, aggregated future potentials)
         """
-        # Pass config directly to pattern processor's get_predictions_async
-        return await self.pattern_processor.get_predictions_async(stm, config=config)
+        # Pass config directly to pattern processor's get_predictions_with_potentials_async
+        return await self.pattern_processor.get_predictions_with_potentials_async(stm, config=config)
 
     def get_pattern_count(self) -> int:
         """
@@ -2,32 +2,47 @@ import asyncio
 import heapq
 import itertools
 import logging
+import threading
 from collections import Counter, deque
+from contextlib import contextmanager
 from itertools import chain
 from math import log, log2
 from operator import itemgetter
 from os import environ
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import numpy as np
+from kato.filters.stm_sketch import USE_STM_SKETCHES, get_stm_sketches
 from kato.informatics.knowledge_base import SuperKnowledgeBase
 from kato.informatics.metrics import (
     accumulate_metadata,
     average_emotives,
-    confluence,
 )
+from kato.informatics.prediction_metrics import prediction_metrics
 from kato.informatics.predictive_information import calculate_ensemble_predictive_information
 from kato.representations.pattern import Pattern
+from kato.representations.prediction import pre_potential
 from kato.searches.pattern_search import PatternSearcher
+from kato.searches.searcher_pool import SearcherPool, matching_config_key
+from kato.searches.single_symbol_predictions import SINGLE_SYMBOL_TOP_K, get_single_symbol_predictions
 from kato.storage.aggregation_pipelines import OptimizedQueryManager
 from kato.storage.metrics_cache import CachedMetricsCalculator, get_metrics_cache_manager
 from kato.storage.connection_manager import OptimizedConnectionManager
+from kato.storage.token_index import USE_TOKEN_INDEX, patterns_by_token_query
 from kato.config.session_config import SessionConfiguration
 
 # Standard logger configuration
 logger = logging.getLogger('kato.pattern_processor')
 logger.setLevel(getattr(logging, environ.get('LOG_LEVEL', 'INFO')))
 
+# Prediction fields set from prediction_metrics(), in update order
+_METRIC_FIELDS = ('entropy', 'normalized_entropy', 'global_normalized_entropy',
+                  'itfdf_similarity', 'confluence', 'tfidf_score')
+
+# predictPattern keeps the max_predictions * PRUNING_FACTOR candidates with the
+# highest pre-potential for the ensemble metrics loop
+PRUNING_FACTOR = 3
+
 class PatternProcessor:
     """
     Responsible for creating new, recognizing known, discovering unknown, and predicting patterns.
@@ -196,6 +211,10 @@ class PatternProcessor:
 
         self.patterns_searcher = PatternSearcher(**searcher_kwargs)
 
+        # Searchers for session-configured predictions, reused across calls
+        # with the same matching configuration (see get_predictions_async)
+        self.searcher_pool = SearcherPool()
+
         # Initialize optimized query manager for aggregation pipelines
         self.query_manager = OptimizedQueryManager(self.superkb)
 
@@ -206,13 +225,14 @@ class PatternProcessor:
         self.initiateDefaults()
         self.predict = True
         self.predictions_kb = self.superkb.predictions_kb
-        self.predictions = []  # Cache for most recent predictions
         self.mood = {}
         self.target_class = None
         self.target_class_candidates = []
-        self.future_potentials = []  # Store aggregated future potentials for API
         # Prediction-level caches (invalidated on learn())
         self._global_metadata_cache = None  # Caches get_global_metadata() result
+        # Serializes learns (KB write + searcher index update); observations of
+        # different sessions otherwise run concurrently on this processor
+        self._learn_lock = threading.Lock()
         logger.info(f"PatternProcessor {self.name} started!")
         return
 
@@ -245,6 +265,7 @@ class PatternProcessor:
         self.clear_stm()
         self.last_learned_pattern_name: Optional[str] = None
         self.patterns_searcher.clearPatternsFromRAM()
+        self.searcher_pool.clear()
 
         # Delete all patterns from ClickHouse for this processor
         # This ensures test isolation and prevents pattern contamination
@@ -259,6 +280,7 @@ class PatternProcessor:
         self.superkb.symbols_observation_count = 0
         # Invalidate caches since all data was cleared
         self.query_manager.invalidate_caches()
+        self.superkb.redis_writer.symbol_table.invalidate()
         self._global_metadata_cache = None
         self.initiateDefaults()
         return
@@ -299,21 +321,45 @@ class PatternProcessor:
         """
         Convert current short-term memory into a persistent pattern.
 
-        Creates a hash-named pattern from the data in STM, stores it in ClickHouse/Redis,
-        and distributes it to search workers for future pattern matching.
+        Learns self.STM with the accumulated emotives and metadata (see
+        learn_events), then resets all three.
 
         Returns:
             Pattern name (PTRN|<hash>) if learned successfully, None otherwise.
         """
-        pattern = Pattern(self.STM)  # Create pattern from short-term memory data
+        stm, emotives, metadata = list(self.STM), self.emotives, self.metadata
         self.STM.clear()  # Reset short-term memory after learning
+        self.emotives = []
+        self.metadata = []
+        return self.learn_events(stm, emotives, metadata)
+
+    def learn_events(self, stm_events: list[list[str]],
+                     emotives: Optional[list[dict[str, float]]] = None,
+                     metadata: Optional[list[dict[str, Any]]] = None) -> Optional[str]:
+        """
+        Learn a pattern from the given events without touching this processor's STM.
+
+        Creates a hash-named pattern from the events, stores it in ClickHouse/Redis,
+        and distributes it to search workers for future pattern matching.
 
-        if len(pattern) > 1:  # Only learn multi-event patterns
+        Args:
+            stm_events: Events to learn (a session's STM)
+            emotives: Emotives accumulated over those events
+            metadata: Metadata dicts accumulated over those events
+
+        Returns:
+            Pattern name (PTRN|<hash>) if learned successfully, None otherwise.
+        """
+        pattern = Pattern(stm_events)
+        if len(pattern) <= 1:  # Only learn multi-event patterns
+            return None
+
+        with self._learn_lock:
             # Store pattern with emotives as rolling window list and accumulated metadata
             x = self.patterns_kb.learnPattern(
                 pattern,
-                emotives=self.emotives,  # Keep as list - do NOT average before storage
-                metadata=accumulate_metadata(self.metadata) if self.metadata else {}
+                emotives=list(emotives) if emotives else [],  # Keep as list - do NOT average before storage
+                metadata=accumulate_metadata(metadata) if metadata else {}
             )
 
             if x:
@@ -331,18 +377,64 @@ class PatternProcessor:
                         self.metrics_cache_manager.invalidate_pattern_metrics(pattern.name)
                     )
 
-            # Invalidate symbol cache since symbol stats changed
+            # Symbol stats changed: the incremental symbol table already applied
+            # this learn's delta; only the legacy full-table cache is dropped
             self.query_manager.invalidate_caches()
             self._global_metadata_cache = None  # Invalidate global metadata cache
 
             self.last_learned_pattern_name = pattern.name
-            del(pattern)
-            self.emotives = []
-            self.metadata = []
-            return self.last_learned_pattern_name
-        self.emotives = []
-        self.metadata = []
-        return None
+        return pattern.name
+
+    def learn_bulk(self, sequences: list[dict[str, Any]],
+                   sort_symbols: bool = True) -> list[dict[str, Any]]:
+        """
+        Learn many pattern sequences in one call (bulk import).
+
+        Each sequence is learned as if it had been observed event by event and
+        then learned: empty events are dropped, symbols within an event are
+        sorted when sort_symbols is set, and sequences with fewer than two
+        symbols are skipped. STM is not touched.
+
+        Args:
+            sequences: Dicts with 'events' (list of symbol lists), optional
+                'emotives' (list of emotive dicts) and 'metadata' (dict)
+            sort_symbols: Sort symbols within each event
+
+        Returns:
+            One dict per sequence: {'pattern_name', 'status'} with status
+            'new', 'relearned' or 'skipped'
+        """
+        results = []
+        items = []
+        positions = []
+        for sequence in sequences:
+            events = [sorted(event) if sort_symbols else list(event)
+                      for event in sequence.get('events', []) if event]
+            pattern = Pattern(events)
+            if len(pattern) < 2:
+                results.append({'pattern_name': None, 'status': 'skipped'})
+                continue
+            metadata = sequence.get('metadata')
+            positions.append(len(results))
+            results.append({'pattern_name': f"PTRN|{pattern.name}", 'status': 'relearned'})
+            items.append((pattern, list(sequence.get('emotives') or []),
+                          accumulate_metadata([metadata]) if metadata else {}))
+
+        with self._learn_lock:
+            statuses = self.patterns_kb.learnPatterns(items)
+
+            new_patterns = []
+            for position, (pattern, _, _), is_new in zip(positions, items, statuses):
+                if is_new:
+                    results[position]['status'] = 'new'
+                    new_patterns.append((pattern.name, pattern.flat_data))
+            self.patterns_searcher.assignNewlyLearnedBatch(new_patterns)
+
+        if new_patterns and self.metrics_cache_manager:
+            asyncio.create_task(self.metrics_cache_manager.invalidate_all_metrics())
+        self.query_manager.invalidate_caches()
+        self._global_metadata_cache = None
+        return results
 
     async def finalize_training(self) -> dict[str, Any]:
         """
@@ -476,11 +568,20 @@ class PatternProcessor:
     def delete_pattern(self, name: str) -> str:
         if not self.patterns_searcher.delete_pattern(name):
             raise Exception(f'Unable to find and delete pattern {name} in RAM')
+        # Pooled searchers may still hold the pattern in their working sets
+        self.searcher_pool.clear()
         # Delete from ClickHouse
         try:
             self.superkb.clickhouse_writer.client.command(
                 f"ALTER TABLE kato.patterns_data DELETE WHERE kb_id = '{self.kb_id}' AND name = '{name}'"
             )
+            self.superkb.clickhouse_writer.client.command(
+                f"ALTER TABLE kato.lsh_buckets DELETE WHERE kb_id = '{self.kb_id}' AND pattern_name = '{name}'"
+            )
+            if USE_TOKEN_INDEX:
+                self.superkb.clickhouse_writer.client.command(
+                    f"ALTER TABLE kato.pattern_token_index DELETE WHERE kb_id = '{self.kb_id}' AND name = '{name}'"
+                )
         except Exception as e:
             logger.warning(f"Failed to delete pattern {name} from ClickHouse: {e}")
         # Delete metadata from Redis
@@ -514,16 +615,24 @@ class PatternProcessor:
         self.superkb.redis_writer.write_metadata(name, frequency=frequency, emotives=emotives)
         return {'name': name, 'frequency': frequency, 'emotives': emotives}
 
-    async def processEvents(self, current_unique_id: str) -> list[dict[str, Any]]:
+    async def processEvents(self, current_unique_id: str,
+                            stm: Optional[list[list[str]]] = None,
+                            trigger_predictions: Optional[bool] = None,
+                            session_id: Optional[str] = None,
+                            config: Optional[SessionConfiguration] = None) -> list[dict[str, Any]]:
         """
         Generate predictions by matching short-term memory against learned patterns.
 
         Flattens the STM (list of events) into a single state vector,
         then searches for similar patterns in the pattern database.
-        Predictions are cached in Redis for retrieval.
+        Predictions are stored in Redis for retrieval by unique_id.
 
         Args:
             current_unique_id: Unique identifier for this observation.
+            stm: Session STM to predict from (defaults to self.STM)
+            trigger_predictions: Whether to predict (defaults to self.trigger_predictions)
+            session_id: Session the STM belongs to (see predictPattern)
+            config: Session configuration to match with (see get_predictions_async)
 
         Returns:
             List of prediction dictionaries with pattern matches and metrics.
@@ -531,16 +640,23 @@ class PatternProcessor:
         Note:
             KATO requires at least 1 string in STM to generate predictions.
         """
+        if stm is None:
+            stm = self.STM
+        if trigger_predictions is None:
+            trigger_predictions = self.trigger_predictions
+
         # Flatten short-term memory: [["a","b"],["c"]] -> ["a","b","c"]
-        state = list(chain(*self.STM))
+        state = list(chain(*stm))
 
         # Generate predictions if we have at least 1 string in state
         # Single-symbol predictions use optimized fast path
-        if len(state) >= 1 and self.predict and self.trigger_predictions:
-            predictions = await self.predictPattern(state, stm_events=self.STM)
-
-            # Cache predictions in memory for quick access
-            self.predictions = predictions
+        if len(state) >= 1 and self.predict and trigger_predictions:
+            # Match with a leased searcher: the processor's own is shared by
+            # every session observing on this node
+            with self._lease_searcher(config) as (searcher, max_predictions):
+                predictions = await self.predictPattern(state, stm_events=stm, searcher=searcher,
+                                                        max_predictions=max_predictions,
+                                                        session_id=session_id)
 
             # Store predictions for async retrieval
             if predictions:
@@ -629,7 +745,15 @@ class PatternProcessor:
         """
         return float(freq/total_pattern_frequencies) if total_pattern_frequencies > 0 else 0.0
 
-    def _compute_affinity_weights(self, state: list[str], candidate_patterns: list[dict] = None) -> Optional[dict[str, float]]:
+    def _affinity_emotive(self, searcher: Optional[PatternSearcher] = None) -> Optional[str]:
+        """Emotive affinity-weighted matching is configured for, or None (session_config lives on the PatternSearcher)."""
+        if searcher is None:
+            searcher = getattr(self, 'patterns_searcher', None)
+        sc = getattr(searcher, 'session_config', None) if searcher else None
+        return getattr(sc, 'affinity_emotive', None) if sc else None
+
+    def _compute_affinity_weights(self, state: list[str], candidate_patterns: list[dict] = None,
+                                  searcher: Optional[PatternSearcher] = None) -> Optional[dict[str, float]]:
         """
         Compute affinity-weighted token weights for pattern matching.
 
@@ -640,17 +764,13 @@ class PatternProcessor:
             candidate_patterns: Optional list of candidate pattern dicts (for single-symbol path).
                 If None, weights are computed only for state tokens (pattern tokens
                 will get floor weight if not in the weight map).
+            searcher: PatternSearcher whose session_config applies (defaults to
+                self.patterns_searcher)
 
         Returns:
             Dict mapping symbol -> weight, or None if affinity weighting is not active.
         """
-        # Check if affinity_emotive is configured (session_config lives on the PatternSearcher)
-        affinity_emotive = None
-        if hasattr(self, 'patterns_searcher') and self.patterns_searcher:
-            sc = getattr(self.patterns_searcher, 'session_config', None)
-            if sc:
-                affinity_emotive = getattr(sc, 'affinity_emotive', None)
-
+        affinity_emotive = self._affinity_emotive(searcher)
         if not affinity_emotive:
             return None
 
@@ -684,7 +804,51 @@ class PatternProcessor:
 
         return weights
 
-    async def _predict_single_symbol_fast(self, symbol: str, stm_events: Optional[list[list[str]]] = None) -> list[dict[str, Any]]:
+    def _attach_pattern_metadata(self, ranked: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Copies of single-symbol predictions with each pattern's frequency and emotives.
+
+        Args:
+            ranked: Predictions to return (possibly materialized; not modified)
+
+        Returns:
+            Prediction dicts with 'frequency' and averaged 'emotives' added;
+            their lists (matches, missing, past, future, ...) are copies, so
+            callers may modify them without touching materialized entries
+        """
+        metadata_batch = self.superkb.redis_writer.get_metadata_batch([p['name'] for p in ranked])
+        predictions = []
+        for prediction in ranked:
+            name = prediction['name']
+            metadata = metadata_batch.get(name, {'name': name, 'frequency': 1})
+            frequency = metadata.get('frequency', 1)
+            # Floor frequency at 1: pattern exists in ClickHouse, so frequency=0
+            # indicates Redis data loss, not an unlearned pattern
+            if frequency == 0:
+                logger.warning(
+                    f"Pattern {name} found in ClickHouse but has "
+                    f"frequency=0 in Redis — possible Redis data loss. Defaulting to 1."
+                )
+                frequency = 1
+            emotives = metadata.get('emotives', [])
+            try:
+                if isinstance(emotives, list) and emotives:
+                    emotives = average_emotives(emotives)
+                elif not emotives:
+                    emotives = {}
+            except ZeroDivisionError:
+                emotives = {}
+            predictions.append({
+                key: [list(item) if isinstance(item, list) else item for item in value]
+                if isinstance(value, list) else value
+                for key, value in prediction.items()
+            })
+            predictions[-1].update(frequency=frequency, emotives=emotives)
+        return predictions
+
+    async def _predict_single_symbol_fast(self, symbol: str, stm_events: Optional[list[list[str]]] = None, *,
+                                          searcher: Optional[PatternSearcher] = None,
+                                          max_predictions: Optional[int] = None) -> list[dict[str, Any]]:
         """
         Fast path for single-symbol predictions using Redis symbol-to-pattern index.
 
@@ -694,6 +858,8 @@ class PatternProcessor:
         Args:
             symbol: Single symbol to match
             stm_events: Short-term memory events (for temporal segmentation)
+            searcher: PatternSearcher for the fallback path (see predictPattern)
+            max_predictions: Prediction limit (defaults to self.max_predictions)
 
         Returns:
             List of prediction dictionaries sorted by potential
@@ -701,13 +867,30 @@ class PatternProcessor:
         Performance:
             10-1000x faster than full filter pipeline for single-symbol queries.
             O(1) Redis lookup + O(k) ClickHouse batch load where k = matching patterns
+            Later calls for the symbol read its materialized ranking (see
+            kato.searches.single_symbol_predictions) until a write invalidates it.
         """
         logger.info(f"*** {self.name} [ PatternProcessor _predict_single_symbol_fast called with symbol='{symbol}' ]")
 
         # Flush any pending ClickHouse writes so recently learned patterns are visible
         self.superkb.clickhouse_writer.flush_if_pending()
 
+        if max_predictions is None:
+            max_predictions = self.max_predictions
+
+        # Ranked predictions of this symbol materialized by an earlier call. Affinity
+        # weights follow symbol statistics that every learn changes: not materialized
+        store = get_single_symbol_predictions()
+        ticket = None
+        if not self._affinity_emotive(searcher):
+            ticket = store.begin(self.kb_id, symbol, getattr(self.patterns_searcher, 'redis_client', None))
+
         try:
+            ranked = store.get(self.kb_id, symbol, self.use_token_matching, ticket, max_predictions)
+            if ranked is not None:
+                logger.debug(f"Returning {len(ranked)} materialized predictions for single-symbol '{symbol}'")
+                return self._attach_pattern_metadata(ranked)
+
             # Step 1: Query ClickHouse directly for patterns starting with this symbol
             # Uses the first_token column (populated during _prepare_row) instead of
             # building a large IN-clause from Redis, which overflows max_query_size at scale.
@@ -716,18 +899,14 @@ class PatternProcessor:
 
             if not clickhouse_client:
                 logger.warning("ClickHouse not available, falling back to regular prediction path")
-                return await self.predictPattern([symbol], stm_events=stm_events)
-
-            query = f"""
-                SELECT name, pattern_data, length
-                FROM kato.patterns_data
-                WHERE kb_id = '{self.superkb.id}' AND first_token = '{symbol}'
-            """
+                return await self.predictPattern([symbol], stm_events=stm_events,
+                                                 searcher=searcher, max_predictions=max_predictions)
 
-            result = clickhouse_client.query(query)
+            result = self._query_patterns_starting_with(clickhouse_client, symbol)
 
             if not result.result_rows:
                 logger.debug(f"No patterns found starting with symbol '{symbol}'")
+                store.put(self.kb_id, symbol, self.use_token_matching, ticket, [], max_predictions)
                 return []
 
             logger.debug(f"Found {len(result.result_rows)} patterns starting with symbol '{symbol}'")
@@ -745,6 +924,7 @@ class PatternProcessor:
 
             if not candidate_patterns:
                 logger.debug(f"No patterns START with symbol '{symbol}' (found patterns containing it)")
+                store.put(self.kb_id, symbol, self.use_token_matching, ticket, [], max_predictions)
                 return []
 
             logger.debug(f"Found {len(candidate_patterns)} patterns STARTING with symbol '{symbol}'")
@@ -764,15 +944,14 @@ class PatternProcessor:
             # since we're already filtering to patterns that START with this symbol.
             single_symbol_threshold = 0.0
 
-            # Pre-load all pattern metadata in a single batch call
-            candidate_names = [p['name'] for p in candidate_patterns]
-            metadata_batch = self.superkb.redis_writer.get_metadata_batch(candidate_names)
-
             # Compute affinity weights if affinity_emotive is configured
-            affinity_weights = self._compute_affinity_weights(state, candidate_patterns)
+            affinity_weights = self._compute_affinity_weights(state, candidate_patterns, searcher)
 
-            def _process_single_symbol_batch(batch, _state, _extractor, _metadata_batch, _threshold, _weights=None):
-                """Process a batch of candidates for single-symbol prediction (thread-safe)."""
+            def _process_single_symbol_batch(batch, _state, _extractor, _threshold, _weights=None):
+                """Process a batch of candidates for single-symbol prediction (thread-safe).
+
+                Frequency and emotives are attached to the returned predictions only.
+                """
                 batch_results = []
                 for pattern_dict in batch:
                     pattern_data_flat = list(chain(*pattern_dict['pattern_data']))
@@ -791,18 +970,6 @@ class PatternProcessor:
                     (pattern, matching_intersection, past, present, missing, extras,
                      similarity, number_of_blocks, anomalies, weighted_similarity) = prediction_info
 
-                    metadata = _metadata_batch.get(pattern_dict['name'], {'name': pattern_dict['name'], 'frequency': 1})
-                    frequency = metadata.get('frequency', 1)
-                    # Floor frequency at 1: pattern exists in ClickHouse, so frequency=0
-                    # indicates Redis data loss, not an unlearned pattern
-                    if frequency == 0:
-                        logger.warning(
-                            f"Pattern {pattern_dict['name']} found in ClickHouse but has "
-                            f"frequency=0 in Redis — possible Redis data loss. Defaulting to 1."
-                        )
-                        frequency = 1
-                    emotives = metadata.get('emotives', [])
-
                     total_pattern_symbols = len(pattern)
                     evidence = len(matching_intersection) / total_pattern_symbols if total_pattern_symbols > 0 else 0.0
 
@@ -834,20 +1001,10 @@ class PatternProcessor:
                         weighted_confidence = (w_matched / w_present) if w_present > 0 else 0.0
                         weighted_snr = (w_matched / (w_matched + w_extras)) if (w_matched + w_extras) > 0 else 0.0
 
-                    try:
-                        if isinstance(emotives, list) and emotives:
-                            emotives = average_emotives(emotives)
-                        elif not emotives:
-                            emotives = {}
-                    except ZeroDivisionError:
-                        emotives = {}
-
                     batch_results.append({
                         'name': pattern_dict['name'],
                         'pattern_data': pattern_dict['pattern_data'],
                         'length': pattern_dict['length'],
-                        'frequency': frequency,
-                        'emotives': emotives,
                         'matches': matching_intersection,
                         'missing': missing,
                         'present': present,
@@ -879,7 +1036,7 @@ class PatternProcessor:
 
                 with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
                     futures = [
-                        executor.submit(_process_single_symbol_batch, batch, state, extractor, metadata_batch, single_symbol_threshold, affinity_weights)
+                        executor.submit(_process_single_symbol_batch, batch, state, extractor, single_symbol_threshold, affinity_weights)
                         for batch in batches
                     ]
                     for future in concurrent.futures.as_completed(futures):
@@ -889,11 +1046,12 @@ class PatternProcessor:
                             logger.error(f"Error processing single-symbol batch: {e}")
             else:
                 predictions.extend(
-                    _process_single_symbol_batch(candidate_patterns, state, extractor, metadata_batch, single_symbol_threshold, affinity_weights)
+                    _process_single_symbol_batch(candidate_patterns, state, extractor, single_symbol_threshold, affinity_weights)
                 )
 
             if not predictions:
                 logger.debug(f"No predictions passed similarity threshold for symbol '{symbol}'")
+                store.put(self.kb_id, symbol, self.use_token_matching, ticket, [], max_predictions)
                 return []
 
             # Step 5: Calculate metrics using existing infrastructure
@@ -920,12 +1078,13 @@ class PatternProcessor:
 
             # Sort by potential
             predictions.sort(key=lambda x: x['potential'], reverse=True)
+            store.put(self.kb_id, symbol, self.use_token_matching, ticket, predictions, max_predictions)
 
             # Limit to max_predictions
-            predictions = predictions[:self.max_predictions]
+            predictions = predictions[:max_predictions]
 
             logger.debug(f"Returning {len(predictions)} predictions for single-symbol '{symbol}'")
-            return predictions
+            return self._attach_pattern_metadata(predictions)
 
         except Exception as e:
             logger.error(f"Error in _predict_single_symbol_fast for symbol '{symbol}': {e}")
@@ -933,10 +1092,39 @@ class PatternProcessor:
             logger.error(f"Traceback: {traceback.format_exc()}")
             # Fall back to regular prediction path
             logger.warning("Falling back to regular prediction path")
-            return await self.predictPattern([symbol], stm_events=stm_events)
+            return await self.predictPattern([symbol], stm_events=stm_events,
+                                             searcher=searcher, max_predictions=max_predictions)
+
+    def _query_patterns_starting_with(self, clickhouse_client, symbol: str):
+        """Patterns whose first token is symbol, through the token index when enabled.
+
+        The token index reads one key range instead of the kb's partition and
+        pushes KATO_SINGLE_SYMBOL_TOP_K (the most frequent patterns) down to
+        ClickHouse. Without the index table the first_token column is scanned.
+        """
+        if USE_TOKEN_INDEX:
+            try:
+                return clickhouse_client.query(
+                    patterns_by_token_query(self.superkb.id, symbol, 'first', top_k=SINGLE_SYMBOL_TOP_K)
+                )
+            except Exception as e:
+                logger.warning(f"Token index lookup failed, scanning first_token instead "
+                               f"(run scripts/migrate_token_index.py): {e}")
+
+        query = f"""
+            SELECT name, pattern_data, length
+            FROM kato.patterns_data
+            WHERE kb_id = '{self.superkb.id}' AND first_token = '{symbol}'
+        """
+        return clickhouse_client.query(query)
 
-    async def predictPattern(self, state: list[str], stm_events: Optional[list[list[str]]] = None, max_workers: Optional[int] = None, batch_size: int = 100) -> list[dict[str, Any]]:
-        """Predict patterns matching the given state (async with caching support).
+    async def predict_with_potentials(self, state: list[str], stm_events: Optional[list[list[str]]] = None,
+                                      max_workers: Optional[int] = None, batch_size: int = 100, *,
+                                      searcher: Optional[PatternSearcher] = None,
+                                      max_predictions: Optional[int] = None,
+                                      session_id: Optional[str] = None
+                                      ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """Predict patterns matching the given state, with their aggregated future potentials.
 
         Provides 3-10x performance improvement through:
         - Parallel pattern matching using ThreadPoolExecutor
@@ -953,10 +1141,17 @@ class PatternProcessor:
             state: Flattened list of symbols representing current STM state.
             max_workers: Maximum number of worker threads (defaults to CPU count)
             batch_size: Number of patterns per batch for parallel processing
+            searcher: PatternSearcher to match with (defaults to self.patterns_searcher)
+            max_predictions: Prediction limit (defaults to self.max_predictions)
+            session_id: Session whose STM stm_events is; its incrementally
+                maintained STM sketch is handed to the filter pipeline
 
         Returns:
-            List of prediction dictionaries sorted by potential, containing
-            pattern information and calculated metrics.
+            Tuple of (prediction dictionaries sorted by potential, containing
+            pattern information and calculated metrics; future potentials
+            aggregated over the ensemble, empty on the single-symbol path).
+            Both are returned rather than kept on the processor, which
+            concurrent sessions share.
 
         Raises:
             Exception: If async pattern search fails.
@@ -964,29 +1159,60 @@ class PatternProcessor:
         """
         logger.info(f"*** {self.name} [ PatternProcessor predictPattern (async) called with state={state} ]")
 
+        # Per-call settings stay local so concurrent predictions never see each other's
+        if searcher is None:
+            searcher = self.patterns_searcher
+        if max_predictions is None:
+            max_predictions = self.max_predictions
+
         # Flush any pending ClickHouse writes so recently learned patterns are visible
         self.superkb.clickhouse_writer.flush_if_pending()
 
         # FAST PATH: Single-symbol predictions using Redis index
         if len(state) == 1:
             logger.info(f"Using single-symbol fast path for state={state}")
-            return await self._predict_single_symbol_fast(state[0], stm_events=stm_events)
+            predictions = await self._predict_single_symbol_fast(state[0], stm_events=stm_events,
+                                                                 searcher=searcher, max_predictions=max_predictions)
+            return predictions, []
 
         try:
-            # Compute and set affinity weights on pattern searcher before matching
-            self.patterns_searcher.affinity_weights = self._compute_affinity_weights(state)
+            # Affinity weights for this prediction, passed to the searcher explicitly
+            weights = self._compute_affinity_weights(state, searcher=searcher)
+
+            # Session STM sketch: length, tokens and MinHash updated per observed event
+            sketch = None
+            if (USE_STM_SKETCHES and session_id and stm_events is not None
+                    and getattr(searcher, 'use_hybrid_architecture', False)):
+                sketch = get_stm_sketches().sync(self.kb_id, session_id, stm_events)
 
             # Use async parallel pattern matching
-            causal_patterns = await self.patterns_searcher.causalBeliefAsync(
-                state, self.target_class_candidates, stm_events, max_workers, batch_size)
+            max_for_metrics = max_predictions * PRUNING_FACTOR
+            causal_patterns = await searcher.causalBeliefAsync(
+                state, self.target_class_candidates, stm_events, max_workers, batch_size,
+                affinity_weights=weights, top_k=max_for_metrics, sketch=sketch)
         except Exception as e:
             raise Exception(f"\nException in PatternProcessor.predictPattern: Error in causalBeliefAsync! {self.kb_id}: {e}")
 
         # Early return if no patterns found
         if not causal_patterns:
-            self.future_potentials = []  # Clear stale future_potentials
             logger.debug(f" {self.name} [ PatternProcessor predictPattern (async) ] No causal patterns found, returning empty list")
-            return []
+            return [], []
+
+        # Top-K pruning: reduce candidates before expensive metrics loop
+        # Uses a cheap pre-potential from already-available fields (same formula as
+        # final potential minus itfdf_similarity which hasn't been computed yet).
+        # itfdf_similarity is bounded [0,1], so a 3x safety margin prevents losing
+        # high-quality predictions that might reorder after full metrics.
+        # The searcher returns LeanPredictions; only the kept ones are materialized.
+        if len(causal_patterns) > max_for_metrics:
+            original_count = len(causal_patterns)
+            causal_patterns = heapq.nlargest(max_for_metrics, causal_patterns, key=pre_potential)
+            causal_patterns = [p.materialize() for p in causal_patterns]
+            for p in causal_patterns:
+                p['_pre_potential'] = pre_potential(p)
+            logger.debug(f"Top-K pruning: kept {len(causal_patterns)} of {original_count} candidates for metrics loop")
+        else:
+            causal_patterns = [p.materialize() for p in causal_patterns]
 
         # Validate all predictions have required fields (same validation as sync version)
         for idx, prediction in enumerate(causal_patterns):
@@ -1001,7 +1227,6 @@ class PatternProcessor:
                 raise ValueError(f"Prediction '{pred_name}' missing required fields: {missing_fields}")
 
         # Compute weighted metrics for predictions if affinity weighting is active
-        weights = self.patterns_searcher.affinity_weights
         if weights:
             for p in causal_patterns:
                 matches = p.get('matches', [])
@@ -1028,24 +1253,6 @@ class PatternProcessor:
                 p['weighted_confidence'] = (w_matched / w_present) if w_present > 0 else 0.0
                 p['weighted_snr'] = (w_matched / (w_matched + w_extras)) if (w_matched + w_extras) > 0 else 0.0
 
-        # Top-K pruning: reduce candidates before expensive metrics loop
-        # Uses a cheap pre-potential from already-available fields (same formula as
-        # final potential minus itfdf_similarity which hasn't been computed yet).
-        # itfdf_similarity is bounded [0,1], so a 3x safety margin prevents losing
-        # high-quality predictions that might reorder after full metrics.
-        PRUNING_FACTOR = 3
-        max_for_metrics = self.max_predictions * PRUNING_FACTOR
-        if len(causal_patterns) > max_for_metrics:
-            original_count = len(causal_patterns)
-            for p in causal_patterns:
-                frag = p['fragmentation']
-                p['_pre_potential'] = (
-                    (p['evidence'] + p['confidence']) * p['snr']
-                    + (0.0 if frag == -1 else 1.0 / (frag + 1))
-                )
-            causal_patterns = heapq.nlargest(max_for_metrics, causal_patterns, key=itemgetter('_pre_potential'))
-            logger.debug(f"Top-K pruning: kept {len(causal_patterns)} of {original_count} candidates for metrics loop")
-
         try:
             # Pre-calculate symbol probability cache using optimized aggregation pipeline
             symbol_probability_cache = {}
@@ -1087,8 +1294,6 @@ class PatternProcessor:
                             symbol_probability = 0.0
                         symbol_probability_cache[symbol] = symbol_probability
 
-            symbol_frequency_in_state = Counter(state)
-
             if total_ensemble_pattern_frequencies == 0:
                 logger.warning(f" {self.name} [ PatternProcessor predictPattern (async) ] total_ensemble_pattern_frequencies is 0")
 
@@ -1101,71 +1306,23 @@ class PatternProcessor:
             if precomputed_hit > 0:
                 logger.debug(f"Pre-computed metrics: {precomputed_hit} hits, {precomputed_miss} misses")
 
-            # Vectorized cosine distance: batch compute all distances before the loop
-            N = len(causal_patterns)
-            present_lists = []
-            all_present_symbols = set()
-            for prediction in causal_patterns:
-                _present = list(chain(*prediction.present))
-                present_lists.append(_present)
-                all_present_symbols.update(_present)
-
-            global_symbols = sorted(all_present_symbols | set(state))
-            symbol_to_idx = {s: i for i, s in enumerate(global_symbols)}
-            D = len(global_symbols)
-
-            # Pre-compute state vector once (weighted by symbol_probability_cache)
-            state_vec = np.zeros(D)
-            for symbol, count in symbol_frequency_in_state.items():
-                if symbol in symbol_to_idx:
-                    state_vec[symbol_to_idx[symbol]] = symbol_probability_cache.get(symbol, 0) * count
-            state_norm = np.linalg.norm(state_vec)
-
-            # Build pattern frequency matrix (N x D)
-            pattern_matrix = np.zeros((N, D))
-            for i, _present in enumerate(present_lists):
-                for symbol, count in Counter(_present).items():
-                    if symbol in symbol_to_idx:
-                        pattern_matrix[i, symbol_to_idx[symbol]] = symbol_probability_cache.get(symbol, 0) * count
-
-            # Batch cosine distance computation
-            if state_norm > 0:
-                dots = pattern_matrix @ state_vec
-                pattern_norms = np.linalg.norm(pattern_matrix, axis=1)
-                denom = pattern_norms * state_norm
-                cosine_sims = np.where(denom > 0, dots / denom, 0.0)
-                distances = 1.0 - cosine_sims
-            else:
-                distances = np.ones(N)
-
-            # Process predictions with metrics calculations
-            for i, prediction in enumerate(causal_patterns):
-                _present = present_lists[i]
-                distance = float(distances[i])
-                _p_e_h = float(self.patternProbability(prediction['frequency'], total_pattern_frequencies))
-
-                if total_ensemble_pattern_frequencies > 0:
-                    itfdf_similarity = 1 - (distance * prediction['frequency'] / total_ensemble_pattern_frequencies)
-                else:
-                    itfdf_similarity = 0.0
-
-                # Calculate confluence with conditional probability caching if available
-                # Let exceptions propagate - client should receive HTTP 500 on calculation failure
-                if len(_present) > 0:
-                    if self.cached_calculator:
-                        try:
-                            conditional_prob = await self.cached_calculator.conditional_probability_cached(
-                                _present, symbol_probability_cache
-                            )
-                            confluence_val = _p_e_h * (1 - conditional_prob)
-                        except Exception as e:
-                            logger.debug(f"Cached conditional probability failed: {e}, falling back to direct calculation")
-                            confluence_val = _p_e_h * (1 - confluence(_present, symbol_probability_cache))
-                    else:
-                        confluence_val = _p_e_h * (1 - confluence(_present, symbol_probability_cache))
-                else:
-                    confluence_val = 0.0
+            # Columnar metrics pass over all candidates (distance, itfdf, confluence,
+            # entropy fallbacks, TF-IDF); numerically identical to per-candidate formulas
+            present_lists = [list(chain(*prediction.present)) for prediction in causal_patterns]
+            metrics = prediction_metrics(
+                present_lists,
+                [prediction['frequency'] for prediction in causal_patterns],
+                state,
+                [precomputed_metrics.get(name) for name in prediction_names],
+                symbol_probability_cache,
+                total_pattern_frequencies,
+                total_ensemble_pattern_frequencies,
+                total_unique_patterns,
+                total_symbols
+            )
+            metric_rows = zip(*(metrics[field] for field in _METRIC_FIELDS))
 
+            for prediction, row in zip(causal_patterns, metric_rows):
                 # Average emotives (convert from list of dicts to single dict)
                 try:
                     if isinstance(prediction['emotives'], list):
@@ -1174,93 +1331,8 @@ class PatternProcessor:
                     logger.error(f"ZeroDivisionError in average_emotives: emotives={prediction['emotives']}, error={e}")
                     raise
 
-                # Pattern-intrinsic entropy metrics: use pre-computed if available
-                pred_name = prediction.get('name', '')
-                precomp = precomputed_metrics.get(pred_name)
-
-                if precomp:
-                    entropy_val = precomp['entropy']
-                    normalized_entropy_val = precomp['normalized_entropy']
-                    global_normalized_entropy_val = precomp['global_normalized_entropy']
-                else:
-                    # Fallback: compute at runtime (pattern predates finalize-training)
-                    pattern_symbols = [s for event in prediction['present'] for s in event]
-                    pattern_length = len(pattern_symbols)
-                    if pattern_symbols:
-                        symbol_counts = Counter(pattern_symbols)
-                        # Shannon entropy (log base 2)
-                        entropy_val = 0.0
-                        for count in symbol_counts.values():
-                            if count > 0:
-                                p = count / pattern_length
-                                entropy_val -= p * log2(p)
-                        # Normalized entropy (log base total_symbols)
-                        normalized_entropy_val = 0.0
-                        if total_symbols > 1:
-                            for count in symbol_counts.values():
-                                if count > 0:
-                                    p = count / pattern_length
-                                    normalized_entropy_val -= p * log(p, total_symbols)
-                        # Global normalized entropy (using symbol probabilities)
-                        global_normalized_entropy_val = 0.0
-                        if total_symbols > 1:
-                            for symbol in set(pattern_symbols):
-                                prob = symbol_probability_cache.get(symbol, 0)
-                                if prob > 0:
-                                    global_normalized_entropy_val -= prob * log(prob, total_symbols)
-                    else:
-                        entropy_val = 0.0
-                        normalized_entropy_val = 0.0
-                        global_normalized_entropy_val = 0.0
-
-                # TF-IDF: use pre-computed TF vector if available, else compute at runtime
-                if precomp and total_unique_patterns > 0:
-                    tf_vector = precomp['tf_vector']
-                    tfidf_scores = []
-                    for symbol, tf in tf_vector.items():
-                        if symbol in symbol_probability_cache:
-                            patterns_with_symbol = int(symbol_probability_cache[symbol] * total_unique_patterns)
-                            if patterns_with_symbol == 0:
-                                patterns_with_symbol = 1
-                        else:
-                            patterns_with_symbol = 1
-                        idf = log2(total_unique_patterns / patterns_with_symbol) + 1
-                        tfidf_scores.append(tf * idf)
-                    tfidf_score = sum(tfidf_scores) / len(tfidf_scores) if tfidf_scores else 0.0
-                else:
-                    # Fallback: compute TF and IDF at runtime
-                    if not precomp:
-                        pattern_symbols = [s for event in prediction['present'] for s in event]
-                    else:
-                        pattern_symbols = []  # precomp exists but total_unique_patterns == 0
-                    unique_symbols = set(pattern_symbols)
-                    pattern_length = len(pattern_symbols)
-
-                    if pattern_length > 0 and total_unique_patterns > 0:
-                        tfidf_scores = []
-                        for symbol in unique_symbols:
-                            tf = pattern_symbols.count(symbol) / pattern_length
-                            if symbol in symbol_probability_cache:
-                                patterns_with_symbol = int(symbol_probability_cache[symbol] * total_unique_patterns)
-                                if patterns_with_symbol == 0:
-                                    patterns_with_symbol = 1
-                            else:
-                                patterns_with_symbol = 1
-                            idf = log2(total_unique_patterns / patterns_with_symbol) + 1
-                            tfidf_scores.append(tf * idf)
-                        tfidf_score = sum(tfidf_scores) / len(tfidf_scores) if tfidf_scores else 0.0
-                    else:
-                        tfidf_score = 0.0
-
                 # Update prediction with calculated values
-                prediction.update({
-                    'entropy': entropy_val,
-                    'normalized_entropy': normalized_entropy_val,
-                    'global_normalized_entropy': global_normalized_entropy_val,
-                    'itfdf_similarity': itfdf_similarity,
-                    'confluence': confluence_val,
-                    'tfidf_score': tfidf_score
-                })
+                prediction.update(zip(_METRIC_FIELDS, row))
 
                 # Remove pattern_data to save bandwidth
                 prediction.pop('pattern_data', None)
@@ -1268,8 +1340,6 @@ class PatternProcessor:
             # Calculate ensemble-based predictive information for metrics
             # Let exceptions propagate - client should receive HTTP 500 on calculation failure
             causal_patterns, future_potentials = calculate_ensemble_predictive_information(causal_patterns)
-            # Store future_potentials for the API response
-            self.future_potentials = future_potentials
 
             # Vectorized Bayesian posterior probabilities
             # P(pattern|obs) = P(obs|pattern) × P(pattern) / P(obs)
@@ -1313,7 +1383,7 @@ class PatternProcessor:
             try:
                 # Sort predictions using configurable ranking algorithm (default: 'potential')
                 active_causal_patterns = sorted(
-                    list(heapq.nlargest(self.max_predictions, causal_patterns, key=itemgetter(self.rank_sort_algo))),
+                    list(heapq.nlargest(max_predictions, causal_patterns, key=itemgetter(self.rank_sort_algo))),
                     reverse=True,
                     key=itemgetter(self.rank_sort_algo)
                 )
@@ -1323,40 +1393,48 @@ class PatternProcessor:
                 raise Exception(f"\nException in PatternProcessor.predictPattern (async): Error in sorting predictions! {self.kb_id}: {e}")
 
             logger.debug(f" [ PatternProcessor predictPattern (async) ] {len(active_causal_patterns)} active_causal_patterns")
-            return active_causal_patterns
+            return active_causal_patterns, future_potentials
 
         except Exception as e:
             raise Exception(f"\nException in PatternProcessor.predictPattern (async): Error in metrics calculation! {self.kb_id}: {e}")
 
-    async def get_predictions_async(self, stm: list[list[str]], config=None) -> list[dict[str, Any]]:
+    async def predictPattern(self, state: list[str], stm_events: Optional[list[list[str]]] = None,
+                             max_workers: Optional[int] = None, batch_size: int = 100, *,
+                             searcher: Optional[PatternSearcher] = None,
+                             max_predictions: Optional[int] = None,
+                             session_id: Optional[str] = None) -> list[dict[str, Any]]:
+        """Predict patterns matching the given state (see predict_with_potentials).
+
+        Returns:
+            List of prediction dictionaries sorted by potential, containing
+            pattern information and calculated metrics.
         """
-        Generate predictions with session-specific configuration (async version).
+        predictions, _ = await self.predict_with_potentials(
+            state, stm_events, max_workers, batch_size,
+            searcher=searcher, max_predictions=max_predictions, session_id=session_id)
+        return predictions
+
+    @contextmanager
+    def _lease_searcher(self, config: Optional[SessionConfiguration] = None
+                        ) -> Iterator[tuple[PatternSearcher, int]]:
+        """
+        Lease a PatternSearcher built for config's matching values from the searcher pool.
 
-        This is the config-as-parameter version that doesn't mutate processor state.
+        Calls with the same configuration reuse warm searchers, and no two
+        calls hold the same one, so concurrent predictions never mutate the
+        instance's patterns_searcher or each other's.
 
         Args:
-            stm: Short-term memory (list of events)
             config: Optional SessionConfiguration with prediction parameters
 
-        Returns:
-            List of prediction dictionaries
+        Yields:
+            Tuple of (searcher, max_predictions for this configuration)
         """
-        # Flatten STM to state
-        state = list(chain(*stm))
-
-        # Generate predictions if we have at least 1 string in state
-        # Single-symbol predictions use optimized fast path
-        if len(state) < 1:
-            logger.debug("No symbols in state for predictions")
-            return []
-
         # Extract config values or use instance defaults
         recall_threshold = config.recall_threshold if config and config.recall_threshold is not None else self.recall_threshold
         max_predictions = config.max_predictions if config and config.max_predictions is not None else self.max_predictions
         use_token_matching = config.use_token_matching if config and config.use_token_matching is not None else self.use_token_matching
 
-        # Temporarily create a PatternSearcher with config values
-        # This avoids mutating the instance's patterns_searcher
         # Use same architecture mode as main searcher
         temp_searcher_kwargs = {
             'kb_id': self.kb_id,
@@ -1366,33 +1444,70 @@ class PatternProcessor:
         }
 
         # Check if main searcher is using hybrid architecture
+        session_config = None
         if hasattr(self.patterns_searcher, 'use_hybrid_architecture') and self.patterns_searcher.use_hybrid_architecture:
+            session_config = config if config else self.patterns_searcher.session_config
             # Pass hybrid parameters from main searcher
             temp_searcher_kwargs.update({
-                'session_config': config if config else self.patterns_searcher.session_config,
+                'session_config': session_config,
                 'clickhouse_client': self.patterns_searcher.clickhouse_client,
                 'redis_client': self.patterns_searcher.redis_client
             })
 
-        temp_searcher = PatternSearcher(**temp_searcher_kwargs)
+        key = matching_config_key(max_predictions, recall_threshold, use_token_matching, session_config)
+        with self.searcher_pool.lease(key, lambda: PatternSearcher(**temp_searcher_kwargs)) as searcher:
+            if session_config is not None:
+                # Same values as the key; point the searcher at the caller's current object
+                searcher.session_config = session_config
+            yield searcher, max_predictions
 
-        # Save original searcher
-        original_searcher = self.patterns_searcher
-        original_max_predictions = self.max_predictions
+    async def get_predictions_async(self, stm: list[list[str]], config=None) -> list[dict[str, Any]]:
+        """
+        Generate predictions with session-specific configuration (async version).
 
-        try:
-            # Temporarily swap searcher and max_predictions
-            self.patterns_searcher = temp_searcher
-            self.max_predictions = max_predictions
-
-            # Call predictPattern with the provided STM
-            predictions = await self.predictPattern(state, stm_events=stm)
-
-            return predictions or []
-        finally:
-            # Restore original searcher and max_predictions
-            self.patterns_searcher = original_searcher
-            self.max_predictions = original_max_predictions
+        This is the config-as-parameter version that doesn't mutate processor state.
+
+        Args:
+            stm: Short-term memory (list of events)
+            config: Optional SessionConfiguration with prediction parameters
+
+        Returns:
+            List of prediction dictionaries
+        """
+        predictions, _ = await self.get_predictions_with_potentials_async(stm, config)
+        return predictions
+
+    async def get_predictions_with_potentials_async(self, stm: list[list[str]], config=None
+                                                    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """
+        Generate predictions and their future potentials with session-specific configuration.
+
+        Args:
+            stm: Short-term memory (list of events)
+            config: Optional SessionConfiguration with prediction parameters
+
+        Returns:
+            Tuple of (prediction dictionaries, aggregated future potentials)
+        """
+        # Flatten STM to state
+        state = list(chain(*stm))
+
+        # Generate predictions if we have at least 1 string in state
+        # Single-symbol predictions use optimized fast path
+        if len(state) < 1:
+            logger.debug("No symbols in state for predictions")
+            return [], []
+
+        # Match with a PatternSearcher built for these config values, leased
+        # from the pool so calls with the same configuration reuse warm
+        # searchers. This avoids mutating the instance's patterns_searcher
+        with self._lease_searcher(config) as (searcher, max_predictions):
+            # Pass the searcher and limit explicitly: swapping them on self would
+            # leak into observations of other sessions running concurrently
+            predictions, future_potentials = await self.predict_with_potentials(
+                state, stm_events=stm, searcher=searcher, max_predictions=max_predictions,
+                session_id=getattr(config, 'session_id', None))
+        return predictions or [], future_potentials or []
 
     def get_predictions(self, stm: list[list[str]], config=None) -> list[dict[str, Any]]:
         """
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Backfill the lsh_buckets table from existing ClickHouse patterns.
+
+The MinHash filter resolves LSH candidates through point lookups on
+kato.lsh_buckets. Knowledge bases learned before ClickHouseWriter started
+maintaining those buckets (or their pattern_length column) only have
+patterns_data.lsh_bands populated, so their MinHash stage falls back to
+scanning lsh_bands until the buckets are rebuilt.
+The rebuild runs entirely server-side (INSERT ... SELECT with ARRAY JOIN)
+and is idempotent: each kb_id's bucket partition is dropped and regenerated.
+
+Usage:
+    # Backfill specific kb_ids
+    python scripts/backfill_lsh_buckets.py --kb-ids node0_kato,node1_kato
+
+    # Backfill ALL kb_ids found in ClickHouse
+    python scripts/backfill_lsh_buckets.py --all
+
+    # Dry run (report bucket coverage without writing)
+    python scripts/backfill_lsh_buckets.py --all --dry-run
+
+The MinHash filter notices a finished backfill within a minute
+(LSH_BUCKETS_RECHECK_SECONDS) without a restart.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import clickhouse_connect
+
+# Make the kato package importable when run from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kato.storage.clickhouse_writer import ClickHouseWriter
+
+
+def get_clickhouse_client(host: str, port: int, db: str,
+                          user: str, password: str) -> clickhouse_connect.driver.Client:
+    """Create ClickHouse client connection."""
+    return clickhouse_connect.get_client(
+        host=host,
+        port=port,
+        database=db,
+        username=user,
+        password=password
+    )
+
+
+def discover_kb_ids(ch_client) -> list[str]:
+    """Discover all kb_ids in ClickHouse."""
+    result = ch_client.query(
+        "SELECT kb_id, COUNT(*) as cnt FROM kato.patterns_data GROUP BY kb_id ORDER BY cnt DESC"
+    )
+    kb_ids = []
+    for row in result.result_rows:
+        kb_ids.append(row[0])
+        print(f"  Found: {row[0]} ({row[1]:,} patterns)")
+    return kb_ids
+
+
+def backfill_kb_id(kb_id: str, ch_client, dry_run: bool) -> dict:
+    """
+    Rebuild lsh_buckets for a single kb_id.
+
+    Returns summary dict with counts and timing.
+    """
+    start = time.perf_counter()
+    writer = ClickHouseWriter(kb_id, ch_client)
+
+    pattern_count = writer.count_patterns()
+    existing_buckets = writer.count_lsh_buckets()
+    print(f"\n  {kb_id}: {pattern_count:,} patterns, {existing_buckets:,} existing bucket rows")
+
+    if pattern_count == 0:
+        print(f"    SKIP: No patterns found for {kb_id}")
+        return {'kb_id': kb_id, 'patterns': 0, 'buckets': existing_buckets, 'status': 'skipped'}
+
+    if dry_run:
+        print(f"    DRY RUN: Would rebuild buckets for {pattern_count:,} patterns")
+        return {
+            'kb_id': kb_id, 'patterns': pattern_count, 'buckets': existing_buckets,
+            'status': 'dry_run',
+            'time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    buckets = writer.backfill_lsh_buckets()
+    elapsed = round((time.perf_counter() - start) * 1000, 2)
+    print(f"    Wrote {buckets:,} bucket rows in {elapsed / 1000:.1f}s")
+
+    return {
+        'kb_id': kb_id,
+        'patterns': pattern_count,
+        'buckets': buckets,
+        'status': 'completed',
+        'time_ms': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Backfill kato.lsh_buckets from patterns_data LSH bands'
+    )
+    parser.add_argument(
+        '--kb-ids',
+        help='Comma-separated list of kb_ids to backfill (e.g., node0_kato,node1_kato)'
+    )
+    parser.add_argument(
+        '--all', action='store_true',
+        help='Backfill ALL kb_ids found in ClickHouse'
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='Report bucket coverage without writing'
+    )
+    parser.add_argument(
+        '--clickhouse-host', default='localhost',
+        help='ClickHouse host (default: localhost)'
+    )
+    parser.add_argument(
+        '--clickhouse-port', type=int, default=8123,
+        help='ClickHouse HTTP port (default: 8123)'
+    )
+    parser.add_argument(
+        '--clickhouse-db', default='kato',
+        help='ClickHouse database (default: kato)'
+    )
+    parser.add_argument(
+        '--clickhouse-user', default='default',
+        help='ClickHouse user (default: default)'
+    )
+    parser.add_argument(
+        '--clickhouse-password', default='',
+        help='ClickHouse password (default: empty)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.kb_ids and not args.all:
+        parser.error("Must specify --kb-ids or --all")
+
+    print("=" * 70)
+    print("KATO LSH Bucket Backfill")
+    print("=" * 70)
+
+    print(f"\nConnecting to ClickHouse at {args.clickhouse_host}:{args.clickhouse_port}...")
+    ch_client = get_clickhouse_client(
+        host=args.clickhouse_host,
+        port=args.clickhouse_port,
+        db=args.clickhouse_db,
+        user=args.clickhouse_user,
+        password=args.clickhouse_password
+    )
+    print("  Connected")
+
+    if args.all:
+        print("\nDiscovering kb_ids in ClickHouse...")
+        kb_ids = discover_kb_ids(ch_client)
+    else:
+        kb_ids = [k.strip() for k in args.kb_ids.split(',')]
+        print(f"\nTarget kb_ids: {kb_ids}")
+
+    if not kb_ids:
+        print("No kb_ids to process. Exiting.")
+        sys.exit(0)
+
+    if args.dry_run:
+        print("\n*** DRY RUN MODE - No data will be written ***")
+
+    total_start = time.perf_counter()
+    results = [backfill_kb_id(kb_id, ch_client, args.dry_run) for kb_id in kb_ids]
+    total_elapsed = time.perf_counter() - total_start
+
+    print(f"\n{'='*70}")
+    print("SUMMARY")
+    print(f"{'='*70}")
+    print(f"  kb_ids processed:  {len(results)}")
+    print(f"  Total patterns:    {sum(r.get('patterns', 0) for r in results):,}")
+    print(f"  Total buckets:     {sum(r.get('buckets', 0) for r in results):,}")
+    print(f"  Total time:        {total_elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Migrate knowledge bases to the integer token schema (schema v2).
+
+With KATO_TOKEN_IDS=true, ClickHouseWriter stores each pattern's token set
+as patterns_data.token_ids (sorted UInt32 IDs from the kb's Redis token
+dictionary) and leaves token_set empty, and the Jaccard stage filters on
+token_ids. Patterns learned before the switch only have token_set. This
+script:
+
+  1. Adds the token_ids column and its bloom filter skip index
+  2. Per kb_id, assigns dictionary IDs to every distinct token of the kb
+  3. Per kb_id, fills token_ids from token_set server-side, through a
+     temporary Join table and one ALTER UPDATE mutation, and empties
+     token_set (kept with --keep-token-set)
+
+Enable KATO_TOKEN_IDS=true once every kb_id is migrated. Rows that already
+have token_ids (empty token_set) are left alone, so re-running is safe.
+
+Usage:
+    # Migrate specific kb_ids
+    python scripts/migrate_token_ids.py --kb-ids node0_kato,node1_kato
+
+    # Migrate ALL kb_ids found in ClickHouse
+    python scripts/migrate_token_ids.py --all
+
+    # Keep the string token_set (allows switching KATO_TOKEN_IDS back off)
+    python scripts/migrate_token_ids.py --all --keep-token-set
+
+    # Dry run (report token counts without writing)
+    python scripts/migrate_token_ids.py --all --dry-run
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import clickhouse_connect
+import redis
+
+# Make the kato package importable when run from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kato.storage.token_dictionary import TOKEN_IDS_SCHEMA, TokenDictionary
+
+
+def get_clickhouse_client(host: str, port: int, db: str,
+                          user: str, password: str) -> clickhouse_connect.driver.Client:
+    """Create ClickHouse client connection."""
+    return clickhouse_connect.get_client(
+        host=host,
+        port=port,
+        database=db,
+        username=user,
+        password=password
+    )
+
+
+def get_redis_client(redis_url: str) -> redis.Redis:
+    """Create Redis client connection."""
+    return redis.from_url(
+        redis_url,
+        decode_responses=True,
+        encoding='utf-8'
+    )
+
+
+def discover_kb_ids(ch_client) -> list[str]:
+    """Discover all kb_ids in ClickHouse."""
+    result = ch_client.query(
+        "SELECT kb_id, COUNT(*) as cnt FROM kato.patterns_data GROUP BY kb_id ORDER BY cnt DESC"
+    )
+    kb_ids = []
+    for row in result.result_rows:
+        kb_ids.append(row[0])
+        print(f"  Found: {row[0]} ({row[1]:,} patterns)")
+    return kb_ids
+
+
+def migrate_kb_id(kb_id: str, ch_client, redis_client: redis.Redis, batch_size: int,
+                  keep_token_set: bool, dry_run: bool) -> dict:
+    """
+    Assign token IDs for a single kb_id and fill its token_ids column.
+
+    Returns summary dict with counts and timing.
+    """
+    start = time.perf_counter()
+    where = f"kb_id = '{kb_id}' AND notEmpty(token_set)"
+    pending = ch_client.query(f"SELECT COUNT(*) FROM kato.patterns_data WHERE {where}").result_rows[0][0]
+    tokens = [row[0] for row in ch_client.query(
+        f"SELECT DISTINCT arrayJoin(token_set) FROM kato.patterns_data WHERE {where}"
+    ).result_rows]
+    print(f"\n  {kb_id}: {pending:,} patterns to migrate, {len(tokens):,} distinct tokens")
+
+    if pending == 0:
+        print(f"    SKIP: No string token sets left for {kb_id}")
+        return {'kb_id': kb_id, 'patterns': 0, 'tokens': 0, 'status': 'skipped'}
+
+    if dry_run:
+        print(f"    DRY RUN: Would migrate {pending:,} patterns")
+        return {
+            'kb_id': kb_id, 'patterns': pending, 'tokens': len(tokens),
+            'status': 'dry_run',
+            'time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    dictionary = TokenDictionary(kb_id, redis_client)
+    ids = {}
+    for offset in range(0, len(tokens), batch_size):
+        ids.update(dictionary.assign(tokens[offset:offset + batch_size]))
+
+    join_table = f"kato.token_ids_migration_{uuid.uuid4().hex}"
+    ch_client.command(f"CREATE TABLE {join_table} (token String, id UInt32) ENGINE = Join(ANY, LEFT, token)")
+    try:
+        rows = list(ids.items())
+        for offset in range(0, len(rows), batch_size):
+            ch_client.insert(join_table, rows[offset:offset + batch_size], column_names=['token', 'id'])
+
+        clear = "" if keep_token_set else ", token_set = []"
+        ch_client.command(
+            f"ALTER TABLE kato.patterns_data "
+            f"UPDATE token_ids = arraySort(arrayMap(t -> joinGet('{join_table}', 'id', t), token_set)){clear} "
+            f"IN PARTITION '{kb_id}' WHERE {where}",
+            settings={'mutations_sync': 1},
+        )
+    finally:
+        ch_client.command(f"DROP TABLE IF EXISTS {join_table}")
+
+    elapsed = round((time.perf_counter() - start) * 1000, 2)
+    print(f"    Migrated {pending:,} patterns ({len(ids):,} token IDs) in {elapsed / 1000:.1f}s")
+
+    return {
+        'kb_id': kb_id,
+        'patterns': pending,
+        'tokens': len(ids),
+        'status': 'completed',
+        'time_ms': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Migrate patterns_data token sets to dictionary IDs (token_ids)'
+    )
+    parser.add_argument(
+        '--kb-ids',
+        help='Comma-separated list of kb_ids to migrate (e.g., node0_kato,node1_kato)'
+    )
+    parser.add_argument(
+        '--all', action='store_true',
+        help='Migrate ALL kb_ids found in ClickHouse'
+    )
+    parser.add_argument(
+        '--keep-token-set', action='store_true',
+        help='Keep the string token_set column populated'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=10000,
+        help='Tokens per Redis / ClickHouse batch (default: 10000)'
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='Report token counts without writing'
+    )
+    parser.add_argument(
+        '--clickhouse-host', default='localhost',
+        help='ClickHouse host (default: localhost)'
+    )
+    parser.add_argument(
+        '--clickhouse-port', type=int, default=8123,
+        help='ClickHouse HTTP port (default: 8123)'
+    )
+    parser.add_argument(
+        '--clickhouse-db', default='kato',
+        help='ClickHouse database (default: kato)'
+    )
+    parser.add_argument(
+        '--clickhouse-user', default='default',
+        help='ClickHouse user (default: default)'
+    )
+    parser.add_argument(
+        '--clickhouse-password', default='',
+        help='ClickHouse password (default: empty)'
+    )
+    parser.add_argument(
+        '--redis-url', default='redis://localhost:6379',
+        help='Redis URL (default: redis://localhost:6379)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.kb_ids and not args.all:
+        parser.error("Must specify --kb-ids or --all")
+
+    print("=" * 70)
+    print("KATO Token ID Migration (schema v2)")
+    print("=" * 70)
+
+    print(f"\nConnecting to ClickHouse at {args.clickhouse_host}:{args.clickhouse_port}...")
+    ch_client = get_clickhouse_client(
+        host=args.clickhouse_host,
+        port=args.clickhouse_port,
+        db=args.clickhouse_db,
+        user=args.clickhouse_user,
+        password=args.clickhouse_password
+    )
+    print("  Connected")
+
+    print(f"Connecting to Redis at {args.redis_url}...")
+    redis_client = get_redis_client(args.redis_url)
+    print("  Connected")
+
+    if args.dry_run:
+        print("\n*** DRY RUN MODE - No data will be written ***")
+    else:
+        for statement in TOKEN_IDS_SCHEMA:
+            ch_client.command(statement)
+        print("\n  patterns_data.token_ids ready")
+
+    if args.all:
+        print("\nDiscovering kb_ids in ClickHouse...")
+        kb_ids = discover_kb_ids(ch_client)
+    else:
+        kb_ids = [k.strip() for k in args.kb_ids.split(',')]
+        print(f"\nTarget kb_ids: {kb_ids}")
+
+    if not kb_ids:
+        print("No kb_ids to process. Exiting.")
+        sys.exit(0)
+
+    total_start = time.perf_counter()
+    results = [migrate_kb_id(kb_id, ch_client, redis_client, args.batch_size,
+                             args.keep_token_set, args.dry_run)
+               for kb_id in kb_ids]
+    total_elapsed = time.perf_counter() - total_start
+
+    print(f"\n{'='*70}")
+    print("SUMMARY")
+    print(f"{'='*70}")
+    print(f"  kb_ids processed:  {len(results)}")
+    print(f"  Total patterns:    {sum(r.get('patterns', 0) for r in results):,}")
+    print(f"  Total tokens:      {sum(r.get('tokens', 0) for r in results):,}")
+    print(f"  Total time:        {total_elapsed:.1f}s")
+    if not args.dry_run:
+        print("\n  Set KATO_TOKEN_IDS=true once every kb_id is migrated.")
+
+
+if __name__ == '__main__':
+    main()
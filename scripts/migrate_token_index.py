@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Create, backfill and refresh the pattern_token_index table.
+
+Token lookups (the single-symbol prediction fast path, last-token lookups)
+read kato.pattern_token_index, ordered by (kb_id, position, token, name),
+instead of scanning the kb's patterns_data partition. Deployments created
+before the table existed need it created and backfilled from patterns_data;
+every deployment needs pattern frequencies mirrored from Redis periodically
+so lookups can return the most frequent patterns first. This script does
+both:
+
+  1. CREATE TABLE IF NOT EXISTS kato.pattern_token_index
+  2. Per kb_id, rebuild its index partition from patterns_data
+     (server-side INSERT ... SELECT; skipped with --mirror-only)
+  3. Per kb_id, copy frequencies from Redis into the index (only changed
+     rows are written) and invalidate the kb's materialized single-symbol
+     predictions if any changed
+
+Usage:
+    # Migrate specific kb_ids
+    python scripts/migrate_token_index.py --kb-ids node0_kato,node1_kato
+
+    # Migrate ALL kb_ids found in ClickHouse
+    python scripts/migrate_token_index.py --all
+
+    # Refresh frequencies only, every 5 minutes
+    python scripts/migrate_token_index.py --all --mirror-only --interval 300
+
+    # Dry run (report index coverage without writing)
+    python scripts/migrate_token_index.py --all --dry-run
+
+Set KATO_USE_TOKEN_INDEX=true once every kb_id is backfilled; until then
+token lookups scan patterns_data.first_token and no index rows are written.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import clickhouse_connect
+import redis
+
+# Make the kato package importable when run from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kato.searches.single_symbol_predictions import SingleSymbolPredictions
+from kato.storage.clickhouse_writer import ClickHouseWriter
+from kato.storage.token_index import CREATE_TOKEN_INDEX_TABLE
+
+
+def get_clickhouse_client(host: str, port: int, db: str,
+                          user: str, password: str) -> clickhouse_connect.driver.Client:
+    """Create ClickHouse client connection."""
+    return clickhouse_connect.get_client(
+        host=host,
+        port=port,
+        database=db,
+        username=user,
+        password=password
+    )
+
+
+def get_redis_client(redis_url: str) -> redis.Redis:
+    """Create Redis client connection."""
+    return redis.from_url(
+        redis_url,
+        decode_responses=True,
+        encoding='utf-8'
+    )
+
+
+def discover_kb_ids(ch_client) -> list[str]:
+    """Discover all kb_ids in ClickHouse."""
+    result = ch_client.query(
+        "SELECT kb_id, COUNT(*) as cnt FROM kato.patterns_data GROUP BY kb_id ORDER BY cnt DESC"
+    )
+    kb_ids = []
+    for row in result.result_rows:
+        kb_ids.append(row[0])
+        print(f"  Found: {row[0]} ({row[1]:,} patterns)")
+    return kb_ids
+
+
+def migrate_kb_id(kb_id: str, ch_client, redis_client: redis.Redis,
+                  mirror_only: bool, dry_run: bool) -> dict:
+    """
+    Backfill the token index of a single kb_id and mirror its frequencies.
+
+    Returns summary dict with counts and timing.
+    """
+    start = time.perf_counter()
+    writer = ClickHouseWriter(kb_id, ch_client)
+
+    pattern_count = writer.count_patterns()
+    existing_rows = writer.count_token_index()
+    print(f"\n  {kb_id}: {pattern_count:,} patterns, {existing_rows:,} existing index rows")
+
+    if pattern_count == 0:
+        print(f"    SKIP: No patterns found for {kb_id}")
+        return {'kb_id': kb_id, 'patterns': 0, 'rows': existing_rows, 'status': 'skipped'}
+
+    if dry_run:
+        action = "mirror frequencies" if mirror_only else "rebuild the index"
+        print(f"    DRY RUN: Would {action} for {pattern_count:,} patterns")
+        return {
+            'kb_id': kb_id, 'patterns': pattern_count, 'rows': existing_rows,
+            'status': 'dry_run',
+            'time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    rows = existing_rows
+    if not mirror_only:
+        rows = writer.backfill_token_index()
+        print(f"    Wrote {rows:,} index rows")
+
+    mirrored = writer.mirror_frequencies(redis_client)
+    if mirrored:
+        # Top-K predictions of this kb may now select other patterns
+        SingleSymbolPredictions(settle_ms=0).invalidate_kb(kb_id, redis_client)
+    elapsed = round((time.perf_counter() - start) * 1000, 2)
+    print(f"    Mirrored {mirrored:,} changed frequencies in {elapsed / 1000:.1f}s")
+
+    return {
+        'kb_id': kb_id,
+        'patterns': pattern_count,
+        'rows': rows,
+        'mirrored': mirrored,
+        'status': 'completed',
+        'time_ms': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Create, backfill and refresh kato.pattern_token_index'
+    )
+    parser.add_argument(
+        '--kb-ids',
+        help='Comma-separated list of kb_ids to migrate (e.g., node0_kato,node1_kato)'
+    )
+    parser.add_argument(
+        '--all', action='store_true',
+        help='Migrate ALL kb_ids found in ClickHouse'
+    )
+    parser.add_argument(
+        '--mirror-only', action='store_true',
+        help='Only mirror frequencies from Redis (index already backfilled)'
+    )
+    parser.add_argument(
+        '--interval', type=float, default=0,
+        help='Repeat every INTERVAL seconds (implies --mirror-only after the first pass)'
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='Report index coverage without writing'
+    )
+    parser.add_argument(
+        '--clickhouse-host', default='localhost',
+        help='ClickHouse host (default: localhost)'
+    )
+    parser.add_argument(
+        '--clickhouse-port', type=int, default=8123,
+        help='ClickHouse HTTP port (default: 8123)'
+    )
+    parser.add_argument(
+        '--clickhouse-db', default='kato',
+        help='ClickHouse database (default: kato)'
+    )
+    parser.add_argument(
+        '--clickhouse-user', default='default',
+        help='ClickHouse user (default: default)'
+    )
+    parser.add_argument(
+        '--clickhouse-password', default='',
+        help='ClickHouse password (default: empty)'
+    )
+    parser.add_argument(
+        '--redis-url', default='redis://localhost:6379',
+        help='Redis URL (default: redis://localhost:6379)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.kb_ids and not args.all:
+        parser.error("Must specify --kb-ids or --all")
+
+    print("=" * 70)
+    print("KATO Token Index Migration")
+    print("=" * 70)
+
+    print(f"\nConnecting to ClickHouse at {args.clickhouse_host}:{args.clickhouse_port}...")
+    ch_client = get_clickhouse_client(
+        host=args.clickhouse_host,
+        port=args.clickhouse_port,
+        db=args.clickhouse_db,
+        user=args.clickhouse_user,
+        password=args.clickhouse_password
+    )
+    print("  Connected")
+
+    print(f"Connecting to Redis at {args.redis_url}...")
+    redis_client = get_redis_client(args.redis_url)
+    print("  Connected")
+
+    if args.dry_run:
+        print("\n*** DRY RUN MODE - No data will be written ***")
+    else:
+        ch_client.command(CREATE_TOKEN_INDEX_TABLE)
+        print("\n  kato.pattern_token_index ready")
+
+    mirror_only = args.mirror_only
+    while True:
+        if args.all:
+            print("\nDiscovering kb_ids in ClickHouse...")
+            kb_ids = discover_kb_ids(ch_client)
+        else:
+            kb_ids = [k.strip() for k in args.kb_ids.split(',')]
+            print(f"\nTarget kb_ids: {kb_ids}")
+
+        total_start = time.perf_counter()
+        results = [migrate_kb_id(kb_id, ch_client, redis_client, mirror_only, args.dry_run)
+                   for kb_id in kb_ids]
+        total_elapsed = time.perf_counter() - total_start
+
+        print(f"\n{'='*70}")
+        print("SUMMARY")
+        print(f"{'='*70}")
+        print(f"  kb_ids processed:  {len(results)}")
+        print(f"  Total patterns:    {sum(r.get('patterns', 0) for r in results):,}")
+        print(f"  Total index rows:  {sum(r.get('rows', 0) for r in results):,}")
+        print(f"  Total mirrored:    {sum(r.get('mirrored', 0) for r in results):,}")
+        print(f"  Total time:        {total_elapsed:.1f}s")
+
+        if args.interval <= 0 or args.dry_run:
+            break
+        mirror_only = True
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
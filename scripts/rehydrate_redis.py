@@ -31,6 +31,7 @@ import argparse
 import json
 import sys
 import time
+import uuid
 from collections import Counter
 from math import log, log2
 
@@ -181,6 +182,14 @@ def rehydrate_kb_id(kb_id: str, ch_client, redis_client: redis.Redis,
 
     print(f"         {len(symbol_list):,}/{len(symbol_list):,} symbols written")
 
+    # Symbol hashes were rewritten wholesale: start a new symbol-table epoch so
+    # running workers reload instead of catching up from the change log
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(f"{kb_id}:symbols:changelog")
+    pipe.incr(f"{kb_id}:symbols:version")
+    pipe.set(f"{kb_id}:symbols:epoch", uuid.uuid4().hex)
+    pipe.execute()
+
     # Step 4: Write global metadata
     print(f"\n  [4/5] Writing global metadata...")
     pipe = redis_client.pipeline(transaction=False)
@@ -0,0 +1,246 @@
+"""
+In-memory ClickHouse and Redis stand-ins for unit tests.
+
+FakeClickHouse answers the patterns_data queries of the filter pipeline and
+the single-symbol fast path by evaluating their predicates over a dict of
+patterns; FakeRedis keeps strings, hashes and counters in dicts. Sharing one
+instance between several clients stands in for one server seen by several
+processes. make_executor() builds a FilterPipelineExecutor over them.
+"""
+
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from kato.filters.coalescer import RequestCoalescer
+from kato.filters.executor import FilterPipelineExecutor
+from kato.filters.pattern_data_cache import PatternDataCache
+
+# Bytes a scalar column / one pattern_data value "reads" in FakeClickHouse
+SCALAR_BYTES = 8
+PATTERN_DATA_BYTES = 100
+
+
+def pattern_length(pattern_data):
+    """Number of symbols in a pattern (patterns_data.length)."""
+    return sum(map(len, pattern_data))
+
+
+class FakeResult:
+    """Query result with clickhouse_connect's column_names, result_rows and summary."""
+
+    def __init__(self, column_names=(), rows=()):
+        self.column_names = list(column_names)
+        self.result_rows = list(rows)
+        read = sum(PATTERN_DATA_BYTES if c == 'pattern_data' else SCALAR_BYTES for c in self.column_names)
+        self.summary = {'read_bytes': str(read * len(self.result_rows)),
+                        'result_bytes': str(read * len(self.result_rows))}
+
+
+class FakeClickHouse:
+    """
+    Records queries, inserts and commands, and the column lists of the
+    patterns_data SELECTs it evaluates (`selects`).
+
+    With `rows`, every query returns those rows under `columns`. Otherwise
+    SELECTs from patterns_data are evaluated over `patterns` (name ->
+    pattern_data): candidate names (external table or IN list), first_token
+    and pattern_token_index lookups, length bounds (one flag column per coalesced length predicate) and token
+    overlap, under which a pattern overlaps the STM when its first event
+    holds `overlap_token`. LSH band lookups admit every pattern and the
+    lsh_buckets readiness check reports every pattern bucketed.
+
+    Queries containing `fail_on` raise; inserts into `missing_tables` raise
+    ClickHouse's unknown table error.
+    """
+
+    def __init__(self, patterns=None, rows=None, columns=(), overlap_token='b', fail_on=None,
+                 missing_tables=()):
+        self.patterns = patterns if patterns is not None else {}
+        self.rows = rows
+        self.columns = list(columns)
+        self.overlap_token = overlap_token
+        self.fail_on = fail_on
+        self.missing_tables = missing_tables
+        self.queries = []
+        self.external_data = []
+        self.selects = []
+        self.inserts = []
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def insert(self, table, rows, column_names=None, settings=None):
+        if table in self.missing_tables:
+            raise RuntimeError(f"Code: 60. DB::Exception: Table {table} does not exist. (UNKNOWN_TABLE)")
+        self.inserts.append((table, [list(r) for r in rows], column_names))
+
+    def command(self, sql, settings=None):
+        self.commands.append(sql)
+
+    def query(self, sql, external_data=None, settings=None):
+        with self._lock:
+            self.queries.append(sql)
+            self.external_data.append(external_data)
+        if self.fail_on is not None and self.fail_on in sql:
+            raise RuntimeError(f"ClickHouse query failed on {self.fail_on!r}")
+        if self.rows is not None:
+            return FakeResult(self.columns, self.rows)
+        if sql.startswith('SELECT count(), countIf(pattern_length = 0) FROM lsh_buckets'):
+            return FakeResult(['count()', 'countIf(pattern_length = 0)'], [(len(self.patterns), 0)])
+        return self._select_patterns(sql, external_data)
+
+    @property
+    def pattern_queries(self):
+        """Queries that read patterns_data (excludes lsh_buckets readiness checks)."""
+        return [sql for sql in self.queries if 'patterns_data' in sql]
+
+    def _select_patterns(self, sql, external_data):
+        select = re.search(r"SELECT (.*?)\s+FROM (?:kato\.)?patterns_data", sql, re.S).group(1)
+        columns = [c.strip() for c in select.split(',') if 'AS _kato_match_' not in c]
+        with self._lock:
+            self.selects.append(columns)
+        flags = [(int(lo), int(hi)) for lo, hi in
+                 re.findall(r"\(\(length BETWEEN (\d+) AND (\d+)\)\) AS _kato_match_\d+", sql)]
+
+        names = set(self.patterns)
+        if external_data is not None:
+            names &= set(external_data.files[0].data.decode('utf-8').split('\n'))
+        elif 'name IN (' in sql:
+            names = {n for n in names if f"'{n}'" in sql}
+        first_token = re.search(r"first_token = '([^']*)'", sql)
+        if first_token:
+            names = {n for n in names if self.patterns[n][0][0] == first_token.group(1)}
+        indexed = re.search(r"position = '(first|last)' AND token = '([^']*)'", sql)
+        if indexed:
+            position, token = indexed.groups()
+            names = {n for n in names
+                     if (self.patterns[n][0][0] if position == 'first' else self.patterns[n][-1][-1]) == token}
+        lengths = {n: pattern_length(self.patterns[n]) for n in names}
+        if flags:
+            names = {n for n in names if any(lo <= lengths[n] <= hi for lo, hi in flags)}
+        else:
+            bounds = re.search(r"length BETWEEN (\d+) AND (\d+)", sql)
+            if bounds:
+                names = {n for n in names if int(bounds.group(1)) <= lengths[n] <= int(bounds.group(2))}
+        if 'arrayIntersect' in sql:
+            names = {n for n in names if self.overlap_token in self.patterns[n][0]}
+
+        values = {'length': lambda n: lengths[n], 'pattern_data': lambda n: self.patterns[n],
+                  'minhash_sig': lambda n: [1, 2, 3]}
+        rows = []
+        for n in sorted(names):
+            row = [n] + [values[c](n) for c in columns[1:]]
+            row += [int(lo <= lengths[n] <= hi) for lo, hi in flags]
+            rows.append(tuple(row))
+        return FakeResult(columns + [f"_kato_match_{i}" for i in range(len(flags))], rows)
+
+
+class FakeRedis:
+    """
+    The string, hash and counter commands KATO's caches and dictionaries use.
+
+    `calls` counts round trips: each command sent directly, and each
+    pipeline execution, counts once.
+    """
+
+    def __init__(self, values=None):
+        self.data = dict(values or {})
+        self.hashes = {}
+        self.expiry = {}
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        if key in self.expiry and time.monotonic() >= self.expiry[key]:
+            self.data.pop(key, None)
+            self.expiry.pop(key)
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None):
+        self.calls += 1
+        self.data[key] = str(value).encode('utf-8')
+        if ex is not None or px is not None:
+            self.expiry[key] = time.monotonic() + (px / 1000 if px is not None else ex)
+
+    def exists(self, *keys):
+        calls = self.calls
+        found = sum(1 for key in keys if self.get(key) is not None)
+        self.calls = calls + 1
+        return found
+
+    def incrby(self, key, amount):
+        self.calls += 1
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def hmget(self, key, fields):
+        self.calls += 1
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hsetnx(self, key, field, value):
+        self.calls += 1
+        values = self.hashes.setdefault(key, {})
+        if field in values:
+            return 0
+        values[field] = str(value)
+        return 1
+
+    def hincrby(self, key, field, amount):
+        self.calls += 1
+        values = self.hashes.setdefault(key, {})
+        values[field] = values.get(field, 0) + amount
+        return values[field]
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+            def execute(self):
+                calls = redis.calls
+                results = [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+                redis.calls = calls + 1
+                return results
+
+        return Pipeline()
+
+
+def filter_config(pipeline=('length',), **settings):
+    """Session config for a filter pipeline: metrics off, no per-stage cap, plus `settings`."""
+    values = dict(filter_pipeline=list(pipeline) if pipeline is not None else None,
+                  enable_filter_metrics=False, max_candidates_per_stage=None)
+    values.update(settings)
+    return SimpleNamespace(**values)
+
+
+def make_executor(client, state, pipeline=('length',), kb_id='kb_test', redis=None, settings=None,
+                  config=None, **components):
+    """
+    FilterPipelineExecutor over fake backends.
+
+    Args:
+        client: ClickHouse client (usually FakeClickHouse)
+        state: Flattened STM
+        pipeline: Filter names, used when no config is given
+        kb_id: Knowledge base identifier
+        redis: Redis client
+        settings: Filter settings added to filter_config(pipeline)
+        config: Session config used as is instead
+        **components: Passed through (pattern_cache, coalescer, candidate_cache, ...);
+            instead of the process-wide ones, pattern_cache defaults to a fresh
+            cache and coalescer to a disabled one
+    """
+    config = config or filter_config(pipeline, **(settings or {}))
+    components.setdefault('pattern_cache', PatternDataCache(1 << 20))
+    components.setdefault('coalescer', RequestCoalescer(0))
+    return FilterPipelineExecutor(config, state, client, redis, kb_id, **components)
@@ -0,0 +1,151 @@
+"""
+Alignment engine tests for KATO.
+
+These tests validate:
+1. AlignmentEngine blocks and similarity equal SequenceMatcher's
+   get_matching_blocks() and ratio()
+2. Missing and extras equal the "- " / "+ " lines of compare() over present
+3. InformationExtractor.extract_prediction_info returns the same tuples as
+   the SequenceMatcher + compare() extraction it replaced (differential test
+   over random sequences, cutoffs and matching modes)
+"""
+
+import random
+
+import pytest
+
+from kato.informatics.alignment import AlignmentEngine
+from kato.informatics.extractor import SequenceMatcher
+from kato.searches.pattern_search import InformationExtractor
+
+
+def _sequence(rng, max_len, vocab):
+    return [f"tok{rng.randint(0, vocab)}" for _ in range(rng.randint(0, max_len))]
+
+
+def _pairs(seed, count=300):
+    rng = random.Random(seed)
+    for _ in range(count):
+        vocab = rng.choice([3, 8, 30])
+        yield _sequence(rng, 25, vocab), _sequence(rng, 12, vocab)
+
+
+def _reference(pattern, state, cutoff):
+    """The exact-matching extraction before the alignment engine."""
+    matcher = SequenceMatcher()
+    matcher.set_seq1(pattern)
+    matcher.set_seq2(state)
+    similarity = matcher.ratio()
+    if similarity < cutoff:
+        return None
+    matching_blocks = matcher.get_matching_blocks()
+    matching_intersection = []
+    for i, j, n in matching_blocks[:-1]:
+        matching_intersection += state[j:j + n]
+    num_actual_blocks = len(matching_blocks) - 1
+    if num_actual_blocks >= 2:
+        i0, _, _ = matching_blocks[0]
+        i1, _, n1 = matching_blocks[-2]
+        past = pattern[:i0]
+        present = pattern[i0:i1 + n1] if i1 + n1 > i0 else pattern[i0:]
+    elif num_actual_blocks == 1:
+        i0, _, n0 = matching_blocks[0]
+        past = pattern[:i0]
+        present = pattern[i0:i0 + n0]
+    else:
+        if cutoff > 0.0:
+            return None
+        past = []
+        present = pattern
+    missing = []
+    extras = []
+    if present:
+        matcher.set_seq1(present)
+        for diff in matcher.compare():
+            if diff.startswith("- "):
+                missing.append(diff[2:])
+            elif diff.startswith("+ "):
+                extras.append(diff[2:])
+    return (pattern, matching_intersection, past, present, missing, extras,
+            similarity, num_actual_blocks, [], None)
+
+
+class TestAlignmentEngine:
+    """Blocks, similarity and ranges against SequenceMatcher."""
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_blocks_and_similarity(self, seed):
+        for pattern, state in _pairs(seed):
+            matcher = SequenceMatcher(pattern, state)
+            alignment = AlignmentEngine(state).align(pattern)
+            assert alignment.blocks == [tuple(b) for b in matcher.get_matching_blocks()[:-1]]
+            assert alignment.similarity == matcher.ratio()
+            assert alignment.matches == sum(n for _, _, n in alignment.blocks)
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_missing_and_extras_match_compare(self, seed):
+        for pattern, state in _pairs(seed):
+            alignment = AlignmentEngine(state).align(pattern)
+            present = pattern[slice(*alignment.present)]
+            if not present:
+                assert alignment.missing(pattern) == alignment.extras(state) == []
+                continue
+            deltas = list(SequenceMatcher(present, state).compare())
+            assert alignment.missing(pattern) == [d[2:] for d in deltas if d.startswith('- ')]
+            assert alignment.extras(state) == [d[2:] for d in deltas if d.startswith('+ ')]
+
+    def test_ranges(self):
+        state = ['a', 'b', 'x', 'c']
+        alignment = AlignmentEngine(state).align(['p', 'a', 'b', 'q', 'c', 'f'])
+        assert alignment.blocks == [(1, 0, 2), (4, 3, 1)]
+        assert (alignment.past, alignment.present, alignment.future) == ((0, 1), (1, 5), (5, 6))
+        assert alignment.missing_ranges == [(3, 4)]
+        assert alignment.extras_ranges == [(2, 3)]
+        assert alignment.matching_intersection(state) == ['a', 'b', 'c']
+
+    def test_no_match(self):
+        alignment = AlignmentEngine(['x', 'y']).align(['a', 'b'])
+        assert alignment.number_of_blocks == 0
+        assert (alignment.past, alignment.present) == ((0, 0), (0, 2))
+        assert alignment.missing(['a', 'b']) == ['a', 'b']
+        assert alignment.extras(['x', 'y']) == ['x', 'y']
+
+    def test_engine_is_reusable(self):
+        engine = AlignmentEngine(['a', 'b', 'c'])
+        assert engine.align(['a', 'c']).blocks == [(0, 0, 1), (1, 2, 1)]
+        assert engine.align(['b', 'c']).blocks == [(0, 1, 2)]
+
+
+class TestExtractorDifferential:
+    """extract_prediction_info against the SequenceMatcher + compare() extraction."""
+
+    @pytest.mark.parametrize('seed,cutoff', [(0, 0.0), (1, 0.1), (2, 0.3), (3, 0.6)])
+    def test_fallback_matches_reference(self, seed, cutoff):
+        extractor = InformationExtractor(use_fast_matcher=False, use_token_matching=True)
+        for pattern, state in _pairs(seed):
+            assert extractor.extract_prediction_info(pattern, state, cutoff) == _reference(pattern, state, cutoff)
+
+    @pytest.mark.parametrize('seed,cutoff', [(4, 0.0), (5, 0.1), (6, 0.4)])
+    def test_shared_engine_with_precomputed_similarity(self, seed, cutoff):
+        extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                         use_int_matching=False)
+        rng = random.Random(seed)
+        state = _sequence(rng, 12, 8)
+        engine = AlignmentEngine(state)
+        for _ in range(200):
+            pattern = _sequence(rng, 25, 8)
+            expected = _reference(pattern, state, cutoff)
+            similarity = SequenceMatcher(pattern, state).ratio()
+            info = extractor.extract_prediction_info(pattern, state, cutoff,
+                                                     precomputed_similarity=similarity,
+                                                     alignment_engine=engine)
+            assert info == expected
+
+    def test_fuzzy_regions_use_same_blocks(self):
+        extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True)
+        for pattern, state in _pairs(7, count=100):
+            reference = _reference(pattern, state, 0.0)
+            info = extractor.extract_prediction_info(pattern, state, 0.0, fuzzy_token_threshold=0.9,
+                                                     precomputed_similarity=reference[6])
+            assert info[2:4] == reference[2:4]
+            assert info[7] == reference[7]
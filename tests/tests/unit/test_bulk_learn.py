@@ -0,0 +1,127 @@
+"""
+Bulk learn tests for KATO.
+
+These tests validate:
+1. learnPatterns leaves Redis in the same state as learning one pattern at a
+   time (frequencies, emotives windows, metadata, symbol stats, affinity)
+2. Per-item status: the first occurrence of a new pattern is new, later
+   duplicates and existing patterns are re-learns
+3. New patterns are written to ClickHouse once, in one bulk call per chunk
+4. Other workers' symbol tables catch up from the bulk change log entry
+
+Runs against fakeredis.
+"""
+
+import json
+import random
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+import kato.informatics.knowledge_base as knowledge_base_module
+from kato.informatics.knowledge_base import SuperKnowledgeBase
+from kato.representations.pattern import Pattern
+from kato.storage.redis_writer import RedisWriter
+from kato.storage.symbol_table import SymbolTable
+
+
+class RecordingClickHouseWriter:
+    def __init__(self):
+        self.rows = []
+        self.bulk_calls = 0
+
+    def write_pattern(self, pattern_object):
+        self.rows.append(pattern_object.name)
+
+    def write_patterns_bulk(self, pattern_objects):
+        self.bulk_calls += 1
+        self.rows.extend(p.name for p in pattern_objects)
+        return len(pattern_objects)
+
+
+def _kb(kb_id, persistence=3):
+    kb = object.__new__(SuperKnowledgeBase)
+    kb.id = kb_id
+    kb.persistence = persistence
+    kb.emotives_available = set()
+    kb.redis_writer = RedisWriter(kb_id, fakeredis.FakeRedis(decode_responses=True))
+    kb.clickhouse_writer = RecordingClickHouseWriter()
+    return kb
+
+
+def _dump(client):
+    """Redis contents with JSON documents decoded; symbol version/log bookkeeping dropped."""
+    state = {}
+    for key in client.keys('*'):
+        if ':symbols:version' in key or ':symbols:epoch' in key or ':symbols:changelog' in key:
+            continue
+        kind = client.type(key)
+        if kind == 'string':
+            value = client.get(key)
+            state[key] = json.loads(value) if ':emotives:' in key or ':metadata:' in key else value
+        elif kind == 'hash':
+            state[key] = {f: round(float(v), 9) for f, v in client.hgetall(key).items()}
+        elif kind == 'set':
+            state[key] = client.smembers(key)
+    return state
+
+
+def _items(rng, count):
+    items = []
+    for _ in range(count):
+        events = [[f"s{rng.randint(0, 4)}"], [f"s{rng.randint(0, 4)}", 's9']]
+        emotives = rng.choice([[], [{'joy': rng.choice([0.5, 1.0, -2.0])}], [{'joy': 0.25}, {'fear': 1.0}]])
+        metadata = rng.choice([{}, {'source': [rng.choice(['a', 'b', 'c'])]}])
+        items.append((Pattern(events), emotives, metadata))
+    return items
+
+
+class TestBulkLearn:
+    """Compare learnPatterns with sequential learnPattern calls."""
+
+    def test_same_state_as_sequential_learns(self, monkeypatch):
+        """A bulk learn over existing and new patterns matches one-at-a-time learning."""
+        monkeypatch.setattr(knowledge_base_module, 'USE_SINGLE_ROUND_TRIP_LEARN', False)
+        monkeypatch.setattr(knowledge_base_module, 'BULK_LEARN_CHUNK_SIZE', 7)
+        rng = random.Random(3)
+        warmup, batch = _items(rng, 15), _items(rng, 60)
+        bulk_kb, sequential_kb = _kb('kb'), _kb('kb')
+        for kb in (bulk_kb, sequential_kb):
+            for pattern, emotives, metadata in warmup:
+                kb.learnPattern(pattern, emotives=list(emotives), metadata=metadata)
+
+        statuses = bulk_kb.learnPatterns([(p, list(e), m) for p, e, m in batch])
+        expected = [sequential_kb.learnPattern(p, emotives=list(e), metadata=m) for p, e, m in batch]
+
+        assert statuses == expected
+        assert _dump(bulk_kb.redis_writer.client) == _dump(sequential_kb.redis_writer.client)
+        assert sorted(bulk_kb.clickhouse_writer.rows) == sorted(sequential_kb.clickhouse_writer.rows)
+
+    def test_duplicates_report_relearned(self):
+        """Only the first occurrence of a new pattern reports new; ClickHouse gets one row."""
+        kb = _kb('kb_dupes')
+        a, b = Pattern([['a'], ['b']]), Pattern([['b'], ['c']])
+        kb.learnPattern(b)
+
+        statuses = kb.learnPatterns([(a, [], {}), (b, [], {}), (a, [{'joy': 1.0}], {})])
+
+        assert statuses == [True, False, False]
+        assert kb.clickhouse_writer.rows == [b.name, a.name]
+        assert kb.clickhouse_writer.bulk_calls == 1
+        assert kb.redis_writer.get_frequency(a.name) == 2
+        assert kb.redis_writer.get_metadata(a.name)['emotives'] == [{'joy': 1.0}]
+
+    def test_symbol_table_catches_up_from_bulk_entry(self):
+        """The combined delta carries pattern member counts for other workers."""
+        kb = _kb('kb_bulk_table')
+        client = kb.redis_writer.client
+        reader = SymbolTable('kb_bulk_table', client)
+        reader.get_all()
+
+        kb.learnPatterns([(Pattern([['x'], ['y']]), [], {}), (Pattern([['x'], ['x']]), [], {}),
+                          (Pattern([['x'], ['y']]), [], {})])
+
+        assert reader.get_all() == kb.redis_writer.get_all_symbols_batch()
+        assert reader.full_reloads == 1
+        assert reader.get_all()['x'] == {'name': 'x', 'frequency': 4, 'pattern_member_frequency': 2}
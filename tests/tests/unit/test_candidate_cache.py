@@ -0,0 +1,162 @@
+"""
+Candidate set cache tests for the KATO filter pipeline.
+
+These tests validate:
+1. STM fingerprints are canonical: STMs with equal token count and token set
+   share an entry unless a filter reads the token sequence, and filter
+   settings are part of the key
+2. A hit skips every database stage and returns the candidates of the
+   uncached run, whose materialized predictions match the uncached ones;
+   runs with a failed stage are not cached
+3. A kb write bumps its version, invalidating its entries (in every process
+   sharing Redis), and the kb bypasses the cache while the write settles
+4. Shared entries are served across processes, and the in-process cache is
+   bounded by the names it holds
+"""
+
+import asyncio
+import time
+
+import kato.filters  # noqa: F401  (registers filters)
+from kato.filters.candidate_cache import CandidateSetCache
+from kato.searches.pattern_search import InformationExtractor, PatternSearcher
+from fixtures.fake_backends import FakeClickHouse, FakeRedis, make_executor
+
+PATTERNS = {f"p{i}": [[f"t{j}" for j in range(i)], ['z']] for i in range(1, 10)}
+SETTINGS = dict(length_min_ratio=0.5, length_max_ratio=1.0, recall_threshold=0.1)
+
+
+def _predict(executor, state):
+    """Evidence per prediction built from the executor's materialized candidates."""
+    candidates = executor.execute_pipeline()
+    executor.materialize(candidates)
+    searcher = PatternSearcher.__new__(PatternSearcher)
+    searcher.kb_id = 'kb_test'
+    searcher.redis_client = None
+    searcher.session_config = None
+    searcher.recall_threshold = 0.1
+    searcher.use_token_matching = True
+    searcher.extractor = InformationExtractor(use_fast_matcher=False, use_token_matching=True,
+                                              use_int_matching=False)
+    sequences = {name: executor.get_pattern(name)['pattern_data_flat'] for name in candidates}
+    results = searcher._process_batch_original(state, sorted(candidates), None, sequences)
+    predictions = asyncio.run(searcher._build_predictions_batch(results, None, executor))
+    return {p['name']: p['evidence'] for p in predictions}
+
+
+def _key(cache, state, pipeline=('length',), **overrides):
+    executor = make_executor(FakeClickHouse(PATTERNS), state, pipeline, settings=dict(SETTINGS, **overrides),
+                             candidate_cache=cache)
+    return executor._candidate_cache_key()
+
+
+class TestFingerprint:
+    """Canonical keys."""
+
+    def test_token_set_pipelines_ignore_order(self):
+        cache = CandidateSetCache(settle_ms=0)
+        assert _key(cache, ['a', 'b', 'a']) == _key(cache, ['b', 'a', 'a'])
+        assert _key(cache, ['a', 'b', 'a']) != _key(cache, ['a', 'b'])
+        assert (_key(cache, ['a', 'b'], pipeline=('length', 'rapidfuzz'))
+                != _key(cache, ['b', 'a'], pipeline=('length', 'rapidfuzz')))
+
+    def test_settings_are_keyed(self):
+        cache = CandidateSetCache(settle_ms=0)
+        state = ['a', 'b']
+        assert _key(cache, state) != _key(cache, state, length_max_ratio=2.0)
+        # Parameters of filters outside the pipeline don't split entries
+        assert _key(cache, state) == _key(cache, state, jaccard_threshold=0.9)
+
+
+class TestCachedPipeline:
+    """Executor runs through the cache."""
+
+    def test_hit_skips_database_stages(self):
+        cache = CandidateSetCache(settle_ms=0)
+        state = ['t0', 't1', 't2', 'z']
+        client = FakeClickHouse(PATTERNS)
+        expected = make_executor(FakeClickHouse(PATTERNS), state, settings=SETTINGS).execute_pipeline()
+
+        first = make_executor(client, state, settings=SETTINGS, candidate_cache=cache)
+        assert first.execute_pipeline() == expected
+        assert first.get_metrics()['candidate_cache'] == 'miss'
+        queries = len(client.queries)
+
+        second = make_executor(client, list(reversed(state)), settings=SETTINGS, candidate_cache=cache)
+        assert second.execute_pipeline() == expected
+        assert len(client.queries) == queries
+        metrics = second.get_metrics()
+        assert metrics['candidate_cache'] == 'hit'
+        assert metrics['stages'][0]['handoff'] == 'cache'
+        assert metrics['final_candidates'] == len(expected)
+
+        stats = cache.get_stats()
+        assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+        # The hit ran no stage, so materialize() reads the lengths evidence depends on
+        expected = _predict(make_executor(FakeClickHouse(PATTERNS), state, settings=SETTINGS), state)
+        assert expected and all(expected.values())
+        assert _predict(make_executor(client, state, settings=SETTINGS, candidate_cache=cache), state) == expected
+        assert len(client.queries) == queries + 1
+
+    def test_failed_stage_is_not_cached(self):
+        cache = CandidateSetCache(settle_ms=0)
+        client = FakeClickHouse(PATTERNS)
+        client.fail_on = 'patterns_data'
+        make_executor(client, ['a', 'b'], settings=SETTINGS, candidate_cache=cache).execute_pipeline()
+        assert len(cache) == 0
+
+
+class TestInvalidation:
+    """Per-kb write versions."""
+
+    def test_bump_invalidates_and_settles(self):
+        cache = CandidateSetCache(settle_ms=50)
+        state = ['a', 'b', 'c', 'd']
+        key = _key(cache, state)
+        cache.put(key, {'p1'})
+        assert cache.get(_key(cache, state)) == {'p1'}
+
+        cache.bump('kb_test')
+        assert len(cache) == 0
+        assert _key(cache, state) is None
+        time.sleep(0.06)
+        new_key = _key(cache, state)
+        assert new_key is not None and new_key != key
+        assert cache.get(new_key) is None
+        assert cache.get_stats()['bypassed'] == 1
+
+    def test_write_through_another_process(self):
+        redis = FakeRedis()
+        this, other = CandidateSetCache(settle_ms=50), CandidateSetCache(settle_ms=50)
+        state = ['a', 'b']
+        key = this.key('kb', {}, state, False, redis)
+        this.put(key, {'p1'}, redis)
+
+        other.bump('kb', redis)
+        assert this.key('kb', {}, state, False, redis) is None
+        time.sleep(0.06)
+        assert this.get(this.key('kb', {}, state, False, redis), redis) is None
+
+
+class TestStorage:
+    """Shared tier and bounds."""
+
+    def test_shared_entries(self):
+        redis = FakeRedis()
+        this, other = CandidateSetCache(settle_ms=0, shared=True), CandidateSetCache(settle_ms=0, shared=True)
+        this.put(this.key('kb', {}, ['a'], False, redis), {'p1', 'p2'}, redis)
+        assert other.get(other.key('kb', {}, ['a'], False, redis), redis) == {'p1', 'p2'}
+        assert other.get_stats()['shared_hits'] == 1
+
+    def test_bounded_by_names(self):
+        cache = CandidateSetCache(max_names=5, max_candidates=3, settle_ms=0)
+        keys = [cache.key('kb', {}, [f"s{i}"], False) for i in range(3)]
+        cache.put(keys[0], {'a', 'b'})
+        cache.put(keys[1], {'c', 'd'})
+        cache.put(keys[2], {'e', 'f'})
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[2]) == {'e', 'f'}
+        cache.put(keys[0], {'a', 'b', 'c', 'd'})
+        stats = cache.get_stats()
+        assert (stats['names'], stats['evictions'], stats['oversized']) == (4, 1, 1)
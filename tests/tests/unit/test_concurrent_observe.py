@@ -0,0 +1,179 @@
+"""
+Concurrent observation tests for KATO.
+
+These tests validate:
+1. Observations of different sessions on one processor run concurrently
+   (no node-wide lock held across prediction)
+2. Each observation predicts from, and returns, its own session STM while
+   others are in flight; the shared pattern processor STM is never touched
+3. Auto-learning (CLEAR and ROLLING) learns the session STM passed in and
+   returns the session's new STM
+4. PatternProcessor.learn_events leaves the processor's STM and accumulators alone
+"""
+
+import asyncio
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+from kato.workers.observation_processor import ObservationProcessor
+from kato.workers.pattern_operations import PatternOperations
+from kato.workers.pattern_processor import PatternProcessor
+
+
+class FakePatternProcessor:
+    """Records the STM each prediction sees; yields to the loop mid-prediction."""
+
+    def __init__(self):
+        self.superkb = SimpleNamespace(patterns_kb=None, predictions_kb=None)
+        self.STM = deque([['untouched']])
+        self.learned = []
+        self.gates = {}
+
+    async def processEvents(self, unique_id, stm=None, trigger_predictions=None, session_id=None, config=None):
+        seen = [list(event) for event in stm]
+        gate = self.gates.get(unique_id)
+        if gate is not None:
+            await gate.wait()
+        await asyncio.sleep(0)
+        return [{'unique_id': unique_id, 'stm': seen}]
+
+    def learn_events(self, stm_events, emotives=None, metadata=None):
+        self.learned.append([list(event) for event in stm_events])
+        return f"hash{len(self.learned)}"
+
+
+class FakeVectorProcessor:
+    def learn(self):
+        pass
+
+
+def _observation_processor(max_pattern_length=0):
+    pattern_processor = FakePatternProcessor()
+    operations = PatternOperations(pattern_processor, FakeVectorProcessor(), None)
+    return ObservationProcessor(FakeVectorProcessor(), pattern_processor, None, operations,
+                                sort_symbols=True, max_pattern_length=max_pattern_length)
+
+
+def _config(**overrides):
+    values = {'max_pattern_length': None, 'process_predictions': None, 'stm_mode': None, 'sort_symbols': None}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestConcurrentObserve:
+    """Observations of several sessions sharing one processor."""
+
+    def test_sessions_observe_concurrently(self):
+        """Session A's prediction waits on session B, which must be able to finish."""
+        processor = _observation_processor()
+
+        async def run():
+            gate = asyncio.Event()
+            processor.pattern_processor.gates['a'] = gate
+
+            async def observe_b():
+                result = await processor.process_observation(
+                    {'unique_id': 'b', 'strings': ['y']}, config=_config(), stm=[['x']])
+                gate.set()
+                return result
+
+            return await asyncio.wait_for(asyncio.gather(
+                processor.process_observation({'unique_id': 'a', 'strings': ['b', 'a']},
+                                              config=_config(), stm=[['c']]),
+                observe_b()), timeout=5)
+
+        result_a, result_b = asyncio.run(run())
+
+        assert result_a['stm'] == [['c'], ['a', 'b']]
+        assert result_a['predictions'][0]['stm'] == [['c'], ['a', 'b']]
+        assert result_b['stm'] == [['x'], ['y']]
+        assert result_b['predictions'][0]['stm'] == [['x'], ['y']]
+        assert list(processor.pattern_processor.STM) == [['untouched']]
+
+    def test_interleaved_sessions_keep_their_stm(self):
+        """Many interleaved observations each see only their own session's events."""
+        processor = _observation_processor()
+        sessions = {f"s{i}": [[f"s{i}_0"]] for i in range(8)}
+
+        async def observe(session_id, step):
+            result = await processor.process_observation(
+                {'unique_id': f"{session_id}_{step}", 'strings': [f"{session_id}_{step}"]},
+                config=_config(), stm=sessions[session_id])
+            sessions[session_id] = result['stm']
+            return result
+
+        async def run():
+            for step in range(1, 4):
+                results = await asyncio.gather(*(observe(s, step) for s in sessions))
+                for result in results:
+                    session_id = result['unique_id'].split('_')[0]
+                    assert all(event[0].startswith(session_id + '_') for event in result['predictions'][0]['stm'])
+
+        asyncio.run(run())
+
+        for session_id, stm in sessions.items():
+            assert stm == [[f"{session_id}_{step}"] for step in range(4)]
+
+    def test_input_stm_is_not_mutated(self):
+        """The caller's STM list is copied, not appended to."""
+        processor = _observation_processor()
+        stm = [['a']]
+
+        result = asyncio.run(processor.process_observation(
+            {'unique_id': 'u', 'strings': ['b']}, config=_config(process_predictions=False), stm=stm))
+
+        assert stm == [['a']]
+        assert result['stm'] == [['a'], ['b']]
+        assert result['predictions'] == []
+
+
+class TestAutoLearnSessionStm:
+    """Auto-learning works on the STM passed in."""
+
+    def test_clear_mode(self):
+        processor = _observation_processor()
+        result = asyncio.run(processor.process_observation(
+            {'unique_id': 'u', 'strings': ['c']},
+            config=_config(max_pattern_length=3, stm_mode='CLEAR'), stm=[['a'], ['b']]))
+
+        assert result['auto_learned_pattern'] == 'PTRN|hash1'
+        assert result['stm'] == []
+        assert processor.pattern_processor.learned == [[['a'], ['b'], ['c']]]
+        assert list(processor.pattern_processor.STM) == [['untouched']]
+
+    def test_rolling_mode(self):
+        processor = _observation_processor()
+        result = asyncio.run(processor.process_observation(
+            {'unique_id': 'u', 'strings': ['d']},
+            config=_config(max_pattern_length=3, stm_mode='ROLLING'), stm=[['a'], ['b'], ['c']]))
+
+        assert result['auto_learned_pattern'] == 'PTRN|hash1'
+        assert result['stm'] == [['c'], ['d']]
+        assert processor.pattern_processor.learned == [[['a'], ['b'], ['c'], ['d']]]
+
+
+class TestLearnEvents:
+    """PatternProcessor.learn_events does not use processor-level session state."""
+
+    def test_learn_events_leaves_processor_state(self):
+        learned = []
+        processor = object.__new__(PatternProcessor)
+        processor._learn_lock = threading.Lock()
+        processor.STM = deque([['other'], ['session']])
+        processor.emotives = [{'joy': 1.0}]
+        processor.metadata = [{'tag': 'other'}]
+        processor.metrics_cache_manager = None
+        processor.patterns_kb = SimpleNamespace(
+            learnPattern=lambda pattern, emotives, metadata: learned.append(
+                (pattern.pattern_data, emotives, metadata)) or True)
+        processor.patterns_searcher = SimpleNamespace(assignNewlyLearnedToWorkers=lambda *args: None)
+        processor.query_manager = SimpleNamespace(invalidate_caches=lambda: None)
+
+        name = processor.learn_events([['a'], ['b']], [{'fear': 0.5}], [{'tag': 'mine'}])
+
+        assert name is not None
+        assert learned == [([['a'], ['b']], [{'fear': 0.5}], {'tag': ['mine']})]
+        assert list(processor.STM) == [['other'], ['session']]
+        assert processor.emotives == [{'joy': 1.0}]
+        assert processor.metadata == [{'tag': 'other'}]
@@ -0,0 +1,62 @@
+"""
+Filter pipeline candidate hand-off tests for KATO.
+
+These tests validate:
+1. Stage-to-stage candidates travel as one external table query
+2. The chunked IN-list fallback still issues one query per 500 names
+3. Per-stage metrics report round trips, SQL bytes and hand-off mode
+"""
+
+import kato.filters  # noqa: F401  (registers filters)
+import kato.filters.executor as executor_module
+from kato.filters.executor import EXTERNAL_CANDIDATES_TABLE
+from fixtures.fake_backends import FakeClickHouse, make_executor
+
+
+def _run(names, use_external, monkeypatch):
+    monkeypatch.setattr(executor_module, 'USE_EXTERNAL_CANDIDATES', use_external)
+    # Hand-off happens between separately executed stages
+    monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', False)
+    client = FakeClickHouse({n: [['a', 'b', 'c']] for n in names})
+    executor = make_executor(client, ['a', 'b', 'c'], ['length', 'length'])
+    candidates = executor.execute_pipeline()
+    return executor, client, candidates
+
+
+class TestCandidateHandoff:
+    """Test how candidates move between database stages."""
+
+    def test_external_table_is_single_round_trip(self, monkeypatch):
+        """Second stage sends all candidates in one query."""
+        names = [f"p{i:05d}" for i in range(1200)]
+        executor, client, candidates = _run(names, True, monkeypatch)
+
+        assert candidates == set(names)
+        sql, external_data = client.queries[1], client.external_data[1]
+        assert f"name IN (SELECT name FROM {EXTERNAL_CANDIDATES_TABLE})" in sql
+        assert "kb_id = 'kb_test' AND name IN" in sql
+        assert external_data is not None
+
+        stage = executor.stage_metrics[1]
+        assert stage['handoff'] == 'external'
+        assert stage['round_trips'] == 1
+        assert stage['candidates_in'] == 1200
+
+    def test_chunked_fallback(self, monkeypatch):
+        """With external tables disabled, 1200 names take three IN chunks."""
+        names = [f"p{i:05d}" for i in range(1200)]
+        executor, client, candidates = _run(names, False, monkeypatch)
+
+        assert candidates == set(names)
+        stage = executor.stage_metrics[1]
+        assert stage['handoff'] == 'chunked'
+        assert stage['round_trips'] == 3
+        assert executor.get_metrics()['total_round_trips'] == 4
+
+    def test_first_stage_has_no_handoff(self, monkeypatch):
+        """The first stage queries the kb directly."""
+        executor, _, _ = _run(['p1', 'p2'], True, monkeypatch)
+        stage = executor.stage_metrics[0]
+        assert stage['handoff'] == 'none'
+        assert stage['round_trips'] == 1
+        assert stage['query_bytes'] > 0
@@ -0,0 +1,102 @@
+"""
+Filter stage fusion tests for the KATO filter pipeline.
+
+These tests validate:
+1. Consecutive database stages (length, jaccard, minhash) run as one query
+   ANDing their predicates
+2. Fused and staged execution return the same candidates
+3. Python-only stages (bloom) split the pipeline into separate queries
+4. explain() shows the stages and the SQL each one sends
+5. KATO_FUSE_FILTER_STAGES=false restores one query per stage
+"""
+
+import kato.filters  # noqa: F401  (registers filters)
+import kato.filters.executor as executor_module
+import kato.filters.minhash_filter as minhash_module
+from kato.filters.executor import EXTERNAL_CANDIDATES_TABLE
+from fixtures.fake_backends import FakeClickHouse, make_executor
+
+PATTERNS = {f"p{i}": [[f"a{i}", 'b'], ['c']] if i % 2 else [[f"a{i}"], ['z']] for i in range(6)}
+STM = ['a1', 'b', 'c']
+# Length admits every pattern; token overlap keeps those sharing 'b' with the STM
+SETTINGS = dict(length_min_ratio=0.5, length_max_ratio=1.0, jaccard_threshold=0.1, jaccard_min_overlap=1)
+
+
+def _verify_all(self, candidates, patterns_cache):
+    return set(candidates)
+
+
+class TestFusedPipeline:
+    """Consecutive database stages share one query."""
+
+    def test_three_stages_one_query(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', True)
+        monkeypatch.setattr(minhash_module.MinHashFilter, 'filter_python', _verify_all)
+        client = FakeClickHouse(PATTERNS)
+        executor = make_executor(client, STM, ['length', 'jaccard', 'minhash'], settings=SETTINGS)
+        candidates = executor.execute_pipeline()
+
+        assert candidates == {'p1', 'p3', 'p5'}
+        assert len(client.pattern_queries) == 1
+        sql = client.pattern_queries[0]
+        assert "WHERE kb_id = 'kb_test' AND (length BETWEEN" in sql
+        assert 'arrayIntersect' in sql and ('lsh_buckets' in sql or 'hasAny(lsh_bands' in sql)
+        assert 'minhash_sig' in sql
+
+        assert len(executor.stage_metrics) == 1
+        stage = executor.stage_metrics[0]
+        assert stage['filter'] == 'length+jaccard+minhash'
+        assert stage['fused'] is True
+        assert stage['round_trips'] == 1
+
+    def test_fused_matches_staged(self, monkeypatch):
+        monkeypatch.setattr(minhash_module.MinHashFilter, 'filter_python', _verify_all)
+        results = {}
+        for fuse in (True, False):
+            monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', fuse)
+            client = FakeClickHouse(PATTERNS)
+            executor = make_executor(client, STM, ['length', 'jaccard', 'minhash'], settings=SETTINGS)
+            results[fuse] = (executor.execute_pipeline(), len(client.pattern_queries))
+        assert results[True][0] == results[False][0]
+        assert (results[True][1], results[False][1]) == (1, 3)
+
+    def test_python_stage_breaks_fusion(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', True)
+        client = FakeClickHouse(PATTERNS)
+        executor = make_executor(client, STM, ['length', 'bloom', 'jaccard'], settings=SETTINGS,
+                                 bloom_filter=object())
+        candidates = executor.execute_pipeline()
+
+        assert candidates == {'p1', 'p3', 'p5'}
+        assert [m['filter'] for m in executor.stage_metrics] == ['length', 'bloom', 'jaccard']
+        assert not any(m['fused'] for m in executor.stage_metrics)
+        # length, bloom's pattern_data read, jaccard restricted to survivors
+        assert len(client.pattern_queries) == 3
+        assert f"SELECT name FROM {EXTERNAL_CANDIDATES_TABLE}" in client.pattern_queries[2]
+
+
+class TestExplain:
+    """explain() describes the plan without querying ClickHouse."""
+
+    def test_explain(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', True)
+        client = FakeClickHouse(PATTERNS)
+        steps = make_executor(client, STM, ['length', 'jaccard', 'bloom', 'minhash'], settings=SETTINGS,
+                              bloom_filter=object()).explain()
+
+        assert client.pattern_queries == []
+        assert [(s['stage'], s['fused'], s['python']) for s in steps] == [
+            ('length+jaccard', True, []),
+            ('bloom', False, ['bloom']),
+            ('minhash', False, ['minhash']),
+        ]
+        assert steps[0]['sql'].startswith('SELECT name, length\nFROM patterns_data\n'
+                                          "WHERE kb_id = 'kb_test' AND (length BETWEEN")
+        assert steps[1]['sql'] is None
+        assert f"kb_id = 'kb_test' AND name IN (SELECT name FROM {EXTERNAL_CANDIDATES_TABLE})" in steps[2]['sql']
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', False)
+        steps = make_executor(FakeClickHouse(PATTERNS), STM, ['length', 'jaccard'], settings=SETTINGS).explain()
+        assert [s['stage'] for s in steps] == ['length', 'jaccard']
+        assert not any(s['fused'] for s in steps)
@@ -0,0 +1,115 @@
+"""
+Adaptive filter stage ordering tests for KATO.
+
+These tests validate:
+1. Stage statistics are learned per kb from executor stage metrics
+2. 'strict' reorders stages by cost per candidate removed and returns the
+   configured pipeline's candidates
+3. 'auto' also skips stages that keep nearly every candidate, returning a
+   superset, and runs every stage on exploration runs
+4. With stage fusion, database filters move up into the first query
+5. 'configured' (the default) keeps filter_pipeline as given
+"""
+
+import kato.filters  # noqa: F401  (registers filters)
+import kato.filters.executor as executor_module
+from kato.filters.stage_stats import MIN_OBSERVATIONS, FilterStageStats
+from fixtures.fake_backends import FakeClickHouse, make_executor
+
+PATTERNS = {f"p{i}": [[f"a{i}", 'b'], ['c']] if i % 2 else [[f"a{i}"], ['z']] for i in range(6)}
+STM = ['a1', 'b', 'c', 'z']
+# Length admits every pattern; token overlap keeps those sharing 'b' with the STM
+SETTINGS = dict(length_min_ratio=0.5, length_max_ratio=1.0, jaccard_threshold=0.1, jaccard_min_overlap=1)
+STAGES = ['length', 'bloom', 'jaccard']
+
+
+def _observe(stats, kb_id, stages, runs=MIN_OBSERVATIONS):
+    """Record runs of (filter, candidates_in, candidates_after, time_ms) stages."""
+    for _ in range(runs):
+        stats.record(kb_id, [{'filter': f, 'candidates_in': n_in, 'candidates_after': n_out, 'time_ms': ms}
+                             for f, n_in, n_out, ms in stages])
+
+
+class TestPlanOrder:
+    """Ordering decisions from learned statistics."""
+
+    PIPELINE = [('length', False), ('bloom', False), ('rapidfuzz', False)]
+
+    def test_selective_cheap_stage_first(self):
+        stats = FilterStageStats(skip_pass_rate=0.99, explore_interval=0)
+        # bloom keeps 99.5% at 0.01ms/candidate; rapidfuzz keeps 10% at 0.02ms/candidate
+        _observe(stats, 'kb', [('length', 0, 1000, 5.0), ('bloom', 1000, 995, 10.0), ('rapidfuzz', 995, 100, 20.0)])
+
+        assert stats.plan_order('kb', self.PIPELINE, 'configured') == (['length', 'bloom', 'rapidfuzz'], [])
+        assert stats.plan_order('kb', self.PIPELINE, 'strict') == (['length', 'rapidfuzz', 'bloom'], [])
+        assert stats.plan_order('kb', self.PIPELINE, 'auto') == (['length', 'rapidfuzz'], ['bloom'])
+
+        kb = stats.get_stats('kb')['kb']
+        assert kb['pipelines'] == MIN_OBSERVATIONS
+        assert kb['order'] == ['length', 'rapidfuzz'] and kb['skipped'] == ['bloom']
+        assert kb['stages']['rapidfuzz']['pass_rate'] == round(100 / 995, 4)
+        assert kb['stages']['length']['scans'] == MIN_OBSERVATIONS
+
+    def test_needs_observations(self):
+        stats = FilterStageStats(explore_interval=0)
+        _observe(stats, 'kb', [('bloom', 1000, 995, 10.0), ('rapidfuzz', 995, 100, 20.0)],
+                 runs=MIN_OBSERVATIONS - 1)
+        assert stats.plan_order('kb', self.PIPELINE, 'auto') == (['length', 'bloom', 'rapidfuzz'], [])
+        # Statistics are per kb
+        _observe(stats, 'other', [('bloom', 1000, 995, 10.0), ('rapidfuzz', 995, 100, 20.0)])
+        assert stats.plan_order('kb', self.PIPELINE, 'strict')[0] == ['length', 'bloom', 'rapidfuzz']
+
+    def test_exploration_runs_every_stage(self):
+        stats = FilterStageStats(skip_pass_rate=0.99, explore_interval=MIN_OBSERVATIONS)
+        _observe(stats, 'kb', [('bloom', 1000, 995, 10.0), ('rapidfuzz', 995, 100, 20.0)])
+        assert stats.plan_order('kb', self.PIPELINE, 'auto') == (['length', 'rapidfuzz', 'bloom'], [])
+        stats.record('kb', [])
+        assert stats.plan_order('kb', self.PIPELINE, 'auto') == (['length', 'rapidfuzz'], ['bloom'])
+
+    def test_fusable_filters_join_first_query(self):
+        stats = FilterStageStats(explore_interval=0)
+        filters = [('length', True), ('bloom', False), ('jaccard', True)]
+        assert stats.plan_order('kb', filters, 'strict') == (['length', 'jaccard', 'bloom'], [])
+
+
+class TestExecutorOrdering:
+    """FilterPipelineExecutor runs the planned order."""
+
+    def test_strict_matches_configured(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', False)
+        stats = FilterStageStats(explore_interval=0)
+        configured = make_executor(FakeClickHouse(PATTERNS), STM, STAGES, stage_stats=stats, bloom_filter=object(),
+                                   settings=dict(SETTINGS, filter_ordering='configured'))
+        expected = configured.execute_pipeline()
+        assert [m['filter'] for m in configured.stage_metrics] == ['length', 'bloom', 'jaccard']
+
+        # jaccard removes half its input, bloom nothing: jaccard should run first
+        _observe(stats, 'kb_test', [('bloom', 6, 6, 1.0), ('jaccard', 6, 3, 1.0)])
+        strict = make_executor(FakeClickHouse(PATTERNS), STM, STAGES, stage_stats=stats, bloom_filter=object(),
+                               settings=dict(SETTINGS, filter_ordering='strict'))
+        assert strict.execute_pipeline() == expected == {'p1', 'p3', 'p5'}
+        assert [m['filter'] for m in strict.stage_metrics] == ['length', 'jaccard', 'bloom']
+        assert strict.get_metrics()['filter_ordering'] == 'strict'
+
+    def test_auto_returns_superset(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'FUSE_DB_STAGES', False)
+        stats = FilterStageStats(skip_pass_rate=0.99, explore_interval=0)
+        # Learned on STMs where jaccard let everything through
+        _observe(stats, 'kb_test', [('bloom', 6, 3, 1.0), ('jaccard', 6, 6, 1.0)])
+        auto = make_executor(FakeClickHouse(PATTERNS), STM, STAGES, stage_stats=stats, bloom_filter=object(),
+                             settings=dict(SETTINGS, filter_ordering='auto'))
+        candidates = auto.execute_pipeline()
+
+        assert candidates >= {'p1', 'p3', 'p5'}
+        assert candidates == set(PATTERNS)
+        assert auto.skipped_filters == ['jaccard']
+        assert [m['filter'] for m in auto.stage_metrics] == ['length', 'bloom']
+        assert stats.get_stats('kb_test')['kb_test']['stages']['jaccard']['skipped'] == 1
+
+    def test_drop_kb(self):
+        stats = FilterStageStats()
+        make_executor(FakeClickHouse(PATTERNS), STM, ['length'], stage_stats=stats, bloom_filter=object(),
+                      settings=dict(SETTINGS, filter_ordering='configured')).execute_pipeline()
+        assert 'kb_test' in stats.get_stats()
+        stats.drop_kb('kb_test')
+        assert stats.get_stats() == {}
@@ -0,0 +1,90 @@
+"""
+Integer-encoded matching tests for KATO.
+
+These tests validate:
+1. TokenVocabulary assigns dense, stable int32 IDs and decodes them back
+2. IntegerMatcher batch results are identical to the string path
+   (differential test over random sequences, thresholds and weights)
+3. Fuzzy token matching stays on the string path
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from kato.searches.int_matcher import IntegerMatcher, TokenVocabulary
+from kato.searches.pattern_search import InformationExtractor, _match_batch
+
+
+def _sequence(rng, max_len, vocab):
+    return [f"tok{rng.randint(0, vocab)}" for _ in range(rng.randint(0, max_len))]
+
+
+class TestTokenVocabulary:
+    """Test symbol <-> ID encoding."""
+
+    def test_dense_ids_round_trip(self):
+        """IDs are assigned in first-seen order and decode to the original symbols."""
+        vocabulary = TokenVocabulary()
+        encoded = vocabulary.encode_sequence(['b', 'a', 'b', 'VCTR|x'])
+        assert encoded.dtype == np.int32
+        assert encoded.tolist() == [0, 1, 0, 2]
+        assert vocabulary.decode_sequence(encoded) == ['b', 'a', 'b', 'VCTR|x']
+        assert vocabulary.vocab_size == 3
+
+    def test_cache_reset_keeps_batch_consistent(self):
+        """A reset starts a new vocabulary without touching a prepared state."""
+        matcher = IntegerMatcher(max_patterns=2)
+        state = matcher.prepare_state(['a', 'b'])
+        for i in range(3):
+            matcher.encode_pattern(f"p{i}", ['b', 'c'], state)
+        assert state.vocabulary.decode_sequence(state.encoded['p2']) == ['b', 'c']
+
+        fresh = matcher.prepare_state(['c'])
+        assert fresh.vocabulary is not state.vocabulary
+        assert fresh.ids == [0]
+        assert matcher.cached_patterns == 0
+
+
+class TestIntegerMatching:
+    """Differential tests against InformationExtractor on token strings."""
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_identical_to_string_path(self, seed):
+        """Results, including their order, match the string path exactly."""
+        rng = random.Random(seed)
+        string_extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                                use_int_matching=False)
+        int_extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                             use_int_matching=True)
+        for trial in range(100):
+            vocab = rng.choice([3, 8, 30])
+            state = _sequence(rng, 20, vocab)
+            batch = [(f"PTRN|{seed}.{trial}.{k}", _sequence(rng, 15, vocab)) for k in range(30)]
+            threshold = rng.choice([0.0, 0.1, 0.3, 0.6])
+            weights = rng.choice([None, {f"tok{i}": rng.random() for i in range(vocab + 1)}])
+
+            expected = _match_batch(string_extractor, state, batch, threshold, True, 0.0, weights)
+            actual = _match_batch(int_extractor, state, batch, threshold, True, 0.0, weights)
+            assert actual == expected
+
+    def test_repeated_tokens_and_empty_state(self):
+        """Edge cases: repeated symbols, empty state at threshold 0.0."""
+        int_extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                             use_int_matching=True)
+        string_extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                                use_int_matching=False)
+        batch = [('PTRN|a', ['x', 'x', 'y', 'x']), ('PTRN|b', ['y']), ('PTRN|c', [])]
+        for state in (['x', 'y', 'x', 'x'], []):
+            assert (_match_batch(int_extractor, state, batch, 0.0, True, 0.0)
+                    == _match_batch(string_extractor, state, batch, 0.0, True, 0.0))
+
+    def test_fuzzy_threshold_uses_string_path(self):
+        """fuzzy_token_threshold > 0 never reaches the integer matcher."""
+        extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                         use_int_matching=True)
+        results = _match_batch(extractor, ['apple', 'banana'], [('PTRN|a', ['apple', 'bananas'])],
+                               0.1, True, 0.8)
+        assert results
+        assert extractor.int_matcher.cached_patterns == 0
@@ -0,0 +1,105 @@
+"""
+Late materialization tests for the KATO filter pipeline.
+
+These tests validate:
+1. Database stages select names and scalar columns, not pattern_data
+   (unless KATO_LATE_MATERIALIZATION is disabled)
+2. materialize() reads pattern_data once, only for the final candidates,
+   and not at all for patterns already in the shared cache
+3. Python-side stages that use pattern_data get it before they run
+4. Per-stage metrics report bytes read from ClickHouse
+"""
+
+from types import SimpleNamespace
+
+import kato.filters  # noqa: F401  (registers filters)
+import kato.filters.base as base_module
+from kato.filters.jaccard_filter import JaccardFilter
+from kato.filters.length_filter import LengthFilter
+from kato.filters.pattern_data_cache import PatternDataCache
+from fixtures.fake_backends import PATTERN_DATA_BYTES, SCALAR_BYTES, FakeClickHouse, make_executor
+
+PATTERNS = {
+    f"p{i}": [[f"a{i}", 'b'], ['c']] if i % 2 else [[f"a{i}"], ['z']]
+    for i in range(6)
+}
+STM = ['a1', 'b', 'c']
+
+
+class TestSelectColumns:
+    """Database stages leave pattern_data out of their SELECT lists."""
+
+    def test_stage_queries(self, monkeypatch):
+        config = SimpleNamespace()
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', True)
+        assert 'pattern_data' not in LengthFilter(config, ['a', 'b']).get_db_query()
+        assert 'pattern_data' not in JaccardFilter(config, ['a', 'b']).get_db_query()
+        assert LengthFilter(config, ['a']).select_columns('minhash_sig') == 'name, length, minhash_sig'
+
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', False)
+        assert LengthFilter(config, ['a']).select_columns('minhash_sig') == 'name, pattern_data, length, minhash_sig'
+
+
+class TestMaterialize:
+    """pattern_data is read once, for the surviving candidates."""
+
+    def test_final_candidates_are_materialized(self, monkeypatch):
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', True)
+        client = FakeClickHouse(PATTERNS)
+        executor = make_executor(client, STM, ['length', 'length'])
+        candidates = executor.execute_pipeline()
+        assert all('pattern_data' not in columns for columns in client.selects)
+        assert all('pattern_data' not in executor.patterns_cache[n] for n in candidates)
+
+        executor.materialize(candidates)
+        assert client.selects[-1] == ['name', 'pattern_data', 'length']
+        for name in candidates:
+            entry = executor.patterns_cache[name]
+            assert entry['pattern_data'] == PATTERNS[name]
+            assert entry['pattern_data_flat'] == [s for event in PATTERNS[name] for s in event]
+
+        stage = executor.stage_metrics[-1]
+        assert stage['filter'] == 'materialize'
+        assert stage['materialized'] == len(candidates)
+        assert stage['round_trips'] == 1
+        assert stage['read_bytes'] == (2 * SCALAR_BYTES + PATTERN_DATA_BYTES) * len(candidates)
+        assert executor.stage_metrics[0]['read_bytes'] == 2 * SCALAR_BYTES * len(PATTERNS)
+        assert executor.get_metrics()['total_read_bytes'] == sum(m['read_bytes'] for m in executor.stage_metrics)
+
+    def test_cached_patterns_are_not_read_again(self, monkeypatch):
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', True)
+        cache = PatternDataCache(1 << 20)
+        client = FakeClickHouse(PATTERNS)
+        first = make_executor(client, STM, pattern_cache=cache)
+        first.materialize(first.execute_pipeline())
+
+        second = make_executor(client, STM, pattern_cache=cache)
+        candidates = second.execute_pipeline()
+        queries = len(client.selects)
+        second.materialize(candidates)
+        assert len(client.selects) == queries
+        assert second.stage_metrics[-1]['round_trips'] == 0
+        assert second.get_pattern('p1')['pattern_data'] == PATTERNS['p1']
+
+    def test_eager_mode_needs_no_materialization(self, monkeypatch):
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', False)
+        client = FakeClickHouse(PATTERNS)
+        executor = make_executor(client, STM)
+        executor.materialize(executor.execute_pipeline())
+        assert len(client.selects) == 1
+        assert executor.stage_metrics[-1]['round_trips'] == 0
+
+
+class TestPythonStages:
+    """Python-side stages that read sequences get them first."""
+
+    def test_bloom_stage_gets_pattern_data(self, monkeypatch):
+        monkeypatch.setattr(base_module, 'LATE_MATERIALIZATION', True)
+        client = FakeClickHouse(PATTERNS)
+        executor = make_executor(client, STM, ['length', 'bloom'], bloom_filter=object())
+        candidates = executor.execute_pipeline()
+
+        # Patterns sharing a token with the STM (a1, b, c): the odd ones
+        assert candidates == {'p1', 'p3', 'p5'}
+        assert client.selects[1] == ['name', 'pattern_data', 'length']
+        assert executor.stage_metrics[1]['round_trips'] == 1
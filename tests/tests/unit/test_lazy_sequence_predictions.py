@@ -0,0 +1,108 @@
+"""
+Lazy sequence prediction tests for KATO.
+
+These tests validate:
+1. process_observation(predict=False) skips the prediction search but still
+   updates STM and auto-learns
+2. Replaying a sequence lazily (predicting only at the end) yields the same
+   STM after every step, the same learned patterns and the same final
+   predictions as predicting after every observation
+3. ObservationSequenceRequest defaults to predicting after every observation
+   (lazy predictions are opt-in)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from kato.api.schemas import ObservationSequenceRequest
+from kato.workers.observation_processor import ObservationProcessor
+from kato.workers.pattern_operations import PatternOperations
+
+
+class FakePatternProcessor:
+    """Counts prediction searches; predictions echo the STM they saw."""
+
+    def __init__(self):
+        self.superkb = SimpleNamespace(patterns_kb=None, predictions_kb=None)
+        self.searches = 0
+        self.learned = []
+
+    async def processEvents(self, unique_id, stm=None, trigger_predictions=None, session_id=None, config=None):
+        self.searches += 1
+        return [{'unique_id': unique_id, 'stm': [list(event) for event in stm]}]
+
+    def learn_events(self, stm_events, emotives=None, metadata=None):
+        self.learned.append([list(event) for event in stm_events])
+        return f"hash{len(self.learned)}"
+
+
+class FakeVectorProcessor:
+    def learn(self):
+        pass
+
+
+def _observation_processor(max_pattern_length):
+    operations = PatternOperations(FakePatternProcessor(), FakeVectorProcessor(), None)
+    return ObservationProcessor(FakeVectorProcessor(), operations.pattern_processor, None, operations,
+                                sort_symbols=True, max_pattern_length=max_pattern_length)
+
+
+def _config(**overrides):
+    values = {'max_pattern_length': None, 'process_predictions': None, 'stm_mode': None, 'sort_symbols': None}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _replay(processor, sequence, config, lazy):
+    """Observe a sequence like observe-sequence does; returns (stms, final predictions)."""
+
+    async def run():
+        stm, stms, predictions = [], [], []
+        for i, strings in enumerate(sequence):
+            result = await processor.process_observation(
+                {'unique_id': f"obs{i}", 'strings': strings}, config=config, stm=stm,
+                predict=not lazy or i == len(sequence) - 1)
+            stm = result['stm']
+            stms.append(stm)
+            predictions = result['predictions']
+        return stms, predictions
+
+    return asyncio.run(run())
+
+
+class TestLazyPredictions:
+    """Sequence observation that predicts only where results are read."""
+
+    def test_predict_false_skips_search_but_auto_learns(self):
+        processor = _observation_processor(max_pattern_length=2)
+
+        async def run():
+            return await processor.process_observation(
+                {'unique_id': 'b', 'strings': ['y']}, config=_config(), stm=[['x']], predict=False)
+
+        result = asyncio.run(run())
+        assert result['predictions'] == []
+        assert processor.pattern_processor.searches == 0
+        assert processor.pattern_processor.learned == [[['x'], ['y']]]
+        assert result['auto_learned_pattern'] == 'PTRN|hash1'
+        assert result['stm'] == []
+
+    def test_lazy_replay_matches_eager_replay(self):
+        sequence = [[f"s{i % 7}", f"t{i % 3}"] for i in range(25)]
+        for mode in ('CLEAR', 'ROLLING'):
+            config = _config(stm_mode=mode, max_pattern_length=4)
+            eager, lazy = _observation_processor(0), _observation_processor(0)
+
+            eager_stms, eager_predictions = _replay(eager, sequence, config, lazy=False)
+            lazy_stms, lazy_predictions = _replay(lazy, sequence, config, lazy=True)
+
+            assert lazy_stms == eager_stms
+            assert lazy.pattern_processor.learned == eager.pattern_processor.learned
+            assert lazy_predictions == eager_predictions
+            assert eager.pattern_processor.searches == len(sequence)
+            assert lazy.pattern_processor.searches == 1
+
+    def test_sequence_request_defaults(self):
+        request = ObservationSequenceRequest(observations=[{'strings': ['a']}])
+        assert request.lazy_predictions is False
+        assert request.prediction_checkpoints == []
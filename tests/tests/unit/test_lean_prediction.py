@@ -0,0 +1,78 @@
+"""
+Lean prediction tests for KATO.
+
+These tests validate:
+1. LeanPrediction scores equal the fields of the Prediction dict built from
+   the same match, and materialize() builds that dict (same keys, order and
+   values)
+2. Event bounds place a match starting in the last past event into present
+3. Key access on a LeanPrediction covers the score fields only
+"""
+
+import random
+
+import pytest
+
+from kato.representations.prediction import LeanPrediction, Prediction, pre_potential
+from kato.searches.pattern_search import InformationExtractor
+
+SCORES = ('name', 'frequency', 'similarity', 'weighted_similarity', 'potential',
+          'evidence', 'confidence', 'snr', 'fragmentation')
+
+
+def _matches(seed, count=200):
+    rng = random.Random(seed)
+    extractor = InformationExtractor(use_fast_matcher=False, use_token_matching=True)
+    for _ in range(count):
+        vocab = rng.choice([3, 6, 15])
+        events = [[f"t{rng.randrange(vocab)}" for _ in range(rng.randint(1, 4))] for _ in range(rng.randint(1, 8))]
+        stm = [[f"t{rng.randrange(vocab)}" for _ in range(rng.randint(1, 3))] for _ in range(rng.randint(1, 3))]
+        flat = [t for event in events for t in event]
+        info = extractor.extract_prediction_info(flat, [t for event in stm for t in event], 0.0)
+        pattern = {'name': 'PTRN|x', 'pattern_data': events, 'length': len(flat),
+                   'frequency': 2, 'emotives': {'joy': 1.0}}
+        yield pattern, info, stm
+
+
+class TestLeanPrediction:
+    """LeanPrediction against the Prediction dict."""
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_materialize_matches_prediction(self, seed):
+        for pattern, info, stm in _matches(seed):
+            for stm_events in (stm, None):
+                args = (pattern,) + tuple(info[1:8])
+                kwargs = dict(anomalies=info[8], stm_events=stm_events, weighted_similarity=info[9])
+                lean = LeanPrediction(*args, **kwargs)
+                expected = Prediction(*args, **kwargs)
+                materialized = lean.materialize()
+
+                assert list(materialized.items()) == list(expected.items())
+                assert materialized.present == expected.present
+                for field in SCORES:
+                    assert lean[field] == expected[field]
+                assert pre_potential(lean) == pre_potential(expected)
+
+    def test_match_in_last_past_event_moves_to_present(self):
+        pattern = {'name': 'p', 'pattern_data': [['a', 'b'], ['c', 'd'], ['e']], 'length': 5, 'frequency': 1}
+        # Extractor split: past ['a', 'b', 'c'], present ['d', 'e']
+        lean = LeanPrediction(pattern, ['d', 'e'], ['a', 'b', 'c'], ['d', 'e'], [], [], 0.8, 1,
+                              stm_events=[['d'], ['e']])
+        assert (lean.present_start, lean.present_end) == (1, 3)
+        prediction = lean.materialize()
+        assert prediction['past'] == [['a', 'b']]
+        assert prediction['present'] == [['c', 'd'], ['e']]
+        assert prediction['future'] == []
+        assert prediction['missing'] == [['c'], []]
+        assert prediction['confidence'] == lean.confidence == 2 / 3
+
+    def test_key_access(self):
+        pattern = {'name': 'p', 'pattern_data': [['a'], ['b']], 'length': 2, 'frequency': 4}
+        lean = LeanPrediction(pattern, ['a'], [], ['a'], [], ['x'], 0.5, 1)
+        assert lean['name'] == 'p' and lean.get('frequency') == 4
+        assert 'snr' in lean and 'present' not in lean
+        assert lean.get('present', 'missing') == 'missing'
+        with pytest.raises(KeyError):
+            lean['present']
+        with pytest.raises(AttributeError):
+            lean.extra_field = 1
@@ -0,0 +1,167 @@
+"""
+Single round-trip learn tests for KATO.
+
+These tests validate:
+1. The learn script leaves Redis in the same state as the step-by-step learn
+   (frequency, emotives window, merged metadata, symbol stats, affinity)
+2. Only the new-pattern winner writes the ClickHouse row
+3. The in-process symbol table applies the script's delta locally
+4. Re-learn metadata is merged in Python with the step-by-step merge, and
+   a concurrent change to the document is retried rather than lost
+
+Runs the Lua script on fakeredis (requires fakeredis[lua]).
+"""
+
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+import kato.informatics.knowledge_base as knowledge_base_module
+from kato.informatics.knowledge_base import SuperKnowledgeBase
+from kato.storage.redis_writer import RedisWriter
+
+
+class RecordingClickHouseWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write_pattern(self, pattern_object):
+        self.rows.append(pattern_object.name)
+
+
+def _kb(kb_id, persistence=3):
+    kb = object.__new__(SuperKnowledgeBase)
+    kb.id = kb_id
+    kb.persistence = persistence
+    kb.emotives_available = set()
+    kb.redis_writer = RedisWriter(kb_id, fakeredis.FakeRedis(decode_responses=True))
+    kb.clickhouse_writer = RecordingClickHouseWriter()
+    return kb
+
+
+def _pattern(name, events):
+    return SimpleNamespace(name=name, pattern_data=events, length=sum(len(e) for e in events))
+
+
+def _dump(client):
+    """Redis contents with JSON documents decoded; stream entry IDs dropped."""
+    state = {}
+    for key in client.keys('*'):
+        kind = client.type(key)
+        if kind == 'string':
+            value = client.get(key)
+            state[key] = json.loads(value) if ':emotives:' in key or ':metadata:' in key else value
+        elif kind == 'hash':
+            state[key] = {f: round(float(v), 9) for f, v in client.hgetall(key).items()}
+        elif kind == 'set':
+            state[key] = client.smembers(key)
+        elif kind == 'stream':
+            state[key] = [fields for _, fields in client.xrange(key)]
+    state.pop('kb:symbols:epoch', None)
+    return state
+
+
+def _learn_both(monkeypatch, script_kb, legacy_kb, pattern, emotives, metadata):
+    monkeypatch.setattr(knowledge_base_module, 'USE_SINGLE_ROUND_TRIP_LEARN', True)
+    is_new = script_kb.learnPattern(pattern, emotives=emotives, metadata=metadata)
+    monkeypatch.setattr(knowledge_base_module, 'USE_SINGLE_ROUND_TRIP_LEARN', False)
+    assert legacy_kb.learnPattern(pattern, emotives=emotives, metadata=metadata) == is_new
+    return is_new
+
+
+class TestLearnScript:
+    """Differential tests of the script against the step-by-step learn."""
+
+    def test_same_redis_state_as_legacy_learn(self, monkeypatch):
+        """Random learns and re-learns produce identical Redis contents."""
+        rng = random.Random(7)
+        script_kb, legacy_kb = _kb('kb'), _kb('kb')
+        names = [f"PTRN|{i}" for i in range(6)]
+        for step in range(60):
+            name = rng.choice(names)
+            events = [[f"s{rng.randint(0, 5)}" for _ in range(rng.randint(1, 3))] for _ in range(2)]
+            emotives = rng.choice([None, [], [{'joy': rng.random()}],
+                                   [{'joy': rng.random(), 'fear': -1.5}, {'joy': 0.1}]])
+            metadata = rng.choice([None, {}, {'tags': [rng.choice(['a', 'b', 'é', 'B'])]},
+                                   {'tags': ['z'], 'rank': [rng.randint(1, 12)]}])
+            _learn_both(monkeypatch, script_kb, legacy_kb, _pattern(name, events), emotives, metadata)
+
+            assert _dump(script_kb.redis_writer.client) == _dump(legacy_kb.redis_writer.client), step
+        assert script_kb.clickhouse_writer.rows == legacy_kb.clickhouse_writer.rows
+
+    def test_emotives_window_is_byte_identical(self, monkeypatch):
+        """Appended emotives are stored exactly as json.dumps() writes them."""
+        script_kb, legacy_kb = _kb('kb', persistence=2), _kb('kb', persistence=2)
+        pattern = _pattern('PTRN|e', [['a', 'b']])
+        for emotives in ([{'joy': 0.1}], [{'joy': 1 / 3, 'a "b", [c]': 2}], [{'fear': 2.5e-7}]):
+            _learn_both(monkeypatch, script_kb, legacy_kb, pattern, emotives, None)
+
+        key = 'kb:emotives:PTRN|e'
+        assert script_kb.redis_writer.client.get(key) == legacy_kb.redis_writer.client.get(key)
+
+    def test_new_pattern_writes_clickhouse_once(self):
+        """A re-learn only increments; the ClickHouse row is written by the first learn."""
+        kb = _kb('kb')
+        pattern = _pattern('PTRN|once', [['x'], ['y', 'x']])
+        assert kb.learnPattern(pattern, emotives=[{'joy': 1.0}]) is True
+        assert kb.learnPattern(pattern) is False
+
+        client = kb.redis_writer.client
+        assert kb.clickhouse_writer.rows == ['PTRN|once']
+        assert client.get('kb:frequency:PTRN|once') == '2'
+        assert client.hget('kb:symbols:pmf', 'x') == '1'
+        assert client.hget('kb:symbols:freq', 'x') == '4'
+        assert float(client.hget('kb:affinity:y', 'joy')) == 1.0
+
+    def test_symbol_table_applies_delta_locally(self):
+        """Learns through the script keep the symbol table current without reloads."""
+        kb = _kb('kb_table')
+        table = kb.redis_writer.symbol_table
+        table.invalidate()
+        kb.learnPattern(_pattern('PTRN|t1', [['a', 'b']]))
+        table.get_all()
+        kb.learnPattern(_pattern('PTRN|t2', [['a']]))
+
+        assert table.local_applies == 1
+        assert table.full_reloads == 1
+        assert table.get_all() == kb.redis_writer.get_all_symbols_batch()
+
+    def test_metadata_merge_matches_legacy_learn(self, monkeypatch):
+        """Booleans and mixed int/float values merge as in the step-by-step learn."""
+        script_kb, legacy_kb = _kb('kb'), _kb('kb')
+        pattern = _pattern('PTRN|m', [['a'], ['b']])
+        for metadata in ({'flag': [True], 'n': [1]}, {'flag': [False], 'n': [2.5, 1.0]}, {'n': [0.1 + 0.2]}):
+            _learn_both(monkeypatch, script_kb, legacy_kb, pattern, None, metadata)
+
+        key = 'kb:metadata:PTRN|m'
+        assert script_kb.redis_writer.client.get(key) == legacy_kb.redis_writer.client.get(key)
+
+    def test_concurrent_metadata_change_is_retried(self):
+        """A document changed between WATCH and EXEC is re-read and merged again."""
+        kb = _kb('kb')
+        pattern = _pattern('PTRN|w', [['a']])
+        kb.learnPattern(pattern, metadata={'tags': ['a']})
+
+        client = kb.redis_writer.client
+        update = kb.redis_writer.update_metadata
+        attempts = []
+
+        def racing_update(name, merge):
+            def merge_once_raced(current):
+                if not attempts:
+                    # Another worker's write, on another connection
+                    client.set('kb:metadata:PTRN|w', json.dumps({'tags': ['a', 'b']}))
+                attempts.append(current)
+                return merge(current)
+            return update(name, merge_once_raced)
+
+        kb.redis_writer.update_metadata = racing_update
+        kb.learnPattern(pattern, metadata={'tags': ['c']})
+
+        assert len(attempts) == 2
+        assert json.loads(client.get('kb:metadata:PTRN|w')) == {'tags': ['a', 'b', 'c']}
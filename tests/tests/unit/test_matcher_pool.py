@@ -0,0 +1,184 @@
+"""
+Matcher pool tests for KATO.
+
+These tests validate:
+1. Shared-memory segment encoding round-trips pattern sequences exactly
+2. PatternArena assigns stable indices across appends and compaction
+3. PatternArena stays within its byte budget and unlinks replaced segments
+   once the last request referencing them is released
+4. MatcherPool results are identical to in-process batch matching
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from kato.searches import matcher_pool
+from kato.searches.matcher_pool import MatcherPool, PatternArena, SegmentView, encode_segment
+from kato.searches.pattern_search import InformationExtractor, _match_batch
+
+
+def _patterns(count, seed=7):
+    rng = random.Random(seed)
+    return {
+        f"PTRN|{i:04d}": [f"tok{rng.randint(0, 40)}" for _ in range(rng.randint(2, 10))]
+        for i in range(count)
+    }
+
+
+class TestSegmentEncoding:
+    """Test the flat shared-memory segment layout."""
+
+    def test_round_trip(self):
+        """Every sequence decodes back to the original tokens."""
+        sequences = [['a', 'b', 'a'], ['ünïcode', 'VCTR|abc'], [], ['b']]
+        view = SegmentView(encode_segment(sequences))
+        assert view.count == 4
+        assert [view.sequence(i) for i in range(4)] == sequences
+
+    def test_empty_segment(self):
+        """An empty batch encodes to a valid segment."""
+        assert SegmentView(encode_segment([])).count == 0
+
+
+class TestPatternArena:
+    """Test arena index assignment and lifecycle."""
+
+    def test_indices_stable_across_appends(self):
+        """Known patterns keep their index; unseen ones are appended."""
+        patterns = _patterns(20)
+        names = list(patterns)
+        arena = PatternArena('kb_test')
+        try:
+            first, spec, _ = arena.acquire(names[:10], patterns)
+            arena.release(spec)
+            second, spec, index_names = arena.acquire(names[5:20], patterns)
+            arena.release(spec)
+            assert first == list(range(10))
+            assert second == list(range(5, 20))
+            assert [index_names[i] for i in second] == names[5:20]
+            assert len(spec[1]) == 2
+        finally:
+            arena.close()
+
+    def test_compaction_preserves_indices(self, monkeypatch):
+        """Compacting into one segment keeps every index and sequence."""
+        monkeypatch.setattr(matcher_pool, 'MAX_ARENA_SEGMENTS', 2)
+        patterns = _patterns(30)
+        names = list(patterns)
+        arena = PatternArena('kb_test')
+        try:
+            for i in range(3):
+                _, spec, _ = arena.acquire(names[i * 10:(i + 1) * 10], patterns)
+                arena.release(spec)
+            assert arena.segment_count == 1
+            indices, spec, index_names = arena.acquire(names, patterns)
+            arena.release(spec)
+            assert indices == list(range(30))
+            shm_name, base, count = spec[1][0]
+            view = SegmentView(arena._segments[0].buf)
+            assert [view.sequence(i) for i in range(count)] == [patterns[n] for n in index_names]
+            view.release()
+        finally:
+            arena.close()
+
+    def test_budget_rebuilds_from_request(self):
+        """An arena over budget keeps only the current request's patterns."""
+        patterns = _patterns(40)
+        names = list(patterns)
+        arena = PatternArena('kb_test', max_bytes=1)
+        try:
+            _, spec, _ = arena.acquire(names[:20], patterns)
+            arena.release(spec)
+            assert len(arena) == 20
+
+            indices, spec, index_names = arena.acquire(names[20:30], patterns)
+            arena.release(spec)
+            assert len(arena) == 10 and arena.segment_count == 1
+            assert [index_names[i] for i in indices] == names[20:30]
+            view = SegmentView(arena._segments[0].buf)
+            assert [view.sequence(i) for i in indices] == [patterns[n] for n in names[20:30]]
+            view.release()
+            assert arena._retired == {}
+        finally:
+            arena.close()
+
+    def test_budget_rebuild_keeps_stored_sequences(self):
+        """Patterns already in the arena survive a rebuild without being passed again."""
+        patterns = _patterns(30)
+        names = list(patterns)
+        arena = PatternArena('kb_test', max_bytes=1)
+        try:
+            _, spec, _ = arena.acquire(names[:20], patterns)
+            arena.release(spec)
+            unseen = {n: patterns[n] for n in names[20:]}
+            indices, spec, index_names = arena.acquire(names[:5] + names[20:], unseen)
+            arena.release(spec)
+            assert len(arena) == 15
+            view = SegmentView(arena._segments[0].buf)
+            assert [view.sequence(i) for i in indices] == [patterns[index_names[i]] for i in indices]
+            view.release()
+        finally:
+            arena.close()
+
+    def test_replaced_segment_unlinked_by_last_reference(self, monkeypatch):
+        """A replaced segment waits for its own users only, not for every request."""
+        monkeypatch.setattr(matcher_pool, 'MAX_ARENA_SEGMENTS', 1)
+        patterns = _patterns(20)
+        names = list(patterns)
+        arena = PatternArena('kb_test')
+        try:
+            _, old_spec, _ = arena.acquire(names[:10], patterns)
+            old_segment = old_spec[1][0][0]
+            # Appending compacts into a new segment while old_spec is in flight
+            _, new_spec, _ = arena.acquire(names, patterns)
+            assert old_segment not in {shm for shm, _, _ in new_spec[1]}
+            assert list(arena._retired) == [old_segment]
+
+            arena.release(old_spec)
+            assert arena._retired == {}
+            with pytest.raises(FileNotFoundError):
+                matcher_pool._attach(old_segment)
+            arena.release(new_spec)
+        finally:
+            arena.close()
+
+    def test_close_defers_segments_in_use(self):
+        """Closing an arena keeps acquired segments until they are released."""
+        patterns = _patterns(10)
+        arena = PatternArena('kb_test')
+        _, spec, _ = arena.acquire(list(patterns), patterns)
+        arena.close()
+        assert len(arena._retired) == 1
+        arena.release(spec)
+        assert arena._retired == {}
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = MatcherPool(workers=1)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+class TestMatcherPool:
+    """Test pool results against in-process matching."""
+
+    @pytest.mark.parametrize('use_token_matching', [True, False])
+    def test_matches_in_process_results(self, pool, use_token_matching):
+        """Pool output equals _match_batch over the same candidates."""
+        patterns = _patterns(400)
+        names = list(patterns)
+        state = ['tok1', 'tok2', 'tok3', 'tok5', 'tok8']
+
+        results = asyncio.run(pool.match('kb_test', names, patterns, state, 0.2,
+                                         use_token_matching, batch_size=50))
+
+        extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=use_token_matching)
+        expected = _match_batch(extractor, state, [(n, patterns[n]) for n in names], 0.2,
+                                use_token_matching, 0.0)
+
+        assert results
+        assert sorted(results, key=lambda r: r[0]) == sorted(expected, key=lambda r: r[0])
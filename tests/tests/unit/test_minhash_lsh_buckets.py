@@ -0,0 +1,176 @@
+"""
+LSH bucket tests for KATO.
+
+These tests validate:
+1. ClickHouseWriter emits one lsh_buckets row per band alongside each pattern
+2. STM band hashes computed by MinHashFilter match the stored pattern bands
+3. MinHashFilter resolves (length, name) candidates through lsh_buckets when
+   the kb's buckets are populated
+4. Fallback to the patterns_data.lsh_bands scan without kb_id or usable buckets
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from kato.filters import minhash_filter
+from kato.filters.minhash_filter import MinHashFilter
+from kato.representations.pattern import Pattern
+from kato.storage.clickhouse_writer import LSH_BANDS, LSH_BUCKET_COLUMNS, ClickHouseWriter
+from fixtures.fake_backends import FakeClickHouse
+
+
+def _buckets(rows, unsized=0):
+    """Client answering the lsh_buckets readiness check with fixed counts."""
+    return FakeClickHouse(rows=[(rows, unsized)])
+
+
+def _config():
+    return SimpleNamespace(minhash_threshold=0.7, minhash_bands=20,
+                           minhash_rows=5, minhash_num_hashes=100)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_bucket_status():
+    minhash_filter.reset_lsh_bucket_status()
+    yield
+    minhash_filter.reset_lsh_bucket_status()
+
+
+class TestWriterBuckets:
+    """Test lsh_buckets rows written by ClickHouseWriter."""
+
+    def test_flush_writes_one_bucket_per_band(self):
+        """Each pattern produces 20 bucket rows referencing its name."""
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client, token_index=False)
+        pattern = Pattern([['a', 'b'], ['c']])
+        writer.write_pattern(pattern)
+
+        tables = [t for t, _, _ in client.inserts]
+        assert tables == ['kato.patterns_data', 'kato.lsh_buckets']
+
+        _, bucket_rows, columns = client.inserts[1]
+        assert columns == LSH_BUCKET_COLUMNS
+        assert len(bucket_rows) == 20
+        assert [r[1] for r in bucket_rows] == list(range(20))
+        assert all(r[0] == 'kb_test' and r[3] == pattern.name for r in bucket_rows)
+        assert all(r[4] == pattern.length for r in bucket_rows)
+
+    def test_bucket_schema_is_updated_before_insert(self, monkeypatch):
+        """Older lsh_buckets tables gain pattern_length before the first insert."""
+        from kato.storage import clickhouse_writer
+        monkeypatch.setattr(clickhouse_writer, '_bucket_schema_checked', False)
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client)
+        writer.write_pattern(Pattern([['a'], ['b']]))
+        writer.write_pattern(Pattern([['c'], ['d']]))
+        assert client.commands == list(clickhouse_writer.LSH_BUCKETS_SCHEMA)
+
+    def test_bucket_hashes_match_stored_bands(self):
+        """Bucket band_hash values equal the patterns_data lsh_bands column."""
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client)
+        writer.write_pattern(Pattern([['a', 'b'], ['c']]))
+
+        _, pattern_rows, columns = client.inserts[0]
+        lsh_bands = pattern_rows[0][columns.index('lsh_bands')]
+        _, bucket_rows, _ = client.inserts[1]
+        assert [r[2] for r in bucket_rows] == lsh_bands
+
+    def test_overflow_trim_keeps_buckets_aligned(self):
+        """Dropping buffered patterns after failed flushes drops their bucket rows."""
+        client = FakeClickHouse()
+        client.insert = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError('down'))
+        writer = ClickHouseWriter('kb_test', client)
+        for i in range(writer.max_buffer_size + 3):
+            with pytest.raises(RuntimeError):
+                writer.write_pattern(Pattern([[f"t{i}"], ['x']]))
+
+        names = [row[1] for row in writer._write_buffer]
+        assert len(writer._bucket_buffer) == len(names) * LSH_BANDS
+        assert [r[3] for r in writer._bucket_buffer[::LSH_BANDS]] == names
+
+    def test_delete_all_patterns_drops_bucket_partition(self):
+        """Deleting a kb drops both the pattern and bucket partitions."""
+        client = FakeClickHouse()
+        ClickHouseWriter('kb_test', client).delete_all_patterns()
+        assert any('kato.patterns_data DROP PARTITION' in c for c in client.commands)
+        assert any('kato.lsh_buckets DROP PARTITION' in c for c in client.commands)
+
+
+class TestMinHashFilterQuery:
+    """Test the MinHash database stage query."""
+
+    def test_stm_bands_collide_with_identical_pattern(self):
+        """An STM with the same tokens as a pattern hits all of its bands."""
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client)
+        writer.write_pattern(Pattern([['a', 'b'], ['c']]))
+        _, bucket_rows, _ = client.inserts[1]
+
+        minhash = MinHashFilter(_config(), ['a', 'b', 'c'], kb_id='kb_test')
+        assert [abs(b) for b in minhash.stm_lsh_bands] == [r[2] for r in bucket_rows]
+
+    def test_query_uses_lsh_buckets_with_kb_id(self):
+        """With populated buckets the candidates come from an lsh_buckets lookup."""
+        query = MinHashFilter(_config(), ['a', 'b'], kb_id='kb_test',
+                              clickhouse_client=_buckets(20)).get_db_query()
+        assert 'SELECT pattern_length, pattern_name' in query
+        assert "kb_id = 'kb_test' AND band_hash IN (" in query
+        assert 'hasAny' not in query
+        # The outer WHERE must come first so the executor's kb_id injection
+        # lands on patterns_data, not on the subquery, and must match the
+        # patterns_data sort key (kb_id, length, name)
+        assert query.index('WHERE (length, name) IN') < query.index('FROM lsh_buckets')
+
+    def test_query_falls_back_to_scan_without_kb_id(self):
+        """Without kb_id the legacy lsh_bands scan is used."""
+        query = MinHashFilter(_config(), ['a', 'b']).get_db_query()
+        assert 'hasAny(lsh_bands' in query
+        assert 'lsh_buckets' not in query
+
+    def test_query_falls_back_to_scan_without_buckets(self):
+        """A kb that was never backfilled scans lsh_bands instead of finding nothing."""
+        query = MinHashFilter(_config(), ['a', 'b'], kb_id='kb_test',
+                              clickhouse_client=_buckets(0)).get_db_query()
+        assert 'hasAny(lsh_bands' in query
+        assert 'lsh_buckets' not in query
+
+    def test_query_falls_back_to_scan_for_unsized_buckets(self):
+        """Bucket rows written before pattern_length existed cannot be joined by length."""
+        query = MinHashFilter(_config(), ['a', 'b'], kb_id='kb_test',
+                              clickhouse_client=_buckets(20, unsized=3)).get_db_query()
+        assert 'hasAny(lsh_bands' in query
+
+    def test_query_falls_back_to_scan_on_error(self):
+        """A failed readiness check falls back to the scan."""
+        client = FakeClickHouse(fail_on='lsh_buckets')
+        assert not MinHashFilter(_config(), ['a'], kb_id='kb_test',
+                                 clickhouse_client=client).use_buckets
+
+    def test_readiness_is_cached_per_kb(self, monkeypatch):
+        """Ready kbs are checked once; unready kbs are rechecked after the interval."""
+        ready = _buckets(20)
+        for _ in range(3):
+            MinHashFilter(_config(), ['a'], kb_id='kb_ready', clickhouse_client=ready)
+        assert len(ready.queries) == 1
+
+        empty = _buckets(0)
+        MinHashFilter(_config(), ['a'], kb_id='kb_empty', clickhouse_client=empty)
+        MinHashFilter(_config(), ['a'], kb_id='kb_empty', clickhouse_client=empty)
+        assert len(empty.queries) == 1
+
+        monkeypatch.setattr(minhash_filter, 'LSH_BUCKETS_RECHECK_SECONDS', 0.0)
+        empty.rows = [(20, 0)]
+        assert MinHashFilter(_config(), ['a'], kb_id='kb_empty',
+                             clickhouse_client=empty).use_buckets
+        assert len(empty.queries) == 2
+
+    def test_flag_off_forces_scan(self, monkeypatch):
+        """KATO_MINHASH_USE_LSH_BUCKETS=false scans without checking the buckets."""
+        monkeypatch.setattr(minhash_filter, 'USE_LSH_BUCKETS', False)
+        client = _buckets(20)
+        query = MinHashFilter(_config(), ['a'], kb_id='kb_test', clickhouse_client=client).get_db_query()
+        assert 'hasAny(lsh_bands' in query
+        assert client.queries == []
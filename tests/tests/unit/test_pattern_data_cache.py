@@ -0,0 +1,149 @@
+"""
+Shared pattern data cache tests for KATO.
+
+These tests validate:
+1. The cache stays within its byte budget, evicting least recently (lru)
+   or least frequently (lfu) used entries
+2. Hit, miss, insert and eviction counters and per-kb entry counts
+3. Executors of the same kb share entries; other kbs are isolated
+4. An executor's working set holds only the current pipeline run
+5. Entries keep columns added by later stages and are re-sized
+"""
+
+import pytest
+
+import kato.filters  # noqa: F401  (registers filters)
+from kato.filters.pattern_data_cache import PatternDataCache, entry_size
+from fixtures.fake_backends import FakeClickHouse, make_executor
+
+
+def _entry(i, events=2):
+    pattern_data = [[f"sym{i}_{e}", f"tok{e}"] for e in range(events)]
+    return {'pattern_data': pattern_data,
+            'pattern_data_flat': [s for event in pattern_data for s in event],
+            'length': 2 * events}
+
+
+def _client(names):
+    """Answers every query with the same rows of `names`."""
+    return FakeClickHouse(rows=_rows(names), columns=('name', 'pattern_data', 'length'))
+
+
+def _rows(names):
+    return [(name, [[name, 'x'], ['y']], 3) for name in names]
+
+
+class TestPatternDataCache:
+    """Budget, eviction policies and metrics."""
+
+    def test_lru_evicts_least_recently_used(self):
+        size = entry_size(_entry(0))
+        cache = PatternDataCache(max_bytes=3 * size, policy='lru')
+        for i in range(3):
+            cache.put('kb', f"p{i}", _entry(i))
+        assert cache.get('kb', 'p0') is not None  # p1 is now least recent
+        cache.put('kb', 'p3', _entry(3))
+
+        assert ('kb', 'p1') not in cache
+        assert {('kb', 'p0'), ('kb', 'p2'), ('kb', 'p3')} <= set(cache._entries)
+        assert cache.bytes <= cache.max_bytes
+        assert cache.evictions == 1
+
+    def test_lfu_keeps_frequently_used(self):
+        size = entry_size(_entry(0))
+        cache = PatternDataCache(max_bytes=3 * size, policy='lfu')
+        for i in range(3):
+            cache.put('kb', f"p{i}", _entry(i))
+        for _ in range(3):
+            cache.get('kb', 'p0')
+            cache.get('kb', 'p2')
+        cache.get('kb', 'p1')
+        cache.get('kb', 'p1')
+        # p1 (three uses) makes room for p3; p3 (one use) then makes room for p4
+        cache.put('kb', 'p3', _entry(3))
+        cache.put('kb', 'p4', _entry(4))
+
+        assert ('kb', 'p1') not in cache and ('kb', 'p3') not in cache
+        assert {('kb', 'p0'), ('kb', 'p2'), ('kb', 'p4')} == set(cache._entries)
+        assert cache.evictions == 2
+
+    def test_metrics_and_kb_operations(self):
+        cache = PatternDataCache(max_bytes=1 << 20)
+        cache.put('kb1', 'p1', _entry(1))
+        cache.put('kb1', 'p2', _entry(2))
+        cache.put('kb2', 'p1', _entry(1))
+        assert cache.get('kb1', 'p1') is not None
+        assert cache.get('kb2', 'p9') is None
+
+        stats = cache.get_stats()
+        assert (stats['hits'], stats['misses'], stats['inserts']) == (1, 1, 3)
+        assert stats['hit_rate'] == 0.5
+        assert stats['entries_by_kb'] == {'kb1': 2, 'kb2': 1}
+        assert stats['bytes'] == 2 * entry_size(_entry(1)) + entry_size(_entry(2))
+
+        assert cache.discard('kb1', 'p2')
+        assert cache.drop_kb('kb2') == 1
+        assert cache.get_stats()['entries_by_kb'] == {'kb1': 1}
+        assert cache.bytes == entry_size(_entry(1))
+
+    def test_oversized_entry_and_disabled_cache(self):
+        cache = PatternDataCache(max_bytes=10)
+        entry = _entry(0)
+        assert cache.put('kb', 'p0', entry) is entry
+        assert len(cache) == 0 and cache.bytes == 0
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            PatternDataCache(policy='fifo')
+
+
+class TestExecutorSharing:
+    """FilterPipelineExecutor reads and writes through the shared cache."""
+
+    def test_executors_share_entries_per_kb(self):
+        cache = PatternDataCache(max_bytes=1 << 20)
+        client = _client(['p1', 'p2'])
+        first = make_executor(client, ['a'], None, kb_id='kb1', pattern_cache=cache)
+        second = make_executor(client, ['a'], None, kb_id='kb1', pattern_cache=cache)
+        other = make_executor(client, ['a'], None, kb_id='kb2', pattern_cache=cache)
+
+        assert first.execute_pipeline() == {'p1', 'p2'}
+        assert second.execute_pipeline() == {'p1', 'p2'}
+        other.execute_pipeline()
+
+        assert second.patterns_cache['p1'] is first.patterns_cache['p1']
+        assert other.patterns_cache['p1'] is not first.patterns_cache['p1']
+        assert first.patterns_cache['p1']['pattern_data_flat'] == ['p1', 'x', 'y']
+        metrics = second.get_metrics()
+        assert (metrics['pattern_cache_hits'], metrics['pattern_cache_misses']) == (2, 0)
+        assert cache.get_stats()['entries_by_kb'] == {'kb1': 2, 'kb2': 2}
+
+    def test_working_set_is_per_run(self):
+        cache = PatternDataCache(max_bytes=1 << 20)
+        client = _client(['p1', 'p2', 'p3'])
+        executor = make_executor(client, ['a'], kb_id='kb', pattern_cache=cache)
+        executor.execute_pipeline()
+        assert set(executor.patterns_cache) == {'p1', 'p2', 'p3'}
+
+        client.rows = _rows(['p2'])
+        assert executor.execute_pipeline() == {'p2'}
+        assert set(executor.patterns_cache) == {'p2'}
+        # Patterns of earlier runs remain reachable through the shared cache
+        assert executor.get_pattern('p1')['length'] == 3
+        assert executor.get_pattern('missing') == {}
+
+    def test_later_columns_are_added_and_resized(self):
+        cache = PatternDataCache(max_bytes=1 << 20)
+        client = _client(['p1'])
+        make_executor(client, ['a'], kb_id='kb', pattern_cache=cache).execute_pipeline()
+        before = cache.bytes
+
+        client.columns = ['name', 'pattern_data', 'length', 'minhash_sig']
+        client.rows = [row + (list(range(50)),) for row in _rows(['p1'])]
+        executor = make_executor(client, ['a'], kb_id='kb', pattern_cache=cache)
+        executor.execute_pipeline()
+
+        entry = executor.patterns_cache['p1']
+        assert entry['minhash_sig'] == list(range(50))
+        assert cache.get('kb', 'p1') is entry
+        assert cache.bytes == entry_size(entry) > before
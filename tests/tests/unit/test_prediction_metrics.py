@@ -0,0 +1,163 @@
+"""
+Columnar prediction metrics tests for KATO.
+
+These tests validate:
+1. prediction_metrics() returns exactly the values of the per-candidate loop
+   it replaced in predictPattern (itfdf_similarity, confluence, entropies,
+   TF-IDF), with and without pre-computed pattern metrics
+2. Edge cases: empty present, zero totals, single-symbol knowledge bases
+3. Row sums round like builtin sum() on the running interpreter
+"""
+
+import random
+from collections import Counter
+from math import log, log2
+
+import numpy as np
+
+from kato.informatics.metrics import confluence
+from kato.informatics.prediction_metrics import _builtin_sums, prediction_metrics
+
+
+def _reference(present_lists, frequencies, state, precomputed, symbol_probability_cache,
+               total_pattern_frequencies, total_ensemble_pattern_frequencies,
+               total_unique_patterns, total_symbols):
+    """The per-candidate loop formerly in PatternProcessor.predictPattern."""
+    N = len(present_lists)
+    all_present_symbols = set()
+    for _present in present_lists:
+        all_present_symbols.update(_present)
+    global_symbols = sorted(all_present_symbols | set(state))
+    symbol_to_idx = {s: i for i, s in enumerate(global_symbols)}
+    D = len(global_symbols)
+    state_vec = np.zeros(D)
+    for symbol, count in Counter(state).items():
+        state_vec[symbol_to_idx[symbol]] = symbol_probability_cache.get(symbol, 0) * count
+    state_norm = np.linalg.norm(state_vec)
+    pattern_matrix = np.zeros((N, D))
+    for i, _present in enumerate(present_lists):
+        for symbol, count in Counter(_present).items():
+            pattern_matrix[i, symbol_to_idx[symbol]] = symbol_probability_cache.get(symbol, 0) * count
+    if state_norm > 0:
+        dots = pattern_matrix @ state_vec
+        denom = np.linalg.norm(pattern_matrix, axis=1) * state_norm
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = 1.0 - np.where(denom > 0, dots / denom, 0.0)
+    else:
+        distances = np.ones(N)
+
+    rows = []
+    for i, _present in enumerate(present_lists):
+        frequency = frequencies[i]
+        distance = float(distances[i])
+        _p_e_h = float(frequency / total_pattern_frequencies) if total_pattern_frequencies > 0 else 0.0
+        if total_ensemble_pattern_frequencies > 0:
+            itfdf_similarity = 1 - (distance * frequency / total_ensemble_pattern_frequencies)
+        else:
+            itfdf_similarity = 0.0
+        confluence_val = _p_e_h * (1 - confluence(_present, symbol_probability_cache)) if _present else 0.0
+
+        precomp = precomputed[i]
+        if precomp:
+            entropy_val = precomp['entropy']
+            normalized_entropy_val = precomp['normalized_entropy']
+            global_normalized_entropy_val = precomp['global_normalized_entropy']
+        else:
+            pattern_symbols = list(_present)
+            pattern_length = len(pattern_symbols)
+            entropy_val = normalized_entropy_val = global_normalized_entropy_val = 0.0
+            if pattern_symbols:
+                symbol_counts = Counter(pattern_symbols)
+                for count in symbol_counts.values():
+                    p = count / pattern_length
+                    entropy_val -= p * log2(p)
+                if total_symbols > 1:
+                    for count in symbol_counts.values():
+                        p = count / pattern_length
+                        normalized_entropy_val -= p * log(p, total_symbols)
+                    for symbol in set(pattern_symbols):
+                        prob = symbol_probability_cache.get(symbol, 0)
+                        if prob > 0:
+                            global_normalized_entropy_val -= prob * log(prob, total_symbols)
+
+        if precomp and total_unique_patterns > 0:
+            items = list(precomp['tf_vector'].items())
+        elif not precomp and _present and total_unique_patterns > 0:
+            items = [(s, _present.count(s) / len(_present)) for s in set(_present)]
+        else:
+            items = []
+        tfidf_scores = []
+        for symbol, tf in items:
+            if symbol in symbol_probability_cache:
+                patterns_with_symbol = int(symbol_probability_cache[symbol] * total_unique_patterns)
+                if patterns_with_symbol == 0:
+                    patterns_with_symbol = 1
+            else:
+                patterns_with_symbol = 1
+            tfidf_scores.append(tf * (log2(total_unique_patterns / patterns_with_symbol) + 1))
+        tfidf_score = sum(tfidf_scores) / len(tfidf_scores) if tfidf_scores else 0.0
+
+        rows.append((entropy_val, normalized_entropy_val, global_normalized_entropy_val,
+                     itfdf_similarity, confluence_val, tfidf_score))
+    return rows
+
+
+def _case(rng, n, total_unique_patterns=500, total_symbols=40):
+    vocabulary = [f"s{i}" for i in range(30)]
+    state = rng.sample(vocabulary, 6)
+    cache = {s: rng.choice([0, rng.random(), 1 / rng.randint(1, 50)]) for s in vocabulary[:25]}
+    present_lists, frequencies, precomputed = [], [], []
+    for _ in range(n):
+        present_lists.append([rng.choice(vocabulary) for _ in range(rng.choice([0, 1, 3, 7, 15, 40]))])
+        frequencies.append(rng.randint(1, 30))
+        if rng.random() < 0.5:
+            tf_vector = {s: rng.random() for s in rng.sample(vocabulary, rng.randint(0, 12))}
+            precomputed.append({'entropy': rng.random(), 'normalized_entropy': rng.random(),
+                                'global_normalized_entropy': rng.random(), 'tf_vector': tf_vector})
+        else:
+            precomputed.append(None)
+    return (present_lists, frequencies, state, precomputed, cache,
+            sum(frequencies) * 3, sum(frequencies), total_unique_patterns, total_symbols)
+
+
+def _columns(result):
+    return list(zip(result['entropy'], result['normalized_entropy'], result['global_normalized_entropy'],
+                    result['itfdf_similarity'], result['confluence'], result['tfidf_score']))
+
+
+class TestPredictionMetrics:
+    """Compare the columnar pass with the scalar loop, value for value."""
+
+    def test_identical_to_scalar_loop(self):
+        rng = random.Random(11)
+        for n in (1, 2, 17, 300):
+            args = _case(rng, n)
+            assert _columns(prediction_metrics(*args)) == _reference(*args)
+
+    def test_identical_for_degenerate_totals(self):
+        rng = random.Random(5)
+        for unique_patterns, total_symbols in ((0, 40), (500, 1), (500, 0), (1, 2)):
+            args = list(_case(rng, 40, unique_patterns, total_symbols))
+            args[5] = args[6] = 0  # no pattern frequencies
+            assert _columns(prediction_metrics(*args)) == _reference(*args)
+
+    def test_zero_state_vector(self):
+        """All state symbols with probability 0: every distance is 1.0."""
+        rng = random.Random(2)
+        args = list(_case(rng, 20))
+        args[4] = {s: p for s, p in args[4].items() if s not in args[2]}
+        result = prediction_metrics(*args)
+        assert _columns(result) == _reference(*args)
+        assert all(v == 1 - 1.0 * f / args[6] for v, f in zip(result['itfdf_similarity'], args[1]))
+
+
+class TestBuiltinSums:
+    """Row sums follow builtin sum() rounding."""
+
+    def test_matches_builtin_sum(self):
+        rng = random.Random(3)
+        rows = [[rng.choice([1e16, 1.0, -1e16, rng.random(), rng.random() * 1e-8]) for _ in range(rng.randint(1, 30))]
+                for _ in range(200)]
+        width = max(len(r) for r in rows)
+        matrix = np.array([r + [0.0] * (width - len(r)) for r in rows])
+        assert _builtin_sums(matrix).tolist() == [sum(r) for r in rows]
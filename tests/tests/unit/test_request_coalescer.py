@@ -0,0 +1,200 @@
+"""
+Request coalescing tests for the KATO filter pipeline.
+
+These tests validate:
+1. Requests for the same kb within the window run as one batch, each caller
+   receiving its own result; other kbs batch separately
+2. A full batch dispatches before the window ends, and a lone request waits
+   at most one window
+3. A batch's exception reaches every caller, and batch sizes and queueing
+   delays are reported
+4. Concurrent executors share one leading scan (one flag column per distinct
+   predicate) and one pattern_data read, with the same candidates as
+   uncoalesced runs
+5. Concurrent predictions on one PatternSearcher share the scan but each
+   match against their own candidates, leaving the searcher untouched
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import kato.filters  # noqa: F401  (registers filters)
+import kato.filters.executor as executor_module
+import kato.searches.pattern_search as pattern_search_module
+from kato.filters.coalescer import RequestCoalescer
+from kato.filters.pattern_data_cache import PatternDataCache
+from kato.searches.pattern_search import InformationExtractor, PatternSearcher
+from fixtures.fake_backends import FakeClickHouse, filter_config, make_executor
+
+PATTERNS = {f"p{i}": [[f"t{j}" for j in range(i)], ['z']] for i in range(1, 10)}
+# Length bounds of an STM of n tokens: [n / 2, n]
+SETTINGS = dict(length_min_ratio=0.5, length_max_ratio=1.0)
+
+
+def _run_concurrently(*calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        results[i] = call()
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestRequestCoalescer:
+    """Window batching."""
+
+    def test_requests_in_window_share_a_batch(self):
+        coalescer = RequestCoalescer(window_ms=100, max_batch=16)
+        batches = []
+
+        def run_batch(payloads):
+            batches.append(list(payloads))
+            return [p * 10 for p in payloads]
+
+        results = _run_concurrently(
+            *[lambda i=i: coalescer.submit('scan', 'kb1', i, run_batch) for i in range(4)],
+            lambda: coalescer.submit('scan', 'kb2', 7, run_batch),
+        )
+        assert results == [0, 10, 20, 30, 70]
+        assert sorted(map(sorted, batches)) == [[0, 1, 2, 3], [7]]
+
+        stats = coalescer.get_stats()['operations']['scan']
+        assert (stats['batches'], stats['requests'], stats['max_batch_size']) == (2, 5, 4)
+        assert stats['mean_batch_size'] == 2.5
+        assert 0 < stats['max_queue_ms'] < 1000
+
+    def test_full_batch_dispatches_early(self):
+        coalescer = RequestCoalescer(window_ms=10_000, max_batch=3)
+        start = time.perf_counter()
+        results = _run_concurrently(
+            *[lambda i=i: coalescer.submit('scan', 'kb', i, lambda p: list(p)) for i in range(3)]
+        )
+        assert sorted(results) == [0, 1, 2]
+        assert time.perf_counter() - start < 5
+
+    def test_lone_request_waits_one_window(self):
+        coalescer = RequestCoalescer(window_ms=20, max_batch=16)
+        start = time.perf_counter()
+        assert coalescer.submit('scan', 'kb', 'x', lambda p: ['ok']) == 'ok'
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert 15 <= elapsed_ms < 500
+
+    def test_error_reaches_every_caller(self):
+        coalescer = RequestCoalescer(window_ms=100, max_batch=2)
+
+        def run_batch(payloads):
+            raise RuntimeError('clickhouse down')
+
+        def call():
+            with pytest.raises(RuntimeError, match='clickhouse down'):
+                coalescer.submit('scan', 'kb', 1, run_batch)
+            return True
+
+        assert _run_concurrently(call, call) == [True, True]
+        assert coalescer.get_stats()['operations']['scan']['errors'] == 1
+
+    def test_disabled(self):
+        assert not RequestCoalescer(window_ms=0).enabled
+
+
+def _pipeline(executor):
+    candidates = executor.execute_pipeline()
+    executor.materialize(candidates)
+    return candidates, {n: executor.get_pattern(n).get('pattern_data') for n in candidates}
+
+
+class TestCoalescedPipelines:
+    """FilterPipelineExecutor through the coalescer."""
+
+    @pytest.mark.parametrize('external', [True, False])
+    def test_concurrent_pipelines_share_queries(self, monkeypatch, external):
+        monkeypatch.setattr(executor_module, 'USE_EXTERNAL_CANDIDATES', external)
+        states = [[f"s{i}" for i in range(n)] for n in (4, 8, 8)]
+
+        expected = [_pipeline(make_executor(FakeClickHouse(PATTERNS), state, settings=SETTINGS,
+                                            pattern_cache=PatternDataCache(0)))
+                    for state in states]
+
+        client = FakeClickHouse(PATTERNS)
+        coalescer = RequestCoalescer(window_ms=200, max_batch=3)
+        executors = [make_executor(client, state, settings=SETTINGS, pattern_cache=PatternDataCache(0),
+                                   coalescer=coalescer) for state in states]
+        actual = _run_concurrently(*[lambda e=e: _pipeline(e) for e in executors])
+
+        assert actual == expected
+        assert expected[0][0] != expected[1][0]
+        # One scan with a flag per distinct predicate, one pattern_data read
+        assert len(client.queries) == 2
+        assert client.queries[0].count('AS _kato_match_') == 2
+        stats = coalescer.get_stats()['operations']
+        assert stats['scan']['max_batch_size'] == stats['materialize']['max_batch_size'] == 3
+        assert executors[0].stage_metrics[0]['handoff'] == 'coalesced'
+
+    def test_single_predicate_runs_plain_query(self):
+        client = FakeClickHouse(PATTERNS)
+        coalescer = RequestCoalescer(window_ms=200, max_batch=2)
+        state = ['a', 'b', 'c', 'd']
+        results = _run_concurrently(
+            *[lambda: make_executor(client, state, settings=SETTINGS, coalescer=coalescer).execute_pipeline()
+              for _ in range(2)]
+        )
+        assert results[0] == results[1] == {'p1', 'p2', 'p3'}
+        assert len(client.queries) == 1
+        assert '_kato_match_' not in client.queries[0]
+
+
+def _searcher(client):
+    searcher = PatternSearcher.__new__(PatternSearcher)
+    searcher.kb_id = 'kb_test'
+    searcher.session_config = filter_config(**SETTINGS)
+    searcher.clickhouse_client = client
+    searcher.redis_client = None
+    searcher.bloom_filter = None
+    searcher.recall_threshold = 0.1
+    searcher.use_hybrid_architecture = True
+    searcher.use_indexing = False
+    searcher.index_manager = None
+    searcher.use_fast_matching = True
+    searcher.use_token_matching = True
+    searcher.affinity_weights = None
+    searcher.extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                              use_int_matching=False)
+    searcher.patterns_cache = {}
+    searcher.patterns_count = 0
+    searcher.filter_executor = None
+    return searcher
+
+
+class TestSearcherPipelines:
+    """Concurrent causalBeliefAsync calls on a shared PatternSearcher."""
+
+    def test_calls_match_their_own_candidates(self, monkeypatch):
+        coalescer = RequestCoalescer(window_ms=200, max_batch=2)
+        monkeypatch.setattr(executor_module, 'get_request_coalescer', lambda: coalescer)
+        monkeypatch.setattr(executor_module, 'get_pattern_data_cache', lambda: PatternDataCache(0))
+        monkeypatch.setattr(pattern_search_module, 'get_request_coalescer', lambda: coalescer)
+        monkeypatch.setattr(pattern_search_module, 'get_candidate_cache', lambda: None)
+        states = [['t0', 't1', 't2', 'z'], [f"t{i}" for i in range(7)] + ['z']]
+
+        def predict(searcher, state):
+            return {p['name'] for p in asyncio.run(searcher.causalBeliefAsync(state, max_workers=2))}
+
+        expected = [predict(_searcher(FakeClickHouse(PATTERNS)), state) for state in states]
+
+        client = FakeClickHouse(PATTERNS)
+        searcher = _searcher(client)
+        actual = _run_concurrently(*[lambda s=s: predict(searcher, s) for s in states])
+
+        assert actual == expected
+        assert expected[0] == {'p1', 'p2', 'p3'} and expected[1] == {f"p{i}" for i in range(3, 8)}
+        # One shared scan and pattern_data read; the searcher's own state is untouched
+        assert len(client.queries) == 2
+        assert searcher.patterns_cache == {} and searcher.filter_executor is None
@@ -0,0 +1,170 @@
+"""
+PatternSearcher pool tests for KATO.
+
+These tests validate:
+1. Searchers are keyed by the effective matching configuration
+2. A searcher is leased exclusively and reused after release
+3. The pool keeps at most max_size idle searchers, dropping the least
+   recently used configurations, and counts hits, misses and evictions
+4. clear() drops idle searchers and those leased before it
+5. get_predictions_async reuses one searcher across calls with equal
+   configurations, and builds separate ones for different configurations
+6. Observations (processEvents) lease searchers the same way, and
+   predictions and future potentials are returned, not kept on the processor
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import kato.workers.pattern_processor as pattern_processor_module
+from kato.config.session_config import SessionConfiguration
+from kato.searches.searcher_pool import SearcherPool, matching_config_key
+from kato.workers.pattern_processor import PatternProcessor
+
+
+class TestConfigKey:
+    """matching_config_key identifies the matching configuration."""
+
+    def test_equal_configs_share_a_key(self):
+        first = SessionConfiguration(filter_pipeline=['length'], jaccard_threshold=0.4, session_id='s1')
+        second = SessionConfiguration(filter_pipeline=['length'], jaccard_threshold=0.4, session_id='s2')
+        assert matching_config_key(10, 0.1, True, first) == matching_config_key(10, 0.1, True, second)
+
+    def test_matching_parameters_change_the_key(self):
+        config = SessionConfiguration(filter_pipeline=['length'])
+        key = matching_config_key(10, 0.1, True, config)
+        assert key != matching_config_key(10, 0.2, True, config)
+        assert key != matching_config_key(20, 0.1, True, config)
+        assert key != matching_config_key(10, 0.1, False, config)
+        assert key != matching_config_key(10, 0.1, True, SessionConfiguration(filter_pipeline=['minhash']))
+
+
+class TestSearcherPool:
+    """Leasing, bounds and metrics."""
+
+    def test_lease_and_reuse(self):
+        pool = SearcherPool(max_size=4)
+        built = []
+
+        def factory():
+            built.append(object())
+            return built[-1]
+
+        with pool.lease('a', factory) as first:
+            # Concurrent lease of the same configuration gets its own searcher
+            with pool.lease('a', factory) as second:
+                assert first is not second
+                assert pool.get_stats()['leased'] == 2
+        with pool.lease('a', factory) as third:
+            assert third in (first, second)
+
+        stats = pool.get_stats()
+        assert len(built) == 2
+        assert (stats['hits'], stats['misses'], stats['size'], stats['leased']) == (1, 2, 2, 0)
+        assert stats['reuse_rate'] == 1 / 3
+
+    def test_bounded_lru(self):
+        pool = SearcherPool(max_size=2)
+        for key in ('a', 'b', 'c'):
+            pool.release(key, pool.acquire(key, object))
+        stats = pool.get_stats()
+        assert (stats['size'], stats['configs'], stats['evictions']) == (2, 2, 1)
+        # 'a' was least recently used
+        pool.acquire('a', object)
+        assert pool.get_stats()['misses'] == 4
+
+    def test_clear_discards_leased_searchers(self):
+        pool = SearcherPool(max_size=4)
+        pool.release('a', pool.acquire('a', object))
+        with pool.lease('b', object):
+            assert pool.clear() == 1
+        assert pool.get_stats()['size'] == 0
+
+    def test_disabled(self):
+        pool = SearcherPool(max_size=0)
+        pool.release('a', pool.acquire('a', object))
+        assert pool.get_stats()['size'] == 0
+
+
+class FakeSearcher:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.session_config = kwargs.get('session_config')
+
+
+def _processor():
+    processor = PatternProcessor.__new__(PatternProcessor)
+    processor.kb_id = 'kb_test'
+    processor.recall_threshold = 0.1
+    processor.max_predictions = 100
+    processor.use_token_matching = True
+    processor.patterns_searcher = SimpleNamespace(use_hybrid_architecture=True, session_config=None,
+                                                  clickhouse_client=object(), redis_client=None)
+    processor.searcher_pool = SearcherPool(max_size=4)
+    processor.predict = True
+    processor.trigger_predictions = True
+    processor.stored = []
+    processor.predictions_kb = SimpleNamespace(insert_one=processor.stored.append)
+    processor.used = []
+
+    async def predict(state, stm_events=None, max_workers=None, batch_size=100, *,
+                      searcher=None, max_predictions=None, session_id=None):
+        processor.used.append(searcher)
+        return [{'name': 'p'}], [{'future': ['x'], 'potential': 1.0}]
+
+    processor.predict_with_potentials = predict
+    return processor
+
+
+class TestGetPredictions:
+    """PatternProcessor leases searchers from its pool."""
+
+    def test_equal_configs_reuse_a_searcher(self, monkeypatch):
+        monkeypatch.setattr(pattern_processor_module, 'PatternSearcher', FakeSearcher)
+        processor = _processor()
+        config_a = SessionConfiguration(filter_pipeline=['length'], recall_threshold=0.3, session_id='a')
+        config_b = SessionConfiguration(filter_pipeline=['length'], recall_threshold=0.3, session_id='b')
+        other = SessionConfiguration(filter_pipeline=['length'], recall_threshold=0.5, session_id='c')
+
+        async def run():
+            for config in (config_a, config_b, other, config_a):
+                assert await processor.get_predictions_async([['x']], config) == [{'name': 'p'}]
+
+        asyncio.run(run())
+        first, second, third, fourth = processor.used
+        assert first is second is fourth
+        assert third is not first
+        assert third.kwargs['recall_threshold'] == 0.5
+        # The searcher matches with the calling session's config object
+        assert fourth.session_config is config_a
+        stats = processor.searcher_pool.get_stats()
+        assert (stats['hits'], stats['misses'], stats['size']) == (2, 2, 2)
+
+    def test_potentials_are_returned(self, monkeypatch):
+        monkeypatch.setattr(pattern_processor_module, 'PatternSearcher', FakeSearcher)
+        processor = _processor()
+        config = SessionConfiguration(filter_pipeline=['length'], session_id='a')
+
+        predictions, future_potentials = asyncio.run(
+            processor.get_predictions_with_potentials_async([['x'], ['y']], config))
+        assert predictions == [{'name': 'p'}]
+        assert future_potentials == [{'future': ['x'], 'potential': 1.0}]
+        assert not hasattr(processor, 'future_potentials')
+
+    def test_observations_lease_searchers(self, monkeypatch):
+        monkeypatch.setattr(pattern_processor_module, 'PatternSearcher', FakeSearcher)
+        processor = _processor()
+        config = SessionConfiguration(filter_pipeline=['length'], recall_threshold=0.3, session_id='a')
+
+        async def run():
+            await processor.processEvents('u1', stm=[['x']], config=config, session_id='a')
+            await processor.processEvents('u2', stm=[['y']], config=config, session_id='a')
+            return await processor.get_predictions_async([['x']], config)
+
+        assert asyncio.run(run()) == [{'name': 'p'}]
+        first, second, third = processor.used
+        assert first is second is third
+        assert first is not processor.patterns_searcher
+        assert first.kwargs['recall_threshold'] == 0.3
+        assert [stored['unique_id'] for stored in processor.stored] == ['u1', 'u2']
+        assert not hasattr(processor, 'predictions')
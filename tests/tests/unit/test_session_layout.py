@@ -0,0 +1,224 @@
+"""
+Compact session storage tests for KATO.
+
+These tests validate:
+1. list_delta() finds append, rolling-window, clear and rewrite deltas
+2. Sessions round-trip through the hash + list layout unchanged
+3. Partial reads return only the requested parts, and saving such a session
+   leaves the parts it did not read untouched
+4. Saves send deltas: list keys are trimmed/appended, not rewritten
+5. A writer whose snapshot is stale falls back to a full rewrite
+6. Sessions stored by older builds (one JSON document) are read and
+   converted on their next write; loads refresh the TTL of every key
+
+Runs the Lua scripts on fakeredis (requires fakeredis[lua]).
+"""
+
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+from kato.sessions.redis_session_manager import RedisSessionManager
+from kato.sessions.session_layout import (
+    LOAD_SESSION_LUA,
+    REWRITE,
+    SAVE_SESSION_LUA,
+    list_delta,
+    session_keys,
+)
+
+
+def _manager(compact_layout=True, ttl=3600):
+    server = fakeredis.FakeServer()
+    manager = RedisSessionManager(default_ttl_seconds=ttl, compact_layout=compact_layout)
+    manager.redis_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    manager.data_client = fakeredis.aioredis.FakeRedis(server=server)
+    manager._load_script = manager.data_client.register_script(LOAD_SESSION_LUA)
+    manager._save_script = manager.data_client.register_script(SAVE_SESSION_LUA)
+    manager._connected = True
+    manager._cleanup_task = object()  # no background loop in tests
+    return manager
+
+
+def _observe(session, step):
+    """What the observe endpoint changes on a session."""
+    session.stm = session.stm + [[f"s{step}", 'x']]
+    session.emotives_accumulator = session.emotives_accumulator + [{'joy': step / 10}]
+    session.metadata_accumulator = session.metadata_accumulator + [{'step': [str(step)]}]
+    session.time += 1
+    session.percept_data = {'strings': [f"s{step}"], 'vectors': [], 'emotives': {}}
+    session.predictions = [{'name': f"PTRN|{i}", 'similarity': i / 100, 'present': [['a']]} for i in range(step)]
+
+
+def _parse_save_args(args):
+    """(changed fields, [(expected, trim, items)] per list) of SAVE_SESSION_LUA ARGV."""
+    n_fields = args[1]
+    fields = dict(zip(args[2:2 + 2 * n_fields:2], args[3:3 + 2 * n_fields:2]))
+    deltas, pos = [], 2 + 2 * n_fields
+    for _ in range(3):
+        expected, trim, n_push = args[pos:pos + 3]
+        deltas.append((expected, trim, args[pos + 3:pos + 3 + n_push]))
+        pos += 3 + n_push
+    return fields, deltas
+
+
+def _state(session):
+    return (session.stm, session.emotives_accumulator, session.metadata_accumulator, session.time,
+            session.percept_data, session.predictions, session.session_config.to_dict())
+
+
+class TestListDelta:
+    """Smallest LTRIM/RPUSH change between stored and current lists."""
+
+    def test_deltas(self):
+        a, b, c, d = b'a', b'b', b'c', b'd'
+        assert list_delta([a, b], [a, b, c]) == (2, 0, [c])
+        assert list_delta([a, b, c], [b, c, d]) == (3, 1, [d])
+        assert list_delta([a, b, c], []) == (3, 3, [])
+        assert list_delta([a, b], [c]) == (2, 2, [c])
+        assert list_delta([a, a], [a, a, a]) == (2, 0, [a])
+        assert list_delta(None, [a]) == (REWRITE, 0, [a])
+
+
+class TestCompactSessions:
+    """RedisSessionManager on the hash + list layout."""
+
+    def test_round_trip(self):
+        manager = _manager()
+
+        async def run():
+            session = await manager.create_session('node', config={'max_pattern_length': 5})
+            for step in range(4):
+                session = await manager.get_session(session.session_id)
+                _observe(session, step)
+                assert await manager.update_session(session)
+            loaded = await manager.get_session(session.session_id)
+            return session, loaded
+
+        session, loaded = asyncio.run(run())
+        assert _state(loaded) == _state(session)
+        assert loaded.session_config.max_pattern_length == 5
+        assert loaded.node_id == 'node'
+
+    def test_partial_read_leaves_other_parts(self):
+        manager = _manager()
+
+        async def run():
+            session = await manager.create_session('node')
+            _observe(session, 3)
+            await manager.update_session(session)
+
+            partial = await manager.get_session(session.session_id, parts=('stm',))
+            assert partial.predictions == [] and partial.emotives_accumulator == []
+            partial.stm = partial.stm + [['new']]
+            await manager.update_session(partial)
+
+            # Assigned parts are written even when they were not read
+            partial = await manager.get_session(session.session_id, parts=('stm',))
+            partial.predictions = []
+            await manager.update_session(partial)
+            return session, await manager.get_session(session.session_id)
+
+        session, loaded = asyncio.run(run())
+        assert loaded.stm == session.stm + [['new']]
+        assert loaded.emotives_accumulator == session.emotives_accumulator
+        assert loaded.metadata_accumulator == session.metadata_accumulator
+        assert loaded.percept_data == session.percept_data
+        assert loaded.predictions == []
+
+    def test_saves_send_deltas(self):
+        manager = _manager()
+        sent = []
+        script = manager._save_script
+
+        async def recording_script(keys, args):
+            sent.append(args)
+            return await script(keys=keys, args=args)
+
+        manager._save_script = recording_script
+
+        async def run():
+            session = await manager.create_session('node')
+            for step in range(3):
+                session = await manager.get_session(session.session_id, parts=('stm', 'emotives', 'metadata'))
+                _observe(session, step)
+                await manager.update_session(session)
+            # Rolling window: drop the first event
+            session = await manager.get_session(session.session_id)
+            session.stm = session.stm[1:] + [['last']]
+            await manager.update_session(session)
+            return session
+
+        session = asyncio.run(run())
+        fields, deltas = _parse_save_args(sent[3])
+        assert set(fields) == {'core', 'percept', 'predictions'}
+        assert deltas[0] == (2, 0, [b'["s2","x"]'])
+        assert deltas[1] == (2, 0, [b'{"joy":0.2}'])
+        fields, deltas = _parse_save_args(sent[4])
+        assert deltas == [(3, 1, [b'["last"]']), (3, 0, []), (3, 0, [])]
+        assert 'predictions' not in fields
+        stm_key = session_keys(f"{manager.key_prefix}{session.session_id}")[1]
+        stored = asyncio.run(manager.data_client.lrange(stm_key, 0, -1))
+        assert stored == [b'["s1","x"]', b'["s2","x"]', b'["last"]']
+
+    def test_stale_writer_rewrites(self):
+        manager = _manager()
+
+        async def run():
+            session = await manager.create_session('node')
+            first = await manager.get_session(session.session_id)
+            second = await manager.get_session(session.session_id)
+            _observe(first, 1)
+            await manager.update_session(first)
+            second.stm = [['other']]
+            await manager.update_session(second)
+            return await manager.get_session(session.session_id)
+
+        loaded = asyncio.run(run())
+        assert loaded.stm == [['other']]
+        assert loaded.emotives_accumulator == []
+
+    def test_legacy_document_is_read_and_converted(self):
+        legacy, compact = _manager(compact_layout=False), _manager()
+        compact.redis_client, compact.data_client = legacy.redis_client, legacy.data_client
+        compact._load_script, compact._save_script = legacy._load_script, legacy._save_script
+
+        async def run():
+            session = await legacy.create_session('node')
+            _observe(session, 2)
+            await legacy.update_session(session)
+            key = f"{legacy.key_prefix}{session.session_id}"
+            assert await legacy.redis_client.type(key) == 'string'
+
+            loaded = await compact.get_session(session.session_id)
+            assert _state(loaded) == _state(session)
+            _observe(loaded, 3)
+            await compact.update_session(loaded)
+            assert await compact.redis_client.type(key) == 'hash'
+            return loaded, await compact.get_session(session.session_id)
+
+        session, loaded = asyncio.run(run())
+        assert _state(loaded) == _state(session)
+
+    def test_load_refreshes_ttl_and_delete_removes_keys(self):
+        manager = _manager(ttl=100)
+
+        async def run():
+            session = await manager.create_session('node')
+            _observe(session, 1)
+            await manager.update_session(session)
+            keys = session_keys(f"{manager.key_prefix}{session.session_id}")
+            for key in keys:
+                await manager.data_client.expire(key, 5)
+            await manager.get_session(session.session_id)
+            ttls = [await manager.data_client.ttl(key) for key in keys]
+            assert await manager.get_session_lock(session.session_id) is not None
+            assert await manager.delete_session(session.session_id)
+            return ttls, [await manager.data_client.exists(key) for key in keys]
+
+        ttls, exists = asyncio.run(run())
+        assert all(95 <= ttl <= 100 for ttl in ttls)
+        assert exists == [0, 0, 0, 0]
@@ -0,0 +1,171 @@
+"""
+Materialized single-symbol prediction tests for KATO.
+
+These tests validate:
+1. Predictions served from the store equal freshly computed ones, with the
+   pattern frequency and emotives read per call, and skip the ClickHouse
+   scan; callers cannot modify stored predictions through returned lists
+2. Learning a pattern invalidates only the entry of its first symbol;
+   deletes and clears invalidate the kb; invalidations in another process
+   are seen through Redis versions
+3. Results are not stored while the symbol settles after a write, limits
+   beyond the stored depth are recomputed, and affinity-weighted
+   predictions are not materialized
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import kato.storage.connection_manager as connection_manager
+from kato.searches.pattern_search import PatternSearcher
+from kato.searches.single_symbol_predictions import (
+    SingleSymbolPredictions,
+    get_single_symbol_predictions,
+    reset_single_symbol_predictions,
+)
+from kato.workers.pattern_processor import PatternProcessor
+from fixtures.fake_backends import FakeClickHouse, FakeRedis
+
+
+PATTERNS = {
+    'p1': [['a'], ['b'], ['c']],
+    'p2': [['a', 'x'], ['d']],
+    'p3': [['a'], ['b']],
+    'p4': [['b'], ['c']],
+}
+
+
+@pytest.fixture
+def clickhouse(monkeypatch):
+    client = FakeClickHouse(dict(PATTERNS))
+    monkeypatch.setattr(connection_manager, 'get_clickhouse_client', lambda: client)
+    reset_single_symbol_predictions(settle_ms=0)
+    yield client
+    reset_single_symbol_predictions()
+
+
+def _processor(metadata=None, session_config=None, redis=None):
+    processor = object.__new__(PatternProcessor)
+    processor.name = 'test'
+    processor.kb_id = 'kb'
+    processor.max_predictions = 10
+    processor.use_token_matching = True
+    metadata = metadata if metadata is not None else {}
+    processor.superkb = SimpleNamespace(
+        id='kb',
+        clickhouse_writer=SimpleNamespace(flush_if_pending=lambda: 0),
+        redis_writer=SimpleNamespace(get_metadata_batch=lambda names: {
+            n: metadata.get(n, {'name': n, 'frequency': 1}) for n in names}),
+    )
+    processor.patterns_searcher = SimpleNamespace(session_config=session_config, redis_client=redis)
+    return processor
+
+
+def _predict(processor, symbol, max_predictions=None):
+    return asyncio.run(processor._predict_single_symbol_fast(symbol, [[symbol]],
+                                                             max_predictions=max_predictions))
+
+
+class TestMaterialized:
+    """Lookups against fresh computation."""
+
+    def test_hit_matches_fresh_prediction(self, clickhouse):
+        metadata = {'p1': {'name': 'p1', 'frequency': 3, 'emotives': [{'joy': 1.0}, {'joy': 0.0}]}}
+        processor = _processor(metadata)
+        first = _predict(processor, 'a')
+        assert {p['name'] for p in first} == {'p1', 'p2', 'p3'}
+        assert len(clickhouse.queries) == 1
+
+        metadata['p1'] = {'name': 'p1', 'frequency': 4, 'emotives': [{'joy': 1.0}]}
+        second = _predict(processor, 'a')
+        assert len(clickhouse.queries) == 1
+        assert [p['name'] for p in second] == [p['name'] for p in first]
+        p1 = next(p for p in second if p['name'] == 'p1')
+        assert (p1['frequency'], p1['emotives']) == (4, {'joy': 1.0})
+
+        reset_single_symbol_predictions(max_predictions=0)
+        assert _predict(processor, 'a') == second
+        assert get_single_symbol_predictions().get_stats()['hits'] == 0
+
+    def test_depth_and_limit(self, clickhouse):
+        reset_single_symbol_predictions(settle_ms=0, depth=1)
+        processor = _processor()
+        assert len(_predict(processor, 'a', max_predictions=1)) == 1
+        assert len(_predict(processor, 'a', max_predictions=1)) == 1
+        assert len(clickhouse.queries) == 1
+        # More than the stored depth of an incomplete entry: recomputed
+        assert len(_predict(processor, 'a', max_predictions=3)) == 3
+        assert len(clickhouse.queries) == 2
+
+    def test_returned_lists_are_copies(self, clickhouse):
+        processor = _processor()
+        first = _predict(processor, 'a')
+        for prediction in first:
+            for value in prediction.values():
+                if isinstance(value, list):
+                    value.append('mutated')
+                    if value[:-1] and isinstance(value[0], list):
+                        value[0].append('mutated')
+        assert 'mutated' not in str(_predict(processor, 'a'))
+        assert len(clickhouse.queries) == 1
+
+    def test_affinity_weighting_is_not_materialized(self, clickhouse, monkeypatch):
+        processor = _processor(session_config=SimpleNamespace(affinity_emotive='joy'))
+        monkeypatch.setattr(PatternProcessor, '_compute_affinity_weights', lambda *args, **kwargs: None)
+        _predict(processor, 'a')
+        _predict(processor, 'a')
+        assert len(clickhouse.queries) == 2
+
+
+class TestInvalidation:
+    """Incremental invalidation."""
+
+    def test_learning_invalidates_the_first_symbol(self, clickhouse):
+        processor = _processor()
+        _predict(processor, 'a')
+        _predict(processor, 'b')
+
+        clickhouse.patterns['p5'] = [['a'], ['z']]
+        searcher = object.__new__(PatternSearcher)
+        searcher.kb_id, searcher.redis_client = 'kb', None
+        searcher._record_kb_write(['a'])
+
+        assert 'p5' in {p['name'] for p in _predict(processor, 'a')}
+        _predict(processor, 'b')
+        assert len(clickhouse.queries) == 3
+
+        # Deletes and clears invalidate every symbol of the kb
+        searcher._record_kb_write()
+        assert len(get_single_symbol_predictions()) == 0
+
+    def test_settling_results_are_not_stored(self, clickhouse):
+        reset_single_symbol_predictions(settle_ms=50)
+        processor = _processor()
+        get_single_symbol_predictions().invalidate('kb', ['a'])
+        _predict(processor, 'a')
+        _predict(processor, 'a')
+        assert len(clickhouse.queries) == 2
+        time.sleep(0.06)
+        _predict(processor, 'a')
+        _predict(processor, 'a')
+        assert len(clickhouse.queries) == 3
+
+    def test_invalidation_through_another_process(self):
+        redis = FakeRedis()
+        this, other = SingleSymbolPredictions(settle_ms=50), SingleSymbolPredictions(settle_ms=50)
+        ranked = [{'name': 'p1', 'potential': 1.0}]
+        this.put('kb', 'a', True, this.begin('kb', 'a', redis), ranked, 10)
+        this.put('kb', 'b', True, this.begin('kb', 'b', redis), ranked, 10)
+
+        other.invalidate('kb', ['a'], redis)
+        assert this.get('kb', 'a', True, this.begin('kb', 'a', redis), 10) is None
+        assert this.get('kb', 'b', True, this.begin('kb', 'b', redis), 10) == ranked
+        assert not this.begin('kb', 'a', redis).settled
+        time.sleep(0.06)
+        assert this.begin('kb', 'a', redis).settled
+
+        other.invalidate_kb('kb', redis)
+        assert this.get('kb', 'b', True, this.begin('kb', 'b', redis), 10) is None
@@ -0,0 +1,132 @@
+"""
+STM sketch tests for the KATO filter pipeline.
+
+These tests validate:
+1. Signatures, LSH bands, length and token set of an incrementally synced
+   sketch equal MinHashFilter's batch computation over the same STM, across
+   appended, rolled-off, cleared and replaced events
+2. Syncing hashes only tokens entering the STM
+3. Filters built with a sketch send the same predicates as filters built
+   from the flattened state
+4. The registry keeps one sketch per (kb, session), bounded by LRU
+"""
+
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import kato.filters.stm_sketch as sketch_module
+from kato.filters.jaccard_filter import JaccardFilter
+from kato.filters.length_filter import LengthFilter
+from kato.filters.minhash_filter import MinHashFilter
+from kato.filters.stm_sketch import StmSketch, StmSketchRegistry
+
+CONFIG = SimpleNamespace(minhash_threshold=0.5, minhash_bands=20, minhash_rows=5, minhash_num_hashes=100,
+                         length_min_ratio=0.5, length_max_ratio=2.0,
+                         jaccard_threshold=0.2, jaccard_min_overlap=1)
+
+
+def _transitions(seed, steps=300):
+    rng = random.Random(seed)
+    stm = []
+    for _ in range(steps):
+        r = rng.random()
+        if r < 0.5:
+            stm = stm + [[f"t{rng.randrange(25)}" for _ in range(rng.randint(1, 4))]]
+        elif r < 0.8 and stm:
+            stm = stm[1:] + [[f"t{rng.randrange(25)}"]]
+        elif r < 0.9:
+            stm = stm[-1:]
+        else:
+            stm = [[f"u{rng.randrange(25)}"] for _ in range(rng.randint(0, 4))]
+        yield stm
+
+
+def _state(stm):
+    return [t for event in stm for t in event]
+
+
+class TestStmSketch:
+    """Incremental maintenance against batch computation."""
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_matches_batch_computation(self, seed):
+        sketch = StmSketch()
+        for stm in _transitions(seed):
+            sketch.sync(stm)
+            state = _state(stm)
+            assert list(sketch.events) == stm
+            assert sketch.length == len(state)
+            assert sketch.tokens == set(state)
+            if not state:
+                continue
+            batch = MinHashFilter(CONFIG, state)
+            assert np.array_equal(sketch.minhash(100).hashvalues, batch.stm_minhash.hashvalues)
+            assert sketch.lsh_bands(100, 20, 5) == batch.stm_lsh_bands
+
+    def test_other_signature_sizes(self):
+        config = SimpleNamespace(minhash_threshold=0.5, minhash_bands=16, minhash_rows=4, minhash_num_hashes=64)
+        sketch = StmSketch()
+        for stm in _transitions(7, steps=50):
+            sketch.sync(stm)
+            if _state(stm):
+                batch = MinHashFilter(config, _state(stm))
+                assert sketch.lsh_bands(64, 16, 4) == batch.stm_lsh_bands
+                assert sketch.lsh_bands(100, 20, 5) == MinHashFilter(CONFIG, _state(stm)).stm_lsh_bands
+
+    def test_only_new_tokens_are_hashed(self, monkeypatch):
+        hashed = []
+        vector = sketch_module._Signature.vector
+        monkeypatch.setattr(sketch_module._Signature, 'vector',
+                            lambda self, token: hashed.append(token) or vector(self, token))
+
+        stm = [['a', 'b'], ['c'], ['a']]
+        sketch = StmSketch(stm)
+        sketch.lsh_bands(100, 20, 5)
+        assert sorted(hashed) == ['a', 'b', 'c']
+
+        # ROLLING: one event rolls off, one is appended
+        hashed.clear()
+        stm = stm[1:] + [['d', 'c']]
+        sketch.sync(stm)
+        sketch.lsh_bands(100, 20, 5)
+        assert hashed == ['d']
+        assert sketch.tokens == {'a', 'c', 'd'}
+
+        # Replaced STM reuses the vectors of tokens still present
+        hashed.clear()
+        sketch.sync([['d'], ['e']])
+        assert hashed == ['e']
+
+
+class TestFiltersWithSketch:
+    """Filters read the sketch instead of the flattened state."""
+
+    def test_same_predicates(self):
+        stm = [['x', 'y'], ['z', 'x'], ['w']]
+        state = _state(stm)
+        sketch = StmSketch(stm)
+        assert (LengthFilter(CONFIG, state, sketch=sketch).get_db_condition()
+                == LengthFilter(CONFIG, state).get_db_condition())
+        assert JaccardFilter(CONFIG, state, sketch=sketch).stm_tokens == JaccardFilter(CONFIG, state).stm_tokens
+        assert (MinHashFilter(CONFIG, state, kb_id='kb', sketch=sketch).get_db_condition()
+                == MinHashFilter(CONFIG, state, kb_id='kb').get_db_condition())
+
+
+class TestStmSketchRegistry:
+    """One sketch per session."""
+
+    def test_sessions_and_lru(self):
+        registry = StmSketchRegistry(max_sessions=2)
+        first = registry.sync('kb', 's1', [['a']])
+        assert registry.sync('kb', 's1', [['a'], ['b']]) is first
+        assert first.tokens == {'a', 'b'}
+        assert registry.sync('kb', 's2', [['c']]) is not first
+        registry.sync('kb', 's3', [['d']])
+
+        stats = registry.get_stats()
+        assert (stats['sessions'], stats['hits'], stats['misses']) == (2, 1, 3)
+        # s1 was least recently used
+        assert registry.sync('kb', 's1', [['a']]) is not first
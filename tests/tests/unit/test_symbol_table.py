@@ -0,0 +1,176 @@
+"""
+Incremental symbol table tests for KATO.
+
+These tests validate:
+1. A learn applies its own symbol delta in-process (no HGETALL reload)
+2. A table in another worker catches up from the Redis change log
+3. A trimmed change log or a cleared kb falls back to a full reload
+4. get_all() returns a snapshot that later learns do not change
+"""
+
+from collections import Counter
+
+import kato.storage.symbol_table as symbol_table_module
+from kato.storage.redis_writer import RedisWriter
+from kato.storage.symbol_table import SymbolTable
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    """The subset of redis-py used by RedisWriter and SymbolTable (decode_responses=True)."""
+
+    def __init__(self):
+        self.data = {}
+        self.next_id = 0
+        self.hgetall_calls = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hincrby(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+        return int(h[field])
+
+    def hgetall(self, key):
+        self.hgetall_calls += 1
+        return dict(self.data.get(key, {}))
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def incrby(self, key, amount):
+        self.data[key] = str(int(self.data.get(key, 0)) + amount)
+        return int(self.data[key])
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for k in keys if self.data.pop(k, None) is not None)
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        self.next_id += 1
+        entries = self.data.setdefault(key, [])
+        entries.append((f"{self.next_id}-0", dict(fields)))
+        if maxlen is not None:
+            del entries[:-maxlen]
+        return f"{self.next_id}-0"
+
+    def xrange(self, key, min='-', max='+'):
+        start = int(min[1:].split('-')[0]) if min.startswith('(') else 0
+        return [e for e in self.data.get(key, []) if int(e[0].split('-')[0]) > start]
+
+    def xrevrange(self, key, max='+', min='-', count=None):
+        return list(reversed(self.data.get(key, [])))[:count]
+
+
+def _learn(writer, symbols, is_new=True):
+    counts = Counter(symbols)
+    writer.batch_update_symbol_stats(counts, f"PTRN|{sorted(counts)}", is_new, len(symbols))
+
+
+class TestSymbolTable:
+    """Test delta application, catch-up and reload paths."""
+
+    def test_local_learn_applies_delta(self):
+        """The writer's own learns update the table without re-reading the hashes."""
+        client = FakeRedis()
+        writer = RedisWriter('kb_local', client)
+        table = writer.symbol_table
+        table.invalidate()
+        _learn(writer, ['a', 'b'])
+        table.get_all()
+        reads = client.hgetall_calls
+
+        _learn(writer, ['a', 'a', 'c'])
+        _learn(writer, ['a', 'b'], is_new=False)
+        symbols = table.get_all()
+
+        assert client.hgetall_calls == reads
+        assert table.local_applies == 2
+        assert symbols == writer.get_all_symbols_batch()
+        assert symbols['a'] == {'name': 'a', 'frequency': 4, 'pattern_member_frequency': 2}
+
+    def test_other_worker_catches_up_from_changelog(self):
+        """A table in another process applies log entries instead of reloading."""
+        client = FakeRedis()
+        writer = RedisWriter('kb_remote', client)
+        reader = SymbolTable('kb_remote', client)
+        _learn(writer, ['x', 'y'])
+        reader.get_all()
+
+        _learn(writer, ['y', 'z'])
+        _learn(writer, ['x'], is_new=False)
+        symbols = reader.get_all()
+
+        assert reader.full_reloads == 1
+        assert reader.entries_applied == 2
+        assert symbols == writer.get_all_symbols_batch()
+
+    def test_trimmed_changelog_reloads(self, monkeypatch):
+        """Falling behind the capped log triggers a full reload."""
+        monkeypatch.setattr(symbol_table_module, 'SYMBOL_CHANGELOG_MAXLEN', 2)
+        client = FakeRedis()
+        writer = RedisWriter('kb_trim', client)
+        reader = SymbolTable('kb_trim', client)
+        reader.get_all()
+
+        for i in range(5):
+            _learn(writer, [f"s{i}", 'common'])
+
+        assert reader.get_all() == writer.get_all_symbols_batch()
+        assert reader.full_reloads == 2
+
+    def test_cleared_kb_starts_new_epoch(self):
+        """After a clear, matching version numbers do not hide the reset."""
+        client = FakeRedis()
+        writer = RedisWriter('kb_clear', client)
+        reader = SymbolTable('kb_clear', client)
+        _learn(writer, ['old'])
+        reader.get_all()
+
+        client.data.clear()
+        _learn(writer, ['new'])
+
+        assert reader.get_all() == {'new': {'name': 'new', 'frequency': 1, 'pattern_member_frequency': 1}}
+        assert reader.full_reloads == 2
+
+    def test_get_all_returns_a_snapshot(self):
+        """A returned table is not changed by a catch-up running after it."""
+        client = FakeRedis()
+        writer = RedisWriter('kb_snapshot', client)
+        reader = SymbolTable('kb_snapshot', client)
+        _learn(writer, ['a'])
+        before = reader.get_all()
+        assert reader.get_all() is before
+
+        _learn(writer, ['a', 'b'])
+        after = reader.get_all()
+        assert before == {'a': {'name': 'a', 'frequency': 1, 'pattern_member_frequency': 1}}
+        assert after['a']['frequency'] == 2 and 'b' in after
@@ -0,0 +1,158 @@
+"""
+Integer token schema (schema v2) tests for KATO.
+
+These tests validate:
+1. TokenDictionary assigns stable kb-scoped IDs shared across processes
+   through Redis; lookups never assign
+2. ClickHouseWriter with a dictionary writes sorted token_ids and an empty
+   token_set, assigning a bulk block's tokens in one pass
+3. The Jaccard predicate on token_ids selects the same patterns as the
+   string predicate, including STM tokens that have no ID
+4. The executor hands the kb's dictionary to the Jaccard stage when
+   KATO_TOKEN_IDS is enabled
+"""
+
+import random
+from types import SimpleNamespace
+
+import kato.filters.executor as executor_module
+from kato.filters.jaccard_filter import JaccardFilter
+from kato.representations.pattern import Pattern
+from kato.storage.clickhouse_writer import ClickHouseWriter
+from kato.storage.token_dictionary import TokenDictionary
+from fixtures.fake_backends import FakeClickHouse, FakeRedis, make_executor
+
+
+def _jaccard(stm, dictionary=None, threshold=0.3, min_overlap=2):
+    config = SimpleNamespace(jaccard_threshold=threshold, jaccard_min_overlap=min_overlap)
+    return JaccardFilter(config, stm, token_dictionary=dictionary)
+
+
+def _passes(condition, token_ids, token_count):
+    """Evaluate the token_ids predicate in Python (hasAny, overlap and ratio)."""
+    if condition == "0":
+        return False
+    stm_ids = set(map(int, condition.split('hasAny(token_ids, [')[1].split(']')[0].split(', ')))
+    overlap = len(set(token_ids) & stm_ids)
+    min_overlap = int(condition.split('>= ')[1].split()[0])
+    threshold = float(condition.split('>= ')[-1].split()[0])
+    stm_size = int(condition.split('token_count + ')[1].split()[0])
+    return (overlap > 0 and overlap >= min_overlap
+            and overlap / (token_count + stm_size - overlap) >= threshold)
+
+
+class TestTokenDictionary:
+    """Kb-scoped ID assignment."""
+
+    def test_ids_are_stable_and_shared(self):
+        redis = FakeRedis()
+        this, other = TokenDictionary('kb', redis), TokenDictionary('kb', redis)
+        first = this.assign(['a', 'b', 'a'])
+        assert sorted(first.values()) == [1, 2]
+        assert this.assign(['b', 'c']) == {'b': first['b'], 'c': 3}
+
+        calls = redis.calls
+        assert this.lookup(['a', 'b', 'c']) == {'a': first['a'], 'b': first['b'], 'c': 3}
+        assert redis.calls == calls
+
+        # Another process sees the same IDs and only assigns new tokens
+        assert other.assign(['c', 'd']) == {'c': 3, 'd': 4}
+        assert other.lookup(['zzz']) == {}
+        assert TokenDictionary('other_kb', redis).assign(['a']) == {'a': 1}
+
+    def test_lost_race_keeps_the_winner(self, monkeypatch):
+        redis = FakeRedis()
+        this, other = TokenDictionary('kb', redis), TokenDictionary('kb', redis)
+        read = this._read
+        raced = []
+
+        def racing_read(tokens):
+            if not raced:
+                # The other process claims the token between our read and HSETNX
+                raced.append(other.assign(tokens))
+                return {}
+            return read(tokens)
+
+        monkeypatch.setattr(this, '_read', racing_read)
+        assert this.assign(['x']) == raced[0] == {'x': 1}
+        assert this.lookup(['x']) == {'x': 1}
+
+
+class TestWriter:
+    """token_ids rows written by ClickHouseWriter."""
+
+    def test_token_ids_replace_token_set(self):
+        client = FakeClickHouse()
+        dictionary = TokenDictionary('kb', FakeRedis())
+        ClickHouseWriter('kb', client, token_dictionary=dictionary).write_pattern(Pattern([['b', 'a'], ['b', 'c']]))
+
+        _, rows, columns = client.inserts[0]
+        row = dict(zip(columns, rows[0]))
+        assert row['token_set'] == []
+        assert row['token_ids'] == sorted(dictionary.lookup(['a', 'b', 'c']).values())
+        assert row['token_count'] == 3
+
+    def test_bulk_assigns_once_per_block(self):
+        redis = FakeRedis()
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb', client, token_dictionary=TokenDictionary('kb', redis))
+        writer.write_patterns_bulk([Pattern([[f"t{i}"], [f"t{i + 1}"]]) for i in range(50)])
+        # One HMGET, one INCRBY and one HSETNX pipeline for the whole block
+        assert redis.calls == 3
+
+    def test_without_dictionary_schema_is_unchanged(self):
+        client = FakeClickHouse()
+        ClickHouseWriter('kb', client).write_pattern(Pattern([['a'], ['b']]))
+        _, rows, columns = client.inserts[0]
+        assert 'token_ids' not in columns
+        assert sorted(rows[0][columns.index('token_set')]) == ['a', 'b']
+
+
+class TestJaccardOnTokenIds:
+    """Integer predicate against the string predicate."""
+
+    def test_same_patterns_as_string_sets(self):
+        rng = random.Random(7)
+        vocabulary = [f"tok{i}" for i in range(30)]
+        dictionary = TokenDictionary('kb', FakeRedis())
+        patterns = [set(rng.sample(vocabulary[:20], rng.randint(1, 10))) for _ in range(200)]
+        dictionary.assign(vocabulary[:20])
+
+        for _ in range(20):
+            # STMs draw from tokens no pattern has (no ID) as well
+            stm = rng.sample(vocabulary, rng.randint(1, 12))
+            for threshold, min_overlap in ((0.3, 2), (0.1, 1), (0.5, 3)):
+                condition = _jaccard(stm, dictionary, threshold, min_overlap).get_db_condition()
+                for tokens in patterns:
+                    overlap = len(tokens & set(stm))
+                    expected = overlap >= min_overlap and overlap / len(tokens | set(stm)) >= threshold
+                    ids = dictionary.encode_set(tokens)
+                    assert _passes(condition, ids, len(tokens)) == expected
+
+    def test_conditions(self):
+        dictionary = TokenDictionary('kb', FakeRedis())
+        dictionary.assign(['a', 'b'])
+        condition = _jaccard(['a', 'b', 'c'], dictionary).get_db_condition()
+        assert 'hasAny(token_ids, [1, 2])' in condition
+        assert 'token_set' not in condition and "'a'" not in condition
+
+        assert _jaccard(['x', 'y'], dictionary).get_db_condition() == "0"
+        assert 'token_set' in _jaccard(['a', 'b']).get_db_condition()
+
+
+class TestExecutorWiring:
+    """Dictionary handed to the Jaccard stage."""
+
+    def _jaccard_stage(self, redis):
+        executor = make_executor(None, ['a', 'b'], ['jaccard'], kb_id='kb', redis=redis)
+        return executor._create_filter_instance(JaccardFilter, 'jaccard')
+
+    def test_enabled(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'USE_TOKEN_IDS', True)
+        redis = FakeRedis()
+        TokenDictionary('kb', redis).assign(['a'])
+        assert self._jaccard_stage(redis).stm_ids == [1]
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(executor_module, 'USE_TOKEN_IDS', False)
+        assert self._jaccard_stage(FakeRedis()).stm_ids is None
@@ -0,0 +1,143 @@
+"""
+Token index tests for KATO.
+
+These tests validate:
+1. With the index enabled, ClickHouseWriter emits first and last token
+   index rows alongside each pattern and deleting a kb drops the index
+   partition; disabled, or with the table missing, no index rows are
+   written and flushes still succeed
+2. Token lookups read one index key range and fetch patterns_data by
+   primary key; top-K lookups rank the latest rows by frequency
+3. Frequencies are mirrored from Redis, re-inserting only changed rows
+4. The single-symbol fast path looks patterns up through the index and
+   falls back to the first_token scan when the index is unavailable
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import kato.storage.connection_manager as connection_manager
+import kato.workers.pattern_processor as pattern_processor_module
+from kato.representations.pattern import Pattern
+from kato.searches.single_symbol_predictions import reset_single_symbol_predictions
+from kato.storage.clickhouse_writer import ClickHouseWriter
+from kato.storage.token_index import TOKEN_INDEX_COLUMNS, patterns_by_token_query
+from kato.workers.pattern_processor import PatternProcessor
+from fixtures.fake_backends import FakeClickHouse, FakeRedis
+
+
+class TestWriterIndexRows:
+    """Index rows written by ClickHouseWriter."""
+
+    def test_flush_writes_first_and_last_token_rows(self):
+        client = FakeClickHouse()
+        pattern = Pattern([['a', 'b'], ['c']])
+        ClickHouseWriter('kb_test', client, token_index=True).write_pattern(pattern)
+
+        table, rows, columns = client.inserts[-1]
+        assert (table, columns) == ('kato.pattern_token_index', TOKEN_INDEX_COLUMNS)
+        assert rows == [['kb_test', 'first', 'a', pattern.name, 3, 1],
+                        ['kb_test', 'last', 'c', pattern.name, 3, 1]]
+
+    def test_bulk_write_and_delete(self):
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client, token_index=True)
+        writer.write_patterns_bulk([Pattern([['a'], ['b']]), Pattern([['c'], ['d']])])
+        index_rows = [r for t, rows, _ in client.inserts if t == 'kato.pattern_token_index' for r in rows]
+        assert len(index_rows) == 4
+
+        writer.delete_all_patterns()
+        assert any('kato.pattern_token_index DROP PARTITION' in c for c in client.commands)
+
+    def test_disabled_index_is_not_touched(self):
+        client = FakeClickHouse()
+        writer = ClickHouseWriter('kb_test', client, token_index=False)
+        writer.write_pattern(Pattern([['a'], ['b']]))
+        writer.write_patterns_bulk([Pattern([['c'], ['d']])])
+        writer.delete_all_patterns()
+        assert all(t != 'kato.pattern_token_index' for t, _, _ in client.inserts)
+        assert all('pattern_token_index' not in c for c in client.commands)
+
+    def test_missing_table_does_not_fail_the_flush(self):
+        client = FakeClickHouse(missing_tables=('kato.pattern_token_index',))
+        writer = ClickHouseWriter('kb_test', client, token_index=True)
+        writer.write_pattern(Pattern([['a'], ['b']]))
+        writer.write_pattern(Pattern([['c'], ['d']]))
+
+        # Each pattern is inserted once; index writes are switched off
+        tables = [t for t, _, _ in client.inserts]
+        assert tables.count('kato.patterns_data') == 2
+        assert not writer.token_index and not writer._token_buffer
+
+
+class TestLookupQuery:
+    """SQL of token lookups."""
+
+    def test_key_range_then_primary_key(self):
+        query = patterns_by_token_query('kb_test', 'a', 'last')
+        assert "position = 'last' AND token = 'a'" in query
+        assert "kb_id = 'kb_test' AND (length, name) IN (" in query
+        assert 'FINAL' not in query and 'LIMIT' not in query
+
+    def test_top_k_pushdown(self):
+        query = patterns_by_token_query('kb_test', "it's", top_k=5)
+        assert 'pattern_token_index FINAL' in query
+        assert query.endswith("ORDER BY frequency DESC, name LIMIT 5)")
+        assert "token = 'it\\'s'" in query
+
+        with pytest.raises(ValueError):
+            patterns_by_token_query('kb_test', 'a', 'middle')
+
+
+class TestFrequencyMirror:
+    """Redis frequencies copied into the index."""
+
+    def test_only_changed_rows_are_inserted(self):
+        client = FakeClickHouse(rows=[('first', 'a', 'p1', 2, 1), ('last', 'b', 'p1', 2, 1),
+                                      ('first', 'c', 'p2', 2, 4), ('last', 'd', 'p2', 2, 4),
+                                      ('first', 'e', 'p3', 2, 1), ('last', 'f', 'p3', 2, 1)])
+        redis = FakeRedis({'kb_test:frequency:p1': '3', 'kb_test:frequency:p2': '4'})
+
+        assert ClickHouseWriter('kb_test', client).mirror_frequencies(redis, batch_size=1) == 2
+        table, rows, _ = client.inserts[0]
+        assert table == 'kato.pattern_token_index'
+        assert sorted(rows) == [['kb_test', 'first', 'a', 'p1', 2, 3], ['kb_test', 'last', 'b', 'p1', 2, 3]]
+
+
+class TestSingleSymbolLookup:
+    """The single-symbol fast path reads through the index."""
+
+    @pytest.fixture(autouse=True)
+    def _no_store(self):
+        reset_single_symbol_predictions(max_predictions=0)
+        yield
+        reset_single_symbol_predictions()
+
+    def _predict(self, client, monkeypatch):
+        monkeypatch.setattr(connection_manager, 'get_clickhouse_client', lambda: client)
+        processor = object.__new__(PatternProcessor)
+        processor.name, processor.kb_id = 'test', 'kb_test'
+        processor.max_predictions = 10
+        processor.use_token_matching = True
+        processor.superkb = SimpleNamespace(
+            id='kb_test',
+            clickhouse_writer=SimpleNamespace(flush_if_pending=lambda: 0),
+            redis_writer=SimpleNamespace(get_metadata_batch=lambda names: {n: {'frequency': 1} for n in names}),
+        )
+        processor.patterns_searcher = SimpleNamespace(session_config=None, redis_client=None)
+        return asyncio.run(processor._predict_single_symbol_fast('a', [['a']]))
+
+    def test_index_lookup(self, monkeypatch):
+        monkeypatch.setattr(pattern_processor_module, 'USE_TOKEN_INDEX', True)
+        client = FakeClickHouse(rows=[('p1', [['a'], ['b']], 2)])
+        assert [p['name'] for p in self._predict(client, monkeypatch)] == ['p1']
+        assert len(client.queries) == 1
+        assert 'pattern_token_index' in client.queries[0]
+
+    def test_scan_fallback(self, monkeypatch):
+        monkeypatch.setattr(pattern_processor_module, 'USE_TOKEN_INDEX', True)
+        client = FakeClickHouse(rows=[('p1', [['a'], ['b']], 2)], fail_on='pattern_token_index')
+        assert [p['name'] for p in self._predict(client, monkeypatch)] == ['p1']
+        assert "first_token = 'a'" in client.queries[-1]
@@ -0,0 +1,139 @@
+"""
+Top-K bounded matching tests for KATO.
+
+These tests validate:
+1. pre_potential_upper_bound() is never below the pre-potential of the
+   aligned prediction
+2. Bounded matching returns every prediction exhaustive matching ranks in the
+   top_k by pre-potential, so predictPattern's pruning keeps the same set
+3. Candidates that cannot enter the top_k are not aligned
+4. Bounded matching is off unless KATO_TOPK_BOUNDED_MATCHING is set
+5. Every batch of a call matches against the candidate map the call started
+   with, even if the searcher's patterns_cache is replaced in between
+"""
+
+import asyncio
+import heapq
+import random
+
+import pytest
+
+import kato.searches.pattern_search as pattern_search_module
+from kato.representations.prediction import pre_potential
+from kato.searches.pattern_search import InformationExtractor, PatternSearcher, pre_potential_upper_bound
+
+
+class FakeFilterExecutor:
+    def __init__(self, patterns):
+        self.patterns = patterns
+
+    def get_pattern(self, name):
+        events = self.patterns[name]
+        return {'pattern_data': events, 'length': sum(map(len, events))}
+
+
+def _searcher(seed, count=300):
+    rng = random.Random(seed)
+    patterns = {}
+    for i in range(count):
+        events = [[f"t{rng.randint(0, 12)}" for _ in range(rng.randint(1, 3))]
+                  for _ in range(rng.randint(1, 12))]
+        patterns[f"PTRN|{i:04d}"] = events
+
+    searcher = PatternSearcher.__new__(PatternSearcher)
+    searcher.kb_id = 'kb_test'
+    searcher.recall_threshold = 0.1
+    searcher.session_config = None
+    searcher.redis_client = None
+    searcher.use_hybrid_architecture = False
+    searcher.use_indexing = False
+    searcher.index_manager = None
+    searcher.use_fast_matching = True
+    searcher.use_token_matching = True
+    searcher.affinity_weights = None
+    searcher.extractor = InformationExtractor(use_fast_matcher=True, use_token_matching=True,
+                                              use_int_matching=False)
+    searcher.patterns_cache = {name: [t for event in events for t in event] for name, events in patterns.items()}
+    searcher.patterns_count = len(patterns)
+    searcher.filter_executor = FakeFilterExecutor(patterns)
+    stm_events = [[f"t{rng.randint(0, 12)}" for _ in range(2)] for _ in range(3)]
+    return searcher, stm_events
+
+
+def _predict(searcher, stm_events, top_k=None):
+    state = [t for event in stm_events for t in event]
+    return asyncio.run(searcher.causalBeliefAsync(state, stm_events=stm_events, max_workers=2,
+                                                  batch_size=25, top_k=top_k))
+
+
+def _top(predictions, k):
+    return heapq.nlargest(k, predictions, key=pre_potential)
+
+
+class TestUpperBound:
+    """The bound holds for every aligned prediction."""
+
+    @pytest.mark.parametrize('seed', range(6))
+    def test_bound_is_admissible(self, seed):
+        searcher, stm_events = _searcher(seed)
+        state = [t for event in stm_events for t in event]
+        for pred in _predict(searcher, stm_events):
+            pattern = searcher.patterns_cache[pred['name']]
+            unmatched = sum(1 for t in state if t not in pattern)
+            value = pre_potential(pred)
+            assert value <= pre_potential_upper_bound(len(pattern), len(state), pred['similarity'], unmatched)
+            assert value <= pre_potential_upper_bound(len(pattern), len(state), unmatched=unmatched)
+            assert value <= pre_potential_upper_bound(len(pattern), len(state))
+
+
+class TestBoundedMatching:
+    """Differential tests against exhaustive matching."""
+
+    @pytest.mark.parametrize('seed,top_k', [(0, 5), (1, 30), (2, 60), (3, 1)])
+    def test_identical_to_exhaustive(self, monkeypatch, seed, top_k):
+        searcher, stm_events = _searcher(seed)
+        exhaustive = _predict(searcher, stm_events)
+        assert len(exhaustive) > top_k
+
+        aligned = []
+        process_batch = searcher._process_batch_rapidfuzz
+
+        def counting(state, candidates, weights=None, sequences=None):
+            aligned.extend(candidates)
+            return process_batch(state, candidates, weights, sequences)
+
+        monkeypatch.setattr(pattern_search_module, 'TOPK_BOUNDED_MATCHING', True)
+        monkeypatch.setattr(searcher, '_process_batch_rapidfuzz', counting)
+        bounded = _predict(searcher, stm_events, top_k=top_k)
+
+        expected = _top(exhaustive, top_k)
+        floor = pre_potential(expected[-1])
+        # Everything at or above the top_k-th pre-potential, ties included
+        assert {p['name'] for p in bounded} == {p['name'] for p in exhaustive if pre_potential(p) >= floor}
+        assert sorted(map(pre_potential, _top(bounded, top_k))) == sorted(map(pre_potential, expected))
+        by_name = {p['name']: p for p in exhaustive}
+        for pred in bounded:
+            assert pred.materialize() == by_name[pred['name']].materialize()
+        assert len(aligned) < len(searcher.patterns_cache)
+
+    def test_cache_replaced_between_batches(self, monkeypatch):
+        monkeypatch.setattr(pattern_search_module, 'TOPK_BOUNDED_MATCHING', True)
+        searcher, stm_events = _searcher(1)
+        expected = {p['name'] for p in _predict(searcher, stm_events, top_k=30)}
+
+        process_batch = searcher._process_batch_rapidfuzz
+
+        def replacing(state, candidates, weights=None, sequences=None):
+            results = process_batch(state, candidates, weights, sequences)
+            # Another session's filter run replaces the searcher's map
+            searcher.patterns_cache = {}
+            return results
+
+        monkeypatch.setattr(searcher, '_process_batch_rapidfuzz', replacing)
+        assert {p['name'] for p in _predict(searcher, stm_events, top_k=30)} == expected
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.setattr(pattern_search_module, 'TOPK_BOUNDED_MATCHING', False)
+        searcher, stm_events = _searcher(0)
+        exhaustive = _predict(searcher, stm_events)
+        assert len(_predict(searcher, stm_events, top_k=5)) == len(exhaustive)